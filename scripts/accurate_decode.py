@@ -0,0 +1,124 @@
+"""
+Typed, partial decoding of Accurate detail responses.
+
+sales-invoice/detail.do and item/detail.do return large payloads, but
+flatten_invoice() and the stock loop only read a dozen fields. With msgspec
+installed, responses are decoded straight into TypedDicts that declare just
+those fields: unknown subtrees are skipped by the parser instead of being built
+as Python dicts, and the result is still a plain dict, so callers keep using
+.get().
+
+Without msgspec, falls back to orjson (full decode, faster parser) and then to
+the standard json module. Any response that does not match the schema (e.g. an
+error body with "s": false) is decoded in full.
+"""
+
+import json
+from typing import List, Optional, TypedDict
+
+try:
+    import msgspec
+except ImportError:  # Optional - full decode fallback
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # Optional - stdlib json fallback
+    orjson = None
+
+
+# --- Fields read by flatten_invoice() ---
+
+
+class _Named(TypedDict, total=False):
+    name: Optional[str]
+
+
+class _LineItem(TypedDict, total=False):
+    no: Optional[str]
+    name: Optional[str]
+    cost: Optional[float]
+    vendorPrice: Optional[float]
+
+
+class _InvoiceLine(TypedDict, total=False):
+    item: Optional[_LineItem]
+    itemUnit: Optional[_Named]
+    department: Optional[_Named]
+    warehouse: Optional[_Named]
+    quantity: Optional[float]
+    unitPrice: Optional[float]
+    totalPrice: Optional[float]
+    unitCost: Optional[float]
+    averageCost: Optional[float]
+    dppAmount: Optional[float]
+    tax1Amount: Optional[float]
+
+
+class _Invoice(TypedDict, total=False):
+    id: Optional[int]
+    number: Optional[str]
+    transDate: Optional[str]
+    customer: Optional[_Named]
+    branchName: Optional[str]
+    detailItem: Optional[List[_InvoiceLine]]
+    lastUpdate: Optional[str]
+    optLock: Optional[int]
+
+
+class InvoiceDetailResponse(TypedDict, total=False):
+    s: bool
+    d: _Invoice
+
+
+# --- Fields read by pull_inventory_stock() and item_master.extract_item() ---
+
+
+class _WarehouseBalance(TypedDict, total=False):
+    warehouseName: Optional[str]
+    balance: Optional[float]
+
+
+class _ItemDetail(TypedDict, total=False):
+    id: Optional[int]
+    no: Optional[str]
+    name: Optional[str]
+    unit1: Optional[_Named]
+    unitPrice: Optional[float]
+    vendorPrice: Optional[float]
+    cost: Optional[float]
+    averageCost: Optional[float]
+    detailWarehouseData: Optional[List[_WarehouseBalance]]
+    lastUpdate: Optional[str]
+    optLock: Optional[int]
+
+
+class ItemDetailResponse(TypedDict, total=False):
+    s: bool
+    d: _ItemDetail
+
+
+def _full_decode(body: bytes):
+    if orjson:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _make_decoder(response_type):
+    if not msgspec:
+        return _full_decode
+
+    decoder = msgspec.json.Decoder(response_type)
+
+    def decode(body: bytes):
+        try:
+            return decoder.decode(body)
+        except msgspec.ValidationError:
+            return _full_decode(body)
+
+    return decode
+
+
+decode_full = _full_decode
+decode_invoice_detail = _make_decoder(InvoiceDetailResponse)
+decode_item_detail = _make_decoder(ItemDetailResponse)
@@ -0,0 +1,94 @@
+"""
+On-disk cache of Accurate api-token.do responses (auth + host discovery).
+
+Shared by pull_accurate_stock.py and pull_accurate_sales.py so that an "all"
+run, a historical run and the two nightly crons validate each token once per
+TTL instead of once per entity run.
+
+Cache files are keyed by SHA-256 of the account server URL and the API token
+(the token itself is never written to disk), so a run against a local mock
+(ACCURATE_ACCOUNT_URL) and a real run never share an entry's database host.
+The URL is also stored in the entry and checked on load. Files live in
+ACCURATE_AUTH_CACHE_DIR (default: scripts/.cache/auth).
+Entries expire after ACCURATE_AUTH_CACHE_TTL seconds (default: 6 hours) and
+are invalidated by the client when the API answers 401.
+"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+DEFAULT_TTL = 6 * 60 * 60  # 6 hours
+
+
+def _cache_dir() -> Path:
+    return Path(os.getenv("ACCURATE_AUTH_CACHE_DIR", SCRIPT_DIR / ".cache" / "auth"))
+
+
+def _ttl() -> int:
+    try:
+        return int(os.getenv("ACCURATE_AUTH_CACHE_TTL", DEFAULT_TTL))
+    except ValueError:
+        return DEFAULT_TTL
+
+
+def _cache_path(account_url: str, api_token: str) -> Path:
+    key = hashlib.sha256(f"{account_url}\n{api_token}".encode("utf-8")).hexdigest()
+    return _cache_dir() / f"{key}.json"
+
+
+def load(account_url: str, api_token: str):
+    """Return cached db_info for this token, or None if missing/expired/corrupt
+    or cached from another account server."""
+    ttl = _ttl()
+    if ttl <= 0:
+        return None
+
+    path = _cache_path(account_url, api_token)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if entry.get("account_url") != account_url:
+        return None
+
+    if time.time() - entry.get("cached_at", 0) > ttl:
+        return None
+
+    db_info = entry.get("db_info")
+    if not isinstance(db_info, dict):
+        return None
+    return db_info
+
+
+def save(account_url: str, api_token: str, db_info: dict):
+    """Persist db_info for this token (best-effort, atomic replace)."""
+    if _ttl() <= 0:
+        return
+
+    path = _cache_path(account_url, api_token)
+    tmp_path = path.with_suffix(".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"cached_at": time.time(), "account_url": account_url, "db_info": db_info}, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"  Warning: could not write auth cache: {e}")
+
+
+def invalidate(account_url: str, api_token: str):
+    """Drop the cached entry for this token (e.g. after a 401)."""
+    try:
+        _cache_path(account_url, api_token).unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"  Warning: could not remove auth cache: {e}")
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Load-path benchmark: the same row set through every load strategy.
+
+Runs against a scratch database (default openclaw_bench, openclaw_ops is
+refused). Each run gets a fresh bench.load_target table shaped like
+raw.accurate_sales_* with the chosen index set, pre-populated so that the given
+share of the incoming rows already exists (conflict ratio), then loads the row
+set in one transaction and commits.
+
+Strategies:
+    values_upsert   execute_values INSERT ... ON CONFLICT DO UPDATE
+                    (pull_accurate_sales: page_size=500, historical: 1000)
+    copy_insert     plain COPY (only valid with 0% conflicts)
+    delete_copy     DELETE the snapshot, then COPY (pull_accurate_stock pattern)
+    staging_merge   COPY into a temp table, then one INSERT ... SELECT ... ON CONFLICT
+    pipeline_upsert psycopg 3 executemany in pipeline mode (skipped if psycopg
+                    3 is not installed)
+
+Reported per run:
+    rows/s      rows loaded / wall time (first statement -> commit)
+    WAL bytes   pg_wal_lsn_diff around the load
+    lock s      time bench.load_target is locked by the load (first statement
+                touching it -> commit); staging_merge only locks for the merge
+
+Usage:
+    python bench_load.py                                    # full matrix, 50k rows
+    python bench_load.py --rows 200000 --strategy staging_merge --strategy values_upsert
+    python bench_load.py --batch-size 500 --batch-size 5000 --conflicts 0 --conflicts 100
+    python bench_load.py --index-set production --json bench_output/load.json
+"""
+
+import io
+import csv
+import json
+import time
+import random
+import argparse
+import itertools
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+import synth_data
+
+try:
+    import psycopg  # psycopg 3, for pipeline mode
+except ImportError:  # Optional - pipeline_upsert is skipped without it
+    psycopg = None
+
+SCRIPT_DIR = Path(__file__).parent
+OUTPUT_DIR = SCRIPT_DIR / "bench_output"
+
+TABLE = "bench.load_target"
+COLUMNS = [c for c in synth_data.SALES_COLUMNS if c != "loaded_at"]
+KEY_COLUMNS = ["nomor_invoice", "kode_produk", "tanggal", "snapshot_date"]
+UPDATE_COLUMNS = [c for c in COLUMNS if c not in KEY_COLUMNS]
+QTY_INDEX = COLUMNS.index("kuantitas")
+
+INDEX_SETS = {
+    # unique key only (what ON CONFLICT needs)
+    "minimal": [],
+    # the five secondary indexes of raw.accurate_sales_* (schema reference section 9)
+    "production": ["kode_produk", "tanggal", "snapshot_date", "load_batch_id", "nama_gudang"],
+}
+
+UPSERT_SQL = f"""
+    INSERT INTO {TABLE} ({', '.join(COLUMNS)})
+    VALUES %s
+    ON CONFLICT ({', '.join(KEY_COLUMNS)})
+    DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in UPDATE_COLUMNS)}, loaded_at = now()
+"""
+
+
+# ============================================================
+# Setup
+# ============================================================
+
+
+def make_rows(n: int, seed: int) -> list:
+    """n sales rows of a single snapshot (the shape one daily sync loads)."""
+    rng = random.Random(seed)
+    catalog = synth_data.Catalog(rng, 950, 120)
+    end = date.today()
+    rows = []
+    per_day = max(50, n // 6)
+    generator = synth_data.sales_rows(catalog, rng, "ddd", end - timedelta(days=365), end, per_day, 1)
+    for row in generator:
+        row = list(row)
+        del row[synth_data.SALES_COLUMNS.index("loaded_at")]
+        row[COLUMNS.index("snapshot_date")] = end
+        rows.append(tuple(row))
+        if len(rows) >= n:
+            break
+    return rows
+
+
+def _copy(cur, table: str, rows: list):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def prepare_target(conn, index_set: str, existing: list):
+    """Fresh target table with the index set, pre-loaded with existing rows."""
+    with conn.cursor() as cur:
+        cur.execute("CREATE SCHEMA IF NOT EXISTS bench")
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(
+            f"""
+            CREATE TABLE {TABLE} (
+                id              bigserial PRIMARY KEY,
+                tanggal         date NOT NULL,
+                nama_departemen text,
+                nama_pelanggan  text,
+                nomor_invoice   text,
+                kode_produk     text NOT NULL,
+                nama_barang     text,
+                satuan          text,
+                kuantitas       numeric NOT NULL,
+                harga_satuan    numeric,
+                total_harga     numeric,
+                bpp             numeric DEFAULT 0,
+                nama_gudang     text,
+                vendor_price    numeric(15,2),
+                dpp_amount      numeric(15,2),
+                tax_amount      numeric(15,2),
+                snapshot_date   date NOT NULL,
+                loaded_at       timestamptz NOT NULL DEFAULT now(),
+                load_batch_id   text,
+                CONSTRAINT uq_load_target UNIQUE ({', '.join(KEY_COLUMNS)})
+            )
+            """
+        )
+        for column in INDEX_SETS[index_set]:
+            cur.execute(f"CREATE INDEX ON {TABLE} ({column})")
+        if existing:
+            _copy(cur, TABLE, existing)
+    conn.commit()
+    # Settle visibility / statistics so every strategy starts from the same state
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"VACUUM ANALYZE {TABLE}")
+    conn.autocommit = False
+
+
+def _wal_lsn(cur):
+    cur.execute("SELECT pg_current_wal_lsn()")
+    return cur.fetchone()[0]
+
+
+def _wal_bytes(cur, start_lsn) -> int:
+    cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)::bigint", (start_lsn,))
+    return cur.fetchone()[0]
+
+
+# ============================================================
+# Strategies: each loads rows in one transaction and returns
+# (wall seconds, lock seconds); the caller commits nothing.
+# ============================================================
+
+
+def load_values_upsert(conn, rows: list, batch_size: int) -> tuple:
+    with conn.cursor() as cur:
+        started = time.perf_counter()
+        execute_values(cur, UPSERT_SQL, rows, page_size=batch_size)
+        conn.commit()
+        elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+def load_copy_insert(conn, rows: list, batch_size: int) -> tuple:
+    with conn.cursor() as cur:
+        started = time.perf_counter()
+        for i in range(0, len(rows), batch_size):
+            _copy(cur, TABLE, rows[i : i + batch_size])
+        conn.commit()
+        elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+def load_delete_copy(conn, rows: list, batch_size: int) -> tuple:
+    snapshot = rows[0][COLUMNS.index("snapshot_date")]
+    with conn.cursor() as cur:
+        started = time.perf_counter()
+        cur.execute(f"DELETE FROM {TABLE} WHERE snapshot_date = %s", (snapshot,))
+        for i in range(0, len(rows), batch_size):
+            _copy(cur, TABLE, rows[i : i + batch_size])
+        conn.commit()
+        elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+def load_staging_merge(conn, rows: list, batch_size: int) -> tuple:
+    with conn.cursor() as cur:
+        started = time.perf_counter()
+        cur.execute(
+            f"CREATE TEMP TABLE load_staging (LIKE {TABLE} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+        for i in range(0, len(rows), batch_size):
+            _copy(cur, "load_staging", rows[i : i + batch_size])
+        lock_started = time.perf_counter()
+        cur.execute(
+            f"""
+            INSERT INTO {TABLE} ({', '.join(COLUMNS)})
+            SELECT {', '.join(COLUMNS)} FROM load_staging
+            ON CONFLICT ({', '.join(KEY_COLUMNS)})
+            DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in UPDATE_COLUMNS)}, loaded_at = now()
+            """
+        )
+        conn.commit()
+        finished = time.perf_counter()
+    return finished - started, finished - lock_started
+
+
+def load_pipeline_upsert(conn, rows: list, batch_size: int, conninfo: dict = None) -> tuple:
+    """psycopg 3 executemany (pipelined); uses its own connection."""
+    sql = UPSERT_SQL.replace("VALUES %s", f"VALUES ({', '.join(['%s'] * len(COLUMNS))})")
+    with psycopg.connect(**conninfo) as pconn:
+        with pconn.cursor() as cur:
+            started = time.perf_counter()
+            for i in range(0, len(rows), batch_size):
+                cur.executemany(sql, rows[i : i + batch_size])
+            pconn.commit()
+            elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+STRATEGIES = {
+    "values_upsert": load_values_upsert,
+    "copy_insert": load_copy_insert,
+    "delete_copy": load_delete_copy,
+    "staging_merge": load_staging_merge,
+    "pipeline_upsert": load_pipeline_upsert,
+}
+# Strategies whose batch size changes round trips (others are run once per matrix cell)
+BATCHED = {"values_upsert", "pipeline_upsert"}
+
+
+# ============================================================
+# Runner
+# ============================================================
+
+
+def run_case(conn, conninfo: dict, strategy: str, rows: list, batch_size: int, index_set: str,
+             conflict_pct: int, repeat: int) -> dict:
+    case = {
+        "strategy": strategy,
+        "batch_size": batch_size if strategy in BATCHED else None,
+        "index_set": index_set,
+        "conflict_pct": conflict_pct,
+        "rows": len(rows),
+    }
+    if strategy == "copy_insert" and conflict_pct:
+        return dict(case, skipped="COPY cannot resolve conflicts")
+    if strategy == "pipeline_upsert" and psycopg is None:
+        return dict(case, skipped="psycopg 3 not installed")
+
+    existing_count = len(rows) * conflict_pct // 100
+    existing = [
+        row[:QTY_INDEX] + (row[QTY_INDEX] + 1,) + row[QTY_INDEX + 1 :] for row in rows[:existing_count]
+    ]
+
+    best = None
+    for _ in range(repeat):
+        prepare_target(conn, index_set, existing)
+        with conn.cursor() as cur:
+            start_lsn = _wal_lsn(cur)
+        conn.commit()
+        try:
+            if strategy == "pipeline_upsert":
+                wall, lock = load_pipeline_upsert(conn, rows, batch_size, conninfo)
+            else:
+                wall, lock = STRATEGIES[strategy](conn, rows, batch_size)
+        except Exception as e:  # Benchmarks report failures instead of aborting
+            conn.rollback()
+            return dict(case, error=f"{type(e).__name__}: {e}".strip())
+        with conn.cursor() as cur:
+            wal = _wal_bytes(cur, start_lsn)
+        conn.commit()
+        if best is None or wall < best["wall_s"]:
+            best = {"wall_s": round(wall, 4), "lock_s": round(lock, 4), "wal_bytes": wal}
+
+    best["rows_per_sec"] = round(len(rows) / best["wall_s"], 1) if best["wall_s"] else 0.0
+    best["wal_bytes_per_row"] = round(best["wal_bytes"] / len(rows), 1)
+    return dict(case, **best)
+
+
+def print_results(results: list):
+    header = (
+        f"{'strategy':<16} {'batch':>6} {'indexes':<11} {'confl%':>6} {'rows/s':>11} "
+        f"{'wall s':>8} {'lock s':>8} {'WAL MiB':>9} {'WAL B/row':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        prefix = (
+            f"{r['strategy']:<16} {r['batch_size'] or '-':>6} {r['index_set']:<11} {r['conflict_pct']:>6}"
+        )
+        if "skipped" in r or "error" in r:
+            print(f"{prefix}  {r.get('skipped') or 'error: ' + r['error']}")
+            continue
+        print(
+            f"{prefix} {r['rows_per_sec']:>11,.0f} {r['wall_s']:>8.3f} {r['lock_s']:>8.3f} "
+            f"{r['wal_bytes'] / 1024 / 1024:>9.1f} {r['wal_bytes_per_row']:>9.0f}"
+        )
+
+
+def print_recommendation(results: list):
+    """Fastest strategy per (index set, conflict ratio)."""
+    print("\nFastest per case:")
+    measured = [r for r in results if "rows_per_sec" in r]
+    key = lambda r: (r["index_set"], r["conflict_pct"])
+    for (index_set, conflict_pct), group in itertools.groupby(sorted(measured, key=key), key=key):
+        best = max(group, key=lambda r: r["rows_per_sec"])
+        batch = f" (batch {best['batch_size']})" if best["batch_size"] else ""
+        print(
+            f"  {index_set:<11} {conflict_pct:>3}% existing: {best['strategy']}{batch} "
+            f"{best['rows_per_sec']:,.0f} rows/s, lock {best['lock_s']:.3f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PostgreSQL load strategies on the same row set")
+    parser.add_argument("--pg-database", type=str, default=synth_data.DEFAULT_DATABASE,
+                        help=f"Scratch database (default: {synth_data.DEFAULT_DATABASE})")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    parser.add_argument("--rows", type=int, default=50_000, help="Rows per load (default: 50000)")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), action="append", help="Repeatable, default: all")
+    parser.add_argument("--batch-size", type=int, action="append",
+                        help="Batch/page size (repeatable, default: 100 500 1000 5000)")
+    parser.add_argument("--index-set", choices=list(INDEX_SETS), action="append", help="Repeatable, default: all")
+    parser.add_argument("--conflicts", type=int, choices=[0, 50, 100], action="append",
+                        help="Percent of rows already present (repeatable, default: 0 50 100)")
+    parser.add_argument("--repeat", type=int, default=2, help="Runs per case, fastest kept (default: 2)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", type=str, default=None, help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.pg_database == synth_data.PRODUCTION_DATABASE:
+        print(f"Refusing to benchmark loads in {synth_data.PRODUCTION_DATABASE}. Use a scratch database.")
+        raise SystemExit(2)
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+
+    strategies = args.strategy or list(STRATEGIES)
+    batch_sizes = args.batch_size or [100, 500, 1000, 5000]
+    index_sets = args.index_set or list(INDEX_SETS)
+    conflict_pcts = args.conflicts or [0, 50, 100]
+
+    rows = make_rows(args.rows, args.seed)
+    print(f"Row set: {len(rows):,} sales rows, seed {args.seed}")
+
+    conn = synth_data.get_connection(args.pg_database, args.pg_host)
+    conninfo = dict(conn.info.dsn_parameters, password=conn.info.password)
+    conninfo.pop("tty", None)
+    conninfo.pop("options", None)
+    results = []
+    try:
+        for index_set, conflict_pct, strategy in itertools.product(index_sets, conflict_pcts, strategies):
+            for batch_size in (batch_sizes if strategy in BATCHED else [max(batch_sizes)]):
+                print(f"  {strategy} batch={batch_size} indexes={index_set} conflicts={conflict_pct}%...",
+                      flush=True)
+                results.append(
+                    run_case(conn, conninfo, strategy, rows, batch_size, index_set, conflict_pct, args.repeat)
+                )
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+    finally:
+        conn.close()
+
+    print()
+    print_results(results)
+    print_recommendation(results)
+
+    json_path = Path(args.json) if args.json else (
+        OUTPUT_DIR / f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    json_path.parent.mkdir(parents=True, exist_ok=True)
+    json_path.write_text(
+        json.dumps(
+            {"run_at": datetime.now().isoformat(timespec="seconds"), "rows": len(rows), "results": results},
+            indent=2,
+        )
+    )
+    print(f"\nResults: {json_path}")
+
+
+if __name__ == "__main__":
+    main()
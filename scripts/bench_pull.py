@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the Accurate pull paths against the local mock API.
+
+Starts mock_accurate_server.py in-process, points the pull scripts at it
+(ACCURATE_ACCOUNT_URL) and runs each strategy in dry-run mode (no PostgreSQL,
+no payload archive, no auth cache). Reports wall time, requests/sec, rows/sec,
+p50/p95 detail latency and retries per strategy, from run_metrics.
+
+Strategies:
+    sales            sync_entity, production throttle (REQUEST_DELAY)
+    sales_unthrottled sync_entity, no client-side sleep
+    stock            pull_inventory_stock, production throttle
+    stock_unthrottled pull_inventory_stock, no client-side sleep
+
+Usage:
+    python bench_pull.py                                  # all strategies, defaults
+    python bench_pull.py --strategy stock_unthrottled --skus 2000 --warehouses 40
+    python bench_pull.py --latency-ms 80 --latency-dist lognormal --rate-limit 8
+    python bench_pull.py --json bench_result.json
+"""
+
+import io
+import os
+import sys
+import json
+import argparse
+import contextlib
+from datetime import datetime
+
+import mock_accurate_server
+
+
+def _configure_env(base_url: str):
+    os.environ["ACCURATE_ACCOUNT_URL"] = base_url
+    os.environ["ACCURATE_API_TOKEN"] = "mock-token"
+    os.environ["ACCURATE_SIGNATURE_SECRET"] = "mock-secret"
+    os.environ["ACCURATE_AUTH_CACHE_TTL"] = "0"
+    os.environ["ACCURATE_ARCHIVE"] = "0"
+    os.environ.setdefault("OPENCLAW_METRICS_DIR", os.path.join("bench_output", "metrics"))
+
+
+def _run_sales(throttled: bool):
+    import pull_accurate_sales
+
+    pull_accurate_sales.REQUEST_DELAY = 0.125 if throttled else 0
+    pull_accurate_sales.sync_entity("ddd", days=3, dry_run=True)
+
+
+def _run_stock(throttled: bool):
+    import pull_accurate_stock
+
+    pull_accurate_stock.REQUEST_DELAY = 0.125 if throttled else 0
+    pull_accurate_stock.PAGE_DELAY = 0.2 if throttled else 0
+    pull_accurate_stock.pull_inventory_stock("ddd", dry_run=True)
+
+
+STRATEGIES = {
+    "sales": lambda: _run_sales(throttled=True),
+    "sales_unthrottled": lambda: _run_sales(throttled=False),
+    "stock": lambda: _run_stock(throttled=True),
+    "stock_unthrottled": lambda: _run_stock(throttled=False),
+}
+
+# Result fields taken from the run's metrics (None when the run left none)
+METRIC_FIELDS = (
+    "wall_time_s",
+    "requests",
+    "requests_per_sec",
+    "rows",
+    "rows_per_sec",
+    "detail_p50_ms",
+    "detail_p95_ms",
+    "retries",
+    "phases_s",
+)
+
+DETAIL_ENDPOINTS = ("/accurate/api/sales-invoice/detail.do", "/accurate/api/item/detail.do")
+
+
+def run_strategy(name: str, verbose: bool = False) -> dict:
+    import run_metrics
+
+    output = io.StringIO()
+    redirect = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(output)
+    error = None
+    previous = run_metrics.last()
+    with redirect:
+        try:
+            STRATEGIES[name]()
+        except Exception as e:  # Benchmarks report failures instead of aborting
+            error = f"{type(e).__name__}: {e}"
+
+    # Only metrics this run finished; last() may still be the previous strategy's
+    metrics = run_metrics.last()
+    if metrics is None or metrics is previous:
+        return {
+            "strategy": name,
+            "status": "error",
+            "error": error or "run finished without metrics",
+            **{field: None for field in METRIC_FIELDS},
+        }
+
+    report = metrics.report()
+    wall = report["wall_time_s"] or 1e-9
+    requests = sum(r["count"] for r in report["requests"].values())
+    rows = report["phase_rows"].get("flatten", 0)
+    detail = next((report["requests"][e] for e in DETAIL_ENDPOINTS if e in report["requests"]), {})
+    return {
+        "strategy": name,
+        "status": "error" if error else report["status"],
+        "error": error,
+        "wall_time_s": report["wall_time_s"],
+        "requests": requests,
+        "requests_per_sec": round(requests / wall, 1),
+        "rows": rows,
+        "rows_per_sec": round(rows / wall, 1),
+        "detail_p50_ms": round(detail.get("p50_s", 0) * 1000, 1),
+        "detail_p95_ms": round(detail.get("p95_s", 0) * 1000, 1),
+        "retries": report["counters"].get("api_retries", 0),
+        "phases_s": report["phases_s"],
+    }
+
+
+def print_results(results: list):
+    header = f"{'strategy':<20} {'status':<8} {'wall s':>9} {'req':>7} {'req/s':>8} {'rows':>8} {'rows/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'retry':>6}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if r["wall_time_s"] is None:
+            print(f"{r['strategy']:<20} {r['status']:<8} {'-':>9} (no metrics)")
+            print(f"    error: {r['error']}")
+            continue
+        print(
+            f"{r['strategy']:<20} {r['status']:<8} {r['wall_time_s']:>9.2f} {r['requests']:>7,} "
+            f"{r['requests_per_sec']:>8.1f} {r['rows']:>8,} {r['rows_per_sec']:>9.1f} "
+            f"{r['detail_p50_ms']:>8.1f} {r['detail_p95_ms']:>8.1f} {r['retries']:>6}"
+        )
+        if r["error"]:
+            print(f"    error: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark pull throughput against the local mock Accurate API"
+    )
+    parser.add_argument(
+        "--strategy",
+        choices=list(STRATEGIES),
+        action="append",
+        help="Strategy to run (repeatable, default: all)",
+    )
+    parser.add_argument("--json", type=str, default=None, help="Also write results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pull scripts' own output")
+    mock_accurate_server.add_config_arguments(parser)
+    args = parser.parse_args()
+
+    config = mock_accurate_server.config_from_args(args)
+    server, base_url = mock_accurate_server.start_server(config)
+    _configure_env(base_url)
+
+    print(f"Mock API: {base_url}")
+    print(
+        f"Catalog: {config.skus:,} SKUs x {config.warehouses} warehouses, {config.invoices:,} invoices"
+        f" | latency {config.latency_ms}ms {config.latency_dist}"
+        f" | rate limit {config.rate_limit or 'off'} | disconnects {config.disconnect_rate}"
+    )
+    print()
+
+    results = []
+    try:
+        for name in args.strategy or list(STRATEGIES):
+            results.append(run_strategy(name, verbose=args.verbose))
+    finally:
+        server.shutdown()
+
+    print_results(results)
+    print(f"\nServer stats: {server.RequestHandlerClass.stats}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "run_at": datetime.now().isoformat(timespec="seconds"),
+                    "config": vars(config),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Results: {args.json}")
+
+    sys.exit(0 if all(r["status"] == "success" for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Query benchmark suite for raw / core / mart queries.
+
+Runs each query in QUERIES with EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and
+records planning/execution time, buffer hits/reads and the full plan of the
+best run. Results go to bench_output/queries_{label}_{timestamp}.json, so a
+schema or index change can be measured as: run, change, run again, --compare.
+
+Queries:
+  maintenance  the checks in 04-database-schema-reference.md section 12
+  core         core_views.sql views (latest snapshot, product/store joins)
+  mart         the planned mart.* reports (section 6), written as plain SQL
+  rollup       core.fact_sales_daily reads (sales_rollup.sql)
+
+Queries whose relations do not exist are skipped. Use with a database filled
+by synth_data.py; against production use --group maintenance only.
+
+Usage:
+    python bench_queries.py --pg-database openclaw_bench
+    python bench_queries.py --pg-database openclaw_bench --label brin --repeat 5
+    python bench_queries.py --pg-database openclaw_bench --group mart --query mart_sales_daily
+    python bench_queries.py --pg-database openclaw_bench --compare bench_output/queries_baseline_....json
+"""
+
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+import synth_data
+
+SCRIPT_DIR = Path(__file__).parent
+OUTPUT_DIR = SCRIPT_DIR / "bench_output"
+
+# (name, group, required relations, sql)
+QUERIES = [
+    (
+        "maint_table_sizes",
+        "maintenance",
+        [],
+        """
+        SELECT schemaname, relname,
+               pg_size_pretty(pg_total_relation_size(relid)) AS total_size,
+               n_live_tup AS row_count
+        FROM pg_stat_user_tables
+        WHERE schemaname IN ('portal', 'raw', 'core', 'mart')
+        ORDER BY schemaname, relname
+        """,
+    ),
+    (
+        "maint_recent_loads",
+        "maintenance",
+        ["raw.load_history"],
+        "SELECT * FROM raw.load_history ORDER BY loaded_at DESC LIMIT 10",
+    ),
+    (
+        "maint_freshness",
+        "maintenance",
+        ["raw.accurate_stock_ddd", "raw.accurate_sales_ddd", "raw.iseller_sales"],
+        """
+        SELECT 'raw.accurate_stock_ddd' AS table_name, MAX(snapshot_date) AS latest FROM raw.accurate_stock_ddd
+        UNION ALL SELECT 'raw.accurate_stock_ljbb', MAX(snapshot_date) FROM raw.accurate_stock_ljbb
+        UNION ALL SELECT 'raw.accurate_stock_mbb', MAX(snapshot_date) FROM raw.accurate_stock_mbb
+        UNION ALL SELECT 'raw.accurate_stock_ubb', MAX(snapshot_date) FROM raw.accurate_stock_ubb
+        UNION ALL SELECT 'raw.accurate_sales_ddd', MAX(snapshot_date) FROM raw.accurate_sales_ddd
+        UNION ALL SELECT 'raw.accurate_sales_mbb', MAX(snapshot_date) FROM raw.accurate_sales_mbb
+        UNION ALL SELECT 'raw.accurate_sales_ubb', MAX(snapshot_date) FROM raw.accurate_sales_ubb
+        UNION ALL SELECT 'raw.iseller_sales', MAX(snapshot_date) FROM raw.iseller_sales
+        """,
+    ),
+    (
+        "maint_portal_integrity",
+        "maintenance",
+        ["portal.kodemix", "portal.hpprsp", "portal.stock_capacity"],
+        """
+        SELECT 'kodemix missing kode_mix' AS check, COUNT(*) AS issues FROM portal.kodemix WHERE kode_mix IS NULL
+        UNION ALL SELECT 'hpprsp missing kode', COUNT(*) FROM portal.hpprsp WHERE kode IS NULL
+        UNION ALL SELECT 'stock_capacity missing location', COUNT(*) FROM portal.stock_capacity
+                  WHERE stock_location IS NULL
+        """,
+    ),
+    (
+        "maint_unmatched_skus",
+        "maintenance",
+        ["raw.accurate_sales_ddd", "portal.kodemix"],
+        """
+        SELECT s.kode_produk, COUNT(*)
+        FROM raw.accurate_sales_ddd s
+        LEFT JOIN portal.kodemix k ON trim(lower(s.kode_produk)) = trim(lower(k.kode_besar))
+        WHERE s.snapshot_date = (SELECT MAX(snapshot_date) FROM raw.accurate_sales_ddd)
+          AND k.id IS NULL
+        GROUP BY s.kode_produk
+        """,
+    ),
+    (
+        "core_fact_sales_all_30d",
+        "core",
+        ["core.fact_sales_all"],
+        """
+        SELECT entity, store_name_clean, SUM(quantity) AS pairs, SUM(total_amount) AS revenue
+        FROM core.fact_sales_all
+        WHERE transaction_date >= CURRENT_DATE - 30
+        GROUP BY entity, store_name_clean
+        """,
+    ),
+    (
+        "core_fact_stock_all",
+        "core",
+        ["core.fact_stock_all"],
+        """
+        SELECT entity, nama_gudang, SUM(quantity) AS pairs
+        FROM core.fact_stock_all
+        GROUP BY entity, nama_gudang
+        """,
+    ),
+    (
+        "core_dim_product",
+        "core",
+        ["core.dim_product"],
+        "SELECT tier, COUNT(*) FROM core.dim_product GROUP BY tier",
+    ),
+    (
+        "mart_sales_daily",
+        "mart",
+        ["raw.accurate_sales_ddd", "portal.store"],
+        """
+        -- Daily sales by store for the last 30 days, latest snapshot per invoice line
+        SELECT tanggal, trim(lower(nama_departemen)) AS store, SUM(kuantitas) AS pairs,
+               SUM(total_harga) AS revenue
+        FROM (
+            SELECT DISTINCT ON (nomor_invoice, kode_produk, tanggal) *
+            FROM raw.accurate_sales_ddd
+            WHERE tanggal >= CURRENT_DATE - 30
+            ORDER BY nomor_invoice, kode_produk, tanggal, snapshot_date DESC
+        ) s
+        GROUP BY tanggal, trim(lower(nama_departemen))
+        ORDER BY tanggal, store
+        """,
+    ),
+    (
+        "mart_stock_vs_capacity",
+        "mart",
+        ["raw.accurate_stock_ddd", "portal.stock_capacity"],
+        """
+        SELECT c.stock_location, c.max_stock, SUM(s.kuantitas) AS pairs,
+               ROUND(100.0 * SUM(s.kuantitas) / NULLIF(c.max_stock, 0), 1) AS pct_of_capacity
+        FROM raw.accurate_stock_ddd s
+        JOIN portal.stock_capacity c ON trim(lower(s.nama_gudang)) = trim(lower(c.stock_location))
+        WHERE s.snapshot_date = (SELECT MAX(snapshot_date) FROM raw.accurate_stock_ddd)
+        GROUP BY c.stock_location, c.max_stock
+        """,
+    ),
+    (
+        "mart_tier_summary",
+        "mart",
+        ["raw.accurate_stock_ddd", "portal.kodemix"],
+        """
+        SELECT COALESCE(k.tier_baru, k.tier_lama) AS tier, COUNT(DISTINCT s.kode_barang) AS skus,
+               SUM(s.kuantitas) AS pairs
+        FROM raw.accurate_stock_ddd s
+        JOIN portal.kodemix k ON trim(lower(s.kode_barang)) = trim(lower(k.kode_besar))
+        WHERE s.snapshot_date = (SELECT MAX(snapshot_date) FROM raw.accurate_stock_ddd)
+        GROUP BY 1
+        """,
+    ),
+    (
+        "mart_control_stock",
+        "mart",
+        ["raw.accurate_stock_ddd", "portal.kodemix"],
+        """
+        -- Per store x article: sizes in stock vs sizes in range (FF%), pairs (depth)
+        WITH latest AS (
+            SELECT nama_gudang, left(kode_barang, length(kode_barang) - 3) AS article,
+                   kode_barang, kuantitas
+            FROM raw.accurate_stock_ddd
+            WHERE snapshot_date = (SELECT MAX(snapshot_date) FROM raw.accurate_stock_ddd)
+        ),
+        size_range AS (
+            SELECT kode, COUNT(*) AS sizes FROM portal.kodemix GROUP BY kode
+        )
+        SELECT l.nama_gudang, l.article,
+               COUNT(*) FILTER (WHERE l.kuantitas > 0) AS sizes_in_stock,
+               r.sizes,
+               ROUND(100.0 * COUNT(*) FILTER (WHERE l.kuantitas > 0) / r.sizes, 1) AS ff_pct,
+               SUM(l.kuantitas) AS depth
+        FROM latest l
+        JOIN size_range r ON r.kode = l.article
+        GROUP BY l.nama_gudang, l.article, r.sizes
+        """,
+    ),
+    (
+        "mart_depth_alert",
+        "mart",
+        ["raw.accurate_stock_ddd"],
+        """
+        SELECT nama_gudang, kode_barang, kuantitas
+        FROM raw.accurate_stock_ddd
+        WHERE snapshot_date = (SELECT MAX(snapshot_date) FROM raw.accurate_stock_ddd)
+          AND kuantitas < 2
+        ORDER BY nama_gudang, kode_barang
+        """,
+    ),
+    (
+        "mart_stock_trend_90d",
+        "mart",
+        ["raw.accurate_stock_ddd"],
+        """
+        SELECT snapshot_date, SUM(kuantitas) AS pairs
+        FROM raw.accurate_stock_ddd
+        WHERE snapshot_date >= CURRENT_DATE - 90
+        GROUP BY snapshot_date
+        ORDER BY snapshot_date
+        """,
+    ),
+    (
+        "mart_iseller_channel_month",
+        "mart",
+        ["raw.iseller_sales"],
+        """
+        SELECT date_trunc('month', order_date) AS month, channel, SUM(item_total) AS revenue
+        FROM (
+            SELECT DISTINCT ON (order_number, item_sku) *
+            FROM raw.iseller_sales
+            ORDER BY order_number, item_sku, snapshot_date DESC
+        ) i
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """,
+    ),
+    (
+        "rollup_top_skus_week",
+        "rollup",
+        ["core.fact_sales_daily"],
+        """
+        SELECT kode_produk, SUM(kuantitas) AS pairs
+        FROM core.fact_sales_daily
+        WHERE tanggal >= CURRENT_DATE - 7
+        GROUP BY kode_produk
+        ORDER BY pairs DESC
+        LIMIT 50
+        """,
+    ),
+    (
+        "rollup_store_yesterday",
+        "rollup",
+        ["core.fact_sales_daily"],
+        """
+        SELECT entity, nama_departemen, SUM(total_harga) AS revenue
+        FROM core.fact_sales_daily
+        WHERE tanggal = CURRENT_DATE - 1
+        GROUP BY entity, nama_departemen
+        """,
+    ),
+]
+
+GROUPS = sorted({group for _, group, _, _ in QUERIES})
+
+
+def _plan_totals(plan: dict) -> dict:
+    """Buffer totals and top node of an EXPLAIN (FORMAT JSON) result."""
+    root = plan["Plan"]
+    return {
+        "planning_ms": round(plan.get("Planning Time", 0.0), 3),
+        "execution_ms": round(plan.get("Execution Time", 0.0), 3),
+        "rows": root.get("Actual Rows", 0),
+        "shared_hit_blocks": root.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": root.get("Shared Read Blocks", 0),
+        "temp_written_blocks": root.get("Temp Written Blocks", 0),
+        "top_node": root.get("Node Type"),
+    }
+
+
+def _missing_relations(cur, relations: list) -> list:
+    missing = []
+    for relation in relations:
+        cur.execute("SELECT to_regclass(%s)", (relation,))
+        if cur.fetchone()[0] is None:
+            missing.append(relation)
+    return missing
+
+
+def run_query(cur, name: str, sql: str, repeat: int) -> dict:
+    """EXPLAIN ANALYZE a query repeat times; keep the fastest run's plan."""
+    best = None
+    runs_ms = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+        wall_ms = (time.perf_counter() - started) * 1000
+        plan = cur.fetchone()[0][0]
+        totals = _plan_totals(plan)
+        totals["wall_ms"] = round(wall_ms, 3)
+        runs_ms.append(totals["execution_ms"])
+        if best is None or totals["execution_ms"] < best["execution_ms"]:
+            best = dict(totals, plan=plan)
+    best["runs_ms"] = runs_ms
+    best["name"] = name
+    return best
+
+
+def table_stats(cur) -> dict:
+    cur.execute(
+        """
+        SELECT schemaname || '.' || relname, n_live_tup, pg_total_relation_size(relid)
+        FROM pg_stat_user_tables
+        WHERE schemaname IN ('portal', 'raw', 'core', 'mart')
+        ORDER BY 1
+        """
+    )
+    return {name: {"rows": rows, "bytes": size} for name, rows, size in cur.fetchall()}
+
+
+def print_results(results: list, baseline: dict = None):
+    header = f"{'query':<28} {'exec ms':>10} {'plan ms':>8} {'rows':>9} {'hit':>9} {'read':>9}  top node"
+    if baseline:
+        header += f"   {'baseline':>10} {'delta':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if r.get("skipped"):
+            print(f"{r['name']:<28} {'skipped':>10}  (missing {', '.join(r['skipped'])})")
+            continue
+        line = (
+            f"{r['name']:<28} {r['execution_ms']:>10.1f} {r['planning_ms']:>8.1f} {r['rows']:>9,} "
+            f"{r['shared_hit_blocks']:>9,} {r['shared_read_blocks']:>9,}  {r['top_node']}"
+        )
+        previous = (baseline or {}).get(r["name"])
+        if previous and not previous.get("skipped"):
+            before = previous["execution_ms"]
+            change = (r["execution_ms"] - before) / before * 100 if before else 0.0
+            line += f"   {before:>10.1f} {change:>+7.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark raw/core/mart queries with EXPLAIN ANALYZE")
+    parser.add_argument("--pg-database", type=str, default=synth_data.DEFAULT_DATABASE,
+                        help=f"Database (default: {synth_data.DEFAULT_DATABASE})")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    parser.add_argument("--group", choices=GROUPS, action="append", help="Query group (repeatable, default: all)")
+    parser.add_argument("--query", action="append", help="Run only this query name (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query, fastest is kept (default: 3)")
+    parser.add_argument("--timeout", type=int, default=600, help="statement_timeout per query in seconds")
+    parser.add_argument("--label", type=str, default="run", help="Label for the result file (e.g. baseline, brin)")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+
+    selected = [
+        q for q in QUERIES
+        if (not args.group or q[1] in args.group) and (not args.query or q[0] in args.query)
+    ]
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    conn = synth_data.get_connection(args.pg_database, args.pg_host)
+    conn.autocommit = True  # EXPLAIN ANALYZE of read-only queries; no open transaction
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = %s", (args.timeout * 1000,))
+            cur.execute("SHOW server_version")
+            server_version = cur.fetchone()[0]
+            stats = table_stats(cur)
+            for name, group, relations, sql in selected:
+                missing = _missing_relations(cur, relations)
+                if missing:
+                    results.append({"name": name, "group": group, "skipped": missing})
+                    continue
+                print(f"  {name}...", flush=True)
+                try:
+                    result = run_query(cur, name, sql, args.repeat)
+                except Exception as e:  # Timeouts etc. are results too
+                    result = {"name": name, "error": f"{type(e).__name__}: {e}".strip(),
+                              "execution_ms": float(args.timeout * 1000), "planning_ms": 0.0,
+                              "rows": 0, "shared_hit_blocks": 0, "shared_read_blocks": 0,
+                              "top_node": "ERROR"}
+                result["group"] = group
+                result["sql"] = " ".join(sql.split())
+                results.append(result)
+    finally:
+        conn.close()
+
+    print()
+    print_results(results, baseline)
+
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    out_path = OUTPUT_DIR / f"queries_{args.label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out_path.write_text(
+        json.dumps(
+            {
+                "run_at": datetime.now().isoformat(timespec="seconds"),
+                "label": args.label,
+                "database": args.pg_database,
+                "server_version": server_version,
+                "tables": stats,
+                "results": results,
+            },
+            indent=2,
+            default=str,
+        )
+    )
+    print(f"\nResults + plans: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
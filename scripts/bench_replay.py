@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Offline regression benchmarks over a recorded API cassette (see cassette.py).
+
+Record once against the real API:
+    python pull_accurate_sales.py ddd --dry-run --record cassettes/ddd_sales.jsonl.gz
+    python pull_accurate_stock.py ddd --dry-run --record cassettes/ddd_stock.jsonl.gz
+
+Then, with byte-identical inputs on every run:
+    decode    json.loads vs accurate_decode (full / typed partial) on detail bodies
+    flatten   flatten_invoice / flatten_item_stock on the decoded details
+    load      upsert_sales_rows into PostgreSQL, rolled back (--load, needs PG env)
+    replay    the full pull script in dry-run mode against the cassette
+              (--replay-speed: 0 = no latency, 1 = recorded latency)
+
+Each benchmark reports best-of-N seconds and items/sec. The cassette sha256 and
+a digest of the flattened rows are printed so regressions in output are caught
+alongside regressions in speed.
+
+Usage:
+    python bench_replay.py cassettes/ddd_sales.jsonl.gz
+    python bench_replay.py cassettes/ddd_stock.jsonl.gz --repeat 5 --json result.json
+    python bench_replay.py cassettes/ddd_sales.jsonl.gz --load --pg-host 127.0.0.1
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+from datetime import datetime
+
+import cassette
+import accurate_decode
+
+SALES_DETAIL = "/accurate/api/sales-invoice/detail.do"
+ITEM_DETAIL = "/accurate/api/item/detail.do"
+
+
+def _best_of(func, repeat: int) -> tuple:
+    """Run func repeat times; return (best seconds, last result)."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _detail_bodies(records: list) -> tuple:
+    """(kind, [body bytes]) for the successful detail responses in a cassette."""
+    sales = [r["body"].encode("utf-8") for r in records if r["path"] == SALES_DETAIL and r["status"] == 200]
+    items = [r["body"].encode("utf-8") for r in records if r["path"] == ITEM_DETAIL and r["status"] == 200]
+    if len(sales) >= len(items):
+        return "sales", sales
+    return "stock", items
+
+
+def _rows_digest(rows) -> str:
+    """Digest of the flattened rows as dicts (stable across the row representation)."""
+    digest = hashlib.sha256()
+    for row in rows.to_dicts():
+        digest.update(json.dumps(row, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def bench_decode(kind: str, bodies: list, repeat: int) -> list:
+    typed = (
+        accurate_decode.decode_invoice_detail if kind == "sales" else accurate_decode.decode_item_detail
+    )
+    total_bytes = sum(len(b) for b in bodies)
+    results = []
+    for name, decode in (
+        ("decode json.loads", json.loads),
+        ("decode full", accurate_decode.decode_full),
+        ("decode typed", typed),
+    ):
+        seconds, _ = _best_of(lambda: [decode(b) for b in bodies], repeat)
+        results.append(
+            {
+                "benchmark": name,
+                "seconds": round(seconds, 4),
+                "items": len(bodies),
+                "items_per_sec": round(len(bodies) / seconds, 1) if seconds else 0.0,
+                "mb_per_sec": round(total_bytes / 1024 / 1024 / seconds, 1) if seconds else 0.0,
+            }
+        )
+    return results
+
+
+def _flatten_func(kind: str):
+    if kind == "sales":
+        import pull_accurate_sales
+
+        return pull_accurate_sales.flatten_invoice
+    import pull_accurate_stock
+
+    return pull_accurate_stock.flatten_item_stock
+
+
+def decoded_details(kind: str, bodies: list) -> list:
+    typed = (
+        accurate_decode.decode_invoice_detail if kind == "sales" else accurate_decode.decode_item_detail
+    )
+    return [typed(b).get("d", {}) for b in bodies]
+
+
+def bench_flatten(kind: str, details: list, repeat: int) -> tuple:
+    flatten = _flatten_func(kind)
+
+    def run():
+        rows = flatten({})  # Empty batch with the right columns
+        for detail in details:
+            flatten(detail, rows)
+        return rows
+
+    seconds, rows = _best_of(run, repeat)
+    return (
+        {
+            "benchmark": "flatten",
+            "seconds": round(seconds, 4),
+            "items": len(rows),
+            "items_per_sec": round(len(rows) / seconds, 1) if seconds else 0.0,
+        },
+        rows,
+    )
+
+
+def bench_load(rows, repeat: int, pg_host: str = None) -> dict:
+    """Time upsert_sales_rows into raw.accurate_sales_ddd; every run is rolled back."""
+    import pg_pool
+    import pull_accurate_sales
+
+    conn = pull_accurate_sales.get_pg_connection(pg_host)
+    snapshot_date = datetime.now().strftime("%Y-%m-%d")
+    try:
+        with conn.cursor() as cur:
+
+            def run():
+                try:
+                    return pull_accurate_sales.upsert_sales_rows(
+                        cur, "raw.accurate_sales_ddd", rows, snapshot_date, "bench_replay"
+                    )
+                finally:
+                    conn.rollback()
+
+            seconds, _ = _best_of(run, repeat)
+    finally:
+        pg_pool.release(conn)
+    return {
+        "benchmark": "load (rolled back)",
+        "seconds": round(seconds, 4),
+        "items": len(rows),
+        "items_per_sec": round(len(rows) / seconds, 1) if seconds else 0.0,
+    }
+
+
+def bench_replay(kind: str, cassette_path: str, speed: float) -> dict:
+    """Run the pull script end-to-end (dry-run) against the cassette."""
+    import run_metrics
+
+    os.environ["ACCURATE_REPLAY"] = cassette_path
+    os.environ["ACCURATE_REPLAY_SPEED"] = str(speed)
+    os.environ.setdefault("ACCURATE_API_TOKEN", "replay-token")
+    os.environ.setdefault("ACCURATE_SIGNATURE_SECRET", "replay-secret")
+    os.environ["ACCURATE_ARCHIVE"] = "0"
+    os.environ.setdefault("OPENCLAW_METRICS_DIR", os.path.join("bench_output", "metrics"))
+
+    error = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            if kind == "sales":
+                import pull_accurate_sales
+
+                pull_accurate_sales.REQUEST_DELAY = 0
+                pull_accurate_sales.sync_entity("ddd", dry_run=True)
+            else:
+                import pull_accurate_stock
+
+                pull_accurate_stock.REQUEST_DELAY = 0
+                pull_accurate_stock.PAGE_DELAY = 0
+                pull_accurate_stock.pull_inventory_stock("ddd", dry_run=True)
+        except Exception as e:  # Benchmarks report failures instead of aborting
+            error = f"{type(e).__name__}: {e}"
+
+    report = run_metrics.last().report()
+    rows = report["phase_rows"].get("flatten", 0)
+    wall = report["wall_time_s"] or 1e-9
+    return {
+        "benchmark": f"replay x{speed:g}",
+        "seconds": report["wall_time_s"],
+        "items": rows,
+        "items_per_sec": round(rows / wall, 1),
+        "status": "error" if error else report["status"],
+        "error": error,
+        "phases_s": report["phases_s"],
+    }
+
+
+def print_results(results: list):
+    header = f"{'benchmark':<22} {'seconds':>10} {'items':>9} {'items/s':>12} {'MB/s':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        mb = f"{r['mb_per_sec']:>8.1f}" if "mb_per_sec" in r else f"{'':>8}"
+        print(f"{r['benchmark']:<22} {r['seconds']:>10.4f} {r['items']:>9,} {r['items_per_sec']:>12,.1f} {mb}")
+        if r.get("error"):
+            print(f"    error: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline regression benchmarks over an API cassette")
+    parser.add_argument("cassette", help="Cassette recorded with --record (.jsonl.gz)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, best is reported (default: 3)")
+    parser.add_argument("--load", action="store_true", help="Also benchmark the PostgreSQL upsert (sales, rolled back)")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST for --load")
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=0.0,
+        help="Latency factor for the end-to-end replay (0 = no delay, default: 0)",
+    )
+    parser.add_argument("--no-replay", action="store_true", help="Skip the end-to-end replay benchmark")
+    parser.add_argument("--json", type=str, default=None, help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.cassette, "rb") as f:
+        cassette_sha = hashlib.sha256(f.read()).hexdigest()
+    records = cassette.load_cassette(args.cassette)
+    kind, bodies = _detail_bodies(records)
+    if not bodies:
+        print(f"No detail responses in {args.cassette}")
+        sys.exit(1)
+
+    print(f"Cassette: {args.cassette} (sha256 {cassette_sha[:16]})")
+    print(f"  {len(records):,} responses, {len(bodies):,} {kind} detail bodies, "
+          f"{sum(len(b) for b in bodies) / 1024 / 1024:,.1f} MiB")
+    print(f"  msgspec: {'yes' if accurate_decode.msgspec else 'no'} | orjson: {'yes' if accurate_decode.orjson else 'no'}")
+    print()
+
+    results = bench_decode(kind, bodies, args.repeat)
+    flatten_result, rows = bench_flatten(kind, decoded_details(kind, bodies), args.repeat)
+    results.append(flatten_result)
+    rows_digest = _rows_digest(rows)
+
+    if args.load:
+        if kind != "sales":
+            print("--load only applies to sales cassettes, skipped")
+        else:
+            from dotenv import load_dotenv
+
+            load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"), override=False)
+            results.append(bench_load(rows, args.repeat, args.pg_host))
+
+    if not args.no_replay:
+        results.append(bench_replay(kind, args.cassette, args.replay_speed))
+
+    print_results(results)
+    print(f"\nFlattened rows digest: {rows_digest} ({len(rows):,} rows)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "run_at": datetime.now().isoformat(timespec="seconds"),
+                    "cassette": args.cassette,
+                    "cassette_sha256": cassette_sha,
+                    "rows_digest": rows_digest,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Results: {args.json}")
+
+    sys.exit(0 if all(r.get("status", "success") == "success" for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
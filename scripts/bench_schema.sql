@@ -0,0 +1,222 @@
+-- ============================================================
+-- BENCH SCHEMA - portal.* + raw.* for a scratch benchmark database
+-- Mirrors 04-database-schema-reference.md (sections 3, 4, 9).
+--
+-- For synth_data.py / bench_queries.py ONLY. Never run against
+-- openclaw_ops: it drops and recreates the tables.
+--
+-- Run:
+--   createdb openclaw_bench
+--   psql -d openclaw_bench -f bench_schema.sql
+-- ============================================================
+
+CREATE SCHEMA IF NOT EXISTS portal;
+CREATE SCHEMA IF NOT EXISTS raw;
+CREATE SCHEMA IF NOT EXISTS core;
+CREATE SCHEMA IF NOT EXISTS mart;
+
+-- ============================================================
+-- PORTAL
+-- ============================================================
+
+DROP TABLE IF EXISTS portal.store CASCADE;
+CREATE TABLE portal.store (
+    nama_department_old text,
+    nama_accurate       text,
+    nama_iseller        text,
+    branch              text,
+    area                text,
+    category            text,
+    stock_filter        text,
+    as_name             text,
+    bm_name             text,
+    max_display         text,
+    max_stock           text,
+    monthly_target      text,
+    storage             text
+);
+
+DROP TABLE IF EXISTS portal.kodemix CASCADE;
+CREATE TABLE portal.kodemix (
+    kode_mix_size       text NOT NULL,
+    kode_mix            text NOT NULL,
+    version             text,
+    kode_besar          text NOT NULL,
+    kode                text,
+    tipe                text,
+    nama_barang         text,
+    nama_variant        text,
+    ukuran              text,
+    tier_lama           text,
+    gender              text,
+    seri                text,
+    series              text,
+    v                   text,
+    totalpairs_hook     text,
+    assortment_lama     text,
+    gender_2            text,
+    status              text,
+    tier_baru           text,
+    article             text,
+    size                text,
+    color               text,
+    assortment          text,
+    count_by_assortment text,
+    group_warna         text,
+    no_urut             text,
+    id                  serial PRIMARY KEY
+);
+
+DROP TABLE IF EXISTS portal.hpprsp CASCADE;
+CREATE TABLE portal.hpprsp (
+    no              text,
+    kode            text PRIMARY KEY,
+    nama_barang     text,
+    tipe            text,
+    series          text,
+    gender          text,
+    tier            text,
+    season          text,
+    launching_sales text,
+    limit_age       text,
+    assortment      text,
+    ukuran          text,
+    status          text,
+    v               text,
+    supplier        text,
+    harga_beli      numeric,
+    price_taq       numeric,
+    rsp             numeric,
+    mg_disney       text
+);
+
+DROP TABLE IF EXISTS portal.stock_capacity CASCADE;
+CREATE TABLE portal.stock_capacity (
+    stock_location text PRIMARY KEY,
+    branch         text,
+    area           text,
+    category       text,
+    as_name        text,
+    bm_name        text,
+    max_display    integer,
+    max_stock      integer,
+    storage        integer
+);
+
+-- ============================================================
+-- RAW - stock (4 entities) and sales (3 entities)
+-- ============================================================
+
+DO $$
+DECLARE
+    v_entity text;
+BEGIN
+    FOREACH v_entity IN ARRAY ARRAY['ddd', 'ljbb', 'mbb', 'ubb'] LOOP
+        EXECUTE format('DROP TABLE IF EXISTS raw.accurate_stock_%s CASCADE', v_entity);
+        EXECUTE format($ddl$
+            CREATE TABLE raw.accurate_stock_%1$s (
+                id            bigserial PRIMARY KEY,
+                kode_barang   text NOT NULL,
+                nama_barang   text,
+                nama_gudang   text,
+                kuantitas     integer NOT NULL,
+                unit_price    numeric(15,2),
+                vendor_price  numeric(15,2),
+                snapshot_date date NOT NULL,
+                loaded_at     timestamptz NOT NULL DEFAULT now(),
+                load_batch_id text
+            )$ddl$, v_entity);
+        EXECUTE format('CREATE INDEX idx_accurate_stock_%1$s_kode ON raw.accurate_stock_%1$s (kode_barang)', v_entity);
+        EXECUTE format('CREATE INDEX idx_accurate_stock_%1$s_snapshot ON raw.accurate_stock_%1$s (snapshot_date)', v_entity);
+    END LOOP;
+
+    FOREACH v_entity IN ARRAY ARRAY['ddd', 'mbb', 'ubb'] LOOP
+        EXECUTE format('DROP TABLE IF EXISTS raw.accurate_sales_%s CASCADE', v_entity);
+        EXECUTE format($ddl$
+            CREATE TABLE raw.accurate_sales_%1$s (
+                id              bigserial PRIMARY KEY,
+                tanggal         date NOT NULL,
+                nama_departemen text,
+                nama_pelanggan  text,
+                nomor_invoice   text,
+                kode_produk     text NOT NULL,
+                nama_barang     text,
+                satuan          text,
+                kuantitas       numeric NOT NULL,
+                harga_satuan    numeric,
+                total_harga     numeric,
+                bpp             numeric DEFAULT 0,
+                nama_gudang     text,
+                vendor_price    numeric(15,2),
+                dpp_amount      numeric(15,2),
+                tax_amount      numeric(15,2),
+                snapshot_date   date NOT NULL,
+                loaded_at       timestamptz NOT NULL DEFAULT now(),
+                load_batch_id   text,
+                CONSTRAINT uq_accurate_sales_%1$s UNIQUE (nomor_invoice, kode_produk, tanggal, snapshot_date)
+            )$ddl$, v_entity);
+        EXECUTE format('CREATE INDEX idx_accurate_sales_%1$s_kode ON raw.accurate_sales_%1$s (kode_produk)', v_entity);
+        EXECUTE format('CREATE INDEX idx_accurate_sales_%1$s_tanggal ON raw.accurate_sales_%1$s (tanggal)', v_entity);
+        EXECUTE format('CREATE INDEX idx_accurate_sales_%1$s_snapshot ON raw.accurate_sales_%1$s (snapshot_date)', v_entity);
+        EXECUTE format('CREATE INDEX idx_accurate_sales_%1$s_batch ON raw.accurate_sales_%1$s (load_batch_id)', v_entity);
+        EXECUTE format('CREATE INDEX idx_accurate_sales_%1$s_gudang ON raw.accurate_sales_%1$s (nama_gudang)', v_entity);
+    END LOOP;
+END $$;
+
+-- ============================================================
+-- RAW - iSeller + load history
+-- ============================================================
+
+DROP TABLE IF EXISTS raw.iseller_sales CASCADE;
+CREATE TABLE raw.iseller_sales (
+    order_number         text,
+    order_date           timestamptz,
+    customer_name        text,
+    customer_email       text,
+    customer_phone       text,
+    payment_method       text,
+    payment_status       text,
+    fulfillment_status   text,
+    shipping_method      text,
+    shipping_address     text,
+    shipping_city        text,
+    shipping_province    text,
+    shipping_postal_code text,
+    item_sku             text,
+    item_name            text,
+    item_variant         text,
+    item_quantity        numeric,
+    item_price           numeric,
+    item_discount        numeric,
+    item_total           numeric,
+    order_subtotal       numeric,
+    order_discount       numeric,
+    order_shipping       numeric,
+    order_tax            numeric,
+    order_total          numeric,
+    channel              text,
+    notes                text,
+    snapshot_date        date,
+    loaded_at            timestamptz,
+    load_batch_id        text
+);
+CREATE INDEX idx_iseller_sales_sku ON raw.iseller_sales (item_sku);
+CREATE INDEX idx_iseller_sales_order_date ON raw.iseller_sales (order_date);
+CREATE INDEX idx_iseller_sales_snapshot ON raw.iseller_sales (snapshot_date);
+
+DROP TABLE IF EXISTS raw.load_history CASCADE;
+CREATE TABLE raw.load_history (
+    id            serial PRIMARY KEY,
+    loaded_at     timestamptz DEFAULT now(),
+    source        text,
+    entity        text,
+    data_type     text,
+    batch_id      text,
+    date_from     date,
+    date_to       date,
+    rows_loaded   integer,
+    status        text,
+    error_message text,
+    phase_timings jsonb
+);
+CREATE INDEX idx_load_history_batch ON raw.load_history (batch_id);
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the pull scripts.
+
+Each target runs in a fresh interpreter as `python <script> --help`, which
+executes every module-level import and then exits in argparse, so the time
+measured is pure startup. Reports min / median wall time over --repeat runs,
+plus one `-X importtime` run per target: the slowest top-level imports and
+whether pandas / numpy / pyarrow were loaded at all.
+
+Two references put the numbers in context:
+    interpreter      python -c pass (the floor)
+    import_pandas    python -c "import pandas" (what every run used to pay)
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --repeat 20 --label lazy
+    python bench_startup.py --json bench_output/startup_lazy.json --compare bench_output/startup_eager.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+TARGETS = {
+    "interpreter": ["-c", "pass"],
+    "import_pandas": ["-c", "import pandas"],
+    "sales": [str(SCRIPT_DIR / "pull_accurate_sales.py"), "--help"],
+    "stock": [str(SCRIPT_DIR / "pull_accurate_stock.py"), "--help"],
+    "historical": [str(SCRIPT_DIR / "pull_historical_sales.py"), "--help"],
+}
+
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "openpyxl", "dateutil", "pytz"]
+
+
+def time_target(argv: list, repeat: int) -> list:
+    """Wall time (ms) of each run; raises if the target fails."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, *argv], cwd=SCRIPT_DIR, capture_output=True, text=True)
+        runs.append((time.perf_counter() - started) * 1000)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    return runs
+
+
+def import_profile(argv: list, top: int) -> dict:
+    """Parse one `-X importtime` run: slowest top-level imports, heavy modules seen."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv], cwd=SCRIPT_DIR, capture_output=True, text=True
+    )
+    top_level = []
+    seen = set()
+    for line in proc.stderr.splitlines():
+        # "import time:  self_us | cumulative_us |   module" (nesting = extra indent)
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        module = name.strip()
+        seen.add(module.split(".")[0])
+        if not name[1:].startswith(" "):  # Top-level: a single space after the bar
+            top_level.append((module, int(cumulative_us)))
+    top_level.sort(key=lambda m: m[1], reverse=True)
+    return {
+        "top_imports": [{"module": m, "cumulative_ms": round(us / 1000, 1)} for m, us in top_level[:top]],
+        "heavy_loaded": [m for m in HEAVY_MODULES if m in seen],
+    }
+
+
+def print_results(results: list, baseline: dict = None):
+    header = f"{'target':<14} {'min ms':>8} {'median ms':>10}  heavy modules loaded"
+    if baseline:
+        header += f"   {'baseline':>9} {'delta':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if r.get("error"):
+            print(f"{r['name']:<14} {'error':>8}  {r['error']}")
+            continue
+        line = f"{r['name']:<14} {r['min_ms']:>8.1f} {r['median_ms']:>10.1f}  {', '.join(r['heavy_loaded']) or '-'}"
+        previous = (baseline or {}).get(r["name"])
+        if previous and not previous.get("error"):
+            before = previous["median_ms"]
+            line += f"   {before:>9.1f} {(r['median_ms'] - before) / before * 100:>+6.0f}%"
+        print(line)
+
+    for r in results:
+        if r.get("top_imports") and r["name"] not in ("interpreter", "import_pandas"):
+            print(f"\n{r['name']}: slowest top-level imports")
+            for m in r["top_imports"]:
+                print(f"  {m['cumulative_ms']:>8.1f} ms  {m['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold-start time of the pull scripts")
+    parser.add_argument("--target", choices=list(TARGETS), action="append", help="Target to run (repeatable, default: all)")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per target (default: 10)")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports to list per target (default: 8)")
+    parser.add_argument("--label", type=str, default="run", help="Label stored in the JSON result")
+    parser.add_argument("--json", type=str, default=None, help="Also write results to this JSON file")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    results = []
+    for name in args.target or list(TARGETS):
+        argv = TARGETS[name]
+        print(f"  {name}...", flush=True)
+        try:
+            runs = time_target(argv, args.repeat)
+        except RuntimeError as e:  # e.g. a dependency missing in this venv
+            results.append({"name": name, "error": str(e)})
+            continue
+        results.append(
+            {
+                "name": name,
+                "min_ms": round(min(runs), 1),
+                "median_ms": round(statistics.median(runs), 1),
+                "runs_ms": [round(r, 1) for r in runs],
+                **import_profile(argv, args.top),
+            }
+        )
+
+    print()
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "label": args.label,
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "python": sys.version.split()[0],
+                    "repeat": args.repeat,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nResults written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,270 @@
+"""
+Record/replay of Accurate API traffic for deterministic offline benchmarks.
+
+Recording (ACCURATE_RECORD=path, or --record on the pull scripts):
+    Every response seen by AccurateAPIClient's requests.Session is appended to
+    a gzip'd JSON-lines cassette: method, path, sorted query params, status,
+    elapsed time and the response body. Request headers (token, signature) are
+    never written, and sensitive fields in bodies (customer contact data,
+    tokens, session ids) are redacted before writing.
+
+Replay (ACCURATE_REPLAY=path, ACCURATE_REPLAY_SPEED=1.0, or --replay):
+    A requests transport adapter serves the recorded responses instead of the
+    network. Requests are matched on (method, path, query); repeated requests
+    are served in recorded order. If there is no exact match, date-valued
+    params are ignored, so a cassette recorded for "last 3 days" replays on any
+    later day. Speed 1.0 reproduces the recorded latency, 2.0 is twice as
+    fast, 0 serves immediately.
+
+The auth cache is disabled in both modes: recording must capture the token
+exchange, and replayed (sanitized) auth must never be cached.
+
+Both are wired in with a single attach(session) call in the client.
+"""
+
+import io
+import os
+import gzip
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import defaultdict, deque
+from urllib.parse import urlsplit, parse_qsl
+
+import requests
+from requests.adapters import BaseAdapter
+
+# Keys whose values are replaced in recorded bodies (matched case-insensitively)
+SENSITIVE_KEYS = {
+    "email",
+    "phone",
+    "mobilephone",
+    "fax",
+    "address",
+    "billstreet",
+    "shipstreet",
+    "npwpno",
+    "nik",
+    "contactinfo",
+    "accesstoken",
+    "refreshtoken",
+    "session",
+    "sessionid",
+    "secret",
+}
+# Keys pseudonymised (stable hash) so grouping by them still works on replay
+PSEUDONYM_KEYS = {"customername", "customerno"}
+
+DATE_VALUE = re.compile(r"^\d{2}/\d{2}/\d{4}$|^\d{4}-\d{2}-\d{2}$")
+
+
+def _normalize_query(query: str) -> str:
+    return "&".join(f"{k}={v}" for k, v in sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def _request_key(method: str, url: str) -> tuple:
+    parts = urlsplit(url)
+    return (method.upper(), parts.path, _normalize_query(parts.query))
+
+
+def _loose_key(key: tuple) -> tuple:
+    method, path, query = key
+    params = [p for p in query.split("&") if not DATE_VALUE.match(p.partition("=")[2])]
+    return (method, path, "&".join(params))
+
+
+def _pseudonym(value) -> str:
+    return "ANON-" + hashlib.sha256(str(value).encode("utf-8")).hexdigest()[:10]
+
+
+def sanitize(obj, parent_key: str = ""):
+    """Return a copy of a decoded JSON body with sensitive values redacted."""
+    if isinstance(obj, dict):
+        clean = {}
+        for key, value in obj.items():
+            lower = key.lower()
+            if lower in SENSITIVE_KEYS:
+                clean[key] = "REDACTED" if value not in (None, "") else value
+            elif lower in PSEUDONYM_KEYS or (parent_key == "customer" and lower == "name"):
+                clean[key] = _pseudonym(value) if value not in (None, "") else value
+            else:
+                clean[key] = sanitize(value, lower)
+        return clean
+    if isinstance(obj, list):
+        return [sanitize(item, parent_key) for item in obj]
+    return obj
+
+
+class CassetteRecorder:
+    """requests response hook that appends sanitized exchanges to a cassette."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self.count = 0
+        atexit.register(self.close)
+
+    def __call__(self, response, *args, **kwargs):
+        method, path, query = _request_key(response.request.method, response.request.url)
+        try:
+            body = json.dumps(sanitize(response.json()), separators=(",", ":"), ensure_ascii=False)
+        except ValueError:
+            body = response.text
+        record = {
+            "method": method,
+            "path": path,
+            "query": query,
+            "status": response.status_code,
+            "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 1),
+            "content_type": response.headers.get("Content-Type", "application/json"),
+            "body": body,
+        }
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.count += 1
+        return response
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def load_cassette(path: str) -> list:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that answers from a cassette instead of the network."""
+
+    def __init__(self, records: list, speed: float = 1.0):
+        super().__init__()
+        self.speed = speed
+        self._queues = defaultdict(deque)
+        self._served = defaultdict(list)
+        self._lock = threading.Lock()
+        for record in records:
+            key = (record["method"], record["path"], record["query"])
+            self._queues[key].append(record)
+            if _loose_key(key) != key:
+                self._queues[_loose_key(key)].append(record)
+        self.misses = 0
+
+    def _next_record(self, key: tuple):
+        record = self._take(key)
+        if record is None:
+            record = self._take(_loose_key(key))
+        return record
+
+    def _take(self, key: tuple):
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                record = queue.popleft()
+                self._served[key].append(record)
+                return record
+            served = self._served.get(key)
+            if served:
+                # Exhausted - cycle through what was recorded for this request
+                record = served.pop(0)
+                served.append(record)
+                return record
+        return None
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = _request_key(request.method, request.url)
+        record = self._next_record(key)
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        if record is None:
+            self.misses += 1
+            response.status_code = 599
+            response._content = json.dumps(
+                {"s": False, "d": [f"Not in cassette: {key[0]} {key[1]}?{key[2]}"]}
+            ).encode("utf-8")
+            response.headers["Content-Type"] = "application/json"
+            return response
+
+        if self.speed > 0 and record["elapsed_ms"]:
+            time.sleep(record["elapsed_ms"] / 1000 / self.speed)
+
+        response.status_code = record["status"]
+        response._content = record["body"].encode("utf-8")
+        response.headers["Content-Type"] = record["content_type"]
+        response.encoding = "utf-8"
+        response.raw = io.BytesIO(response._content)
+        return response
+
+    def close(self):
+        pass
+
+
+_recorder = None
+_replay_records = None
+
+
+def attach(session: requests.Session):
+    """Enable recording or replay on a session according to the environment."""
+    global _recorder, _replay_records
+
+    replay_path = os.getenv("ACCURATE_REPLAY")
+    record_path = os.getenv("ACCURATE_RECORD")
+    if replay_path or record_path:
+        os.environ["ACCURATE_AUTH_CACHE_TTL"] = "0"
+
+    if replay_path:
+        if _replay_records is None:
+            _replay_records = load_cassette(replay_path)
+            print(f"  Replay: {len(_replay_records):,} recorded responses from {replay_path}")
+        speed = float(os.getenv("ACCURATE_REPLAY_SPEED", "1.0"))
+        adapter = ReplayAdapter(_replay_records, speed=speed)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return
+
+    if record_path:
+        if _recorder is None:
+            _recorder = CassetteRecorder(record_path)
+            print(f"  Recording API traffic to {record_path}")
+        session.hooks["response"].append(_recorder)
+
+
+def add_arguments(parser):
+    """Add --record / --replay / --replay-speed to a pull script's parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--record",
+        type=str,
+        default=None,
+        metavar="CASSETTE",
+        help="Record sanitized API traffic to this cassette (.jsonl.gz)",
+    )
+    group.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        metavar="CASSETTE",
+        help="Serve API calls from this cassette instead of the network",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="With --replay: latency speed-up factor (0 = no delay, default: 1.0)",
+    )
+
+
+def configure_from_args(args):
+    """Export the CLI flags as environment for attach()."""
+    if args.record:
+        os.environ["ACCURATE_RECORD"] = args.record
+    if args.replay:
+        os.environ["ACCURATE_REPLAY"] = args.replay
+        os.environ["ACCURATE_REPLAY_SPEED"] = str(args.replay_speed)
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Control-stock metrics (FF%, FB%, depth) computed in NumPy.
+
+mart_reports.py computes report_control_stock / report_depth_alert with SQL
+over the Parquet exports, one GROUP BY over (store, article) after joining
+every stock row to portal.kodemix by string. This engine reads each entity's
+stock snapshot from PostgreSQL once and interns it into integer arrays:
+
+    store    (entity, nama_gudang)                        -> store id
+    sku      kode_barang                                   -> sku id
+    article  lower(trim(kode_barang minus 3-char suffix))  -> article id (= kodemix.kode)
+
+Every metric is then a few np.unique / np.bincount passes over the whole
+network at once, for every store and tier, and the results are written in bulk
+(TRUNCATE + COPY, or DELETE of the selected entities + COPY).
+
+Definitions are those of mart_reports.py (latest snapshot per entity):
+    sizes          distinct kode_besar per article in portal.kodemix
+    FF%            sizes in stock / sizes in range, over articles in stock
+    FB%            articles with their full size run in stock / articles in stock
+    depth          pairs / articles in stock
+    depth alert    SKU rows with kuantitas < DEPTH_THRESHOLD
+
+Reports:
+    report_control_stock       per entity x store
+    report_control_stock_tier  per entity x store x tier (tier of the article's
+                               first kodemix row by no_urut)
+    report_depth_alert         per SKU row below DEPTH_THRESHOLD
+
+Requires numpy.
+
+Usage:
+    python control_stock.py --to-pg
+    python control_stock.py --entity ddd --output-dir reports/
+    python control_stock.py --snapshot-date 2026-10-01 --report report_control_stock --output-dir reports/
+"""
+
+import io
+import csv
+import time
+import argparse
+from array import array
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+try:
+    import numpy as np
+except ImportError:  # Required; checked in main()
+    np = None
+
+import pg_pool
+
+SCRIPT_DIR = Path(__file__).parent
+
+ENTITIES = ["ddd", "ljbb", "mbb", "ubb"]
+DEPTH_THRESHOLD = 2  # same as mart_reports.py
+FETCH_ROWS = 50_000  # server-side cursor batch
+
+REPORT_COLUMNS = {
+    "report_control_stock": [
+        ("entity", "text"), ("snapshot_date", "date"), ("nama_gudang", "text"),
+        ("articles", "bigint"), ("sizes_in_stock", "bigint"), ("sizes_in_range", "bigint"),
+        ("ff_pct", "double precision"), ("fb_pct", "double precision"),
+        ("pairs", "bigint"), ("depth", "double precision"),
+    ],
+    "report_control_stock_tier": [
+        ("entity", "text"), ("snapshot_date", "date"), ("nama_gudang", "text"), ("tier", "text"),
+        ("articles", "bigint"), ("sizes_in_stock", "bigint"), ("sizes_in_range", "bigint"),
+        ("ff_pct", "double precision"), ("fb_pct", "double precision"),
+        ("pairs", "bigint"), ("depth", "double precision"),
+    ],
+    "report_depth_alert": [
+        ("entity", "text"), ("snapshot_date", "date"), ("nama_gudang", "text"),
+        ("kode_barang", "text"), ("nama_barang", "text"), ("kuantitas", "bigint"),
+    ],
+}
+REPORT_NAMES = list(REPORT_COLUMNS)
+
+
+class Interner:
+    """Values -> dense integer ids, in first-seen order."""
+
+    __slots__ = ("ids", "values")
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value) -> int:
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    def ranks(self, key=None):
+        """Sort position of every id (for ORDER BY on interned values)."""
+        order = sorted(range(len(self.values)), key=lambda i: key(self.values[i]) if key else self.values[i])
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        return ranks
+
+
+def _article_key(kode_barang: str) -> str:
+    # = lower(trim(left(kode_barang, length(kode_barang) - 3)))
+    return kode_barang[: len(kode_barang) - 3].strip().lower()
+
+
+# =============================================================================
+# Load
+# =============================================================================
+
+
+class SizeRange:
+    """portal.kodemix per article: sizes in range and tier."""
+
+    def __init__(self, cur):
+        cur.execute(
+            """
+            SELECT lower(trim(kode)),
+                   COUNT(DISTINCT lower(trim(kode_besar))),
+                   (array_agg(COALESCE(tier_baru, tier_lama) ORDER BY no_urut NULLS LAST))[1]
+            FROM portal.kodemix
+            WHERE kode IS NOT NULL
+            GROUP BY 1
+            """
+        )
+        self.articles = Interner()
+        self.tiers = Interner()
+        sizes, tiers = [], []
+        for article, n_sizes, tier in cur.fetchall():
+            self.articles.intern(article)
+            sizes.append(n_sizes)
+            tiers.append(self.tiers.intern(tier or "UNMAPPED"))
+        self.sizes = np.array(sizes, dtype=np.int64)
+        self.tier = np.array(tiers, dtype=np.int64)
+
+
+class Snapshot:
+    """Latest stock snapshot of the selected entities as parallel arrays."""
+
+    def __init__(self):
+        self.stores = Interner()  # (entity, nama_gudang)
+        self.skus = Interner()  # kode_barang
+        self.sku_names = []  # nama_barang per sku id (first seen)
+        self.sku_article = array("q")  # article id per sku id, -1 if not in kodemix
+        self.snapshot_dates = {}  # entity -> date
+        self._store = array("q")
+        self._sku = array("q")
+        self._qty = array("q")
+
+    def load(self, conn, entity: str, snapshot_date, size_range: SizeRange) -> int:
+        """Append one entity's snapshot (latest if snapshot_date is None). Returns rows."""
+        table = f"raw.accurate_stock_{entity}"
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", (table,))
+            if cur.fetchone()[0] is None:
+                return 0
+            if snapshot_date is None:
+                cur.execute(f"SELECT MAX(snapshot_date) FROM {table}")
+                snapshot_date = cur.fetchone()[0]
+        if snapshot_date is None:
+            return 0
+        self.snapshot_dates[entity] = snapshot_date
+
+        stores, skus, articles = self.stores, self.skus, size_range.articles.ids
+        append_store, append_sku, append_qty = self._store.append, self._sku.append, self._qty.append
+        n = 0
+        with conn.cursor(name=f"control_stock_{entity}") as cur:
+            cur.itersize = FETCH_ROWS
+            cur.execute(
+                f"SELECT nama_gudang, kode_barang, nama_barang, kuantitas FROM {table} WHERE snapshot_date = %s",
+                (snapshot_date,),
+            )
+            for nama_gudang, kode_barang, nama_barang, kuantitas in cur:
+                sku = skus.ids.get(kode_barang)
+                if sku is None:
+                    sku = skus.intern(kode_barang)
+                    self.sku_names.append(nama_barang)
+                    self.sku_article.append(articles.get(_article_key(kode_barang), -1))
+                append_store(stores.intern((entity, nama_gudang)))
+                append_sku(sku)
+                append_qty(kuantitas)
+                n += 1
+        conn.commit()
+        return n
+
+    def arrays(self) -> tuple:
+        """(store, sku, article, qty) int64 arrays, one element per stock row."""
+        store = np.frombuffer(self._store, dtype=np.int64)
+        sku = np.frombuffer(self._sku, dtype=np.int64)
+        article = np.frombuffer(self.sku_article, dtype=np.int64)[sku] if len(sku) else sku
+        qty = np.frombuffer(self._qty, dtype=np.int64)
+        return store, sku, article, qty
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+
+def _round1(values):
+    """ROUND(x, 1) as SQL does it (half away from zero); NaN stays NaN."""
+    return np.sign(values) * np.floor(np.abs(values) * 10 + 0.5) / 10
+
+
+def _ratio(numerator, denominator, scale: float = 1.0):
+    """scale * numerator / NULLIF(denominator, 0), rounded; NaN where NULL."""
+    out = np.full(len(numerator), np.nan)
+    nonzero = denominator != 0
+    out[nonzero] = scale * numerator[nonzero] / denominator[nonzero]
+    return _round1(out)
+
+
+def article_metrics(snap: Snapshot, size_range: SizeRange) -> dict:
+    """Per (store, article) in kodemix: sizes in stock, sizes in range, pairs."""
+    store, sku, article, qty = snap.arrays()
+    mapped = article >= 0
+    store, sku, article, qty = store[mapped], sku[mapped], article[mapped], qty[mapped]
+
+    n_articles = max(len(size_range.articles), 1)
+    n_skus = max(len(snap.skus), 1)
+    group = store * n_articles + article
+    keys, inverse = np.unique(group, return_inverse=True)
+    pairs = np.bincount(inverse, weights=qty, minlength=len(keys)).astype(np.int64)
+
+    # COUNT(DISTINCT kode_barang) FILTER (WHERE kuantitas > 0)
+    positive = qty > 0
+    stocked = np.unique(group[positive] * n_skus + sku[positive]) // n_skus
+    sizes_in_stock = np.bincount(np.searchsorted(keys, stocked), minlength=len(keys))
+
+    article_of = keys % n_articles
+    return {
+        "store": keys // n_articles,
+        "article": article_of,
+        "sizes": size_range.sizes[article_of],
+        "sizes_in_stock": sizes_in_stock,
+        "pairs": pairs,
+    }
+
+
+def rollup(per_article: dict, group) -> dict:
+    """Aggregate article metrics to the given group ids (FF%, FB%, depth)."""
+    keys, inverse = np.unique(group, return_inverse=True)
+    n = len(keys)
+    in_stock = per_article["sizes_in_stock"] > 0
+    full_run = per_article["sizes_in_stock"] >= per_article["sizes"]
+
+    articles = np.bincount(inverse, weights=in_stock, minlength=n).astype(np.int64)
+    sizes_in_stock = np.bincount(inverse, weights=per_article["sizes_in_stock"], minlength=n).astype(np.int64)
+    sizes_in_range = np.bincount(
+        inverse, weights=np.where(in_stock, per_article["sizes"], 0), minlength=n
+    ).astype(np.int64)
+    full = np.bincount(inverse, weights=full_run, minlength=n)
+    pairs = np.bincount(inverse, weights=per_article["pairs"], minlength=n).astype(np.int64)
+    return {
+        "key": keys,
+        "articles": articles,
+        "sizes_in_stock": sizes_in_stock,
+        "sizes_in_range": sizes_in_range,
+        "ff_pct": _ratio(sizes_in_stock, sizes_in_range, 100.0),
+        "fb_pct": _ratio(full, articles, 100.0),
+        "pairs": pairs,
+        "depth": _ratio(pairs, articles),
+    }
+
+
+def _nullable(values) -> list:
+    return [None if v != v else v for v in values.tolist()]  # NaN -> NULL
+
+
+def compute_reports(snap: Snapshot, size_range: SizeRange, names: list) -> dict:
+    """{report name: list of row tuples}, ordered like the SQL reports."""
+    results = {}
+    store_entity = [entity for entity, _ in snap.stores.values]
+    store_name = [name for _, name in snap.stores.values]
+    store_rank = snap.stores.ranks(key=lambda v: (v[0], v[1] is None, v[1] or ""))
+
+    per_article = article_metrics(snap, size_range)
+
+    def rows(metrics: dict, store_ids, extra=None) -> list:
+        order = np.lexsort(
+            ([] if extra is None else [extra[1]]) + [store_rank[store_ids]]
+        ) if len(store_ids) else []
+        columns = [
+            metrics["articles"].tolist(), metrics["sizes_in_stock"].tolist(), metrics["sizes_in_range"].tolist(),
+            _nullable(metrics["ff_pct"]), _nullable(metrics["fb_pct"]),
+            metrics["pairs"].tolist(), _nullable(metrics["depth"]),
+        ]
+        store_list = store_ids.tolist()
+        out = []
+        for i in order:
+            s = store_list[i]
+            head = [store_entity[s], snap.snapshot_dates[store_entity[s]], store_name[s]]
+            if extra is not None:
+                head.append(extra[0][i])
+            out.append(tuple(head + [column[i] for column in columns]))
+        return out
+
+    if "report_control_stock" in names:
+        metrics = rollup(per_article, per_article["store"])
+        results["report_control_stock"] = rows(metrics, metrics["key"])
+
+    if "report_control_stock_tier" in names:
+        n_tiers = max(len(size_range.tiers), 1)
+        tier_of = size_range.tier[per_article["article"]]
+        metrics = rollup(per_article, per_article["store"] * n_tiers + tier_of)
+        tier_ids = metrics["key"] % n_tiers
+        tier_rank = size_range.tiers.ranks()
+        tier_names = [size_range.tiers.values[t] for t in tier_ids.tolist()]
+        results["report_control_stock_tier"] = rows(
+            metrics, metrics["key"] // n_tiers, (tier_names, tier_rank[tier_ids])
+        )
+
+    if "report_depth_alert" in names:
+        store, sku, _, qty = snap.arrays()
+        low = np.nonzero(qty < DEPTH_THRESHOLD)[0]
+        sku_rank = snap.skus.ranks()
+        low = low[np.lexsort((sku_rank[sku[low]], store_rank[store[low]]))]
+        results["report_depth_alert"] = [
+            (store_entity[s], snap.snapshot_dates[store_entity[s]], store_name[s],
+             snap.skus.values[k], snap.sku_names[k], q)
+            for s, k, q in zip(store[low].tolist(), sku[low].tolist(), qty[low].tolist())
+        ]
+    return results
+
+
+# =============================================================================
+# Output
+# =============================================================================
+
+
+def _csv_buffer(rows: list) -> io.StringIO:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    return buf
+
+
+def write_pg(conn, results: dict, entities: list):
+    """Replace the selected entities' rows in mart.<report> (one transaction)."""
+    all_entities = set(entities) == set(ENTITIES)
+    with conn.cursor() as cur:
+        cur.execute("CREATE SCHEMA IF NOT EXISTS mart")
+        for name, rows in results.items():
+            columns = REPORT_COLUMNS[name]
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS mart.{name} ({', '.join(f'{c} {t}' for c, t in columns)})"
+            )
+            if all_entities:
+                cur.execute(f"TRUNCATE mart.{name}")
+            else:
+                cur.execute(f"DELETE FROM mart.{name} WHERE entity = ANY(%s)", (entities,))
+            cur.copy_expert(
+                f"COPY mart.{name} ({', '.join(c for c, _ in columns)}) FROM STDIN WITH (FORMAT csv)",
+                _csv_buffer(rows),
+            )
+    conn.commit()
+
+
+def write_file(output_dir: Path, name: str, rows: list) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{name}.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([c for c, _ in REPORT_COLUMNS[name]])
+        writer.writerows(rows)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute control-stock reports (FF%, FB%, depth) in NumPy")
+    parser.add_argument("--entity", choices=ENTITIES, action="append", help="Entity (repeatable, default: all)")
+    parser.add_argument("--report", choices=REPORT_NAMES, action="append", help="Report to run (repeatable, default: all)")
+    parser.add_argument("--snapshot-date", type=str, default=None, help="Snapshot to use (default: latest per entity)")
+    parser.add_argument("--to-pg", action="store_true", help="Write results to mart.report_* tables")
+    parser.add_argument("--output-dir", type=str, default=None, help="Write results as CSV files to this directory")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    args = parser.parse_args()
+
+    if np is None:
+        print("ERROR: numpy is required (pip install numpy)")
+        return 1
+    if not args.to_pg and not args.output_dir:
+        parser.error("nothing to do: pass --to-pg and/or --output-dir")
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+
+    entities = args.entity or ENTITIES
+    names = args.report or REPORT_NAMES
+    conn = pg_pool.connection(args.pg_host)
+    try:
+        started = time.perf_counter()
+        with conn.cursor() as cur:
+            size_range = SizeRange(cur)
+        snap = Snapshot()
+        total = 0
+        for entity in entities:
+            n = snap.load(conn, entity, args.snapshot_date, size_range)
+            if n:
+                print(f"  {entity}: {n:,} rows (snapshot {snap.snapshot_dates[entity]})")
+            total += n
+        loaded = time.perf_counter()
+        print(
+            f"Loaded {total:,} rows, {len(snap.stores):,} stores, {len(snap.skus):,} SKUs, "
+            f"{len(size_range.articles):,} articles in {loaded - started:.2f}s"
+        )
+
+        results = compute_reports(snap, size_range, names)
+        computed = time.perf_counter()
+        for name, rows in results.items():
+            print(f"  {name}: {len(rows):,} rows")
+        print(f"Computed in {computed - loaded:.2f}s")
+
+        if args.to_pg:
+            write_pg(conn, results, list(snap.snapshot_dates) or entities)
+            print(f"  -> mart.{', mart.'.join(results)} in {time.perf_counter() - computed:.2f}s")
+        if args.output_dir:
+            for name, rows in results.items():
+                print(f"  -> {write_file(Path(args.output_dir), name, rows)}")
+    except Exception:
+        pg_pool.rollback(conn)
+        raise
+    finally:
+        pg_pool.release(conn)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
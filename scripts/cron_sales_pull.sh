@@ -38,6 +38,11 @@ for ENTITY in ddd mbb ubb; do
     echo "  $ENTITY: $STATUS (exit=$EXIT_CODE, ${DURATION}s)" >> $LOGFILE
 done
 
+# Incremental Parquet export of today's stock + sales loads (non-fatal)
+echo "" >> $LOGFILE
+echo "--- parquet export ---" >> $LOGFILE
+$VENV /opt/openclaw/scripts/export_parquet.py >> $LOGFILE 2>&1 || echo "  parquet export: error (exit=$?)" >> $LOGFILE
+
 echo "" >> $LOGFILE
 echo "========================================" >> $LOGFILE
 echo "SALES PULL END: $(date '+%Y-%m-%d %H:%M:%S WIB')" >> $LOGFILE
@@ -0,0 +1,144 @@
+"""
+Dead letters for failed detail fetches in raw.accurate_dead_letter.
+
+When sales-invoice/detail.do or item/detail.do fails for one id, the pull
+records it here (error class, attempt count, snapshot it is missing from) and
+carries on. `--retry-dead-letters` re-fetches only the pending ids and merges
+them into their snapshot; a later successful fetch of the same id (retry or
+normal run) marks it resolved.
+
+Writes run under a SAVEPOINT, so a missing table (dead_letter.sql not applied)
+never fails the load itself.
+
+Table DDL: scripts/dead_letter.sql
+"""
+
+from psycopg2.extras import execute_values
+
+DEAD_LETTER_TABLE = "raw.accurate_dead_letter"
+
+KIND_SALES_INVOICE = "sales_invoice"
+KIND_ITEM = "item"
+
+
+class ApiError(Exception):
+    """A detail call answered, but with "s": false."""
+
+
+def error_class(exc: BaseException) -> str:
+    """Short error classification, e.g. 'Timeout', 'HTTPError 502', 'ApiError'."""
+    name = type(exc).__name__
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return f"{name} {status}" if status else name
+
+
+def failure(object_id, object_no: str, exc: BaseException) -> dict:
+    return {
+        "object_id": object_id,
+        "object_no": object_no,
+        "error_class": error_class(exc),
+        "error_message": str(exc)[:500],
+    }
+
+
+def record_failures(cur, entity_key: str, kind: str, failures: list, snapshot_date, batch_id: str) -> int:
+    """Upsert failed ids (attempts + 1, re-opened if previously resolved)."""
+    if not failures:
+        return 0
+    values = [
+        (
+            entity_key,
+            kind,
+            f["object_id"],
+            f["object_no"],
+            f.get("snapshot_date") or snapshot_date,
+            f["error_class"],
+            f["error_message"],
+            batch_id,
+        )
+        for f in failures
+        if f["object_id"] is not None
+    ]
+    cur.execute("SAVEPOINT dead_letter")
+    try:
+        execute_values(
+            cur,
+            f"""
+            INSERT INTO {DEAD_LETTER_TABLE} AS d (entity, kind, object_id, object_no, snapshot_date,
+                                                  error_class, error_message, last_batch_id)
+            VALUES %s
+            ON CONFLICT (entity, kind, object_id)
+            DO UPDATE SET
+                object_no = COALESCE(EXCLUDED.object_no, d.object_no),
+                snapshot_date = GREATEST(d.snapshot_date, EXCLUDED.snapshot_date),
+                error_class = EXCLUDED.error_class,
+                error_message = EXCLUDED.error_message,
+                attempts = d.attempts + 1,
+                last_failed_at = now(),
+                last_batch_id = EXCLUDED.last_batch_id,
+                resolved_at = NULL
+            """,
+            values,
+            page_size=500,
+        )
+        cur.execute("RELEASE SAVEPOINT dead_letter")
+        return len(values)
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT dead_letter")
+        print(f"  Warning: could not record dead letters: {e}")
+        return 0
+
+
+def resolve(cur, entity_key: str, kind: str, object_ids: list) -> int:
+    """Mark ids as resolved (fetched successfully). Returns rows resolved."""
+    if not object_ids:
+        return 0
+    cur.execute("SAVEPOINT dead_letter")
+    try:
+        cur.execute(
+            f"""
+            UPDATE {DEAD_LETTER_TABLE}
+            SET resolved_at = now()
+            WHERE entity = %s AND kind = %s AND object_id = ANY(%s) AND resolved_at IS NULL
+            """,
+            (entity_key, kind, list(object_ids)),
+        )
+        resolved = cur.rowcount
+        cur.execute("RELEASE SAVEPOINT dead_letter")
+        return resolved
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT dead_letter")
+        print(f"  Warning: could not resolve dead letters: {e}")
+        return 0
+
+
+def load_pending(cur, entity_key: str, kind: str, max_attempts: int = None) -> list:
+    """Unresolved dead letters for an entity/kind, oldest snapshot first.
+
+    Missing table (not yet migrated) yields an empty list.
+    """
+    cur.execute("SELECT to_regclass(%s)", (DEAD_LETTER_TABLE,))
+    if cur.fetchone()[0] is None:
+        return []
+
+    cur.execute(
+        f"""
+        SELECT object_id, object_no, snapshot_date, attempts, error_class
+        FROM {DEAD_LETTER_TABLE}
+        WHERE entity = %s AND kind = %s AND resolved_at IS NULL
+          AND (%s::int IS NULL OR attempts < %s::int)
+        ORDER BY snapshot_date, object_id
+        """,
+        (entity_key, kind, max_attempts, max_attempts),
+    )
+    return [
+        {
+            "object_id": object_id,
+            "object_no": object_no,
+            "snapshot_date": snapshot_date,
+            "attempts": attempts,
+            "error_class": error_cls,
+        }
+        for object_id, object_no, snapshot_date, attempts, error_cls in cur.fetchall()
+    ]
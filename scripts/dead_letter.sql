@@ -0,0 +1,32 @@
+-- ============================================================
+-- DEAD LETTERS - raw.accurate_dead_letter
+-- One row per (entity, kind, object_id) whose detail fetch failed
+-- during a pull (sales invoice or stock item). The pull continues;
+-- `--retry-dead-letters` re-fetches only these ids and merges them
+-- into the snapshot they were missing from.
+--
+-- Written by pull_accurate_sales.py / pull_accurate_stock.py via
+-- scripts/dead_letter.py.
+--
+-- Apply once:   psql -d openclaw_ops -f scripts/dead_letter.sql
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS raw.accurate_dead_letter (
+    entity          text        NOT NULL,
+    kind            text        NOT NULL,   -- 'sales_invoice' | 'item'
+    object_id       bigint      NOT NULL,   -- Accurate id (detail.do?id=)
+    object_no       text,                   -- invoice number / item code
+    snapshot_date   date        NOT NULL,   -- snapshot the object is missing from
+    error_class     text,                   -- e.g. Timeout, HTTPError 502, ApiError
+    error_message   text,
+    attempts        integer     NOT NULL DEFAULT 1,
+    first_failed_at timestamptz NOT NULL DEFAULT now(),
+    last_failed_at  timestamptz NOT NULL DEFAULT now(),
+    last_batch_id   text,
+    resolved_at     timestamptz,
+    PRIMARY KEY (entity, kind, object_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_accurate_dead_letter_pending
+    ON raw.accurate_dead_letter (entity, kind)
+    WHERE resolved_at IS NULL;
@@ -0,0 +1,278 @@
+-- ============================================================
+-- DIMENSION TABLES - narrow raw.accurate_sales / raw.accurate_stock
+-- Every fact row repeated its names as text (sales: nama_barang,
+-- satuan, nama_departemen, nama_pelanggan, nama_gudang; stock:
+-- nama_barang, nama_gudang), in every snapshot copy. They move to
+-- small dictionary tables with integer keys:
+--
+--   raw.dim_item        item_id        (nama_barang, satuan)
+--   raw.dim_warehouse   warehouse_id   nama_gudang
+--   raw.dim_department  department_id  nama_departemen
+--   raw.dim_customer    customer_id    nama_pelanggan
+--
+-- and the partitioned parents are rebuilt narrow: keys and measures
+-- only. The per-entity views raw.accurate_{sales,stock}_{entity} join
+-- the names back, with exactly the columns they had, so core views,
+-- the rollup, export_parquet.py, mart_reports.py, control_stock.py and
+-- ad-hoc SQL are unchanged. DELETE through a view still works (row by
+-- row, via an INSTEAD OF trigger); the loaders delete from the parents
+-- directly (fact_tables.delete) and encode names through in-process
+-- caches of the dimensions (scripts/dimensions.py).
+--
+-- Requires the partitioned layout (entity_partitions.sql) and, if the
+-- rollup is installed, the current sales_rollup.sql (statement
+-- triggers on the parent, recomputing through the per-entity views).
+--
+-- The wide tables are kept as raw.accurate_{sales,stock}_wide (partitions
+-- raw.accurate_{sales,stock}_part_{entity}_wide) - drop them once the
+-- new layout is verified. Secondary indexes are recreated as the
+-- baseline set (nama_gudang -> warehouse_id); re-run index_advisor.py.
+--
+-- Apply once, as the owner of the raw tables:
+--     psql -d openclaw_ops -f scripts/dimension_tables.sql
+-- ============================================================
+
+BEGIN;
+
+DO $$
+DECLARE
+    v_rollup boolean := to_regprocedure('core.trg_fact_sales_daily()') IS NOT NULL;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('raw.accurate_sales')) IS DISTINCT FROM 'p'
+       OR (SELECT relkind FROM pg_class WHERE oid = to_regclass('raw.accurate_stock')) IS DISTINCT FROM 'p' THEN
+        RAISE EXCEPTION 'raw.accurate_sales / raw.accurate_stock are not partitioned: apply scripts/entity_partitions.sql first';
+    END IF;
+    IF v_rollup AND to_regprocedure('core.attach_fact_sales_daily(text,text)') IS NULL THEN
+        RAISE EXCEPTION 'core.fact_sales_daily uses row triggers: apply scripts/sales_rollup.sql first';
+    END IF;
+END $$;
+
+-- ------------------------------------------------------------
+-- Dimensions, filled from the current rows
+-- ------------------------------------------------------------
+
+CREATE TABLE raw.dim_item (
+    item_id     integer GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    nama_barang text,
+    satuan      text,
+    CONSTRAINT uq_dim_item UNIQUE NULLS NOT DISTINCT (nama_barang, satuan)
+);
+
+CREATE TABLE raw.dim_warehouse (
+    warehouse_id integer GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    nama_gudang  text NOT NULL CONSTRAINT uq_dim_warehouse UNIQUE
+);
+
+CREATE TABLE raw.dim_department (
+    department_id   integer GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    nama_departemen text NOT NULL CONSTRAINT uq_dim_department UNIQUE
+);
+
+CREATE TABLE raw.dim_customer (
+    customer_id    integer GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    nama_pelanggan text NOT NULL CONSTRAINT uq_dim_customer UNIQUE
+);
+
+INSERT INTO raw.dim_item (nama_barang, satuan)
+SELECT nama_barang, satuan FROM raw.accurate_sales WHERE nama_barang IS NOT NULL OR satuan IS NOT NULL
+UNION
+SELECT nama_barang, NULL FROM raw.accurate_stock WHERE nama_barang IS NOT NULL;
+
+INSERT INTO raw.dim_warehouse (nama_gudang)
+SELECT nama_gudang FROM raw.accurate_sales WHERE nama_gudang IS NOT NULL
+UNION
+SELECT nama_gudang FROM raw.accurate_stock WHERE nama_gudang IS NOT NULL;
+
+INSERT INTO raw.dim_department (nama_departemen)
+SELECT DISTINCT nama_departemen FROM raw.accurate_sales WHERE nama_departemen IS NOT NULL;
+
+INSERT INTO raw.dim_customer (nama_pelanggan)
+SELECT DISTINCT nama_pelanggan FROM raw.accurate_sales WHERE nama_pelanggan IS NOT NULL;
+
+-- ------------------------------------------------------------
+-- Wide tables out of the way (names, indexes, sequences)
+-- ------------------------------------------------------------
+
+DO $$
+DECLARE
+    v_table text;
+    v_rel   record;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['accurate_sales', 'accurate_stock'] LOOP
+        -- Indexes of the parent and its partitions (constraints follow their index)
+        FOR v_rel IN
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = ('raw.' || v_table)::regclass
+               OR i.indrelid IN (SELECT inhrelid FROM pg_inherits
+                                 WHERE inhparent = ('raw.' || v_table)::regclass)
+        LOOP
+            EXECUTE format('ALTER INDEX raw.%I RENAME TO %I', v_rel.relname, left(v_rel.relname, 58) || '_wide');
+        END LOOP;
+
+        FOR v_rel IN
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = ('raw.' || v_table)::regclass
+        LOOP
+            EXECUTE format('ALTER TABLE raw.%I RENAME TO %I', v_rel.relname, v_rel.relname || '_wide');
+        END LOOP;
+
+        EXECUTE format('ALTER SEQUENCE %s RENAME TO %I',
+                       pg_get_serial_sequence('raw.' || v_table, 'id'), v_table || '_wide_id_seq');
+        EXECUTE format('ALTER TABLE raw.%I RENAME TO %I', v_table, v_table || '_wide');
+    END LOOP;
+END $$;
+
+-- ------------------------------------------------------------
+-- Narrow parents
+-- ------------------------------------------------------------
+
+CREATE TABLE raw.accurate_sales (
+    id            bigserial,
+    entity        text NOT NULL,
+    tanggal       date NOT NULL,
+    department_id integer,
+    customer_id   integer,
+    nomor_invoice text,
+    kode_produk   text NOT NULL,
+    item_id       integer,
+    kuantitas     numeric NOT NULL,
+    harga_satuan  numeric,
+    total_harga   numeric,
+    bpp           numeric DEFAULT 0,
+    warehouse_id  integer,
+    vendor_price  numeric(15,2),
+    dpp_amount    numeric(15,2),
+    tax_amount    numeric(15,2),
+    snapshot_date date NOT NULL,
+    loaded_at     timestamptz NOT NULL DEFAULT now(),
+    load_batch_id text,
+    PRIMARY KEY (entity, id),
+    CONSTRAINT uq_accurate_sales UNIQUE (entity, nomor_invoice, kode_produk, tanggal, snapshot_date)
+) PARTITION BY LIST (entity);
+
+CREATE TABLE raw.accurate_stock (
+    id            bigserial,
+    entity        text NOT NULL,
+    kode_barang   text NOT NULL,
+    item_id       integer,
+    warehouse_id  integer,
+    kuantitas     integer NOT NULL,
+    unit_price    numeric(15,2),
+    vendor_price  numeric(15,2),
+    snapshot_date date NOT NULL,
+    loaded_at     timestamptz NOT NULL DEFAULT now(),
+    load_batch_id text,
+    PRIMARY KEY (entity, id)
+) PARTITION BY LIST (entity);
+
+-- DELETE through the wide views: one parent row per view row
+CREATE OR REPLACE FUNCTION raw.trg_accurate_view_delete() RETURNS trigger AS $$
+BEGIN
+    EXECUTE format('DELETE FROM %s WHERE entity = $1 AND id = $2', TG_ARGV[0])
+    USING TG_ARGV[1], OLD.id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Names are matched with chr(1) standing in for NULL, so the joins hash
+-- (IS NOT DISTINCT FROM would not); no name contains that character.
+DO $$
+DECLARE
+    v_entity text;
+    v_rollup boolean := to_regprocedure('core.trg_fact_sales_daily()') IS NOT NULL;
+BEGIN
+    FOREACH v_entity IN ARRAY ARRAY['ddd', 'mbb', 'ubb'] LOOP
+        EXECUTE format(
+            'CREATE TABLE raw.accurate_sales_part_%1$s PARTITION OF raw.accurate_sales FOR VALUES IN (%1$L)',
+            v_entity);
+        EXECUTE format(
+            'INSERT INTO raw.accurate_sales (id, entity, tanggal, department_id, customer_id, nomor_invoice,
+                 kode_produk, item_id, kuantitas, harga_satuan, total_harga, bpp, warehouse_id, vendor_price,
+                 dpp_amount, tax_amount, snapshot_date, loaded_at, load_batch_id)
+             SELECT s.id, s.entity, s.tanggal, d.department_id, c.customer_id, s.nomor_invoice,
+                    s.kode_produk, i.item_id, s.kuantitas, s.harga_satuan, s.total_harga, s.bpp,
+                    w.warehouse_id, s.vendor_price, s.dpp_amount, s.tax_amount, s.snapshot_date,
+                    s.loaded_at, s.load_batch_id
+             FROM raw.accurate_sales_part_%1$s_wide s
+             LEFT JOIN raw.dim_department d ON d.nama_departemen = s.nama_departemen
+             LEFT JOIN raw.dim_customer c ON c.nama_pelanggan = s.nama_pelanggan
+             LEFT JOIN raw.dim_warehouse w ON w.nama_gudang = s.nama_gudang
+             LEFT JOIN raw.dim_item i
+               ON COALESCE(i.nama_barang, chr(1)) = COALESCE(s.nama_barang, chr(1))
+              AND COALESCE(i.satuan, chr(1)) = COALESCE(s.satuan, chr(1))',
+            v_entity);
+        -- Same columns as before, so dependent views (core.*) stay valid
+        EXECUTE format(
+            'CREATE OR REPLACE VIEW raw.accurate_sales_%1$s AS
+             SELECT s.id, s.tanggal, d.nama_departemen, c.nama_pelanggan, s.nomor_invoice, s.kode_produk,
+                    i.nama_barang, i.satuan, s.kuantitas, s.harga_satuan, s.total_harga, s.bpp,
+                    w.nama_gudang, s.vendor_price, s.dpp_amount, s.tax_amount, s.snapshot_date,
+                    s.loaded_at, s.load_batch_id
+             FROM raw.accurate_sales s
+             LEFT JOIN raw.dim_department d ON d.department_id = s.department_id
+             LEFT JOIN raw.dim_customer c ON c.customer_id = s.customer_id
+             LEFT JOIN raw.dim_item i ON i.item_id = s.item_id
+             LEFT JOIN raw.dim_warehouse w ON w.warehouse_id = s.warehouse_id
+             WHERE s.entity = %1$L',
+            v_entity);
+        EXECUTE format(
+            'CREATE TRIGGER trg_accurate_view_delete INSTEAD OF DELETE ON raw.accurate_sales_%1$s '
+            'FOR EACH ROW EXECUTE FUNCTION raw.trg_accurate_view_delete(%2$L, %1$L)',
+            v_entity, 'raw.accurate_sales');
+    END LOOP;
+
+    -- Rollup triggers move from the wide parent to the narrow one
+    IF v_rollup THEN
+        PERFORM core.detach_fact_sales_daily('raw.accurate_sales_wide');
+        PERFORM core.attach_fact_sales_daily('raw.accurate_sales');
+    END IF;
+
+    FOREACH v_entity IN ARRAY ARRAY['ddd', 'ljbb', 'mbb', 'ubb'] LOOP
+        EXECUTE format(
+            'CREATE TABLE raw.accurate_stock_part_%1$s PARTITION OF raw.accurate_stock FOR VALUES IN (%1$L)',
+            v_entity);
+        EXECUTE format(
+            'INSERT INTO raw.accurate_stock (id, entity, kode_barang, item_id, warehouse_id, kuantitas,
+                 unit_price, vendor_price, snapshot_date, loaded_at, load_batch_id)
+             SELECT s.id, s.entity, s.kode_barang, i.item_id, w.warehouse_id, s.kuantitas,
+                    s.unit_price, s.vendor_price, s.snapshot_date, s.loaded_at, s.load_batch_id
+             FROM raw.accurate_stock_part_%1$s_wide s
+             LEFT JOIN raw.dim_warehouse w ON w.nama_gudang = s.nama_gudang
+             LEFT JOIN raw.dim_item i ON i.nama_barang = s.nama_barang AND i.satuan IS NULL',
+            v_entity);
+        EXECUTE format(
+            'CREATE OR REPLACE VIEW raw.accurate_stock_%1$s AS
+             SELECT s.id, s.kode_barang, i.nama_barang, w.nama_gudang, s.kuantitas, s.unit_price,
+                    s.vendor_price, s.snapshot_date, s.loaded_at, s.load_batch_id
+             FROM raw.accurate_stock s
+             LEFT JOIN raw.dim_item i ON i.item_id = s.item_id
+             LEFT JOIN raw.dim_warehouse w ON w.warehouse_id = s.warehouse_id
+             WHERE s.entity = %1$L',
+            v_entity);
+        EXECUTE format(
+            'CREATE TRIGGER trg_accurate_view_delete INSTEAD OF DELETE ON raw.accurate_stock_%1$s '
+            'FOR EACH ROW EXECUTE FUNCTION raw.trg_accurate_view_delete(%2$L, %1$L)',
+            v_entity, 'raw.accurate_stock');
+    END LOOP;
+END $$;
+
+SELECT setval(pg_get_serial_sequence('raw.accurate_sales', 'id'), COALESCE(MAX(id), 0) + 1, false)
+FROM raw.accurate_sales;
+SELECT setval(pg_get_serial_sequence('raw.accurate_stock', 'id'), COALESCE(MAX(id), 0) + 1, false)
+FROM raw.accurate_stock;
+
+CREATE INDEX idx_accurate_sales_kode ON raw.accurate_sales (kode_produk);
+CREATE INDEX idx_accurate_sales_tanggal ON raw.accurate_sales (tanggal);
+CREATE INDEX idx_accurate_sales_snapshot ON raw.accurate_sales (snapshot_date);
+CREATE INDEX idx_accurate_sales_batch ON raw.accurate_sales (load_batch_id);
+CREATE INDEX idx_accurate_sales_warehouse ON raw.accurate_sales (warehouse_id);
+CREATE INDEX idx_accurate_stock_kode ON raw.accurate_stock (kode_barang);
+CREATE INDEX idx_accurate_stock_snapshot ON raw.accurate_stock (snapshot_date);
+
+COMMIT;
+
+ANALYZE raw.dim_item, raw.dim_warehouse, raw.dim_department, raw.dim_customer;
+ANALYZE raw.accurate_sales;
+ANALYZE raw.accurate_stock;
@@ -0,0 +1,131 @@
+"""
+Dictionary-encoded names for the narrow fact layout (dimension_tables.sql).
+
+Stock and sales rows repeat a handful of long names - item, warehouse,
+department, customer - across millions of rows and every snapshot copy. The
+narrow layout stores each distinct value once in a small dimension table and
+only its integer key in the fact row:
+
+    raw.dim_item        item_id        (nama_barang, satuan)
+    raw.dim_warehouse   warehouse_id   nama_gudang
+    raw.dim_department  department_id  nama_departemen
+    raw.dim_customer    customer_id    nama_pelanggan
+
+The loaders encode a RowBatch just before writing:
+
+    if fact_tables.is_narrow(cur, target):
+        rows = dimensions.encode(cur, rows)   # name columns -> key columns
+
+Each dimension is read whole into an in-process dict on first use, so a load
+resolves nearly every name without a round trip. Values not seen before are
+inserted in one statement per dimension (ON CONFLICT DO NOTHING, so
+concurrent loaders agree on one key) through the pooled autocommit
+connection: a dictionary entry is committed before any fact row uses it, and
+a rolled-back load cannot leave keys in the cache that do not exist.
+Entries are never deleted, so cached keys stay valid for the process.
+
+A row whose name columns are all NULL gets a NULL key.
+"""
+
+from itertools import repeat
+
+import pg_pool
+import row_batch
+
+
+class Dimension:
+    """One dimension table and its per-server cache of value tuple -> key."""
+
+    def __init__(self, table: str, key: str, columns: tuple):
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self._cache = {}  # server dsn -> {values: key}
+
+    def _load(self, conn) -> dict:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {self.key}, {', '.join(self.columns)} FROM {self.table}")
+            return {tuple(values): key for key, *values in cur.fetchall()}
+
+    def _insert(self, conn, missing: list, cache: dict):
+        # Sorted, so concurrent loaders take the unique-index locks in the same order
+        missing = sorted(missing, key=lambda v: tuple(x or "" for x in v))
+        arrays = [list(column) for column in zip(*missing)]
+        unnest = f"unnest({', '.join(['%s::text[]'] * len(self.columns))}) AS v({', '.join(self.columns)})"
+        with conn.cursor() as cur:
+            cur.execute(
+                f"INSERT INTO {self.table} ({', '.join(self.columns)}) "
+                f"SELECT * FROM {unnest} ON CONFLICT DO NOTHING",
+                arrays,
+            )
+            cur.execute(
+                f"SELECT t.{self.key}, {', '.join(f't.{c}' for c in self.columns)} "
+                f"FROM {self.table} t JOIN {unnest} "
+                f"ON {' AND '.join(f't.{c} IS NOT DISTINCT FROM v.{c}' for c in self.columns)}",
+                arrays,
+            )
+            for key, *values in cur.fetchall():
+                cache[tuple(values)] = key
+
+    def keys(self, conn, values: list, transient: bool = False) -> list:
+        """Key per value tuple (None for all-NULL), adding unseen values.
+
+        transient: conn's transaction may roll back, so keys of values added
+        in it stay out of the process cache.
+        """
+        cache = self._cache.get(conn.dsn)
+        if cache is None:
+            cache = self._cache[conn.dsn] = self._load(conn)
+        if transient:
+            cache = dict(cache)
+        missing = {
+            v for v in set(values)
+            if v not in cache and any(x is not None for x in v)
+        }
+        if missing:
+            self._insert(conn, list(missing), cache)
+        get = cache.get
+        return [get(v) for v in values]
+
+
+DIMENSIONS = (
+    Dimension("raw.dim_item", "item_id", ("nama_barang", "satuan")),
+    Dimension("raw.dim_warehouse", "warehouse_id", ("nama_gudang",)),
+    Dimension("raw.dim_department", "department_id", ("nama_departemen",)),
+    Dimension("raw.dim_customer", "customer_id", ("nama_pelanggan",)),
+)
+
+# Name column -> key column replacing it in the narrow tables
+KEY_COLUMNS = {column: d.key for d in DIMENSIONS for column in d.columns}
+
+
+def encode(cur, rows: row_batch.RowBatch, transient: bool = False) -> row_batch.RowBatch:
+    """
+    The batch with its name columns replaced by dimension keys.
+
+    Each key column takes the place of the first of its name columns; name
+    columns a batch does not have (e.g. satuan in stock rows) count as NULL.
+    cur must belong to a pooled work connection (pg_pool). With transient=True
+    unseen values are inserted through cur, in its transaction, instead - for
+    loads that are rolled back anyway (index_advisor.py timings).
+    """
+    conn = cur.connection if transient else pg_pool.audit_connection_for(cur.connection)
+    columns = list(rows.columns)
+    data = dict(rows.data)
+    try:
+        for dimension in DIMENSIONS:
+            present = [c for c in dimension.columns if c in data]
+            if not present:
+                continue
+            values = list(zip(*(data.get(c, repeat(None, len(rows))) for c in dimension.columns)))
+            keys = dimension.keys(conn, values, transient)
+            position = columns.index(present[0])
+            for c in present:
+                columns.remove(c)
+                del data[c]
+            columns.insert(position, dimension.key)
+            data[dimension.key] = keys
+    finally:
+        if not transient:
+            pg_pool.release(conn)
+    return row_batch.RowBatch(columns, data)
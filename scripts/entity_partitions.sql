@@ -0,0 +1,159 @@
+-- ============================================================
+-- ENTITY PARTITIONS - raw.accurate_sales / raw.accurate_stock
+-- One table per data type, LIST-partitioned on `entity`, instead of
+-- one table per entity:
+--
+--   raw.accurate_sales   partitions raw.accurate_sales_part_{ddd,mbb,ubb}
+--   raw.accurate_stock   partitions raw.accurate_stock_part_{ddd,ljbb,mbb,ubb}
+--
+-- Cross-entity queries become one scan of the parent (pruned by
+-- `entity = ...`), with one set of index definitions and parent-level
+-- statistics. The old names raw.accurate_{sales,stock}_{entity} become
+-- views over the parent with exactly the old columns, so core views,
+-- the rollup rebuild, export_parquet.py, mart_reports.py and ad-hoc
+-- SQL keep working (SELECT and DELETE both go through them).
+--
+-- The loaders detect the partitioned parent (scripts/fact_tables.py)
+-- and write it directly; no config change is needed.
+--
+-- The rows are copied, ids included. The per-entity tables are kept as
+-- raw.accurate_{sales,stock}_{entity}_unpartitioned - drop them once
+-- the new layout is verified. The rollup triggers of sales_rollup.sql
+-- move to the sales parent, and views reading the old tables (core.*)
+-- are re-pointed at the compatibility views.
+--
+-- Apply once, as the owner of the raw tables:
+--     psql -d openclaw_ops -f scripts/entity_partitions.sql
+-- ============================================================
+
+BEGIN;
+
+CREATE TABLE raw.accurate_sales (
+    id              bigserial,
+    entity          text NOT NULL,
+    tanggal         date NOT NULL,
+    nama_departemen text,
+    nama_pelanggan  text,
+    nomor_invoice   text,
+    kode_produk     text NOT NULL,
+    nama_barang     text,
+    satuan          text,
+    kuantitas       numeric NOT NULL,
+    harga_satuan    numeric,
+    total_harga     numeric,
+    bpp             numeric DEFAULT 0,
+    nama_gudang     text,
+    vendor_price    numeric(15,2),
+    dpp_amount      numeric(15,2),
+    tax_amount      numeric(15,2),
+    snapshot_date   date NOT NULL,
+    loaded_at       timestamptz NOT NULL DEFAULT now(),
+    load_batch_id   text,
+    PRIMARY KEY (entity, id),
+    CONSTRAINT uq_accurate_sales UNIQUE (entity, nomor_invoice, kode_produk, tanggal, snapshot_date)
+) PARTITION BY LIST (entity);
+
+CREATE TABLE raw.accurate_stock (
+    id            bigserial,
+    entity        text NOT NULL,
+    kode_barang   text NOT NULL,
+    nama_barang   text,
+    nama_gudang   text,
+    kuantitas     integer NOT NULL,
+    unit_price    numeric(15,2),
+    vendor_price  numeric(15,2),
+    snapshot_date date NOT NULL,
+    loaded_at     timestamptz NOT NULL DEFAULT now(),
+    load_batch_id text,
+    PRIMARY KEY (entity, id)
+) PARTITION BY LIST (entity);
+
+DO $$
+DECLARE
+    v_entity  text;
+    v_sales   text := 'id, tanggal, nama_departemen, nama_pelanggan, nomor_invoice, kode_produk, '
+                      'nama_barang, satuan, kuantitas, harga_satuan, total_harga, bpp, nama_gudang, '
+                      'vendor_price, dpp_amount, tax_amount, snapshot_date, loaded_at, load_batch_id';
+    v_stock   text := 'id, kode_barang, nama_barang, nama_gudang, kuantitas, unit_price, vendor_price, '
+                      'snapshot_date, loaded_at, load_batch_id';
+    v_rollup  boolean := to_regprocedure('core.trg_fact_sales_daily()') IS NOT NULL;
+    v_dep     record;
+BEGIN
+    IF v_rollup AND to_regprocedure('core.attach_fact_sales_daily(text,text)') IS NULL THEN
+        RAISE EXCEPTION 'core.fact_sales_daily uses row triggers: apply scripts/sales_rollup.sql first';
+    END IF;
+
+    FOREACH v_entity IN ARRAY ARRAY['ddd', 'mbb', 'ubb'] LOOP
+        EXECUTE format('ALTER TABLE raw.accurate_sales_%1$s RENAME TO accurate_sales_%1$s_unpartitioned', v_entity);
+        IF v_rollup THEN
+            PERFORM core.detach_fact_sales_daily(format('raw.accurate_sales_%s_unpartitioned', v_entity));
+        END IF;
+        EXECUTE format(
+            'CREATE TABLE raw.accurate_sales_part_%1$s PARTITION OF raw.accurate_sales FOR VALUES IN (%1$L)',
+            v_entity);
+        EXECUTE format(
+            'INSERT INTO raw.accurate_sales (entity, %2$s) SELECT %1$L, %2$s FROM raw.accurate_sales_%1$s_unpartitioned',
+            v_entity, v_sales);
+        EXECUTE format(
+            'CREATE VIEW raw.accurate_sales_%1$s AS SELECT %2$s FROM raw.accurate_sales WHERE entity = %1$L',
+            v_entity, v_sales);
+    END LOOP;
+
+    -- Rollup triggers once on the parent, after the copy: the rows carry entity
+    IF v_rollup THEN
+        PERFORM core.attach_fact_sales_daily('raw.accurate_sales');
+    END IF;
+
+    FOREACH v_entity IN ARRAY ARRAY['ddd', 'ljbb', 'mbb', 'ubb'] LOOP
+        EXECUTE format('ALTER TABLE raw.accurate_stock_%1$s RENAME TO accurate_stock_%1$s_unpartitioned', v_entity);
+        EXECUTE format(
+            'CREATE TABLE raw.accurate_stock_part_%1$s PARTITION OF raw.accurate_stock FOR VALUES IN (%1$L)',
+            v_entity);
+        EXECUTE format(
+            'INSERT INTO raw.accurate_stock (entity, %2$s) SELECT %1$L, %2$s FROM raw.accurate_stock_%1$s_unpartitioned',
+            v_entity, v_stock);
+        EXECUTE format(
+            'CREATE VIEW raw.accurate_stock_%1$s AS SELECT %2$s FROM raw.accurate_stock WHERE entity = %1$L',
+            v_entity, v_stock);
+    END LOOP;
+
+    -- Views bind to tables, not names: point the ones that read the renamed
+    -- tables (e.g. core.fact_sales_ddd) at the compatibility views instead
+    FOR v_dep IN
+        SELECT DISTINCT r.ev_class AS view_oid, t.relname AS table_name
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        JOIN pg_class t ON t.oid = d.refobjid
+        WHERE t.relnamespace = 'raw'::regnamespace
+          AND t.relname LIKE 'accurate\_%\_unpartitioned'
+          AND v.relkind = 'v'
+          AND r.ev_class <> t.oid
+    LOOP
+        EXECUTE format(
+            'CREATE OR REPLACE VIEW %s AS %s',
+            v_dep.view_oid::regclass,
+            replace(pg_get_viewdef(v_dep.view_oid), v_dep.table_name,
+                    regexp_replace(v_dep.table_name, '_unpartitioned$', '')));
+    END LOOP;
+END $$;
+
+-- New ids continue after the highest copied one (ids were per entity before)
+SELECT setval(pg_get_serial_sequence('raw.accurate_sales', 'id'), COALESCE(MAX(id), 0) + 1, false)
+FROM raw.accurate_sales;
+SELECT setval(pg_get_serial_sequence('raw.accurate_stock', 'id'), COALESCE(MAX(id), 0) + 1, false)
+FROM raw.accurate_stock;
+
+-- Secondary indexes once on the parent (built per partition after the copy)
+CREATE INDEX idx_accurate_sales_kode ON raw.accurate_sales (kode_produk);
+CREATE INDEX idx_accurate_sales_tanggal ON raw.accurate_sales (tanggal);
+CREATE INDEX idx_accurate_sales_snapshot ON raw.accurate_sales (snapshot_date);
+CREATE INDEX idx_accurate_sales_batch ON raw.accurate_sales (load_batch_id);
+CREATE INDEX idx_accurate_sales_gudang ON raw.accurate_sales (nama_gudang);
+CREATE INDEX idx_accurate_stock_kode ON raw.accurate_stock (kode_barang);
+CREATE INDEX idx_accurate_stock_snapshot ON raw.accurate_stock (snapshot_date);
+
+COMMIT;
+
+ANALYZE raw.accurate_sales;
+ANALYZE raw.accurate_stock;
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Export raw.accurate_sales_* / raw.accurate_stock_* snapshots to Parquet.
+
+Heavy ad-hoc scans (multi-month sales, stock trend by warehouse) should read
+these files instead of openclaw_ops, which the pull crons write into. The
+export is incremental: every successful/partial load in raw.load_history since
+the last run marks the snapshot_dates its batch touched as dirty, and each
+dirty (entity, snapshot_date) is re-exported whole, so upserts and snapshot
+replacements never leave stale rows behind.
+
+Layout (OPENCLAW_EXPORT_DIR, default: scripts/export), hive-style partitions:
+    sales/entity=ddd/year=2026/month=10/snapshot_2026-10-19.parquet
+    stock/entity=ljbb/year=2026/month=10/snapshot_2026-10-19.parquet
+    _export_state.json      last exported raw.load_history id
+
+Sales are partitioned by transaction month (tanggal), so one snapshot can span
+two month directories; stock by snapshot_date. Files are zstd-compressed with
+dictionary-encoded string columns and column statistics; numerics are float64.
+Like the raw tables, sales keep every snapshot copy of an invoice line - take
+the latest snapshot_date per (nomor_invoice, kode_produk, tanggal) to count once.
+
+Requires pyarrow.
+
+Usage:
+    python export_parquet.py                       # Incremental, all entities
+    python export_parquet.py --data-type sales --entity ddd
+    python export_parquet.py --since 2026-01-01    # Backfill snapshots >= date
+    python export_parquet.py --dry-run             # Show dirty snapshots only
+"""
+
+import os
+import json
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+
+import psycopg2
+from dotenv import load_dotenv
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Required for export; checked in main()
+    pa = None
+
+SCRIPT_DIR = Path(__file__).parent
+
+ENTITIES = {
+    "sales": ["ddd", "mbb", "ubb"],
+    "stock": ["ddd", "ljbb", "mbb", "ubb"],
+}
+
+STATE_FILE = "_export_state.json"
+FETCH_SIZE = 50_000
+ROW_GROUP_SIZE = 128 * 1024
+
+if pa:
+    SCHEMAS = {
+        "sales": pa.schema([
+            ("tanggal", pa.date32()),
+            ("nama_departemen", pa.string()),
+            ("nama_pelanggan", pa.string()),
+            ("nomor_invoice", pa.string()),
+            ("kode_produk", pa.string()),
+            ("nama_barang", pa.string()),
+            ("satuan", pa.string()),
+            ("kuantitas", pa.float64()),
+            ("harga_satuan", pa.float64()),
+            ("total_harga", pa.float64()),
+            ("bpp", pa.float64()),
+            ("nama_gudang", pa.string()),
+            ("vendor_price", pa.float64()),
+            ("dpp_amount", pa.float64()),
+            ("tax_amount", pa.float64()),
+            ("snapshot_date", pa.date32()),
+            ("loaded_at", pa.timestamp("us", tz="UTC")),
+            ("load_batch_id", pa.string()),
+        ]),
+        "stock": pa.schema([
+            ("kode_barang", pa.string()),
+            ("nama_barang", pa.string()),
+            ("nama_gudang", pa.string()),
+            ("kuantitas", pa.int32()),
+            ("unit_price", pa.float64()),
+            ("vendor_price", pa.float64()),
+            ("snapshot_date", pa.date32()),
+            ("loaded_at", pa.timestamp("us", tz="UTC")),
+            ("load_batch_id", pa.string()),
+        ]),
+    }
+
+# Column whose month picks the partition directory
+PARTITION_COLUMN = {"sales": "tanggal", "stock": "snapshot_date"}
+
+
+def _export_dir() -> Path:
+    return Path(os.getenv("OPENCLAW_EXPORT_DIR", SCRIPT_DIR / "export"))
+
+
+def get_pg_connection(pg_host_override: str = None):
+    """PostgreSQL connection from PG_* env vars (same as the pull scripts)."""
+    host = pg_host_override or os.getenv("PG_HOST", "localhost")
+    port = os.getenv("PG_PORT", "5432")
+    database = os.getenv("PG_DATABASE", "openclaw_ops")
+    user = os.getenv("PG_USER", "openclaw_app")
+    password = os.getenv("PG_PASSWORD")
+
+    if not password:
+        raise ValueError(
+            f"PG_PASSWORD is required. Set it in environment or .env file.\n"
+            f"  Connection: {user}@{host}:{port}/{database}"
+        )
+
+    conn = psycopg2.connect(
+        host=host, port=int(port), dbname=database, user=user, password=password, connect_timeout=10
+    )
+    conn.autocommit = False
+    print(f"  PG connected: {user}@{host}:{port}/{database}")
+    return conn
+
+
+# =============================================================================
+# State
+# =============================================================================
+
+
+def load_state(root: Path) -> dict:
+    path = root / STATE_FILE
+    if not path.exists():
+        return {"load_history_id": 0}
+    return json.loads(path.read_text())
+
+
+def save_state(root: Path, state: dict):
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / (STATE_FILE + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, root / STATE_FILE)
+
+
+# =============================================================================
+# Dirty snapshots
+# =============================================================================
+
+
+def new_batches(cur, after_id: int) -> tuple:
+    """
+    Loads logged since after_id.
+
+    Returns:
+        ({(data_type, entity): [(batch_id, date_from, date_to), ...]}, max id seen)
+    """
+    cur.execute(
+        """
+        SELECT id, data_type, entity, batch_id, date_from, date_to
+        FROM raw.load_history
+        WHERE id > %s
+          AND data_type IN ('sales', 'stock')
+          AND status IN ('success', 'partial')
+          AND rows_loaded > 0
+        ORDER BY id
+    """,
+        (after_id,),
+    )
+    batches = {}
+    max_id = after_id
+    for log_id, data_type, entity, batch_id, date_from, date_to in cur.fetchall():
+        max_id = max(max_id, log_id)
+        if entity in ENTITIES[data_type] and batch_id:
+            batches.setdefault((data_type, entity), []).append((batch_id, date_from, date_to))
+    return batches, max_id
+
+
+def dirty_snapshots(cur, data_type: str, entity_key: str, batches: list) -> list:
+    """snapshot_dates holding rows of the given batches."""
+    table = f"raw.accurate_{data_type}_{entity_key}"
+    batch_ids = [b[0] for b in batches]
+    if data_type == "stock" and all(b[1] and b[2] for b in batches):
+        # No load_batch_id index on stock; date_from/date_to are snapshot dates
+        cur.execute(
+            f"""
+            SELECT DISTINCT snapshot_date FROM {table}
+            WHERE snapshot_date BETWEEN %s AND %s AND load_batch_id = ANY(%s)
+        """,
+            (min(b[1] for b in batches), max(b[2] for b in batches), batch_ids),
+        )
+    else:
+        cur.execute(
+            f"SELECT DISTINCT snapshot_date FROM {table} WHERE load_batch_id = ANY(%s)",
+            (batch_ids,),
+        )
+    return sorted(r[0] for r in cur.fetchall())
+
+
+def snapshots_since(cur, data_type: str, entity_key: str, since: str) -> list:
+    table = f"raw.accurate_{data_type}_{entity_key}"
+    cur.execute(f"SELECT DISTINCT snapshot_date FROM {table} WHERE snapshot_date >= %s", (since,))
+    return sorted(r[0] for r in cur.fetchall())
+
+
+# =============================================================================
+# Export
+# =============================================================================
+
+
+def _rows_to_batch(rows: list, schema) -> "pa.RecordBatch":
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_floating(field.type):
+            values = [None if v is None else float(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_snapshot(conn, data_type: str, entity_key: str, snapshot_date: date, root: Path) -> int:
+    """
+    Re-export one (entity, snapshot_date) from PostgreSQL. Streams the rows with
+    a server-side cursor, writes one file per month partition and swaps them in
+    only after every file is complete. Returns rows written.
+    """
+    schema = SCHEMAS[data_type]
+    table = f"raw.accurate_{data_type}_{entity_key}"
+    entity_dir = root / data_type / f"entity={entity_key}"
+    file_name = f"snapshot_{snapshot_date.isoformat()}.parquet"
+    partition_idx = schema.names.index(PARTITION_COLUMN[data_type])
+    string_columns = [f.name for f in schema if pa.types.is_string(f.type)]
+    order_by = "ORDER BY tanggal, nama_gudang, kode_produk" if data_type == "sales" else "ORDER BY nama_gudang, kode_barang"
+
+    writers = {}  # (year, month) -> (tmp path, ParquetWriter)
+    total = 0
+    try:
+        with conn.cursor(name=f"export_{data_type}_{entity_key}") as cur:
+            cur.itersize = FETCH_SIZE
+            cur.execute(
+                f"SELECT {', '.join(schema.names)} FROM {table} WHERE snapshot_date = %s {order_by}",
+                (snapshot_date,),
+            )
+            while True:
+                rows = cur.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                by_month = {}
+                for row in rows:
+                    d = row[partition_idx]
+                    by_month.setdefault((d.year, d.month), []).append(row)
+                for (year, month), month_rows in by_month.items():
+                    if (year, month) not in writers:
+                        part_dir = entity_dir / f"year={year}" / f"month={month:02d}"
+                        part_dir.mkdir(parents=True, exist_ok=True)
+                        tmp = part_dir / f".{file_name}.tmp"
+                        writers[(year, month)] = (
+                            tmp,
+                            pq.ParquetWriter(
+                                tmp,
+                                schema,
+                                compression="zstd",
+                                use_dictionary=string_columns,
+                                write_statistics=True,
+                            ),
+                        )
+                    writers[(year, month)][1].write_batch(
+                        _rows_to_batch(month_rows, schema), row_group_size=ROW_GROUP_SIZE
+                    )
+                total += len(rows)
+        conn.commit()
+    except Exception:
+        for tmp, writer in writers.values():
+            writer.close()
+            tmp.unlink(missing_ok=True)
+        conn.rollback()
+        raise
+
+    for tmp, writer in writers.values():
+        writer.close()
+
+    # Drop this snapshot's old files in months it no longer spans, then swap in
+    targets = {tmp.parent / file_name: tmp for tmp, _ in writers.values()}
+    for old in entity_dir.glob(f"year=*/month=*/{file_name}"):
+        if old not in targets:
+            old.unlink()
+    for final, tmp in targets.items():
+        os.replace(tmp, final)
+    return total
+
+
+def run_export(conn, root: Path, data_types: list, entity: str, since: str = None, dry_run: bool = False) -> bool:
+    state = load_state(root)
+    with conn.cursor() as cur:
+        if since:
+            work = {
+                (data_type, key): snapshots_since(cur, data_type, key, since)
+                for data_type in data_types
+                for key in ENTITIES[data_type]
+                if entity == "all" or key == entity
+            }
+            max_id = state["load_history_id"]
+        else:
+            batches, max_id = new_batches(cur, state["load_history_id"])
+            work = {
+                (data_type, key): dirty_snapshots(cur, data_type, key, entity_batches)
+                for (data_type, key), entity_batches in batches.items()
+                if data_type in data_types and (entity == "all" or key == entity)
+            }
+    conn.commit()
+
+    work = {k: v for k, v in work.items() if v}
+    if not work:
+        print("  Nothing to export")
+    ok = True
+    for (data_type, key), snapshots in sorted(work.items()):
+        print(f"\n{data_type}/{key}: {len(snapshots)} snapshot(s)")
+        for snapshot_date in snapshots:
+            if dry_run:
+                print(f"  [DRY RUN] {snapshot_date}")
+                continue
+            try:
+                rows = export_snapshot(conn, data_type, key, snapshot_date, root)
+                print(f"  {snapshot_date}: {rows:,} rows")
+            except Exception as e:
+                ok = False
+                print(f"  {snapshot_date}: export failed: {e}")
+
+    # Only advance past loads we fully exported; a partial run redoes them next time
+    filtered = since or entity != "all" or set(data_types) != set(ENTITIES)
+    if ok and not dry_run and not filtered:
+        state["load_history_id"] = max_id
+        state["exported_at"] = datetime.now().isoformat(timespec="seconds")
+        save_state(root, state)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export raw Accurate sales/stock snapshots to partitioned Parquet",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                          Incremental export of new loads
+  %(prog)s --data-type stock        Stock only
+  %(prog)s --since 2026-01-01       Backfill every snapshot since a date
+        """,
+    )
+    parser.add_argument("--data-type", choices=["sales", "stock", "all"], default="all")
+    parser.add_argument("--entity", choices=["ddd", "ljbb", "mbb", "ubb", "all"], default="all")
+    parser.add_argument("--since", type=str, default=None, help="Re-export all snapshots >= YYYY-MM-DD")
+    parser.add_argument("--output-dir", type=str, default=None, help="Export root (default: OPENCLAW_EXPORT_DIR or scripts/export)")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    parser.add_argument("--dry-run", action="store_true", help="List dirty snapshots without writing")
+    args = parser.parse_args()
+
+    if pa is None:
+        print("ERROR: pyarrow is required (pip install pyarrow)")
+        return 1
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+
+    root = Path(args.output_dir) if args.output_dir else _export_dir()
+    data_types = list(ENTITIES) if args.data_type == "all" else [args.data_type]
+
+    print(f"Parquet export -> {root}")
+    conn = get_pg_connection(args.pg_host)
+    try:
+        ok = run_export(conn, root, data_types, args.entity, since=args.since, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,80 @@
+"""
+Write targets for the raw Accurate fact tables.
+
+Two layouts exist:
+
+    per entity    raw.accurate_sales_{ddd,mbb,ubb}, raw.accurate_stock_{ddd,ljbb,mbb,ubb}
+    partitioned   raw.accurate_sales / raw.accurate_stock, LIST-partitioned on
+                  an `entity` column (entity_partitions.sql); the per-entity
+                  names remain as views over them
+
+    narrow        the partitioned parents storing dimension keys (item_id,
+                  warehouse_id, ...) instead of names (dimension_tables.sql);
+                  the per-entity views join the names back
+
+Readers need not care: the views keep every old table name working for
+SELECT (and DELETE, row by row through a trigger in the narrow layout).
+Inserts and upserts cannot go through the views (the views do not expose
+`entity`), so the loaders ask resolve() where to write, is_narrow() whether
+to encode names first (dimensions.py), and use delete() for bulk deletes.
+The layout is looked up once per process from the catalog, so applying
+entity_partitions.sql / dimension_tables.sql switches every loader over
+without a config change.
+
+    target, entity = fact_tables.resolve(cur, "raw.accurate_sales_ddd")
+    # -> ("raw.accurate_sales", "ddd") when partitioned
+    # -> ("raw.accurate_sales_ddd", None) otherwise
+"""
+
+_partitioned = {}  # parent table -> bool
+_narrow = {}  # table -> bool
+
+
+def is_partitioned(cur, parent: str) -> bool:
+    """True if `parent` exists as a partitioned table (cached per process)."""
+    if parent not in _partitioned:
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (parent,))
+        row = cur.fetchone()
+        _partitioned[parent] = row is not None and row[0] == "p"
+    return _partitioned[parent]
+
+
+def resolve(cur, table: str) -> tuple:
+    """
+    (table to write, entity value) for a per-entity table name.
+
+    entity is None in the per-entity layout; otherwise it must be written to
+    the `entity` column and be part of any ON CONFLICT target.
+    """
+    parent, _, entity = table.rpartition("_")
+    if is_partitioned(cur, parent):
+        return parent, entity
+    return table, None
+
+
+def is_narrow(cur, table: str) -> bool:
+    """True if `table` stores dimension keys instead of names (cached per process)."""
+    if table not in _narrow:
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%s) "
+            "AND attname = 'item_id' AND NOT attisdropped)",
+            (table,),
+        )
+        _narrow[table] = cur.fetchone()[0]
+    return _narrow[table]
+
+
+def delete(cur, table: str, condition: str, params: tuple = ()) -> int:
+    """
+    DELETE FROM a per-entity table WHERE condition, against the table actually
+    storing the rows (the partitioned parent, restricted to the entity).
+
+    Returns:
+        Number of rows deleted
+    """
+    target, entity = resolve(cur, table)
+    if entity:
+        cur.execute(f"DELETE FROM {target} WHERE entity = %s AND {condition}", (entity, *params))
+    else:
+        cur.execute(f"DELETE FROM {table} WHERE {condition}", params)
+    return cur.rowcount
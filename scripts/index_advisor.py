@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+Index advisor for the raw Accurate fact tables.
+
+Every upsert into raw.accurate_sales_* maintains five single-column btrees
+(kode_produk, tanggal, snapshot_date, load_batch_id, nama_gudang), while the
+reports mostly filter a date range and group by store and SKU. This command
+looks at what the indexes are actually used for and proposes a smaller set:
+
+    brin      a BRIN index replaces the btree on a date column whose rows are
+              physically in date order (pg_stats.correlation >= 0.9, which
+              append-only loads give). It is a few pages instead of a
+              btree the size of the column and costs next to nothing per row.
+              Not for snapshot_date: the latest-snapshot lookups
+              (MAX(snapshot_date) in core_views.sql) need a btree.
+    covering  a composite btree with INCLUDE columns for the report shape of a
+              table (date, store, SKU -> quantities), so those reports become
+              index-only scans. Its leading column makes the single-column btree
+              on it redundant. Skipped when the date column gets BRIN instead
+              (rows of a date range then sit in consecutive pages anyway), and
+              when pg_stat_statements shows no query filtering on that column.
+    drop      non-constraint indexes with no scans in pg_stat_user_indexes
+              since the statistics were last reset (at least --min-stats-days
+              ago). load_batch_id (export_parquet.py dirty snapshots) and
+              snapshot_date (latest snapshot) indexes are never dropped this
+              way, and neither is anything this advisor created.
+
+Works on every layout (fact_tables.py): the per-entity tables, or the
+partitioned parents raw.accurate_sales / raw.accurate_stock, where scans and
+sizes are summed over the partition indexes; on narrow parents the report
+shapes use the dimension keys (warehouse_id, department_id) for the names.
+
+--apply runs the proposals (CREATE INDEX CONCURRENTLY first, then DROP INDEX
+CONCURRENTLY; partitioned parents do not support CONCURRENTLY and lock writes
+while an index builds). With --measure the effect is measured before and
+after applying:
+
+    load     a synthetic sales day upserted into each sales table and a
+             stock snapshot inserted into each stock table (rows/s), both
+             under a far-future snapshot_date and rolled back
+    queries  the core/mart queries of bench_queries.py, EXPLAIN ANALYZE, best
+             of --repeat
+
+Results (inventory, proposals, measurements) go to
+index_advisor_{timestamp}.json in --output-dir (default: OPENCLAW_BENCH_DIR or
+scripts/bench_output).
+
+Usage:
+    python index_advisor.py                          # report + proposals only
+    python index_advisor.py --measure                # also measure the current state
+    python index_advisor.py --apply --measure        # apply, measure before/after
+    python index_advisor.py --data-type sales --min-stats-days 14
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2.extras import execute_values
+
+import dimensions
+import fact_tables
+import pg_pool
+import row_batch
+
+SCRIPT_DIR = Path(__file__).parent
+
+ENTITIES = {
+    "sales": ["ddd", "mbb", "ubb"],
+    "stock": ["ddd", "ljbb", "mbb", "ubb"],
+}
+
+BRIN_MIN_CORRELATION = 0.9
+BRIN_PAGES_PER_RANGE = 32
+DATE_COLUMNS = {"sales": ["tanggal", "snapshot_date"], "stock": ["snapshot_date"]}
+MAX_LOOKUP_COLUMNS = {"snapshot_date"}  # MAX() needs a btree
+
+# Report shape per data type: (key columns, INCLUDE columns). The sales shape
+# covers the "latest snapshot per invoice line" dedupe of the sales reports.
+COVERING = {
+    "sales": (
+        ["tanggal", "nama_departemen", "kode_produk"],
+        ["nomor_invoice", "snapshot_date", "kuantitas", "total_harga"],
+    ),
+    "stock": (
+        ["snapshot_date", "nama_gudang", "kode_barang"],
+        ["kuantitas"],
+    ),
+}
+
+# Never dropped for lack of scans: used rarely, but a seq scan instead is costly
+KEEP_COLUMNS = {
+    "load_batch_id": "export_parquet.py dirty-snapshot lookup",
+    "snapshot_date": "latest-snapshot lookups",
+}
+ADVISOR_SUFFIXES = ("_brin", "_cov")
+
+MEASURE_SNAPSHOT = date(2099, 12, 31)  # clear of any real snapshot; rows are rolled back
+MEASURE_GROUPS = ("core", "mart")
+
+
+def _output_dir() -> Path:
+    return Path(os.getenv("OPENCLAW_BENCH_DIR", SCRIPT_DIR / "bench_output"))
+
+
+# ============================================================
+# Inventory
+# ============================================================
+
+
+def fact_table_list(cur, data_types: list) -> list:
+    """(table, data_type, partitioned) for every index-owning fact table."""
+    tables = []
+    for data_type in data_types:
+        parent = f"raw.accurate_{data_type}"
+        if fact_tables.is_partitioned(cur, parent):
+            tables.append((parent, data_type, True))
+            continue
+        for entity in ENTITIES[data_type]:
+            table = f"{parent}_{entity}"
+            cur.execute("SELECT to_regclass(%s)", (table,))
+            if cur.fetchone()[0] is not None:
+                tables.append((table, data_type, False))
+    return tables
+
+
+def index_inventory(cur, table: str) -> list:
+    """Indexes of a table with key columns, scans and size (summed over partitions)."""
+    cur.execute(
+        """
+        WITH idx AS (
+            SELECT i.indexrelid, i.indrelid, i.indkey, i.indnkeyatts,
+                   i.indisunique OR i.indisprimary AS is_unique,
+                   EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid) AS is_constraint,
+                   ARRAY(SELECT i.indexrelid UNION ALL
+                         SELECT inhrelid FROM pg_inherits WHERE inhparent = i.indexrelid) AS members
+            FROM pg_index i
+            WHERE i.indrelid = %s::regclass
+        )
+        SELECT c.relname, am.amname, idx.is_unique, idx.is_constraint,
+               ARRAY(SELECT a.attname::text
+                     FROM unnest(idx.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                     JOIN pg_attribute a ON a.attrelid = idx.indrelid AND a.attnum = k.attnum
+                     WHERE k.ord <= idx.indnkeyatts
+                     ORDER BY k.ord) AS key_columns,
+               (SELECT COALESCE(SUM(s.idx_scan), 0) FROM pg_stat_user_indexes s
+                WHERE s.indexrelid = ANY(idx.members))::bigint AS scans,
+               (SELECT COALESCE(SUM(pg_relation_size(m)), 0) FROM unnest(idx.members) AS m)::bigint AS bytes,
+               pg_get_indexdef(idx.indexrelid) AS definition
+        FROM idx
+        JOIN pg_class c ON c.oid = idx.indexrelid
+        JOIN pg_am am ON am.oid = c.relam
+        ORDER BY c.relname
+        """,
+        (table,),
+    )
+    columns = ["name", "method", "unique", "constraint", "key_columns", "scans", "bytes", "definition"]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def date_correlations(cur, table: str, partitioned: bool, columns: list) -> dict:
+    """|pg_stats.correlation| per column; averaged over partitions for a parent."""
+    schema, _, name = table.partition(".")
+    names = [name]
+    if partitioned:
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            (table,),
+        )
+        names = [row[0] for row in cur.fetchall()]
+    cur.execute(
+        """
+        SELECT attname::text, avg(abs(correlation))
+        FROM pg_stats
+        WHERE schemaname = %s AND tablename = ANY(%s) AND attname = ANY(%s) AND NOT inherited
+        GROUP BY attname
+        """,
+        (schema, names, columns),
+    )
+    return {column: float(value) for column, value in cur.fetchall() if value is not None}
+
+
+def stats_age_days(cur):
+    """Days since pg_stat_database was reset; None if it never was."""
+    cur.execute(
+        "SELECT EXTRACT(EPOCH FROM now() - stats_reset) / 86400 "
+        "FROM pg_stat_database WHERE datname = current_database()"
+    )
+    row = cur.fetchone()
+    return None if row is None or row[0] is None else float(row[0])
+
+
+def fact_statements(cur, limit: int = 20):
+    """Top pg_stat_statements entries on the fact tables; None if unavailable."""
+    cur.execute("SELECT to_regclass('pg_stat_statements')")
+    if cur.fetchone()[0] is None:
+        return None
+    try:
+        cur.execute(
+            """
+            SELECT query, calls, total_exec_time, mean_exec_time
+            FROM pg_stat_statements
+            WHERE query ~ 'accurate_(sales|stock)' AND query !~* '^\\s*(insert|delete|prepare|explain)'
+            ORDER BY total_exec_time DESC
+            LIMIT %s
+            """,
+            (limit,),
+        )
+    except psycopg2.Error:  # Installed in another schema / no permission
+        cur.connection.rollback()
+        return None
+    return [
+        {"query": " ".join(q.split()), "calls": calls, "total_ms": round(total, 1), "mean_ms": round(mean, 3)}
+        for q, calls, total, mean in cur.fetchall()
+    ]
+
+
+# ============================================================
+# Proposals
+# ============================================================
+
+
+def _index_name(table: str, suffix: str) -> str:
+    return f"idx_{table.partition('.')[2]}_{suffix}"
+
+
+def _filtered_on(statements, data_type: str, column: str) -> bool:
+    """True if a statement on the data type's tables filters on column (or no stats)."""
+    if statements is None:
+        return True
+    for s in statements:
+        query = s["query"].lower()
+        where = query.partition(" where ")[2]
+        if f"accurate_{data_type}" in query and column in where:
+            return True
+    return False
+
+
+def report_shape(data_type: str, narrow: bool) -> tuple:
+    """COVERING for the table's layout: narrow tables index dimension keys, not names."""
+    key_columns, include_columns = COVERING[data_type]
+    if narrow:
+        key_columns = [dimensions.KEY_COLUMNS.get(c, c) for c in key_columns]
+        include_columns = [dimensions.KEY_COLUMNS.get(c, c) for c in include_columns]
+    return key_columns, include_columns
+
+
+def propose(table: str, data_type: str, partitioned: bool, narrow: bool, indexes: list,
+            correlations: dict, statements, stats_days, min_stats_days: int) -> list:
+    """Index changes for one table: list of {action, index, sql, reason}."""
+    concurrently = "" if partitioned else " CONCURRENTLY"
+    proposals = []
+    dropped = set()
+    btree_leading = {}  # column -> single-column btree indexes on it
+    for index in indexes:
+        if index["method"] == "btree" and len(index["key_columns"]) == 1 and not index["constraint"]:
+            btree_leading.setdefault(index["key_columns"][0], []).append(index)
+
+    def create(suffix: str, body: str, reason: str):
+        name = _index_name(table, suffix)
+        if any(index["name"] == name for index in indexes):
+            return
+        proposals.append({
+            "action": "create",
+            "index": name,
+            "sql": f"CREATE INDEX{concurrently} IF NOT EXISTS {name} ON {table} {body}",
+            "reason": reason,
+        })
+
+    def drop(index: dict, reason: str):
+        if index["name"] in dropped:
+            return
+        dropped.add(index["name"])
+        proposals.append({
+            "action": "drop",
+            "index": index["name"],
+            "sql": f"DROP INDEX{concurrently} IF EXISTS {table.partition('.')[0]}.{index['name']}",
+            "reason": reason,
+        })
+
+    # BRIN for physically ordered date columns
+    brin_columns = set()
+    for column in DATE_COLUMNS[data_type]:
+        correlation = correlations.get(column)
+        if column in MAX_LOOKUP_COLUMNS or correlation is None or correlation < BRIN_MIN_CORRELATION:
+            continue
+        brin_columns.add(column)
+        has_brin = any(i["method"] == "brin" and i["key_columns"][:1] == [column] for i in indexes)
+        if not has_brin:
+            create(
+                f"{column}_brin",
+                f"USING brin ({column}) WITH (pages_per_range = {BRIN_PAGES_PER_RANGE})",
+                f"correlation {correlation:.2f}: range scans need no btree",
+            )
+        for index in btree_leading.get(column, []):
+            drop(index, f"replaced by BRIN on {column} (correlation {correlation:.2f})")
+
+    # Covering index for the report shape
+    key_columns, include_columns = report_shape(data_type, narrow)
+    leading = key_columns[0]
+    has_covering = any(i["key_columns"][: len(key_columns)] == key_columns for i in indexes)
+    if leading not in brin_columns and _filtered_on(statements, data_type, leading):
+        if not has_covering:
+            create(
+                "report_cov",
+                f"({', '.join(key_columns)}) INCLUDE ({', '.join(include_columns)})",
+                f"index-only scans for {leading} filters grouped by store/SKU",
+            )
+        for index in btree_leading.get(leading, []):
+            drop(index, f"redundant with the covering index leading on {leading}")
+
+    # Unused indexes
+    window_ok = stats_days is None or stats_days >= min_stats_days
+    for index in indexes:
+        column = index["key_columns"][0] if len(index["key_columns"]) == 1 else None
+        if (
+            window_ok
+            and index["scans"] == 0
+            and not index["unique"]
+            and not index["constraint"]
+            and column not in KEEP_COLUMNS
+            and not index["name"].endswith(ADVISOR_SUFFIXES)
+        ):
+            since = "ever" if stats_days is None else f"in {stats_days:.0f} days"
+            drop(index, f"no scans {since}")
+
+    # Creates before drops: a replacement exists before the old index goes
+    return sorted(proposals, key=lambda p: p["action"] != "create")
+
+
+def apply_proposals(conn, table: str, proposals: list):
+    """Run proposals one statement at a time (CONCURRENTLY needs autocommit)."""
+    with conn.cursor() as cur:
+        for proposal in proposals:
+            print(f"  {proposal['sql']}", flush=True)
+            started = time.perf_counter()
+            cur.execute(proposal["sql"])
+            proposal["applied_s"] = round(time.perf_counter() - started, 2)
+        cur.execute(f"ANALYZE {table}")
+
+
+# ============================================================
+# Measurement
+# ============================================================
+
+
+def _sales_rows(n: int, seed: int) -> tuple:
+    import bench_load
+
+    rows = [
+        row[: bench_load.COLUMNS.index("snapshot_date")] + (MEASURE_SNAPSHOT,)
+        + row[bench_load.COLUMNS.index("snapshot_date") + 1 :]
+        for row in bench_load.make_rows(n, seed)
+    ]
+    return bench_load.COLUMNS, bench_load.KEY_COLUMNS, rows
+
+
+def _stock_rows(n: int, seed: int) -> tuple:
+    import synth_data
+
+    rng = random.Random(seed)
+    catalog = synth_data.Catalog(rng, 950, 120)
+    columns = [c for c in synth_data.STOCK_COLUMNS if c != "loaded_at"]
+    rows = []
+    for row in synth_data.stock_rows(catalog, rng, "ddd", MEASURE_SNAPSHOT, 1):
+        row = list(row)
+        del row[synth_data.STOCK_COLUMNS.index("loaded_at")]
+        rows.append(tuple(row))
+        if len(rows) >= n:
+            break
+    return columns, None, rows
+
+
+def time_load(conn, table: str, data_type: str, n_rows: int, repeat: int) -> dict:
+    """Best-of-repeat rows/s for one load into table; every run is rolled back."""
+    columns, key_columns, rows = (_sales_rows if data_type == "sales" else _stock_rows)(n_rows, 47)
+    with conn.cursor() as cur:
+        target, entity = fact_tables.resolve(cur, table)
+        narrow = fact_tables.is_narrow(cur, target)
+    batch = row_batch.RowBatch(columns, {c: list(v) for c, v in zip(columns, zip(*rows))})
+    if narrow:  # Names -> dimension keys (encoded below, in the timed and rolled-back load)
+        columns = list(dict.fromkeys(dimensions.KEY_COLUMNS.get(c, c) for c in columns))
+    if entity is not None:
+        columns = columns + ["entity"]
+    sql = f"INSERT INTO {target} ({', '.join(columns)}) VALUES %s"
+    if key_columns:
+        conflict = (["entity"] if entity else []) + key_columns
+        updates = [c for c in columns if c not in conflict]
+        sql += (
+            f" ON CONFLICT ({', '.join(conflict)})"
+            f" DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in updates)}, loaded_at = now()"
+        )
+
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            with conn.cursor() as cur:
+                encoded = dimensions.encode(cur, batch, transient=True) if narrow else batch
+                execute_values(cur, sql, encoded.tuples(*((entity,) if entity else ())), page_size=500)
+            elapsed = time.perf_counter() - started
+        finally:
+            conn.rollback()
+        best = elapsed if best is None else min(best, elapsed)
+    return {"rows": len(rows), "seconds": round(best, 4), "rows_per_sec": round(len(rows) / best, 1)}
+
+
+def measure(conn, tables: list, n_rows: int, repeat: int) -> dict:
+    """Load rows/s per table and core/mart query latency (bench_queries.py)."""
+    import bench_queries
+
+    result = {"loads": {}, "queries": {}}
+    for table, data_type, partitioned in tables:
+        load_tables = [f"{table}_{e}" for e in ENTITIES[data_type]][:1] if partitioned else [table]
+        for load_table in load_tables:
+            print(f"  load {load_table}...", flush=True)
+            result["loads"][load_table] = time_load(conn, load_table, data_type, n_rows, repeat)
+
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for name, group, relations, sql in bench_queries.QUERIES:
+                if group not in MEASURE_GROUPS or bench_queries._missing_relations(cur, relations):
+                    continue
+                print(f"  {name}...", flush=True)
+                r = bench_queries.run_query(cur, name, sql, repeat)
+                result["queries"][name] = {
+                    "execution_ms": r["execution_ms"],
+                    "shared_read_blocks": r["shared_read_blocks"],
+                    "top_node": r["top_node"],
+                }
+    finally:
+        conn.autocommit = False
+    return result
+
+
+# ============================================================
+# Report
+# ============================================================
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024 / 1024:,.1f} MB"
+
+
+def print_inventory(table: str, indexes: list, correlations: dict):
+    print(f"\n{table}")
+    if correlations:
+        print("  correlation: " + ", ".join(f"{c} {v:.2f}" for c, v in sorted(correlations.items())))
+    print(f"  {'index':<44} {'method':<6} {'scans':>12} {'size':>11}  key columns")
+    for index in indexes:
+        flags = " (unique)" if index["unique"] else ""
+        print(
+            f"  {index['name']:<44} {index['method']:<6} {index['scans']:>12,} {_mb(index['bytes']):>11}  "
+            f"{', '.join(index['key_columns'])}{flags}"
+        )
+
+
+def print_proposals(proposals: list):
+    if not proposals:
+        print("  no changes proposed")
+    for p in proposals:
+        print(f"  {p['action']:<6} {p['index']:<44} {p['reason']}")
+
+
+def print_measurements(before: dict, after: dict = None):
+    def delta(old, new, higher_is_better):
+        if not old or new is None:
+            return ""
+        change = (new - old) / old * 100
+        return f"{change:>+7.0f}%{'' if (change >= 0) == higher_is_better else ' (worse)'}"
+
+    print(f"\n  {'load':<28} {'rows/s':>12}" + (f" {'after':>12} {'delta':>8}" if after else ""))
+    for name, r in before["loads"].items():
+        line = f"  {name:<28} {r['rows_per_sec']:>12,.0f}"
+        if after and name in after["loads"]:
+            new = after["loads"][name]["rows_per_sec"]
+            line += f" {new:>12,.0f} {delta(r['rows_per_sec'], new, True)}"
+        print(line)
+
+    print(f"\n  {'query':<28} {'exec ms':>12}" + (f" {'after':>12} {'delta':>8}" if after else ""))
+    for name, r in before["queries"].items():
+        line = f"  {name:<28} {r['execution_ms']:>12.1f}"
+        if after and name in after["queries"]:
+            new = after["queries"][name]["execution_ms"]
+            line += f" {new:>12.1f} {delta(r['execution_ms'], new, False)}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propose (and apply) index changes on the raw fact tables")
+    parser.add_argument("--data-type", choices=sorted(ENTITIES), action="append",
+                        help="sales and/or stock (default: both)")
+    parser.add_argument("--apply", action="store_true", help="Run the proposed CREATE/DROP INDEX statements")
+    parser.add_argument("--measure", action="store_true",
+                        help="Measure load rows/s and query latency (before and after with --apply)")
+    parser.add_argument("--min-stats-days", type=int, default=7,
+                        help="Only drop unused indexes if statistics cover at least this many days (default: 7)")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows per measured load (default: 20000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, best is kept (default: 3)")
+    parser.add_argument("--output-dir", type=str, default=None,
+                        help="Report directory (default: OPENCLAW_BENCH_DIR or scripts/bench_output)")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    args = parser.parse_args()
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+
+    report = {"run_at": datetime.now().isoformat(timespec="seconds"), "tables": {}}
+    conn = pg_pool.connection(args.pg_host)
+    try:
+        with conn.cursor() as cur:
+            tables = fact_table_list(cur, args.data_type or sorted(ENTITIES))
+            stats_days = stats_age_days(cur)
+            statements = fact_statements(cur)
+        conn.rollback()
+
+        age = "never reset" if stats_days is None else f"reset {stats_days:.1f} days ago"
+        print(f"Index statistics {age}; pg_stat_statements {'unavailable' if statements is None else 'read'}")
+
+        for table, data_type, partitioned in tables:
+            with conn.cursor() as cur:
+                indexes = index_inventory(cur, table)
+                correlations = date_correlations(cur, table, partitioned, DATE_COLUMNS[data_type])
+                narrow = fact_tables.is_narrow(cur, table)
+            conn.rollback()
+            proposals = propose(table, data_type, partitioned, narrow, indexes, correlations,
+                                statements, stats_days, args.min_stats_days)
+            print_inventory(table, indexes, correlations)
+            print_proposals(proposals)
+            report["tables"][table] = {
+                "data_type": data_type,
+                "partitioned": partitioned,
+                "correlations": correlations,
+                "indexes": indexes,
+                "proposals": proposals,
+            }
+        report["statements"] = statements
+
+        if args.measure:
+            print("\nMeasuring current state...")
+            report["before"] = measure(conn, tables, args.rows, args.repeat)
+
+        if args.apply:
+            print("\nApplying...")
+            conn.autocommit = True
+            try:
+                for table, entry in report["tables"].items():
+                    if entry["proposals"]:
+                        apply_proposals(conn, table, entry["proposals"])
+            finally:
+                conn.autocommit = False
+            if args.measure:
+                print("\nMeasuring after changes...")
+                report["after"] = measure(conn, tables, args.rows, args.repeat)
+
+        if args.measure:
+            print_measurements(report["before"], report.get("after"))
+    finally:
+        pg_pool.release(conn)
+
+    out_dir = Path(args.output_dir) if args.output_dir else _output_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"index_advisor_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    out_path.write_text(json.dumps(report, indent=2, default=str))
+    print(f"\nReport: {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,66 @@
+-- ============================================================
+-- ISELLER SALES - merge key for raw.iseller_sales
+-- pull_iseller_sales.py merges CSV exports on (order_number, item_sku):
+-- one row per order line, updated in place when a newer export
+-- changes it. Until now the table was filled by hand, one upload per
+-- export, so overlapping exports left the same line in several
+-- snapshots.
+--
+-- This collapses existing rows to the newest snapshot of each line
+-- (lines repeated within that snapshot are summed, as the loader
+-- does) and adds the unique index ON CONFLICT needs.
+--
+-- Apply once:   psql -d openclaw_ops -f scripts/iseller_sales.sql
+-- ============================================================
+
+BEGIN;
+
+WITH ranked AS (
+    SELECT ctid AS row_ctid,
+           order_number,
+           item_sku,
+           snapshot_date,
+           row_number() OVER w AS rn,
+           rank() OVER (PARTITION BY order_number, item_sku
+                        ORDER BY snapshot_date DESC NULLS LAST) AS snapshot_rank
+    FROM raw.iseller_sales
+    WHERE order_number IS NOT NULL AND item_sku IS NOT NULL
+    WINDOW w AS (PARTITION BY order_number, item_sku
+                 ORDER BY snapshot_date DESC NULLS LAST, loaded_at DESC NULLS LAST)
+),
+repeated AS (
+    -- Lines of the newest snapshot that appear more than once in it
+    SELECT r.order_number, r.item_sku,
+           sum(t.item_quantity) AS item_quantity,
+           sum(t.item_discount) AS item_discount,
+           sum(t.item_total) AS item_total
+    FROM ranked r
+    JOIN raw.iseller_sales t ON t.ctid = r.row_ctid
+    WHERE r.snapshot_rank = 1
+    GROUP BY r.order_number, r.item_sku
+    HAVING count(*) > 1
+)
+UPDATE raw.iseller_sales t
+SET item_quantity = p.item_quantity,
+    item_discount = p.item_discount,
+    item_total = p.item_total
+FROM ranked r
+JOIN repeated p USING (order_number, item_sku)
+WHERE t.ctid = r.row_ctid AND r.rn = 1;
+
+DELETE FROM raw.iseller_sales t
+USING (
+    SELECT ctid AS row_ctid,
+           row_number() OVER (PARTITION BY order_number, item_sku
+                              ORDER BY snapshot_date DESC NULLS LAST, loaded_at DESC NULLS LAST) AS rn
+    FROM raw.iseller_sales
+    WHERE order_number IS NOT NULL AND item_sku IS NOT NULL
+) d
+WHERE t.ctid = d.row_ctid AND d.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_iseller_sales_order_sku
+    ON raw.iseller_sales (order_number, item_sku);
+
+COMMIT;
+
+ANALYZE raw.iseller_sales;
@@ -0,0 +1,134 @@
+"""
+Item-master cache in raw.accurate_item_master (one row per entity x item code).
+
+Populated by pull_accurate_stock.py, which already fetches item/detail.do for
+every item. Read by pull_accurate_sales.py and pull_historical_sales.py to fill
+vendor_price / bpp without extra API calls.
+
+Table DDL: scripts/item_master.sql
+"""
+
+from psycopg2.extras import execute_values
+
+ITEM_MASTER_TABLE = "raw.accurate_item_master"
+
+
+def extract_item(detail: dict) -> dict:
+    """Pick the item-master fields out of an item/detail.do payload."""
+    unit_obj = detail.get("unit1", {}) or {}
+    return {
+        "item_id": detail.get("id"),
+        "kode_barang": detail.get("no", ""),
+        "nama_barang": detail.get("name", ""),
+        "satuan": unit_obj.get("name", "") if isinstance(unit_obj, dict) else "",
+        "unit_price": round(detail.get("unitPrice", 0) or 0, 2),
+        "vendor_price": round(detail.get("vendorPrice", 0) or 0, 2),
+        "cost": round(detail.get("cost", 0) or detail.get("averageCost", 0) or 0, 2),
+    }
+
+
+def _table_exists(cur) -> bool:
+    cur.execute("SELECT to_regclass(%s)", (ITEM_MASTER_TABLE,))
+    return cur.fetchone()[0] is not None
+
+
+def upsert_items(cur, entity_key: str, items: list, batch_id: str) -> int:
+    """Upsert item-master rows for an entity (inside the caller's transaction).
+
+    Missing table (not yet migrated) is skipped, so loaders keep working.
+    """
+    values = [
+        (
+            entity_key,
+            item["kode_barang"],
+            item["item_id"],
+            item["nama_barang"],
+            item["satuan"],
+            item["unit_price"],
+            item["vendor_price"],
+            item["cost"],
+            batch_id,
+        )
+        for item in items
+        if item["kode_barang"]
+    ]
+    if not values or not _table_exists(cur):
+        return 0
+
+    execute_values(
+        cur,
+        f"""
+        INSERT INTO {ITEM_MASTER_TABLE} (entity, kode_barang, item_id, nama_barang, satuan,
+                                         unit_price, vendor_price, cost, load_batch_id)
+        VALUES %s
+        ON CONFLICT (entity, kode_barang)
+        DO UPDATE SET
+            item_id = EXCLUDED.item_id,
+            nama_barang = EXCLUDED.nama_barang,
+            satuan = EXCLUDED.satuan,
+            unit_price = EXCLUDED.unit_price,
+            vendor_price = EXCLUDED.vendor_price,
+            cost = EXCLUDED.cost,
+            load_batch_id = EXCLUDED.load_batch_id,
+            updated_at = now()
+        """,
+        values,
+        page_size=500,
+    )
+    return len(values)
+
+
+def load_item_master(cur, entity_key: str) -> dict:
+    """Return {kode_barang: {"vendor_price", "cost", ...}} for an entity.
+
+    Missing table (not yet migrated) yields an empty dict so loaders keep working.
+    """
+    if not _table_exists(cur):
+        return {}
+
+    cur.execute(
+        f"""
+        SELECT kode_barang, nama_barang, satuan, unit_price, vendor_price, cost
+        FROM {ITEM_MASTER_TABLE}
+        WHERE entity = %s
+        """,
+        (entity_key,),
+    )
+    return {
+        kode: {
+            "nama_barang": nama,
+            "satuan": satuan,
+            "unit_price": float(unit_price or 0),
+            "vendor_price": float(vendor_price or 0),
+            "cost": float(cost or 0),
+        }
+        for kode, nama, satuan, unit_price, vendor_price, cost in cur.fetchall()
+    }
+
+
+def fill_sales_rows(rows, master: dict, code_key: str = "kode_produk") -> int:
+    """Fill zero/missing vendor_price and bpp on sales rows from the item master.
+
+    `rows` is a row_batch.RowBatch; its columns are updated in place.
+    Returns the number of rows that were changed.
+    """
+    if not master:
+        return 0
+
+    codes, vendor_prices, bpps = (rows.column(c) for c in (code_key, "vendor_price", "bpp"))
+    filled = 0
+    for i, code in enumerate(codes):
+        item = master.get(code)
+        if not item:
+            continue
+        changed = False
+        if not vendor_prices[i] and item["vendor_price"]:
+            vendor_prices[i] = item["vendor_price"]
+            changed = True
+        if not bpps[i] and item["cost"]:
+            bpps[i] = item["cost"]
+            changed = True
+        if changed:
+            filled += 1
+    return filled
+
@@ -0,0 +1,24 @@
+-- ============================================================
+-- ITEM MASTER CACHE - raw.accurate_item_master
+-- One row per (entity, kode_barang), refreshed by the daily stock pull
+-- (pull_accurate_stock.py) from item/detail.do.
+--
+-- Read by pull_accurate_sales.py and pull_historical_sales.py to fill
+-- vendor_price / bpp without extra API calls.
+--
+-- Apply once:   psql -d openclaw_ops -f scripts/item_master.sql
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS raw.accurate_item_master (
+    entity        text          NOT NULL,
+    kode_barang   text          NOT NULL,
+    item_id       bigint,
+    nama_barang   text,
+    satuan        text,
+    unit_price    numeric(15,2),
+    vendor_price  numeric(15,2),
+    cost          numeric(15,2),
+    load_batch_id text,
+    updated_at    timestamptz   NOT NULL DEFAULT now(),
+    PRIMARY KEY (entity, kode_barang)
+);
@@ -0,0 +1,11 @@
+-- ============================================================
+-- raw.load_history.phase_timings
+-- Per-phase durations (seconds) of the run that produced each load, written
+-- by run_metrics.RunMetrics.store_phase_timings(), e.g.
+--   {"auth": 0.012, "list_pages": 3.4, "details": 812.9, "pg_upsert": 4.1}
+--
+-- Apply once:   psql -d openclaw_ops -f scripts/load_history_metrics.sql
+-- ============================================================
+
+ALTER TABLE raw.load_history
+    ADD COLUMN IF NOT EXISTS phase_timings jsonb;
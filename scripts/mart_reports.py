@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Compute the mart.report_* tables in an embedded DuckDB instead of PostgreSQL.
+
+The Parquet exports (export_parquet.py) are registered as DuckDB views and the
+small portal.* reference tables are copied in from PostgreSQL once per run, so
+the heavy scans and aggregations run vectorized in-process and openclaw_ops
+only sees a few small reads plus the final result writes.
+
+Reports (same definitions as the mart group in bench_queries.py, all entities):
+    report_control_stock      per entity x store, latest stock snapshot:
+                              FF%   sizes in stock / sizes in range (kodemix)
+                              FB%   articles with a full size run / articles
+                              depth pairs per article in stock
+    report_tier_summary       SKUs and pairs per tier, latest stock snapshot
+    report_depth_alert        SKUs below DEPTH_THRESHOLD pairs in a store
+    report_sales_daily        pairs / revenue per day x store x product over the
+                              last --days, latest snapshot per invoice line
+    report_stock_vs_capacity  pairs vs portal.stock_capacity.max_stock
+
+Article = kode_barang without its 3-character size suffix (= kodemix.kode).
+
+Requires duckdb and pyarrow.
+
+Usage:
+    python mart_reports.py --to-pg                         # Rebuild mart.report_* tables
+    python mart_reports.py --output-dir reports/           # Write reports as Parquet files
+    python mart_reports.py --report report_control_stock --output-dir reports/ --format csv
+"""
+
+import io
+import time
+import argparse
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+try:
+    import duckdb
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # Required; checked in main()
+    duckdb = None
+
+import export_parquet
+
+SCRIPT_DIR = Path(__file__).parent
+
+DEPTH_THRESHOLD = 2
+DEFAULT_SALES_DAYS = 90
+
+PORTAL_TABLES = {
+    "portal_kodemix": "SELECT kode_besar, kode, tier_baru, tier_lama, no_urut FROM portal.kodemix",
+    "portal_stock_capacity": "SELECT stock_location, branch, area, max_display, max_stock, storage FROM portal.stock_capacity",
+}
+
+# (name, required views, sql) - DuckDB dialect
+REPORTS = [
+    (
+        "report_control_stock",
+        ["stock_latest", "portal_kodemix"],
+        """
+        WITH size_range AS (
+            SELECT lower(trim(kode)) AS article, COUNT(DISTINCT lower(trim(kode_besar))) AS sizes
+            FROM portal_kodemix
+            WHERE kode IS NOT NULL
+            GROUP BY 1
+        ),
+        per_article AS (
+            SELECT s.entity, s.snapshot_date, s.nama_gudang, r.article, r.sizes,
+                   COUNT(DISTINCT s.kode_barang) FILTER (WHERE s.kuantitas > 0) AS sizes_in_stock,
+                   SUM(s.kuantitas) AS pairs
+            FROM stock_latest s
+            JOIN size_range r
+              ON r.article = lower(trim(left(s.kode_barang, length(s.kode_barang) - 3)))
+            GROUP BY ALL
+        )
+        SELECT entity, snapshot_date, nama_gudang,
+               COUNT(*) FILTER (WHERE sizes_in_stock > 0) AS articles,
+               SUM(sizes_in_stock) AS sizes_in_stock,
+               SUM(sizes) FILTER (WHERE sizes_in_stock > 0) AS sizes_in_range,
+               ROUND(100.0 * SUM(sizes_in_stock) / NULLIF(SUM(sizes) FILTER (WHERE sizes_in_stock > 0), 0), 1) AS ff_pct,
+               ROUND(100.0 * COUNT(*) FILTER (WHERE sizes_in_stock >= sizes)
+                     / NULLIF(COUNT(*) FILTER (WHERE sizes_in_stock > 0), 0), 1) AS fb_pct,
+               SUM(pairs) AS pairs,
+               ROUND(SUM(pairs) / NULLIF(COUNT(*) FILTER (WHERE sizes_in_stock > 0), 0), 1) AS depth
+        FROM per_article
+        GROUP BY entity, snapshot_date, nama_gudang
+        ORDER BY entity, nama_gudang
+        """,
+    ),
+    (
+        "report_tier_summary",
+        ["stock_latest", "portal_kodemix"],
+        """
+        WITH product AS (
+            SELECT lower(trim(kode_besar)) AS kode_besar, COALESCE(tier_baru, tier_lama) AS tier
+            FROM portal_kodemix
+            QUALIFY row_number() OVER (PARTITION BY lower(trim(kode_besar)) ORDER BY no_urut) = 1
+        )
+        SELECT s.entity, s.snapshot_date, COALESCE(p.tier, 'UNMAPPED') AS tier,
+               COUNT(DISTINCT s.kode_barang) AS skus, SUM(s.kuantitas) AS pairs
+        FROM stock_latest s
+        LEFT JOIN product p ON p.kode_besar = lower(trim(s.kode_barang))
+        GROUP BY ALL
+        ORDER BY entity, tier
+        """,
+    ),
+    (
+        "report_depth_alert",
+        ["stock_latest"],
+        f"""
+        SELECT entity, snapshot_date, nama_gudang, kode_barang, nama_barang, kuantitas
+        FROM stock_latest
+        WHERE kuantitas < {DEPTH_THRESHOLD}
+        ORDER BY entity, nama_gudang, kode_barang
+        """,
+    ),
+    (
+        "report_sales_daily",
+        ["sales"],
+        """
+        WITH latest AS (
+            SELECT entity, tanggal, nama_departemen, kode_produk, kuantitas, total_harga
+            FROM sales
+            WHERE tanggal >= current_date - CAST($days AS INTEGER)
+            QUALIFY row_number() OVER (
+                PARTITION BY entity, nomor_invoice, kode_produk, tanggal ORDER BY snapshot_date DESC
+            ) = 1
+        )
+        SELECT entity, tanggal, nama_departemen, kode_produk,
+               SUM(kuantitas) AS pairs, SUM(total_harga) AS revenue
+        FROM latest
+        GROUP BY ALL
+        ORDER BY entity, tanggal, nama_departemen, kode_produk
+        """,
+    ),
+    (
+        "report_stock_vs_capacity",
+        ["stock_latest", "portal_stock_capacity"],
+        """
+        SELECT s.entity, s.snapshot_date, c.stock_location, c.branch, c.area, c.max_stock,
+               SUM(s.kuantitas) AS pairs,
+               ROUND(100.0 * SUM(s.kuantitas) / NULLIF(c.max_stock, 0), 1) AS pct_of_capacity
+        FROM stock_latest s
+        JOIN portal_stock_capacity c ON lower(trim(s.nama_gudang)) = lower(trim(c.stock_location))
+        GROUP BY s.entity, s.snapshot_date, c.stock_location, c.branch, c.area, c.max_stock
+        ORDER BY entity, stock_location
+        """,
+    ),
+]
+
+REPORT_NAMES = [name for name, _, _ in REPORTS]
+
+# pyarrow -> PostgreSQL column types for the mart tables
+PG_TYPES = [
+    (pa.types.is_boolean, "boolean"),
+    (pa.types.is_integer, "bigint"),
+    (pa.types.is_floating, "double precision"),
+    (pa.types.is_decimal, "numeric"),
+    (pa.types.is_date, "date"),
+    (pa.types.is_timestamp, "timestamptz"),
+] if duckdb else []
+
+
+# =============================================================================
+# Sources
+# =============================================================================
+
+
+def _latest_snapshot_files(entity_dir: Path) -> list:
+    """Files of the newest snapshot_YYYY-MM-DD.parquet under one entity."""
+    files = list(entity_dir.glob("year=*/month=*/snapshot_*.parquet"))
+    if not files:
+        return []
+    latest = max(f.name for f in files)
+    return [str(f) for f in files if f.name == latest]
+
+
+def register_parquet(con, export_root: Path) -> list:
+    """Create the sales / stock / stock_latest views. Returns the view names."""
+    views = []
+    for data_type in ("sales", "stock"):
+        pattern = export_root / data_type / "entity=*" / "year=*" / "month=*" / "*.parquet"
+        if not any((export_root / data_type).glob("entity=*/year=*/month=*/*.parquet")):
+            continue
+        con.execute(
+            f"CREATE VIEW {data_type} AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true)"
+        )
+        views.append(data_type)
+
+    # Latest stock snapshot per entity, picked from file names so only those files are read
+    latest = []
+    for entity_dir in sorted((export_root / "stock").glob("entity=*")):
+        latest.extend(_latest_snapshot_files(entity_dir))
+    if latest:
+        con.execute(
+            f"CREATE VIEW stock_latest AS SELECT * FROM read_parquet({latest!r}, hive_partitioning = true)"
+        )
+        views.append("stock_latest")
+    return views
+
+
+def register_portal(con, pg_conn) -> list:
+    """Copy the portal reference tables into DuckDB (they are small)."""
+    views = []
+    with pg_conn.cursor() as cur:
+        for name, sql in PORTAL_TABLES.items():
+            relation = sql.split(" FROM ")[1]
+            cur.execute("SELECT to_regclass(%s)", (relation,))
+            if cur.fetchone()[0] is None:
+                print(f"  {relation} missing, dependent reports skipped")
+                continue
+            cur.execute(sql)
+            columns = [d[0] for d in cur.description]
+            rows = cur.fetchall()
+            if not rows:
+                print(f"  {relation} is empty, dependent reports skipped")
+                continue
+            con.register(name, pa.Table.from_pylist([dict(zip(columns, row)) for row in rows]))
+            views.append(name)
+    pg_conn.commit()
+    return views
+
+
+# =============================================================================
+# Output
+# =============================================================================
+
+
+def _pg_type(arrow_type) -> str:
+    for check, pg_type in PG_TYPES:
+        if check(arrow_type):
+            return pg_type
+    return "text"
+
+
+def write_pg(pg_conn, name: str, table: "pa.Table"):
+    """Replace mart.<name> with the report (created on first run)."""
+    columns = ", ".join(f"{f.name} {_pg_type(f.type)}" for f in table.schema)
+    buf = io.BytesIO()
+    pa_csv.write_csv(table, buf)
+    buf.seek(0)
+    with pg_conn.cursor() as cur:
+        cur.execute("CREATE SCHEMA IF NOT EXISTS mart")
+        cur.execute(f"CREATE TABLE IF NOT EXISTS mart.{name} ({columns})")
+        cur.execute(f"TRUNCATE mart.{name}")
+        cur.copy_expert(
+            f"COPY mart.{name} ({', '.join(table.column_names)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+            buf,
+        )
+    pg_conn.commit()
+
+
+def write_file(output_dir: Path, name: str, table: "pa.Table", fmt: str) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{name}.{fmt}"
+    if fmt == "parquet":
+        pq.write_table(table, path, compression="zstd")
+    else:
+        pa_csv.write_csv(table, path)
+    return path
+
+
+def run_reports(con, available: list, names: list, days: int) -> dict:
+    """Run the selected reports. Returns {name: pyarrow.Table}.
+
+    A report that fails is logged and left out; the others still run.
+    """
+    results = {}
+    for name, required, sql in REPORTS:
+        if name not in names:
+            continue
+        missing = [v for v in required if v not in available]
+        if missing:
+            print(f"  {name}: skipped (missing {', '.join(missing)})")
+            continue
+        started = time.perf_counter()
+        params = {"days": days} if "$days" in sql else {}
+        try:
+            table = con.execute(sql, params).fetch_arrow_table()
+        except duckdb.Error as e:
+            print(f"  {name}: FAILED ({e})")
+            continue
+        print(f"  {name}: {table.num_rows:,} rows in {time.perf_counter() - started:.2f}s")
+        results[name] = table
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute mart.report_* in DuckDB over the Parquet exports",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s --to-pg                       Rebuild mart.report_* in PostgreSQL
+  %(prog)s --output-dir reports/         Write Parquet files only
+        """,
+    )
+    parser.add_argument("--report", choices=REPORT_NAMES, action="append", help="Report to run (repeatable, default: all)")
+    parser.add_argument("--export-dir", type=str, default=None, help="Parquet export root (default: OPENCLAW_EXPORT_DIR or scripts/export)")
+    parser.add_argument("--days", type=int, default=DEFAULT_SALES_DAYS, help=f"Sales window for report_sales_daily (default: {DEFAULT_SALES_DAYS})")
+    parser.add_argument("--to-pg", action="store_true", help="Write results to mart.report_* tables")
+    parser.add_argument("--output-dir", type=str, default=None, help="Write results as files to this directory")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet", help="File format for --output-dir")
+    parser.add_argument("--threads", type=int, default=None, help="DuckDB threads (default: all cores)")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    args = parser.parse_args()
+
+    if duckdb is None:
+        print("ERROR: duckdb and pyarrow are required (pip install duckdb pyarrow)")
+        return 1
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+
+    export_root = Path(args.export_dir) if args.export_dir else export_parquet._export_dir()
+    con = duckdb.connect()
+    if args.threads:
+        con.execute(f"SET threads = {int(args.threads)}")
+
+    pg_conn = export_parquet.get_pg_connection(args.pg_host)
+    try:
+        available = register_parquet(con, export_root) + register_portal(con, pg_conn)
+        print(f"Sources: {', '.join(available) or 'none'} ({export_root})")
+        results = run_reports(con, available, args.report or REPORT_NAMES, args.days)
+
+        for name, table in results.items():
+            if args.to_pg:
+                write_pg(pg_conn, name, table)
+                print(f"  -> mart.{name}")
+            if args.output_dir:
+                print(f"  -> {write_file(Path(args.output_dir), name, table, args.format)}")
+    finally:
+        pg_conn.close()
+        con.close()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
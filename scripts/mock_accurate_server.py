@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Accurate Online API, for throughput benchmarks.
+
+Implements the endpoints the pull scripts use:
+    POST /api/api-token.do                      (account server: auth + host discovery)
+    GET  /accurate/api/sales-invoice/list.do    (sp.page, sp.pageSize)
+    GET  /accurate/api/sales-invoice/detail.do  (id)
+    GET  /accurate/api/item/list.do             (sp.page, sp.pageSize)
+    GET  /accurate/api/item/detail.do           (id)
+
+Synthetic catalog: N SKUs (article + 3-char size suffix) x M warehouses, K invoices
+with a varying number of lines. Payloads include realistic unused subtrees so
+decode cost is representative. Everything is deterministic for a given --seed.
+
+Fault injection:
+    --latency-ms / --latency-dist   fixed | uniform | lognormal
+    --rate-limit                    requests/sec (token bucket), excess -> HTTP 429
+    --disconnect-rate               probability of dropping the connection mid-request
+
+Usage:
+    python mock_accurate_server.py --port 8765 --skus 2000 --warehouses 40
+    ACCURATE_ACCOUNT_URL=http://127.0.0.1:8765 python pull_accurate_stock.py ddd --dry-run
+
+See bench_pull.py for the benchmark harness that drives it in-process.
+"""
+
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SIZES = ["Z36", "Z37", "Z38", "Z39", "Z40", "Z41", "Z42", "Z43"]
+SERIES = ["SLIDE", "AIRMOVE", "STRIPE", "LUNA", "CLASSIC", "FLO"]
+GENDERS = ["M", "L", "B", "G"]
+
+
+class MockConfig:
+    def __init__(
+        self,
+        skus: int = 500,
+        warehouses: int = 20,
+        invoices: int = 300,
+        max_lines: int = 12,
+        latency_ms: float = 0.0,
+        latency_dist: str = "fixed",
+        rate_limit: float = 0.0,
+        disconnect_rate: float = 0.0,
+        seed: int = 42,
+    ):
+        self.skus = skus
+        self.warehouses = warehouses
+        self.invoices = invoices
+        self.max_lines = max_lines
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.rate_limit = rate_limit
+        self.disconnect_rate = disconnect_rate
+        self.seed = seed
+
+
+class SyntheticCatalog:
+    """Deterministic items, warehouses and invoices derived from ids + seed."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.warehouses = [f"Zuma Store {i:03d}" for i in range(1, config.warehouses + 1)]
+
+    def _rng(self, kind: str, object_id: int) -> random.Random:
+        return random.Random(f"{self.config.seed}:{kind}:{object_id}")
+
+    def sku_code(self, item_id: int) -> str:
+        article = item_id // len(SIZES)
+        gender = GENDERS[article % len(GENDERS)]
+        return f"{gender}1{SERIES[article % len(SERIES)][:2]}{article:04d}{SIZES[item_id % len(SIZES)]}"
+
+    def item_summary(self, item_id: int) -> dict:
+        return {"id": item_id, "no": self.sku_code(item_id), "name": f"ITEM {item_id}"}
+
+    def item_detail(self, item_id: int) -> dict:
+        rng = self._rng("item", item_id)
+        unit_price = float(rng.choice([99000, 129000, 159000, 199000, 249000]))
+        stocked = rng.sample(self.warehouses, k=max(1, int(len(self.warehouses) * rng.uniform(0.3, 1.0))))
+        return {
+            "id": item_id,
+            "no": self.sku_code(item_id),
+            "name": f"ZUMA {SERIES[(item_id // len(SIZES)) % len(SERIES)]} {item_id}",
+            "optLock": rng.randint(1, 50),
+            "unit1": {"id": 1, "name": "PAIR"},
+            "unitPrice": unit_price,
+            "vendorPrice": round(unit_price * 0.45, 2),
+            "cost": round(unit_price * 0.4, 2),
+            "itemType": "INVENTORY",
+            "suspended": False,
+            "notes": "x" * rng.randint(0, 200),
+            "detailSellingPrice": [
+                {"priceCategory": {"name": f"CAT {c}"}, "price": unit_price, "effectiveDate": "01/01/2026"}
+                for c in range(rng.randint(1, 6))
+            ],
+            "detailWarehouseData": [
+                {
+                    "warehouseName": wh,
+                    "warehouseId": self.warehouses.index(wh) + 1,
+                    "balance": float(rng.randint(0, 60)),
+                    "balanceUnit": "PAIR",
+                    "defaultWarehouse": False,
+                }
+                for wh in stocked
+            ],
+        }
+
+    def invoice_summary(self, invoice_id: int) -> dict:
+        return {"id": invoice_id, "number": f"SI.2026.{invoice_id:06d}"}
+
+    def invoice_detail(self, invoice_id: int) -> dict:
+        rng = self._rng("invoice", invoice_id)
+        trans_date = datetime.now() - timedelta(days=rng.randint(0, 2))
+        store = rng.choice(self.warehouses)
+        lines = []
+        for _ in range(rng.randint(1, self.config.max_lines)):
+            item_id = rng.randint(1, self.config.skus)
+            detail = self.item_detail(item_id)
+            qty = float(rng.randint(1, 3))
+            total = qty * detail["unitPrice"]
+            lines.append(
+                {
+                    "item": {
+                        "no": detail["no"],
+                        "name": detail["name"],
+                        "cost": detail["cost"],
+                        "vendorPrice": detail["vendorPrice"],
+                        "unitPrice": detail["unitPrice"],
+                        "itemType": "INVENTORY",
+                    },
+                    "itemUnit": {"name": "PAIR"},
+                    "department": {"name": store},
+                    "warehouse": {"name": store},
+                    "quantity": qty,
+                    "unitPrice": detail["unitPrice"],
+                    "totalPrice": total,
+                    "dppAmount": round(total / 1.11, 2),
+                    "tax1Amount": round(total - total / 1.11, 2),
+                    "detailNotes": "",
+                    "salesmanList": [{"name": "SPG"}],
+                }
+            )
+        return {
+            "id": invoice_id,
+            "number": f"SI.2026.{invoice_id:06d}",
+            "transDate": trans_date.strftime("%d/%m/%Y"),
+            "optLock": rng.randint(1, 5),
+            "customer": {"name": rng.choice(["UMUM", "MEMBER", "RESELLER"]), "customerNo": "C-1"},
+            "branchName": "HEAD OFFICE",
+            "detailItem": lines,
+            "detailExpense": [],
+            "description": "x" * rng.randint(0, 300),
+        }
+
+
+class TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+def _page(total: int, params: dict):
+    page = int(params.get("sp.page", ["1"])[0])
+    size = int(params.get("sp.pageSize", ["100"])[0])
+    start = (page - 1) * size + 1
+    return range(start, min(total, start + size - 1) + 1)
+
+
+def make_handler(config: MockConfig):
+    catalog = SyntheticCatalog(config)
+    bucket = TokenBucket(config.rate_limit)
+    fault_rng = random.Random(config.seed)
+    stats = {"requests": 0, "429": 0, "disconnects": 0}
+    stats_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # Small JSON responses: no 40 ms delayed-ACK stalls
+
+        def log_message(self, fmt, *args):
+            pass  # Quiet - benchmarks print their own report
+
+        def _delay(self):
+            if config.latency_ms <= 0:
+                return
+            if config.latency_dist == "uniform":
+                ms = fault_rng.uniform(0, 2 * config.latency_ms)
+            elif config.latency_dist == "lognormal":
+                # Median = latency_ms, long right tail
+                ms = config.latency_ms * math.exp(fault_rng.gauss(0, 0.6))
+            else:
+                ms = config.latency_ms
+            time.sleep(ms / 1000)
+
+        def _send_json(self, status: int, payload: dict, headers: dict = None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self):
+            with stats_lock:
+                stats["requests"] += 1
+            self._delay()
+
+            if config.disconnect_rate and fault_rng.random() < config.disconnect_rate:
+                with stats_lock:
+                    stats["disconnects"] += 1
+                self.close_connection = True
+                return  # No response -> client sees RemoteDisconnected
+
+            if not bucket.take():
+                with stats_lock:
+                    stats["429"] += 1
+                self._send_json(429, {"s": False, "d": ["Too many requests"]}, {"Retry-After": "1"})
+                return
+
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            path = url.path
+
+            if path == "/api/api-token.do":
+                host = f"http://{self.headers.get('Host')}"
+                self._send_json(
+                    200,
+                    {"s": True, "d": {"database": {"id": 1, "alias": "MOCK", "host": host}}},
+                )
+            elif path == "/accurate/api/item/list.do":
+                ids = _page(config.skus, params)
+                self._send_json(200, {"s": True, "d": [catalog.item_summary(i) for i in ids]})
+            elif path == "/accurate/api/item/detail.do":
+                item_id = int(params["id"][0])
+                self._send_json(200, {"s": True, "d": catalog.item_detail(item_id)})
+            elif path == "/accurate/api/sales-invoice/list.do":
+                ids = _page(config.invoices, params)
+                self._send_json(200, {"s": True, "d": [catalog.invoice_summary(i) for i in ids]})
+            elif path == "/accurate/api/sales-invoice/detail.do":
+                invoice_id = int(params["id"][0])
+                self._send_json(200, {"s": True, "d": catalog.invoice_detail(invoice_id)})
+            else:
+                self._send_json(404, {"s": False, "d": [f"Unknown endpoint {path}"]})
+
+        do_GET = _handle
+        do_POST = _handle
+
+    Handler.stats = stats
+    return Handler
+
+
+def start_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+    """Start the mock in a background thread. Returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--skus", type=int, default=500, help="Number of SKUs (default: 500)")
+    parser.add_argument("--warehouses", type=int, default=20, help="Number of warehouses (default: 20)")
+    parser.add_argument("--invoices", type=int, default=300, help="Number of invoices (default: 300)")
+    parser.add_argument("--max-lines", type=int, default=12, help="Max lines per invoice (default: 12)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean response latency (ms)")
+    parser.add_argument(
+        "--latency-dist",
+        choices=["fixed", "uniform", "lognormal"],
+        default="fixed",
+        help="Latency distribution (default: fixed)",
+    )
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/sec before 429 (0 = off)")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Probability of dropped connection")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        skus=args.skus,
+        warehouses=args.warehouses,
+        invoices=args.invoices,
+        max_lines=args.max_lines,
+        latency_ms=args.latency_ms,
+        latency_dist=args.latency_dist,
+        rate_limit=args.rate_limit,
+        disconnect_rate=args.disconnect_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock Accurate Online API server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_server(config_from_args(args), args.host, args.port)
+    print(f"Mock Accurate API listening on {base_url}")
+    print(f"  export ACCURATE_ACCOUNT_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\nStats: {server.RequestHandlerClass.stats}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Compressed, content-addressed archive of raw Accurate API payloads.
+
+Every sales-invoice/detail.do and item/detail.do response body is stored once
+per distinct content as a zstd-compressed blob, so new columns can be
+back-filled by re-running flatten_invoice over the archive (see
+`pull_accurate_sales.py <entity> --reflatten`) instead of re-calling the API.
+
+Layout (ACCURATE_ARCHIVE_DIR, default: scripts/.cache/archive):
+    objects/ab/abcdef....json.zst      blob, name = SHA-256 of the response body
+    index.sqlite                       (entity, kind, object_id, content_hash)
+                                       -> version, first_seen, last_seen
+
+`version` is Accurate's lastUpdate / optLock when present. Falls back to gzip
+when the zstandard package is not installed.
+"""
+
+import os
+import gzip
+import hashlib
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # Optional - gzip fallback
+    zstandard = None
+
+SCRIPT_DIR = Path(__file__).parent
+
+KIND_SALES_INVOICE = "sales_invoice"
+KIND_ITEM = "item"
+
+
+def _archive_dir() -> Path:
+    return Path(os.getenv("ACCURATE_ARCHIVE_DIR", SCRIPT_DIR / ".cache" / "archive"))
+
+
+def archive_enabled() -> bool:
+    return os.getenv("ACCURATE_ARCHIVE", "1").lower() not in ("0", "false", "no")
+
+
+# Seconds a writer waits for another process's lock on index.sqlite
+BUSY_TIMEOUT = 30
+
+
+class PayloadArchive:
+    """Per-process handle on the archive (blob store + sqlite index).
+
+    The index is in WAL mode, so several processes can share it: readers do
+    not block the writer, and writers wait up to BUSY_TIMEOUT for each other.
+    `commit_every` puts are batched per commit; processes running side by side
+    (work_queue.py workers) use 1 so no process holds the write lock for long.
+    """
+
+    def __init__(self, archive_dir: Path = None, commit_every: int = 200):
+        self.root = Path(archive_dir) if archive_dir else _archive_dir()
+        self.objects_dir = self.root / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.root / "index.sqlite"), timeout=BUSY_TIMEOUT)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS payloads (
+                entity       TEXT NOT NULL,
+                kind         TEXT NOT NULL,
+                object_id    TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                version      TEXT,
+                codec        TEXT NOT NULL,
+                first_seen   TEXT NOT NULL,
+                last_seen    TEXT NOT NULL,
+                PRIMARY KEY (entity, kind, object_id, content_hash)
+            )
+            """
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_payloads_seen ON payloads (entity, kind, last_seen)"
+        )
+        self.codec = "zstd" if zstandard else "gzip"
+        self._compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+        self.commit_every = max(1, commit_every)
+        self._pending = 0
+        self.db.commit()
+
+    def _blob_path(self, content_hash: str, codec: str) -> Path:
+        suffix = ".json.zst" if codec == "zstd" else ".json.gz"
+        return self.objects_dir / content_hash[:2] / f"{content_hash}{suffix}"
+
+    def _compress(self, raw: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self._compressor.compress(raw)
+        return gzip.compress(raw, compresslevel=6)
+
+    @staticmethod
+    def _decompress(blob: bytes, codec: str) -> bytes:
+        if codec == "zstd":
+            if not zstandard:
+                raise RuntimeError("zstandard is required to read zstd archive blobs")
+            return zstandard.ZstdDecompressor().decompress(blob)
+        return gzip.decompress(blob)
+
+    def put(self, entity_key: str, kind: str, object_id, raw: bytes, version=None) -> str:
+        """Archive one raw response body; returns its content hash.
+
+        Identical content is stored once. `version` is the payload's lastUpdate/optLock.
+        """
+        content_hash = hashlib.sha256(raw).hexdigest()
+        today = datetime.now().strftime("%Y-%m-%d")
+
+        cur = self.db.execute(
+            """
+            UPDATE payloads SET last_seen = ?
+            WHERE entity = ? AND kind = ? AND object_id = ? AND content_hash = ?
+            """,
+            (today, entity_key, kind, str(object_id), content_hash),
+        )
+        if cur.rowcount == 0:
+            blob_path = self._blob_path(content_hash, self.codec)
+            if not blob_path.exists():
+                blob_path.parent.mkdir(exist_ok=True)
+                tmp_path = blob_path.with_suffix(".tmp")
+                tmp_path.write_bytes(self._compress(raw))
+                os.replace(tmp_path, blob_path)
+            self.db.execute(
+                """
+                INSERT INTO payloads (entity, kind, object_id, content_hash, version,
+                                      codec, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    entity_key,
+                    kind,
+                    str(object_id),
+                    content_hash,
+                    str(version) if version is not None else None,
+                    self.codec,
+                    today,
+                    today,
+                ),
+            )
+
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.db.commit()
+            self._pending = 0
+        return content_hash
+
+    def get(self, content_hash: str, codec: str) -> bytes:
+        blob = self._blob_path(content_hash, codec).read_bytes()
+        return self._decompress(blob, codec)
+
+    def iter_versions(self, entity_key: str, kind: str, since: str = None):
+        """Yield (object_id, first_seen, last_seen, raw_body) for every archived content
+        of each object, oldest first.
+
+        A content was fetched on every day from first_seen to last_seen, though
+        another content of the same object may share some of those days.
+
+        Args:
+            since: Only contents last seen on/after this date (YYYY-MM-DD)
+        """
+        rows = self.db.execute(
+            """
+            SELECT object_id, content_hash, codec, first_seen, last_seen
+            FROM payloads
+            WHERE entity = ? AND kind = ? AND last_seen >= ?
+            ORDER BY object_id, first_seen, rowid
+            """,
+            (entity_key, kind, since or ""),
+        )
+        for object_id, content_hash, codec, first_seen, last_seen in rows.fetchall():
+            yield object_id, first_seen, last_seen, self.get(content_hash, codec)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def open_archive(commit_every: int = 200):
+    """Open the archive, or return None if disabled/unavailable (archiving is best-effort)."""
+    if not archive_enabled():
+        return None
+    try:
+        return PayloadArchive(commit_every=commit_every)
+    except (OSError, sqlite3.Error) as e:
+        print(f"  Warning: payload archive unavailable: {e}")
+        return None
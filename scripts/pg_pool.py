@@ -0,0 +1,337 @@
+"""
+Shared PostgreSQL connections for the pull scripts.
+
+Every script used to open (and close) a fresh connection per entity, per
+90-day chunk and even per load_history line. Over the SSH tunnel to the VPS
+each connect is a TCP + TLS + auth round trip, so a run now keeps one work
+connection per process and hands it out again for the next entity / chunk.
+
+    conn = pg_pool.connection(pg_host_override)   # healthy, autocommit off
+    try:
+        with conn.cursor() as cur:
+            pg_pool.execute_pages(cur, UPSERT_SQL, rows, key=[0, 1])
+        conn.commit()
+    except Exception:
+        pg_pool.rollback(conn)                     # discards it if broken
+        raise
+    finally:
+        pg_pool.release(conn)                      # back to the pool, not closed
+
+    pg_pool.log_load("accurate_api", "ddd", "sales", batch_id, ..., status="error")
+
+Health checks: connection() reconnects if the pooled connection is closed, and
+pings it (SELECT 1) first if it sat idle longer than HEALTH_CHECK_IDLE - long
+API fetches between loads are exactly when a tunnel drops. A connection that
+fails a rollback is discarded, so an error path never writes through a broken
+connection.
+
+raw.load_history writes from error paths go through a second, autocommit
+connection (log_load), so an audit line is recorded even when the work
+transaction was rolled back. Success lines stay inside the load transaction:
+they are what export_parquet.py watermarks on, so they must commit with the
+data or not at all.
+"""
+
+import os
+import json
+import time
+import atexit
+
+import psycopg2
+from psycopg2 import errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.extras import execute_values
+
+CONNECT_TIMEOUT = 10
+HEALTH_CHECK_IDLE = 30  # seconds idle before a connection is pinged on checkout
+
+_work = {}  # pg_host_override -> _Slot
+_audit = {}  # pg_host_override -> _Slot (autocommit)
+
+
+class _Slot:
+    """One pooled connection and when it was last released."""
+
+    __slots__ = ("conn", "released_at")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.released_at = time.monotonic()
+
+
+def _params(pg_host_override: str = None) -> dict:
+    host = pg_host_override or os.getenv("PG_HOST", "localhost")
+    port = os.getenv("PG_PORT", "5432")
+    database = os.getenv("PG_DATABASE", os.getenv("PG_DB", "openclaw_ops"))
+    user = os.getenv("PG_USER", "openclaw_app")
+    password = os.getenv("PG_PASSWORD", os.getenv("PG_PASS"))
+
+    if not password:
+        raise ValueError(
+            f"PG_PASSWORD is required. Set it in environment or .env file.\n"
+            f"  Connection: {user}@{host}:{port}/{database}"
+        )
+    return {"host": host, "port": int(port), "dbname": database, "user": user, "password": password}
+
+
+def _connect(pg_host_override: str, autocommit: bool):
+    params = _params(pg_host_override)
+    try:
+        conn = psycopg2.connect(**params, connect_timeout=CONNECT_TIMEOUT)
+    except psycopg2.OperationalError as e:
+        raise ConnectionError(
+            f"PostgreSQL connection failed:\n"
+            f"  Host: {params['host']}:{params['port']}\n"
+            f"  Database: {params['dbname']}\n"
+            f"  User: {params['user']}\n"
+            f"  Error: {e}"
+        ) from e
+    conn.autocommit = autocommit
+    print(
+        f"  PG connected{' (audit)' if autocommit else ''}: "
+        f"{params['user']}@{params['host']}:{params['port']}/{params['dbname']}"
+    )
+    return conn
+
+
+def _healthy(slot: _Slot) -> bool:
+    conn = slot.conn
+    if conn.closed:
+        return False
+    if conn.info.transaction_status == TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if time.monotonic() - slot.released_at < HEALTH_CHECK_IDLE:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        if not conn.autocommit:
+            conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout(pool: dict, pg_host_override: str, autocommit: bool):
+    slot = pool.get(pg_host_override)
+    if slot is not None and not _healthy(slot):
+        print("  PG connection lost, reconnecting...")
+        _drop(pool, pg_host_override)
+        slot = None
+    if slot is None:
+        slot = pool[pg_host_override] = _Slot(_connect(pg_host_override, autocommit))
+    return slot.conn
+
+
+def _drop(pool: dict, key):
+    slot = pool.pop(key, None)
+    if slot is not None and not slot.conn.closed:
+        try:
+            slot.conn.close()
+        except psycopg2.Error:
+            pass
+
+
+def _slot_of(conn):
+    for slot in _work.values():
+        if slot.conn is conn:
+            return _work, slot
+    for slot in _audit.values():
+        if slot.conn is conn:
+            return _audit, slot
+    return None, None
+
+
+def connection(pg_host_override: str = None):
+    """
+    The pooled work connection (autocommit off), health-checked on checkout.
+
+    Hand it back with release() instead of close().
+
+    Raises:
+        ValueError: PG_PASSWORD not set
+        ConnectionError: PostgreSQL unreachable
+    """
+    return _checkout(_work, pg_host_override, autocommit=False)
+
+
+def audit_connection(pg_host_override: str = None):
+    """The pooled autocommit connection used for raw.load_history writes."""
+    return _checkout(_audit, pg_host_override, autocommit=True)
+
+
+def audit_connection_for(conn):
+    """
+    The pooled autocommit connection to the same server as a pooled work
+    connection, for side writes that must not roll back with the work
+    transaction (dimension entries, see dimensions.py).
+
+    Raises:
+        ValueError: conn is not a pooled work connection
+    """
+    for key, slot in _work.items():
+        if slot.conn is conn:
+            return audit_connection(key)
+    raise ValueError("not a pooled work connection")
+
+
+def rollback(conn) -> bool:
+    """
+    Best-effort rollback. A connection that cannot roll back is broken and is
+    closed and dropped from the pool, so the next checkout reconnects.
+
+    Returns:
+        True if the connection is still usable
+    """
+    try:
+        if not conn.closed:
+            conn.rollback()
+            return True
+    except psycopg2.Error:
+        pass
+    discard(conn)
+    return False
+
+
+def release(conn):
+    """Return a connection to the pool (rolls back anything left uncommitted)."""
+    if conn is None:
+        return
+    pool, slot = _slot_of(conn)
+    if slot is None:  # Not pooled (e.g. opened by a caller directly)
+        if not conn.closed:
+            conn.close()
+        return
+    if conn.closed:
+        discard(conn)
+        return
+    if conn.info.transaction_status != TRANSACTION_STATUS_IDLE and not rollback(conn):
+        return
+    slot.released_at = time.monotonic()
+
+
+def discard(conn):
+    """Close a connection and drop it from the pool."""
+    pool, slot = _slot_of(conn)
+    if slot is None:
+        if not conn.closed:
+            conn.close()
+        return
+    for key, value in list(pool.items()):
+        if value is slot:
+            _drop(pool, key)
+
+
+def close_all():
+    for pool in (_work, _audit):
+        for key in list(pool):
+            _drop(pool, key)
+
+
+atexit.register(close_all)
+
+
+# =============================================================================
+# Paged writes
+# =============================================================================
+
+
+def execute_pages(cur, sql: str, rows, key: list = None, page_size: int = 500) -> int:
+    """
+    Run `sql` (one VALUES %s) once per page of rows (psycopg2 execute_values).
+
+    One statement per page, not per row: statement-level triggers on the
+    target (the sales_rollup.sql recompute) fire once per page.
+
+    Args:
+        key: positions of the ON CONFLICT key in each row. Rows repeating a
+            key are collapsed first, the last one kept (as a row-by-row upsert
+            would), since one INSERT ... ON CONFLICT DO UPDATE cannot touch
+            the same row twice.
+
+    Returns:
+        Number of rows written (after collapsing repeated keys)
+    """
+    if key:
+        latest = {}
+        for row in rows:
+            latest[tuple(row[i] for i in key)] = row
+        rows = list(latest.values())
+    else:
+        rows = list(rows)
+    if rows:
+        execute_values(cur, sql, rows, page_size=page_size)
+    return len(rows)
+
+
+# =============================================================================
+# raw.load_history
+# =============================================================================
+
+_LOAD_HISTORY_COLUMNS = (
+    "source",
+    "entity",
+    "data_type",
+    "batch_id",
+    "date_from",
+    "date_to",
+    "rows_loaded",
+    "status",
+    "error_message",
+)
+
+
+def log_load(
+    source: str,
+    entity: str,
+    data_type: str,
+    batch_id: str,
+    date_from=None,
+    date_to=None,
+    rows_loaded: int = 0,
+    status: str = "success",
+    error_message: str = None,
+    phase_timings: dict = None,
+    pg_host_override: str = None,
+) -> bool:
+    """
+    Insert one raw.load_history row through the autocommit audit connection.
+
+    Best-effort: a failure is printed, never raised, so logging an error can
+    not mask the error itself. phase_timings is dropped (and the row inserted
+    without it) if the column does not exist yet.
+
+    Returns:
+        True if the row was written
+    """
+    values = [source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status]
+    values.append(error_message[:500] if error_message else None)
+    columns = list(_LOAD_HISTORY_COLUMNS)
+    if phase_timings is not None:
+        columns.append("phase_timings")
+        values.append(json.dumps(phase_timings))
+
+    conn = None
+    try:
+        conn = audit_connection(pg_host_override)
+        with conn.cursor() as cur:
+            try:
+                cur.execute(
+                    f"INSERT INTO raw.load_history ({', '.join(columns)}) "
+                    f"VALUES ({', '.join(['%s'] * len(values))})",
+                    values,
+                )
+            except errors.UndefinedColumn:
+                if phase_timings is None:
+                    raise
+                cur.execute(
+                    f"INSERT INTO raw.load_history ({', '.join(columns[:-1])}) "
+                    f"VALUES ({', '.join(['%s'] * (len(values) - 1))})",
+                    values[:-1],
+                )
+        return True
+    except Exception as e:
+        print(f"  Warning: could not log to load_history: {e}")
+        return False
+    finally:
+        release(conn)
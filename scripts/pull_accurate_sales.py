@@ -25,6 +25,17 @@ Usage:
     python pull_accurate_sales.py ddd --dry-run    # Preview without uploading
     python pull_accurate_sales.py all --pg-host 76.13.194.120
     python pull_accurate_sales.py ddd --env-dir /path/to/envs
+
+    # Re-flatten archived API payloads (no API calls, e.g. after adding columns)
+    python pull_accurate_sales.py ddd --reflatten
+    python pull_accurate_sales.py all --reflatten --since 2026-03-01
+
+    # Re-fetch only invoices whose detail call failed in earlier runs
+    python pull_accurate_sales.py all --retry-dead-letters
+
+    # Record API traffic once, replay it offline (see cassette.py)
+    python pull_accurate_sales.py ddd --dry-run --record ddd_sales.jsonl.gz
+    python pull_accurate_sales.py ddd --dry-run --replay ddd_sales.jsonl.gz --replay-speed 0
 """
 
 import os
@@ -41,16 +52,36 @@ from requests.exceptions import (
     ChunkedEncodingError,
 )
 from urllib3.exceptions import ProtocolError
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-import pandas as pd
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import execute_values
+
+import accurate_decode
+import auth_cache
+import cassette
+import dead_letter
+import dimensions
+import fact_tables
+import item_master
+import payload_archive
+import pg_pool
+import row_batch
+import run_metrics
+import run_profile
+import spool
 
 # Retry configuration
 MAX_RETRIES = 3
 RETRY_DELAY_BASE = 2  # Base delay in seconds (exponential backoff: 2, 4, 8)
+RETRY_STATUSES = (429,)  # Rate limited - retried after Retry-After (or the backoff)
+
+# Rate limiting (max 8 req/sec, so 0.125s delay between detail calls)
+REQUEST_DELAY = 0.125
+
+# Accurate account server (token validation + host discovery).
+# Override only to point at a local mock (see mock_accurate_server.py).
+ACCOUNT_URL = os.getenv("ACCURATE_ACCOUNT_URL", "https://account.accurate.id").rstrip("/")
 
 # Script directory (for locating .env files)
 SCRIPT_DIR = Path(__file__).parent
@@ -78,6 +109,24 @@ ENTITIES = {
 }
 
 
+def retry_after(response, default: float) -> float:
+    """Seconds to wait from a Retry-After header (seconds or HTTP date), else default."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:  # "-0000": UTC
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
 class AccurateAPIClient:
     """Simple Accurate API client using HMAC-SHA256 authentication (READ-ONLY)"""
 
@@ -86,6 +135,9 @@ class AccurateAPIClient:
         self.signature_secret = signature_secret
         self.api_host = api_host.rstrip("/") if api_host else None
         self.session = requests.Session()
+        cassette.attach(self.session)  # --record / --replay (no-op otherwise)
+        self.auth_from_cache = False
+        self.last_response_body = None  # Raw bytes of the last API response (for archiving)
 
     def _generate_signature(self, timestamp: str) -> str:
         """Generate HMAC-SHA256 signature (hex encoded)"""
@@ -108,9 +160,23 @@ class AccurateAPIClient:
             "Accept": "application/json",
         }
 
-    def connect(self) -> dict:
-        """Validate token and get database host (POST for auth only, not editing data)"""
-        url = "https://account.accurate.id/api/api-token.do"
+    def connect(self, use_cache: bool = True) -> dict:
+        """Validate token and get database host (POST for auth only, not editing data)
+
+        The api-token.do response is cached on disk per token and account server
+        (see auth_cache.py), so repeated runs within the TTL skip the
+        account.accurate.id round-trip.
+        """
+        if use_cache:
+            db_info = auth_cache.load(ACCOUNT_URL, self.api_token)
+            if db_info:
+                host = db_info.get("database", {}).get("host", "")
+                if host:
+                    self.api_host = host
+                self.auth_from_cache = True
+                return db_info
+
+        url = f"{ACCOUNT_URL}/api/api-token.do"
         headers = self._build_headers()
 
         response = self.session.post(url, headers=headers, timeout=30)
@@ -124,28 +190,61 @@ class AccurateAPIClient:
             host = database.get("host", "")
             if host:
                 self.api_host = host
+            self.auth_from_cache = False
+            auth_cache.save(ACCOUNT_URL, self.api_token, db_info)
             return db_info
         else:
             raise Exception(f"Token validation failed: {data}")
 
-    def _api_call(self, endpoint: str, params: dict = None, timeout: int = 60) -> dict:
-        """Make authenticated API call (GET requests only - READ-ONLY)"""
+    def _api_call(
+        self, endpoint: str, params: dict = None, timeout: int = 60, decode=None
+    ) -> dict:
+        """Make authenticated API call (GET requests only - READ-ONLY)
+
+        Args:
+            decode: Response decoder from accurate_decode (default: full decode)
+        """
         if not self.api_host:
             raise Exception("Not connected. Call connect() first.")
 
         url = f"{self.api_host}{endpoint}"
         last_error = None
 
-        for attempt in range(MAX_RETRIES):
+        attempt = 0
+        while attempt < MAX_RETRIES:
             try:
                 headers = (
                     self._build_headers()
                 )  # Refresh headers each attempt (new timestamp)
+                request_start = time.perf_counter()
                 response = self.session.get(
                     url, headers=headers, params=params, timeout=timeout
                 )
+                run_metrics.active().observe_request(
+                    endpoint,
+                    time.perf_counter() - request_start,
+                    len(response.content),
+                    response.status_code,
+                )
+                if response.status_code == 401 and self.auth_from_cache:
+                    # Cached auth is stale - drop it, re-validate and retry
+                    print("    Cached auth rejected (401), re-connecting...")
+                    auth_cache.invalidate(ACCOUNT_URL, self.api_token)
+                    self.connect(use_cache=False)
+                    url = f"{self.api_host}{endpoint}"
+                    continue  # Not a failed attempt: does not count toward MAX_RETRIES
+                if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES - 1:
+                    delay = retry_after(response, RETRY_DELAY_BASE ** (attempt + 1))
+                    print(
+                        f"    HTTP {response.status_code}, retrying in {delay:g}s... (attempt {attempt + 1}/{MAX_RETRIES})"
+                    )
+                    run_metrics.active().count("api_retries")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
                 response.raise_for_status()
-                return response.json()
+                self.last_response_body = response.content
+                return (decode or accurate_decode.decode_full)(response.content)
 
             except (
                 ConnectionError,
@@ -156,6 +255,7 @@ class AccurateAPIClient:
             ) as e:
                 # Retry on connection-related errors (including RemoteDisconnected)
                 last_error = e
+                run_metrics.active().count("api_connection_errors")
                 if attempt < MAX_RETRIES - 1:
                     delay = RETRY_DELAY_BASE ** (
                         attempt + 1
@@ -163,21 +263,27 @@ class AccurateAPIClient:
                     print(
                         f"    Connection error, retrying in {delay}s... (attempt {attempt + 1}/{MAX_RETRIES})"
                     )
+                    run_metrics.active().count("api_retries")
                     time.sleep(delay)
+                attempt += 1
                 continue
 
             except RequestException as e:
                 # Check if it's a connection-related error wrapped in RequestException
                 if "RemoteDisconnected" in str(e) or "Connection aborted" in str(e):
                     last_error = e
+                    run_metrics.active().count("api_connection_errors")
                     if attempt < MAX_RETRIES - 1:
                         delay = RETRY_DELAY_BASE ** (attempt + 1)
                         print(
                             f"    Connection error, retrying in {delay}s... (attempt {attempt + 1}/{MAX_RETRIES})"
                         )
+                        run_metrics.active().count("api_retries")
                         time.sleep(delay)
+                    attempt += 1
                     continue
                 # Other request errors (4xx, 5xx) - don't retry
+                run_metrics.active().count("api_http_errors")
                 raise e
 
         # All retries exhausted
@@ -198,53 +304,28 @@ class AccurateAPIClient:
 
     def get_invoice_detail(self, invoice_id: int) -> dict:
         """Get invoice details with line items (READ-ONLY GET request)"""
-        return self._api_call(f"/accurate/api/sales-invoice/detail.do?id={invoice_id}")
+        return self._api_call(
+            f"/accurate/api/sales-invoice/detail.do?id={invoice_id}",
+            decode=accurate_decode.decode_invoice_detail,
+        )
 
 
 def get_pg_connection(pg_host_override: str = None):
     """
-    Create PostgreSQL connection using environment variables.
+    PostgreSQL connection from the shared pool (pg_pool.connection).
 
     Connection priority:
       1. --pg-host CLI override
       2. PG_HOST env var
       3. Default: localhost (assumes SSH tunnel)
 
+    The same connection is handed out again for the next entity (health-checked
+    first); give it back with pg_pool.release(), not close().
+
     Returns:
         psycopg2 connection object
     """
-    host = pg_host_override or os.getenv("PG_HOST", "localhost")
-    port = os.getenv("PG_PORT", "5432")
-    database = os.getenv("PG_DATABASE", "openclaw_ops")
-    user = os.getenv("PG_USER", "openclaw_app")
-    password = os.getenv("PG_PASSWORD")
-
-    if not password:
-        raise ValueError(
-            f"PG_PASSWORD is required. Set it in environment or .env file.\n"
-            f"  Connection: {user}@{host}:{port}/{database}"
-        )
-
-    try:
-        conn = psycopg2.connect(
-            host=host,
-            port=int(port),
-            dbname=database,
-            user=user,
-            password=password,
-            connect_timeout=10,
-        )
-        conn.autocommit = False
-        print(f"  PG connected: {user}@{host}:{port}/{database}")
-        return conn
-    except psycopg2.OperationalError as e:
-        raise ConnectionError(
-            f"PostgreSQL connection failed:\n"
-            f"  Host: {host}:{port}\n"
-            f"  Database: {database}\n"
-            f"  User: {user}\n"
-            f"  Error: {e}"
-        ) from e
+    return pg_pool.connection(pg_host_override)
 
 
 def load_entity_credentials(entity_key: str, entity: dict, env_dir: Path = None):
@@ -296,9 +377,30 @@ def load_entity_credentials(entity_key: str, entity: dict, env_dir: Path = None)
     return api_token, signature_secret
 
 
-def flatten_invoice(invoice: dict) -> list:
-    """Convert invoice detail to flat rows for PostgreSQL."""
-    rows = []
+# Flattened sales line columns (row_batch.RowBatch), in raw.accurate_sales_* insert order
+SALES_COLUMNS = (
+    "tanggal",
+    "nama_departemen",
+    "nama_pelanggan",
+    "nomor_invoice",
+    "kode_produk",
+    "nama_barang",
+    "satuan",
+    "kuantitas",
+    "harga_satuan",
+    "total_harga",
+    "bpp",
+    "nama_gudang",
+    "vendor_price",
+    "dpp_amount",
+    "tax_amount",
+)
+SALES_KEY = ("nomor_invoice", "kode_produk", "tanggal", "snapshot_date")
+
+
+def flatten_invoice(invoice: dict, out: row_batch.RowBatch = None) -> row_batch.RowBatch:
+    """Convert invoice detail to flat rows for PostgreSQL, appended to `out` (or a new batch)."""
+    rows = out if out is not None else row_batch.RowBatch(SALES_COLUMNS)
 
     invoice_number = invoice.get("number", "")
     trans_date = invoice.get("transDate", "")
@@ -312,6 +414,12 @@ def flatten_invoice(invoice: dict) -> list:
     # Branch
     branch_name = invoice.get("branchName", "")
 
+    # Convert date DD/MM/YYYY to YYYY-MM-DD (same for every line)
+    tanggal = trans_date
+    if "/" in str(trans_date):
+        parts = trans_date.split("/")
+        tanggal = f"{parts[2]}-{parts[1]}-{parts[0]}"
+
     # Line items
     for item in invoice.get("detailItem", []):
         if not isinstance(item, dict):
@@ -325,11 +433,9 @@ def flatten_invoice(invoice: dict) -> list:
         if quantity <= 0:
             continue
 
-        # Convert date DD/MM/YYYY to YYYY-MM-DD
-        tanggal = trans_date
-        if "/" in str(trans_date):
-            parts = trans_date.split("/")
-            tanggal = f"{parts[2]}-{parts[1]}-{parts[0]}"
+        kode_produk = item_obj.get("no", "")
+        if not kode_produk:
+            continue
 
         # BPP fallback strategy:
         # 1. Try unitCost (transaction cost) - NOT AVAILABLE in API
@@ -347,31 +453,222 @@ def flatten_invoice(invoice: dict) -> list:
         # Get warehouse info for this line item
         warehouse_obj = item.get("warehouse", {}) or {}
 
-        row = {
-            "tanggal": tanggal,
-            "nama_departemen": dept_obj.get("name", "") or branch_name or "UNKNOWN",
-            "nama_pelanggan": customer_name or "UMUM",
-            "nomor_invoice": invoice_number,
-            "kode_produk": item_obj.get("no", ""),
-            "nama_barang": item_obj.get("name", ""),
-            "satuan": unit_obj.get("name", "") or "PAIR",
-            "kuantitas": int(quantity),
-            "harga_satuan": round(item.get("unitPrice", 0), 2),
-            "total_harga": round(item.get("totalPrice", 0), 2),
-            "bpp": round(bpp_value, 2),
-            # 4 NEW COLUMNS:
-            "nama_gudang": warehouse_obj.get("name", ""),
-            "vendor_price": round(item_obj.get("vendorPrice", 0) or 0, 2),
-            "dpp_amount": round(item.get("dppAmount", 0) or 0, 2),
-            "tax_amount": round(item.get("tax1Amount", 0) or 0, 2),
-        }
+        # Values in SALES_COLUMNS order
+        rows.append(
+            tanggal,
+            dept_obj.get("name", "") or branch_name or "UNKNOWN",
+            customer_name or "UMUM",
+            invoice_number,
+            kode_produk,
+            item_obj.get("name", ""),
+            unit_obj.get("name", "") or "PAIR",
+            int(quantity),
+            round(item.get("unitPrice", 0), 2),
+            round(item.get("totalPrice", 0), 2),
+            round(bpp_value, 2),
+            # 4 NEW COLUMNS: nama_gudang, vendor_price, dpp_amount, tax_amount
+            warehouse_obj.get("name", ""),
+            round(item_obj.get("vendorPrice", 0) or 0, 2),
+            round(item.get("dppAmount", 0) or 0, 2),
+            round(item.get("tax1Amount", 0) or 0, 2),
+        )
+
+    return rows
 
-        if row["kode_produk"]:
-            rows.append(row)
 
+def fetch_invoice_rows(client, entity_key: str, invoice_id, archive=None, out=None) -> row_batch.RowBatch:
+    """
+    Fetch one invoice detail (archiving the raw payload) and flatten it.
+
+    Raises on any failure, including an "s": false response (dead_letter.ApiError),
+    so callers can dead-letter the id.
+    """
+    metrics = run_metrics.active()
+    with metrics.phase("details"):
+        detail = client.get_invoice_detail(invoice_id)
+    if not detail.get("s"):
+        raise dead_letter.ApiError(f"detail.do returned s=false: {str(detail.get('d'))[:200]}")
+
+    invoice = detail.get("d", {})
+    if archive:
+        try:
+            archive.put(
+                entity_key,
+                payload_archive.KIND_SALES_INVOICE,
+                invoice_id,
+                client.last_response_body,
+                version=invoice.get("lastUpdate") or invoice.get("optLock"),
+            )
+        except Exception as e:  # Best-effort: never fails the invoice
+            print(f"  Warning: could not archive invoice {invoice_id}: {e}")
+    rows = out if out is not None else row_batch.RowBatch(SALES_COLUMNS)
+    start = len(rows)
+    with metrics.phase("flatten"):
+        try:
+            flatten_invoice(invoice, rows)
+        except Exception:
+            rows.truncate(start)  # No half-flattened invoice in the batch
+            raise
+    metrics.add_rows("flatten", len(rows) - start)
     return rows
 
 
+def list_invoices(client, start_date: datetime, end_date: datetime, throttle=None) -> list:
+    """
+    All invoice list records (id, number, ...) for a date range, page by page.
+
+    A failed page ends the listing with what was found so far.
+
+    Args:
+        throttle: Called before each list call (work_queue rate budget)
+    """
+    all_invoices = []
+    page = 1
+
+    while True:
+        try:
+            if throttle:
+                throttle()
+            response = client.get_invoices(start_date, end_date, page)
+            if not response.get("s"):
+                print(f"  API error: {response}")
+                break
+
+            invoices = response.get("d", [])
+            all_invoices.extend(invoices)
+
+            if len(invoices) < 100:
+                break
+            page += 1
+            print(
+                f"  Page {page - 1}: {len(invoices)} invoices (total: {len(all_invoices)})"
+            )
+
+        except Exception as e:
+            print(f"  Error fetching page {page}: {e}")
+            break
+
+    return all_invoices
+
+
+def upsert_sales_rows(cur, table: str, rows: list, snapshot_date: str, batch_id: str, fetched_at=None) -> int:
+    """
+    UPSERT flattened invoice rows into a raw.accurate_sales_* table.
+
+    Runs inside the caller's transaction (caller commits).
+
+    Args:
+        fetched_at: when the rows were fetched, if not now (spool replay). Rows
+            get loaded_at = fetched_at, and an existing row is only updated if
+            it was loaded before that - a newer load of the same line wins.
+
+    Returns:
+        Number of rows sent
+    """
+    # Entity-partitioned layout: write the parent, entity is part of the key
+    target, entity = fact_tables.resolve(cur, table)
+    extra = (entity,) if entity else ()
+    conflict = [*(["entity"] if entity else []), *SALES_KEY]
+
+    rows = row_batch.as_batch(rows, SALES_COLUMNS)
+    # Narrow layout: names are stored as dimension keys
+    if fact_tables.is_narrow(cur, target):
+        rows = dimensions.encode(cur, rows)
+    columns = [*rows.columns, "snapshot_date", "load_batch_id", *(["entity"] if entity else [])]
+    updates = [f"{c} = EXCLUDED.{c}" for c in columns if c not in conflict]
+    values = (snapshot_date, batch_id, *extra)
+    if fetched_at is None:
+        updates.append("loaded_at = now()")
+        stale = ""
+    else:
+        columns.append("loaded_at")
+        values += (fetched_at,)
+        updates.append("loaded_at = EXCLUDED.loaded_at")
+        stale = "WHERE t.loaded_at < EXCLUDED.loaded_at"
+
+    # UPSERT: INSERT ... ON CONFLICT, one statement per page
+    upsert_sql = f"""
+        INSERT INTO {target} AS t ({', '.join(columns)})
+        VALUES %s
+        ON CONFLICT ({', '.join(conflict)})
+        DO UPDATE SET
+            {', '.join(updates)}
+        {stale}
+    """
+    return pg_pool.execute_pages(
+        cur, upsert_sql, rows.tuples(*values), key=[columns.index(c) for c in conflict]
+    )
+
+
+REFLATTEN_STAGE = "reflatten_stage"
+
+
+def update_sales_snapshots(cur, table: str, rows: row_batch.RowBatch, seen: list, batch_id: str) -> int:
+    """
+    UPDATE existing rows of a raw.accurate_sales_* table from re-flattened rows.
+
+    seen[i] is the (first_seen, last_seen) range of the archived content row i
+    came from; the row is applied to every snapshot in that range that already
+    holds its line. No snapshot or line is created. Where contents of an invoice
+    overlap (same line, same snapshot), the row appended last wins.
+
+    Runs inside the caller's transaction (caller commits).
+
+    Returns:
+        Number of rows updated
+    """
+    target, entity = fact_tables.resolve(cur, table)
+    if fact_tables.is_narrow(cur, target):
+        rows = dimensions.encode(cur, rows)
+    columns = list(rows.columns)
+    key = [c for c in SALES_KEY if c != "snapshot_date"]
+
+    # Stage with the target's column types (no constraints), plus the range and order
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE {REFLATTEN_STAGE} ON COMMIT DROP AS
+        SELECT {', '.join(columns)}, snapshot_date AS first_seen, snapshot_date AS last_seen,
+               0::integer AS seq
+        FROM {target} WITH NO DATA
+    """
+    )
+    staged = (
+        (*values, first_seen, last_seen, seq)
+        for seq, (values, (first_seen, last_seen)) in enumerate(zip(rows.tuples(), seen))
+    )
+    pg_pool.execute_pages(
+        cur,
+        f"INSERT INTO {REFLATTEN_STAGE} ({', '.join(columns)}, first_seen, last_seen, seq) VALUES %s",
+        staged,
+    )
+    cur.execute(f"ANALYZE {REFLATTEN_STAGE}")
+
+    matches = " AND ".join(f"t.{c} = s.{c}" for c in key)
+    overlaps = " AND ".join(f"n.{c} = s.{c}" for c in key)
+    updates = [f"{c} = s.{c}" for c in columns if c not in key]
+    cur.execute(
+        f"""
+        UPDATE {target} AS t
+        SET {', '.join(updates)}, load_batch_id = %s
+        FROM {REFLATTEN_STAGE} s
+        WHERE {matches}
+          AND t.snapshot_date BETWEEN s.first_seen AND s.last_seen
+          {"AND t.entity = %s" if entity else ""}
+          AND NOT EXISTS (
+              SELECT 1 FROM {REFLATTEN_STAGE} n
+              WHERE {overlaps}
+                AND t.snapshot_date BETWEEN n.first_seen AND n.last_seen
+                AND n.seq > s.seq
+          )
+    """,
+        (batch_id, *((entity,) if entity else ())),
+    )
+    updated = cur.rowcount
+    cur.execute(f"DROP TABLE {REFLATTEN_STAGE}")
+    return updated
+
+
+@run_metrics.instrumented("sales")
 def sync_entity(
     entity_key: str,
     days: int = 3,
@@ -398,6 +695,7 @@ def sync_entity(
         return False
 
     table = entity["pg_table"]
+    metrics = run_metrics.active()
 
     print(f"\n{'=' * 60}")
     print(f"  {entity['name']} DAILY SALES SYNC (Official API -> PostgreSQL)")
@@ -427,11 +725,13 @@ def sync_entity(
     client = AccurateAPIClient(api_token, signature_secret, entity["api_host"])
 
     try:
-        db_info = client.connect()
+        with metrics.phase("auth"):
+            db_info = client.connect()
         database = db_info.get("database", {})
         db_name = database.get("alias") or database.get("name") or "Unknown"
         host = database.get("host", "Unknown")
-        print(f"  Connected: {db_name}")
+        cached = " (cached auth)" if client.auth_from_cache else ""
+        print(f"  Connected: {db_name}{cached}")
         print(f"  Host: {host}")
     except Exception as e:
         print(f"  Connection failed: {e}")
@@ -439,30 +739,10 @@ def sync_entity(
 
     # Fetch invoices
     print(f"\nFetching invoices...")
-    all_invoices = []
-    page = 1
-
-    while True:
-        try:
-            response = client.get_invoices(start_date, end_date, page)
-            if not response.get("s"):
-                print(f"  API error: {response}")
-                break
-
-            invoices = response.get("d", [])
-            all_invoices.extend(invoices)
-
-            if len(invoices) < 100:
-                break
-            page += 1
-            print(
-                f"  Page {page - 1}: {len(invoices)} invoices (total: {len(all_invoices)})"
-            )
-
-        except Exception as e:
-            print(f"  Error fetching page {page}: {e}")
-            break
-
+    metrics.start_phase("list_pages")
+    all_invoices = list_invoices(client, start_date, end_date)
+    metrics.end_phase("list_pages")
+    metrics.add_rows("list_pages", len(all_invoices))
     print(f"  Found {len(all_invoices)} invoices")
 
     if not all_invoices:
@@ -471,123 +751,118 @@ def sync_entity(
 
     # Fetch details and flatten
     print(f"\nFetching invoice details...")
-    all_rows = []
+    all_rows = row_batch.RowBatch(SALES_COLUMNS)
+    fetched_ids = []  # Invoice ids fetched OK (resolves older dead letters)
+    failures = []  # Failed invoice ids -> raw.accurate_dead_letter
     total = len(all_invoices)
+    archive = payload_archive.open_archive()
 
     for idx, inv in enumerate(all_invoices, 1):
         if idx % 20 == 0 or idx == total:
             print(f"  Progress: {idx}/{total} ({idx * 100 // total}%)")
 
         try:
-            detail = client.get_invoice_detail(inv.get("id"))
-            if detail.get("s"):
-                rows = flatten_invoice(detail.get("d", {}))
-                all_rows.extend(rows)
-            time.sleep(0.125)  # Rate limit: 8 req/sec
+            fetch_invoice_rows(client, entity_key, inv.get("id"), archive, out=all_rows)
+            fetched_ids.append(inv.get("id"))
+            metrics.add_rows("details", 1)
+            with metrics.phase("throttle"):
+                time.sleep(REQUEST_DELAY)  # Rate limit: 8 req/sec
         except Exception as e:
+            metrics.count("detail_errors")
+            failures.append(dead_letter.failure(inv.get("id"), inv.get("number"), e))
             print(f"  Error on invoice {inv.get('number')}: {e}")
 
-    if not all_rows:
-        print("  No line items extracted")
-        return True
+    if archive:
+        archive.close()
+
+    snapshot_date = datetime.now().strftime("%Y-%m-%d")
+    batch_id = f"accurate_sales_{entity_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
-    # Convert to DataFrame for summary
-    df = pd.DataFrame(all_rows)
+    if failures:
+        print(f"\n  {len(failures)} invoice detail(s) failed - recorded as dead letters")
+        print("  Re-fetch only those with: --retry-dead-letters")
 
-    # Summary
+    if not len(all_rows):
+        print("  No line items extracted")
+        if failures and not dry_run:
+            conn = get_pg_connection(pg_host_override)
+            try:
+                with conn.cursor() as cur:
+                    dead_letter.record_failures(
+                        cur, entity_key, dead_letter.KIND_SALES_INVOICE, failures, snapshot_date, batch_id
+                    )
+                conn.commit()
+            except Exception:
+                pg_pool.rollback(conn)
+                raise
+            finally:
+                pg_pool.release(conn)
+        return not failures
+
+    # Summary: one pass over the columns (keeps pandas off the fetch -> load path)
+    metrics.start_phase("summary")
+    summary = row_batch.summarize(
+        all_rows,
+        "nama_departemen",
+        sums=("kuantitas", "total_harga"),
+        distinct=("nomor_invoice", "kode_produk"),
+    )
     print(f"\n{'=' * 60}")
     print("SALES SUMMARY")
     print(f"{'=' * 60}")
-    print(f"Total line items: {len(df):,}")
-    print(f"Unique invoices: {df['nomor_invoice'].nunique():,}")
-    print(f"Unique products: {df['kode_produk'].nunique():,}")
-    print(f"Total quantity: {df['kuantitas'].sum():,}")
-    print(f"Total sales: Rp {df['total_harga'].sum():,.0f}")
+    print(f"Total line items: {summary['rows']:,}")
+    print(f"Unique invoices: {summary['distinct']['nomor_invoice']:,}")
+    print(f"Unique products: {summary['distinct']['kode_produk']:,}")
+    print(f"Total quantity: {summary['sums']['kuantitas']:,}")
+    print(f"Total sales: Rp {summary['sums']['total_harga']:,.0f}")
     print(f"\nBy department:")
-    for dept in df["nama_departemen"].unique():
-        dept_df = df[df["nama_departemen"] == dept]
-        print(
-            f"  - {dept}: {len(dept_df):,} items, Rp {dept_df['total_harga'].sum():,.0f}"
-        )
+    for dept, (items, _, total) in summary["groups"].items():
+        print(f"  - {dept}: {items:,} items, Rp {total:,.0f}")
 
     # Sample data
     print(f"\nFirst 5 records:")
-    print(df.head(5).to_string(index=False))
+    row_batch.print_sample(all_rows)
+    metrics.end_phase("summary")
 
     if dry_run:
         print(f"\n[DRY RUN] Would upload to PostgreSQL:")
         print(f"  Table: {table}")
-        print(f"  Rows: {len(df)}")
+        print(f"  Rows: {len(all_rows)}")
         return True
 
     # --- PostgreSQL UPSERT ---
-    snapshot_date = datetime.now().strftime("%Y-%m-%d")
-    batch_id = f"accurate_sales_{entity_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     conn = None
 
     try:
         print(f"\nConnecting to PostgreSQL...")
-        conn = get_pg_connection(pg_host_override)
+        with metrics.phase("pg_connect"):
+            conn = get_pg_connection(pg_host_override)
 
         print(f"Upserting to {table} (snapshot: {snapshot_date})...")
+        metrics.start_phase("pg_upsert")
 
         with conn.cursor() as cur:
-            # UPSERT: INSERT ... ON CONFLICT
-            insert_sql = f"""
-                INSERT INTO {table} (tanggal, nama_departemen, nama_pelanggan, nomor_invoice,
-                                     kode_produk, nama_barang, satuan, kuantitas, harga_satuan,
-                                     total_harga, bpp, nama_gudang, vendor_price, dpp_amount,
-                                     tax_amount, snapshot_date, load_batch_id)
-                VALUES %s
-                ON CONFLICT (nomor_invoice, kode_produk, tanggal, snapshot_date)
-                DO UPDATE SET
-                    nama_departemen = EXCLUDED.nama_departemen,
-                    nama_pelanggan = EXCLUDED.nama_pelanggan,
-                    nama_barang = EXCLUDED.nama_barang,
-                    satuan = EXCLUDED.satuan,
-                    kuantitas = EXCLUDED.kuantitas,
-                    harga_satuan = EXCLUDED.harga_satuan,
-                    total_harga = EXCLUDED.total_harga,
-                    bpp = EXCLUDED.bpp,
-                    nama_gudang = EXCLUDED.nama_gudang,
-                    vendor_price = EXCLUDED.vendor_price,
-                    dpp_amount = EXCLUDED.dpp_amount,
-                    tax_amount = EXCLUDED.tax_amount,
-                    load_batch_id = EXCLUDED.load_batch_id,
-                    loaded_at = now()
-            """
-
-            values = [
-                (
-                    row["tanggal"],
-                    row["nama_departemen"],
-                    row["nama_pelanggan"],
-                    row["nomor_invoice"],
-                    row["kode_produk"],
-                    row["nama_barang"],
-                    row["satuan"],
-                    row["kuantitas"],
-                    row["harga_satuan"],
-                    row["total_harga"],
-                    row["bpp"],
-                    row["nama_gudang"],
-                    row["vendor_price"],
-                    row["dpp_amount"],
-                    row["tax_amount"],
-                    snapshot_date,
-                    batch_id,
-                )
-                for row in all_rows
-            ]
-
-            execute_values(cur, insert_sql, values, page_size=500)
-            print(f"  Upserted {len(values):,} records")
+            # Fill vendor_price / bpp gaps from the item master (no extra API calls)
+            master = item_master.load_item_master(cur, entity_key)
+            filled = item_master.fill_sales_rows(all_rows, master)
+            if filled:
+                print(f"  Filled vendor_price/bpp from item master: {filled:,} rows")
+
+            upserted = upsert_sales_rows(cur, table, all_rows, snapshot_date, batch_id)
+            metrics.add_rows("pg_upsert", upserted)
+            print(f"  Upserted {upserted:,} records")
+
+            # Dead letters: record this run's failures, close any re-fetched ones
+            dead_letter.record_failures(
+                cur, entity_key, dead_letter.KIND_SALES_INVOICE, failures, snapshot_date, batch_id
+            )
+            dead_letter.resolve(cur, entity_key, dead_letter.KIND_SALES_INVOICE, fetched_ids)
 
             # Log to load_history
             cur.execute(
                 """
-                INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
                 (
                     "accurate_api",
@@ -597,54 +872,328 @@ def sync_entity(
                     start_date.strftime("%Y-%m-%d"),
                     end_date.strftime("%Y-%m-%d"),
                     len(all_rows),
-                    "success",
+                    "partial" if failures else "success",
+                    f"{len(failures)} invoice details dead-lettered" if failures else None,
                 ),
             )
+            metrics.store_phase_timings(cur, batch_id)
 
         conn.commit()
-        print(f"  Upload complete: {len(df):,} records -> {table}")
+        metrics.end_phase("pg_upsert")
+        print(f"  Upload complete: {len(all_rows):,} records -> {table}")
         return True
 
     except Exception as e:
         print(f"\n  PostgreSQL upload failed: {e}")
         if conn:
-            try:
-                conn.rollback()
-                # Attempt to log failure
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                        (
-                            "accurate_api",
-                            entity_key,
-                            "sales",
-                            batch_id,
-                            start_date.strftime("%Y-%m-%d"),
-                            end_date.strftime("%Y-%m-%d"),
-                            0,
-                            "error",
-                            str(e)[:500],
-                        ),
-                    )
-                    conn.commit()
-            except Exception:
-                pass  # Best-effort error logging
+            pg_pool.rollback(conn)  # Drops the connection if it is broken
+        pg_pool.log_load(
+            "accurate_api",
+            entity_key,
+            "sales",
+            batch_id,
+            start_date.strftime("%Y-%m-%d"),
+            end_date.strftime("%Y-%m-%d"),
+            0,
+            "error",
+            str(e),
+            pg_host_override=pg_host_override,
+        )
 
-        # Save to CSV as fallback
-        csv_file = (
-            SCRIPT_DIR
-            / f"{entity['name']}_sales_{datetime.now().strftime('%Y%m%d')}.csv"
+        # Spool the fetched rows; the next run loads them before pulling again
+        segment = spool.write_segment(
+            spool.KIND_SALES,
+            entity_key,
+            batch_id,
+            {"rows": all_rows},
+            snapshot_date=snapshot_date,
+            date_from=start_date.strftime("%Y-%m-%d"),
+            date_to=end_date.strftime("%Y-%m-%d"),
+            failures=failures,
+            fetched_ids=fetched_ids,
         )
-        df.to_csv(csv_file, index=False)
-        print(f"  Saved fallback CSV: {csv_file}")
+        print(f"  Spooled {len(all_rows):,} rows for replay: {segment}")
+        return False
+
+    finally:
+        pg_pool.release(conn)
+
+
+def load_spool_segment(cur, segment):
+    """spool.replay callback: upsert one spooled sales batch.
+
+    Every segment is replayed (each covers its own date window); a line that a
+    later load already wrote is left as it is (upsert_sales_rows fetched_at).
+    """
+    manifest = segment.manifest
+    entity_key = manifest["entity"]
+    table = ENTITIES[entity_key]["pg_table"]
+    snapshot_date = manifest["snapshot_date"]
+    batch_id = manifest["batch_id"]
+
+    rows = row_batch.as_batch(segment.read(), SALES_COLUMNS)
+    master = item_master.load_item_master(cur, entity_key)
+    item_master.fill_sales_rows(rows, master)
+    upserted = upsert_sales_rows(
+        cur, table, rows, snapshot_date, batch_id, fetched_at=segment.created_at.astimezone()
+    )
+
+    failures = manifest.get("failures", [])
+    dead_letter.record_failures(cur, entity_key, dead_letter.KIND_SALES_INVOICE, failures, snapshot_date, batch_id)
+    dead_letter.resolve(cur, entity_key, dead_letter.KIND_SALES_INVOICE, manifest.get("fetched_ids", []))
+    cur.execute(
+        """
+        INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+        (
+            "spool_replay",
+            entity_key,
+            "sales",
+            batch_id,
+            manifest["date_from"],
+            manifest["date_to"],
+            upserted,
+            "partial" if failures else "success",
+            f"{len(failures)} invoice details dead-lettered" if failures else None,
+        ),
+    )
+    return upserted
+
+
+def reflatten_entity(
+    entity_key: str,
+    since: str = None,
+    dry_run: bool = False,
+    pg_host_override: str = None,
+) -> bool:
+    """
+    Re-run flatten_invoice over archived sales-invoice/detail.do payloads -> PostgreSQL.
+
+    No API calls: payloads come from the local archive (payload_archive.py). Each
+    archived content of an invoice is applied to the rows it produced in the
+    snapshots it was fetched for (first_seen..last_seen), updating them in place
+    (e.g. to back-fill newly added columns). Snapshots and lines that are not in
+    the table are left alone - the archive also records dry runs and failed loads.
+
+    Args:
+        entity_key: Entity code (ddd, mbb, ubb)
+        since: Only payloads last fetched on/after this date (YYYY-MM-DD)
+        dry_run: If True, flatten and count without uploading
+        pg_host_override: Override PG_HOST from CLI
+
+    Returns:
+        True if successful
+    """
+    entity = ENTITIES[entity_key]
+    table = entity["pg_table"]
+
+    print(f"\n{'=' * 60}")
+    print(f"  {entity['name']} REFLATTEN (archive -> PostgreSQL)")
+    print(f"{'=' * 60}")
+
+    archive = payload_archive.open_archive()
+    if not archive:
+        print("  Payload archive is disabled or unavailable")
         return False
 
+    # Every archived content, oldest first; seen[i] = snapshot range of row i
+    rows = row_batch.RowBatch(SALES_COLUMNS)
+    seen = []
+    versions = 0
+    invoices = set()
+    try:
+        for object_id, first_seen, last_seen, body in archive.iter_versions(
+            entity_key, payload_archive.KIND_SALES_INVOICE, since=since
+        ):
+            invoice = accurate_decode.decode_invoice_detail(body).get("d", {})
+            before = len(rows)
+            flatten_invoice(invoice, rows)
+            seen.extend([(first_seen, last_seen)] * (len(rows) - before))
+            versions += 1
+            invoices.add(object_id)
     finally:
+        archive.close()
+
+    total_rows = len(rows)
+    print(f"  Archived invoices: {len(invoices):,} ({versions:,} contents)")
+    print(f"  Flattened rows: {total_rows:,}")
+
+    if not total_rows:
+        return True
+
+    date_from = min(first_seen for first_seen, _ in seen)
+    date_to = max(last_seen for _, last_seen in seen)
+
+    if dry_run:
+        print(f"\n[DRY RUN] Would update existing {table} rows in snapshots {date_from} to {date_to}")
+        return True
+
+    batch_id = f"reflatten_sales_{entity_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    conn = None
+
+    try:
+        print("\nConnecting to PostgreSQL...")
+        conn = get_pg_connection(pg_host_override)
+
+        with conn.cursor() as cur:
+            master = item_master.load_item_master(cur, entity_key)
+            item_master.fill_sales_rows(rows, master)
+            updated = update_sales_snapshots(cur, table, rows, seen, batch_id)
+            print(f"  Snapshots {date_from} to {date_to}: updated {updated:,} records")
+
+            cur.execute(
+                """
+                INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+                (
+                    "payload_archive",
+                    entity_key,
+                    "sales",
+                    batch_id,
+                    date_from,
+                    date_to,
+                    updated,
+                    "success",
+                ),
+            )
+
+        conn.commit()
+        print(f"  Reflatten complete: {updated:,} records -> {table}")
+        return True
+
+    except Exception as e:
+        print(f"\n  PostgreSQL upload failed: {e}")
         if conn:
-            conn.close()
+            pg_pool.rollback(conn)
+        return False
+
+    finally:
+        pg_pool.release(conn)
+
+
+@run_metrics.instrumented("sales_retry")
+def retry_dead_letters(
+    entity_key: str,
+    dry_run: bool = False,
+    pg_host_override: str = None,
+    env_dir: Path = None,
+    max_attempts: int = None,
+) -> bool:
+    """
+    Re-fetch only the dead-lettered invoices of an entity and merge them in.
+
+    Each invoice is upserted into the snapshot it was missing from, so the
+    result is the same as if the original run had not failed on it.
+
+    Args:
+        entity_key: Entity code (ddd, mbb, ubb)
+        dry_run: If True, re-fetch and count without writing
+        pg_host_override: Override PG_HOST from CLI
+        env_dir: Directory containing entity .env files
+        max_attempts: Skip dead letters that already failed this many times
+
+    Returns:
+        True if every pending invoice was recovered
+    """
+    entity = ENTITIES[entity_key]
+    table = entity["pg_table"]
+    kind = dead_letter.KIND_SALES_INVOICE
+
+    print(f"\n{'=' * 60}")
+    print(f"  {entity['name']} DEAD-LETTER RETRY (sales invoices)")
+    print(f"{'=' * 60}")
+
+    try:
+        api_token, signature_secret = load_entity_credentials(entity_key, entity, env_dir)
+    except ValueError as e:
+        print(f"  {e}")
+        return False
+
+    conn = get_pg_connection(pg_host_override)
+    batch_id = f"retry_sales_{entity_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        with conn.cursor() as cur:
+            pending = dead_letter.load_pending(cur, entity_key, kind, max_attempts)
+        pg_pool.release(conn)
+        conn = None
+        print(f"  Pending dead letters: {len(pending)}")
+        if not pending:
+            return True
+
+        client = AccurateAPIClient(api_token, signature_secret, entity["api_host"])
+        client.connect()
+
+        rows_by_snapshot = {}
+        recovered = []
+        failures = []
+        archive = payload_archive.open_archive()
+        try:
+            for letter in pending:
+                try:
+                    rows = fetch_invoice_rows(client, entity_key, letter["object_id"], archive)
+                    if letter["snapshot_date"] in rows_by_snapshot:
+                        rows_by_snapshot[letter["snapshot_date"]].extend(rows)
+                    else:
+                        rows_by_snapshot[letter["snapshot_date"]] = rows
+                    recovered.append(letter["object_id"])
+                    print(f"  Recovered {letter['object_no']}: {len(rows)} lines")
+                except Exception as e:
+                    failure = dead_letter.failure(letter["object_id"], letter["object_no"], e)
+                    failure["snapshot_date"] = letter["snapshot_date"]
+                    failures.append(failure)
+                    print(f"  Still failing {letter['object_no']} (attempt {letter['attempts'] + 1}): {e}")
+                time.sleep(REQUEST_DELAY)
+        finally:
+            if archive:
+                archive.close()
+
+        total_rows = sum(len(rows) for rows in rows_by_snapshot.values())
+        print(f"  Recovered {len(recovered)}/{len(pending)} invoices, {total_rows:,} lines")
+
+        if dry_run:
+            print(f"\n[DRY RUN] Would upsert {total_rows:,} rows into {table}")
+            return not failures
+
+        conn = get_pg_connection(pg_host_override)  # Re-checked after the fetch
+        with conn.cursor() as cur:
+            master = item_master.load_item_master(cur, entity_key)
+            for snapshot_date, rows in sorted(rows_by_snapshot.items()):
+                item_master.fill_sales_rows(rows, master)
+                upserted = upsert_sales_rows(cur, table, rows, snapshot_date, batch_id)
+                print(f"  Snapshot {snapshot_date}: upserted {upserted:,} records")
+            dead_letter.record_failures(cur, entity_key, kind, failures, None, batch_id)
+            dead_letter.resolve(cur, entity_key, kind, recovered)
+            cur.execute(
+                """
+                INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+                (
+                    "dead_letter_retry",
+                    entity_key,
+                    "sales",
+                    batch_id,
+                    min(l["snapshot_date"] for l in pending),
+                    max(l["snapshot_date"] for l in pending),
+                    total_rows,
+                    "partial" if failures else "success",
+                    f"{len(failures)} invoice details still failing" if failures else None,
+                ),
+            )
+        conn.commit()
+        print(f"  Retry complete: {total_rows:,} records -> {table}")
+        return not failures
+
+    except Exception as e:
+        print(f"\n  Dead-letter retry failed: {e}")
+        if conn:
+            pg_pool.rollback(conn)
+        return False
+
+    finally:
+        pg_pool.release(conn)
 
 
 def sync_all_entities(
@@ -693,6 +1242,8 @@ Examples:
   python pull_accurate_sales.py mbb --days 5     # Custom days
   python pull_accurate_sales.py ddd --dry-run    # Preview only
   python pull_accurate_sales.py all --pg-host 76.13.194.120
+  python pull_accurate_sales.py ddd --reflatten  # Re-flatten archived payloads (no API)
+  python pull_accurate_sales.py all --retry-dead-letters  # Re-fetch failed invoices only
 """,
     )
     parser.add_argument(
@@ -723,8 +1274,38 @@ Examples:
         default=None,
         help="Directory containing entity .env files (default: script dir)",
     )
+    parser.add_argument(
+        "--reflatten",
+        action="store_true",
+        help="Re-flatten archived invoice payloads into PostgreSQL (no API calls)",
+    )
+    parser.add_argument(
+        "--since",
+        type=str,
+        default=None,
+        help="With --reflatten: only payloads fetched on/after YYYY-MM-DD",
+    )
+    parser.add_argument(
+        "--retry-dead-letters",
+        action="store_true",
+        help="Re-fetch only invoices recorded in raw.accurate_dead_letter and merge them in",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=None,
+        help="With --retry-dead-letters: skip ids that already failed this many times",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run (hotspots, flamegraph stacks, peak memory per phase)",
+    )
+    cassette.add_arguments(parser)
 
     args = parser.parse_args()
+    cassette.configure_from_args(args)
 
     # Load PG credentials from .env at script dir level
     pg_env_path = SCRIPT_DIR / ".env"
@@ -740,40 +1321,75 @@ Examples:
     print(f"  Started: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'=' * 60}")
 
-    try:
-        if args.entity == "all":
-            results = sync_all_entities(
-                days=args.days,
-                dry_run=args.dry_run,
-                pg_host_override=args.pg_host,
-                env_dir=env_dir,
-            )
-            all_success = all(results.values())
-        else:
-            all_success = sync_entity(
-                args.entity,
-                days=args.days,
-                dry_run=args.dry_run,
-                pg_host_override=args.pg_host,
-                env_dir=env_dir,
-            )
+    with run_profile.profiling("sales", enabled=args.profile):
+        try:
+            # Load batches spooled by earlier runs whose PG upload failed
+            if not args.dry_run:
+                spool.replay(
+                    spool.KIND_SALES,
+                    ["ddd", "mbb", "ubb"] if args.entity == "all" else [args.entity],
+                    lambda: get_pg_connection(args.pg_host),
+                    load_spool_segment,
+                )
 
-        # Duration
-        duration = datetime.now() - start_time
-        print(f"\nDuration: {duration}")
-        print("Done!")
+            if args.reflatten:
+                entity_keys = ["ddd", "mbb", "ubb"] if args.entity == "all" else [args.entity]
+                results = [
+                    reflatten_entity(
+                        entity_key,
+                        since=args.since,
+                        dry_run=args.dry_run,
+                        pg_host_override=args.pg_host,
+                    )
+                    for entity_key in entity_keys
+                ]
+                all_success = all(results)
+            elif args.retry_dead_letters:
+                entity_keys = ["ddd", "mbb", "ubb"] if args.entity == "all" else [args.entity]
+                results = [
+                    retry_dead_letters(
+                        entity_key,
+                        dry_run=args.dry_run,
+                        pg_host_override=args.pg_host,
+                        env_dir=env_dir,
+                        max_attempts=args.max_attempts,
+                    )
+                    for entity_key in entity_keys
+                ]
+                all_success = all(results)
+            elif args.entity == "all":
+                results = sync_all_entities(
+                    days=args.days,
+                    dry_run=args.dry_run,
+                    pg_host_override=args.pg_host,
+                    env_dir=env_dir,
+                )
+                all_success = all(results.values())
+            else:
+                all_success = sync_entity(
+                    args.entity,
+                    days=args.days,
+                    dry_run=args.dry_run,
+                    pg_host_override=args.pg_host,
+                    env_dir=env_dir,
+                )
 
-        sys.exit(0 if all_success else 1)
+            # Duration
+            duration = datetime.now() - start_time
+            print(f"\nDuration: {duration}")
+            print("Done!")
 
-    except KeyboardInterrupt:
-        print("\n\nInterrupted by user")
-        sys.exit(1)
-    except Exception as e:
-        print(f"\nError: {e}")
-        import traceback
+            sys.exit(0 if all_success else 1)
+
+        except KeyboardInterrupt:
+            print("\n\nInterrupted by user")
+            sys.exit(1)
+        except Exception as e:
+            print(f"\nError: {e}")
+            import traceback
 
-        traceback.print_exc()
-        sys.exit(1)
+            traceback.print_exc()
+            sys.exit(1)
 
 
 if __name__ == "__main__":
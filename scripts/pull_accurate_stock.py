@@ -18,7 +18,15 @@ Usage:
     # Options
     python pull_accurate_stock.py ddd --dry-run    # Preview without uploading
     python pull_accurate_stock.py ljbb --local-only --output ljbb_stock.xlsx
+    python pull_accurate_stock.py ljbb --local-only --output ljbb_stock.csv.gz   # or .parquet
     python pull_accurate_stock.py all --pg-host 76.13.194.120
+
+    # Re-fetch only items whose detail call failed in earlier runs
+    python pull_accurate_stock.py all --retry-dead-letters
+
+    # Record API traffic once, replay it offline (see cassette.py)
+    python pull_accurate_stock.py ddd --dry-run --record ddd_stock.jsonl.gz
+    python pull_accurate_stock.py ddd --dry-run --replay ddd_stock.jsonl.gz --replay-speed 0
 """
 
 import os
@@ -35,16 +43,38 @@ from requests.exceptions import (
     ChunkedEncodingError,
 )
 from urllib3.exceptions import ProtocolError
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-import pandas as pd
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import execute_values
+
+import accurate_decode
+import auth_cache
+import cassette
+import dead_letter
+import dimensions
+import fact_tables
+import item_master
+import payload_archive
+import pg_pool
+import row_batch
+import run_metrics
+import run_profile
+import spool
+import stream_export
 
 # Retry configuration
 MAX_RETRIES = 3
 RETRY_DELAY_BASE = 2  # Base delay in seconds (exponential backoff: 2, 4, 8)
+RETRY_STATUSES = (429,)  # Rate limited - retried after Retry-After (or the backoff)
+
+# Rate limiting (max 8 req/sec, so 0.125s delay between detail calls)
+REQUEST_DELAY = 0.125
+PAGE_DELAY = 0.2
+
+# Accurate account server (token validation + host discovery).
+# Override only to point at a local mock (see mock_accurate_server.py).
+ACCOUNT_URL = os.getenv("ACCURATE_ACCOUNT_URL", "https://account.accurate.id").rstrip("/")
 
 # Script directory (for locating .env files)
 SCRIPT_DIR = Path(__file__).parent
@@ -78,6 +108,24 @@ ENTITIES = {
 }
 
 
+def retry_after(response, default: float) -> float:
+    """Seconds to wait from a Retry-After header (seconds or HTTP date), else default."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:  # "-0000": UTC
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
 class AccurateAPIClient:
     """Simple Accurate API client using HMAC-SHA256 authentication (READ-ONLY)"""
 
@@ -86,6 +134,9 @@ class AccurateAPIClient:
         self.signature_secret = signature_secret
         self.api_host = api_host.rstrip("/") if api_host else None
         self.session = requests.Session()
+        cassette.attach(self.session)  # --record / --replay (no-op otherwise)
+        self.auth_from_cache = False
+        self.last_response_body = None  # Raw bytes of the last API response (for archiving)
 
     def _generate_signature(self, timestamp: str) -> str:
         """Generate HMAC-SHA256 signature (hex encoded)"""
@@ -108,9 +159,23 @@ class AccurateAPIClient:
             "Accept": "application/json",
         }
 
-    def connect(self) -> dict:
-        """Validate token and get database host (POST for auth only, not editing data)"""
-        url = "https://account.accurate.id/api/api-token.do"
+    def connect(self, use_cache: bool = True) -> dict:
+        """Validate token and get database host (POST for auth only, not editing data)
+
+        The api-token.do response is cached on disk per token and account server
+        (see auth_cache.py), so repeated runs within the TTL skip the
+        account.accurate.id round-trip.
+        """
+        if use_cache:
+            db_info = auth_cache.load(ACCOUNT_URL, self.api_token)
+            if db_info:
+                host = db_info.get("database", {}).get("host", "")
+                if host:
+                    self.api_host = host
+                self.auth_from_cache = True
+                return db_info
+
+        url = f"{ACCOUNT_URL}/api/api-token.do"
         headers = self._build_headers()
 
         response = self.session.post(url, headers=headers, timeout=30)
@@ -124,28 +189,61 @@ class AccurateAPIClient:
             host = database.get("host", "")
             if host:
                 self.api_host = host
+            self.auth_from_cache = False
+            auth_cache.save(ACCOUNT_URL, self.api_token, db_info)
             return db_info
         else:
             raise Exception(f"Token validation failed: {data}")
 
-    def _api_call(self, endpoint: str, params: dict = None, timeout: int = 60) -> dict:
-        """Make authenticated API call (GET requests only - READ-ONLY)"""
+    def _api_call(
+        self, endpoint: str, params: dict = None, timeout: int = 60, decode=None
+    ) -> dict:
+        """Make authenticated API call (GET requests only - READ-ONLY)
+
+        Args:
+            decode: Response decoder from accurate_decode (default: full decode)
+        """
         if not self.api_host:
             raise Exception("Not connected. Call connect() first.")
 
         url = f"{self.api_host}{endpoint}"
         last_error = None
 
-        for attempt in range(MAX_RETRIES):
+        attempt = 0
+        while attempt < MAX_RETRIES:
             try:
                 headers = (
                     self._build_headers()
                 )  # Refresh headers each attempt (new timestamp)
+                request_start = time.perf_counter()
                 response = self.session.get(
                     url, headers=headers, params=params, timeout=timeout
                 )
+                run_metrics.active().observe_request(
+                    endpoint,
+                    time.perf_counter() - request_start,
+                    len(response.content),
+                    response.status_code,
+                )
+                if response.status_code == 401 and self.auth_from_cache:
+                    # Cached auth is stale - drop it, re-validate and retry
+                    print("    Cached auth rejected (401), re-connecting...")
+                    auth_cache.invalidate(ACCOUNT_URL, self.api_token)
+                    self.connect(use_cache=False)
+                    url = f"{self.api_host}{endpoint}"
+                    continue  # Not a failed attempt: does not count toward MAX_RETRIES
+                if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES - 1:
+                    delay = retry_after(response, RETRY_DELAY_BASE ** (attempt + 1))
+                    print(
+                        f"    HTTP {response.status_code}, retrying in {delay:g}s... (attempt {attempt + 1}/{MAX_RETRIES})"
+                    )
+                    run_metrics.active().count("api_retries")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
                 response.raise_for_status()
-                return response.json()
+                self.last_response_body = response.content
+                return (decode or accurate_decode.decode_full)(response.content)
 
             except (
                 ConnectionError,
@@ -156,6 +254,7 @@ class AccurateAPIClient:
             ) as e:
                 # Retry on connection-related errors (including RemoteDisconnected)
                 last_error = e
+                run_metrics.active().count("api_connection_errors")
                 if attempt < MAX_RETRIES - 1:
                     delay = RETRY_DELAY_BASE ** (
                         attempt + 1
@@ -163,21 +262,27 @@ class AccurateAPIClient:
                     print(
                         f"    Connection error, retrying in {delay}s... (attempt {attempt + 1}/{MAX_RETRIES})"
                     )
+                    run_metrics.active().count("api_retries")
                     time.sleep(delay)
+                attempt += 1
                 continue
 
             except RequestException as e:
                 # Check if it's a connection-related error wrapped in RequestException
                 if "RemoteDisconnected" in str(e) or "Connection aborted" in str(e):
                     last_error = e
+                    run_metrics.active().count("api_connection_errors")
                     if attempt < MAX_RETRIES - 1:
                         delay = RETRY_DELAY_BASE ** (attempt + 1)
                         print(
                             f"    Connection error, retrying in {delay}s... (attempt {attempt + 1}/{MAX_RETRIES})"
                         )
+                        run_metrics.active().count("api_retries")
                         time.sleep(delay)
+                    attempt += 1
                     continue
                 # Other request errors (4xx, 5xx) - don't retry
+                run_metrics.active().count("api_http_errors")
                 raise e
 
         # All retries exhausted
@@ -186,48 +291,20 @@ class AccurateAPIClient:
 
 def get_pg_connection(pg_host_override: str = None):
     """
-    Create PostgreSQL connection using environment variables.
+    PostgreSQL connection from the shared pool (pg_pool.connection).
 
     Connection priority:
       1. --pg-host CLI override
       2. PG_HOST env var
       3. Default: localhost (assumes SSH tunnel)
 
+    The same connection is handed out again for the next entity (health-checked
+    first); give it back with pg_pool.release(), not close().
+
     Returns:
         psycopg2 connection object
     """
-    host = pg_host_override or os.getenv("PG_HOST", "localhost")
-    port = os.getenv("PG_PORT", "5432")
-    database = os.getenv("PG_DATABASE", "openclaw_ops")
-    user = os.getenv("PG_USER", "openclaw_app")
-    password = os.getenv("PG_PASSWORD")
-
-    if not password:
-        raise ValueError(
-            f"PG_PASSWORD is required. Set it in environment or .env file.\n"
-            f"  Connection: {user}@{host}:{port}/{database}"
-        )
-
-    try:
-        conn = psycopg2.connect(
-            host=host,
-            port=int(port),
-            dbname=database,
-            user=user,
-            password=password,
-            connect_timeout=10,
-        )
-        conn.autocommit = False
-        print(f"  PG connected: {user}@{host}:{port}/{database}")
-        return conn
-    except psycopg2.OperationalError as e:
-        raise ConnectionError(
-            f"PostgreSQL connection failed:\n"
-            f"  Host: {host}:{port}\n"
-            f"  Database: {database}\n"
-            f"  User: {user}\n"
-            f"  Error: {e}"
-        ) from e
+    return pg_pool.connection(pg_host_override)
 
 
 def load_entity_credentials(entity_key: str, entity: dict, env_dir: Path = None):
@@ -279,6 +356,98 @@ def load_entity_credentials(entity_key: str, entity: dict, env_dir: Path = None)
     return api_token, signature_secret
 
 
+def list_items(client, page: int) -> list:
+    """One page (100) of item list records (id, no, ...); empty past the last page."""
+    response = client._api_call(
+        "/accurate/api/item/list.do",
+        params={"sp.page": page, "sp.pageSize": 100},
+    )
+    return response.get("d", [])
+
+
+def fetch_item_detail(client, entity_key: str, item_id, archive=None) -> dict:
+    """
+    Fetch one item detail (archiving the raw payload).
+
+    Raises on any failure, including an "s": false response (dead_letter.ApiError),
+    so callers can dead-letter the id.
+    """
+    with run_metrics.phase("details"):
+        response = client._api_call(
+            f"/accurate/api/item/detail.do?id={item_id}",
+            decode=accurate_decode.decode_item_detail,
+        )
+    if not response.get("s", True):
+        raise dead_letter.ApiError(f"detail.do returned s=false: {str(response.get('d'))[:200]}")
+
+    detail = response.get("d", {})
+    if archive:
+        try:
+            archive.put(
+                entity_key,
+                payload_archive.KIND_ITEM,
+                item_id,
+                client.last_response_body,
+                version=detail.get("lastUpdate") or detail.get("optLock"),
+            )
+        except Exception as e:  # Best-effort: never fails the item
+            print(f"  Warning: could not archive item {item_id}: {e}")
+    return detail
+
+
+# Flattened stock row columns (row_batch.RowBatch), in raw.accurate_stock_* insert order
+STOCK_COLUMNS = ("kode_barang", "nama_barang", "nama_gudang", "kuantitas", "unit_price", "vendor_price")
+STOCK_TYPES = {"kuantitas": "int", "unit_price": "float", "vendor_price": "float"}
+
+
+def flatten_item_stock(detail: dict, out: row_batch.RowBatch = None) -> row_batch.RowBatch:
+    """Flatten one item detail into one stock row per warehouse, appended to `out` (or a new batch)"""
+    rows = out if out is not None else row_batch.RowBatch(STOCK_COLUMNS)
+    kode_barang = detail.get("no", "")
+    nama_barang = detail.get("name", "")
+    unit_price = round(detail.get("unitPrice", 0) or 0, 2)
+    vendor_price = round(detail.get("vendorPrice", 0) or 0, 2)
+    start = len(rows)
+    try:
+        for wh in detail.get("detailWarehouseData", []):
+            rows.append(
+                kode_barang,
+                nama_barang,
+                wh.get("warehouseName", ""),
+                int(wh.get("balance", 0)),
+                unit_price,
+                vendor_price,
+            )
+    except Exception:
+        rows.truncate(start)  # No half-flattened item in the batch
+        raise
+    return rows
+
+
+def insert_stock_rows(cur, table: str, rows: list, snapshot_date: str, batch_id: str) -> int:
+    """
+    INSERT flattened stock rows into a raw.accurate_stock_* table.
+
+    Runs inside the caller's transaction (caller deletes the snapshot first and commits).
+
+    Returns:
+        Number of rows inserted
+    """
+    # Entity-partitioned layout: write the parent with the entity column
+    target, entity = fact_tables.resolve(cur, table)
+    extra = (entity,) if entity else ()
+
+    rows = row_batch.as_batch(rows, STOCK_COLUMNS)
+    # Narrow layout: names are stored as dimension keys
+    if fact_tables.is_narrow(cur, target):
+        rows = dimensions.encode(cur, rows)
+    columns = [*rows.columns, "snapshot_date", "load_batch_id", *(["entity"] if entity else [])]
+
+    insert_sql = f"INSERT INTO {target} ({', '.join(columns)}) VALUES %s"
+    return pg_pool.execute_pages(cur, insert_sql, rows.tuples(snapshot_date, batch_id, *extra))
+
+
+@run_metrics.instrumented("stock")
 def pull_inventory_stock(
     entity_key: str,
     dry_run: bool = False,
@@ -286,23 +455,29 @@ def pull_inventory_stock(
     output_file: str = None,
     pg_host_override: str = None,
     env_dir: Path = None,
-) -> pd.DataFrame:
+) -> row_batch.RowBatch:
     """
     Pull current inventory/stock data from Accurate Online API (READ-ONLY).
 
     Args:
         entity_key: Entity key (ddd, ljbb, mbb, ubb)
         dry_run: If True, preview data without uploading to PostgreSQL
-        local_only: If True, save to Excel only (no PostgreSQL upload)
-        output_file: Custom Excel filename (optional)
+        local_only: If True, export to a local file only (no PostgreSQL upload)
+        output_file: Export filename (optional); format by extension:
+            .xlsx (default), .csv, .csv.gz, .parquet
         pg_host_override: Override PG_HOST from CLI
         env_dir: Directory containing entity .env files
 
     Returns:
-        DataFrame with stock data
+        RowBatch of stock rows, sorted by warehouse and product code
+        (empty with local_only: rows are streamed to the file, not kept)
+
+    Raises:
+        RuntimeError: if every item detail failed (after recording them as dead letters)
     """
     entity = ENTITIES[entity_key]
     table = entity["pg_table"]
+    metrics = run_metrics.active()
 
     print(f"\n{'=' * 60}")
     print(f"Pulling {entity['name']} Inventory Stock")
@@ -317,122 +492,175 @@ def pull_inventory_stock(
     # Initialize Accurate client
     print("\nConnecting to Accurate Online API...")
     client = AccurateAPIClient(api_token, signature_secret, entity["api_host"])
-    client.connect()
-    print("  Connected (READ-ONLY mode)")
+    with metrics.phase("auth"):
+        client.connect()
+    cached = ", cached auth" if client.auth_from_cache else ""
+    print(f"  Connected (READ-ONLY mode{cached})")
+
+    # Local export: streamed while fetching (format by extension)
+    writer = None
+    if local_only or output_file:
+        if not output_file:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = f"{entity['name']}_stock_{timestamp}.xlsx"
+        writer = stream_export.open_writer(
+            Path("xlsx auto pull - inventory") / output_file, STOCK_COLUMNS, STOCK_TYPES
+        )
+        print(f"Export: {writer.path} (streaming)")
 
     # Pull inventory data
     print("\nFetching inventory data (GET requests only)...")
-    all_stock = []
+    all_stock = row_batch.RowBatch(STOCK_COLUMNS)
+    summary = row_batch.Summary("nama_gudang", sums=("kuantitas",), distinct=("kode_barang",))
+    sample = row_batch.RowBatch(STOCK_COLUMNS)
+    all_items = []  # One item-master record per item (for raw.accurate_item_master)
+    fetched_ids = []  # Item ids fetched OK (resolves older dead letters)
+    failures = []  # Failed item ids -> raw.accurate_dead_letter
+    archive = payload_archive.open_archive()
     page = 1
     total_items = 0
 
-    while True:
-        print(f"  Page {page}...", end="", flush=True)
-
-        # Get items list (100 per page) - READ-ONLY GET request
-        response = client._api_call(
-            "/accurate/api/item/list.do", params={"sp.page": page, "sp.pageSize": 100}
-        )
-
-        items = response.get("d", [])
-        if not items:
-            print(" (no more items)")
-            break
-
-        print(f" {len(items)} items", flush=True)
-
-        # For each item, get detail with warehouse data
-        for idx, item in enumerate(items, 1):
-            item_id = item.get("id")
-
-            # Get item detail (contains detailWarehouseData) - READ-ONLY GET request
-            detail_response = client._api_call(
-                f"/accurate/api/item/detail.do?id={item_id}"
-            )
-            detail = detail_response.get("d", {})
-
-            # Extract warehouse data
-            warehouse_data = detail.get("detailWarehouseData", [])
-
-            for wh in warehouse_data:
-                all_stock.append(
-                    {
-                        "kode_barang": detail.get("no", ""),
-                        "nama_barang": detail.get("name", ""),
-                        "nama_gudang": wh.get("warehouseName", ""),
-                        "kuantitas": int(wh.get("balance", 0)),
-                        "unit_price": round(detail.get("unitPrice", 0) or 0, 2),
-                        "vendor_price": round(detail.get("vendorPrice", 0) or 0, 2),
-                    }
-                )
-
-            # Rate limiting (max 8 req/sec, so 0.125s delay)
-            time.sleep(0.125)
-
-            # Progress indicator
-            if idx % 10 == 0:
-                print(f"    Processed {idx}/{len(items)} items...", flush=True)
-
-        total_items += len(items)
-
-        # Check if more pages
-        if len(items) < 100:
-            break
-
-        page += 1
-        time.sleep(0.2)  # Extra delay between pages
+    try:
+        while True:
+            print(f"  Page {page}...", end="", flush=True)
+
+            # Get items list (100 per page) - READ-ONLY GET request
+            with metrics.phase("list_pages"):
+                items = list_items(client, page)
+            if not items:
+                print(" (no more items)")
+                break
+
+            print(f" {len(items)} items", flush=True)
+
+            # For each item, get detail with warehouse data
+            for idx, item in enumerate(items, 1):
+                item_id = item.get("id")
+
+                # Get item detail (contains detailWarehouseData) - READ-ONLY GET request.
+                # A failed item (fetch or flatten) is dead-lettered and skipped; the run continues.
+                before = len(all_stock)
+                try:
+                    detail = fetch_item_detail(client, entity_key, item_id, archive)
+                    with metrics.phase("flatten"):
+                        master_record = item_master.extract_item(detail)
+                        flatten_item_stock(detail, all_stock)
+                except Exception as e:
+                    all_stock.truncate(before)  # No half-flattened item in the batch
+                    metrics.count("detail_errors")
+                    failures.append(dead_letter.failure(item_id, item.get("no"), e))
+                    print(f"\n    Error on item {item.get('no') or item_id}: {e}", flush=True)
+                    continue
+                fetched_ids.append(item_id)
+                all_items.append(master_record)
+                metrics.add_rows("details", 1)
+                metrics.add_rows("flatten", len(all_stock) - before)
+
+                if writer:
+                    with metrics.phase("export"):
+                        writer.write(all_stock.slice(before).tuples())
+                    if local_only:
+                        # Export-only: fold the rows into the summary and drop them (flat memory)
+                        if len(sample) < 5:
+                            sample.extend(all_stock.head(5 - len(sample)))
+                        summary.add(all_stock)
+                        all_stock.truncate(0)
+
+                # Rate limiting (max 8 req/sec, so 0.125s delay)
+                with metrics.phase("throttle"):
+                    time.sleep(REQUEST_DELAY)
+
+                # Progress indicator
+                if idx % 10 == 0:
+                    print(f"    Processed {idx}/{len(items)} items...", flush=True)
+
+            total_items += len(items)
+
+            # Check if more pages
+            if len(items) < 100:
+                break
+
+            page += 1
+            time.sleep(PAGE_DELAY)  # Extra delay between pages
+    except BaseException:
+        if writer:
+            writer.abort()  # No .partial file left behind
+        raise
+    finally:
+        if archive:
+            archive.close()
 
+    total_rows = summary.rows if local_only else len(all_stock)
     print(f"\n  Total items processed: {total_items}")
-    print(f"  Total stock records: {len(all_stock)}")
+    print(f"  Total stock records: {total_rows}")
+    if failures:
+        print(f"  {len(failures)} item detail(s) failed - recorded as dead letters")
+        print("  Re-fetch only those with: --retry-dead-letters")
+
+    if writer:
+        if total_rows:
+            with metrics.phase("export"):
+                writer.close()
+            print(f"\n  Saved {writer.rows:,} rows to: {writer.path}")
+        else:
+            writer.abort()
 
-    # Create DataFrame
-    df = pd.DataFrame(all_stock)
+    # Summary: one pass over the columns (keeps pandas off the fetch -> load path)
+    metrics.start_phase("summary")
 
-    if df.empty:
+    if not total_rows:
         print("\n  No stock data retrieved - skipping upload.")
-        return df
-
-    # Sort by warehouse, then product code
-    df = df.sort_values(["nama_gudang", "kode_barang"]).reset_index(drop=True)
+        if not failures:
+            return all_stock
+        # Every item failed: still record them, so --retry-dead-letters finds them
+        if not (dry_run or local_only):
+            snapshot_date = datetime.now().strftime("%Y-%m-%d")
+            batch_id = f"accurate_stock_{entity_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            conn = get_pg_connection(pg_host_override)
+            try:
+                with conn.cursor() as cur:
+                    dead_letter.record_failures(
+                        cur, entity_key, dead_letter.KIND_ITEM, failures, snapshot_date, batch_id
+                    )
+                conn.commit()
+            except Exception:
+                pg_pool.rollback(conn)
+                raise
+            finally:
+                pg_pool.release(conn)
+        raise RuntimeError(f"All {len(failures)} item detail(s) failed")
+
+    if not local_only:
+        # Sort by warehouse, then product code
+        all_stock.sort_by("nama_gudang", "kode_barang")
+        summary.add(all_stock)
+        sample = all_stock.head(5)
+    stats = summary.result()
 
-    # Summary
     print(f"\n{'=' * 60}")
     print("INVENTORY SUMMARY")
     print(f"{'=' * 60}")
-    print(f"Total stock records: {len(df):,}")
-    print(f"Unique products: {df['kode_barang'].nunique():,}")
-    print(f"Unique warehouses: {df['nama_gudang'].nunique():,}")
-    print(f"Total quantity: {df['kuantitas'].sum():,}")
+    print(f"Total stock records: {stats['rows']:,}")
+    print(f"Unique products: {stats['distinct']['kode_barang']:,}")
+    print(f"Unique warehouses: {len(stats['groups']):,}")
+    print(f"Total quantity: {stats['sums']['kuantitas']:,}")
     print(f"\nWarehouses:")
-    for wh in df["nama_gudang"].unique():
-        wh_df = df[df["nama_gudang"] == wh]
-        print(f"  - {wh}: {len(wh_df):,} records, {wh_df['kuantitas'].sum():,} units")
+    for wh, (records, units) in stats["groups"].items():
+        print(f"  - {wh}: {records:,} records, {units:,} units")
 
     # Sample data
     print(f"\nFirst 5 records:")
-    print(df.head(5).to_string(index=False))
-
-    # Save to Excel if requested
-    if local_only or output_file:
-        output_dir = Path("xlsx auto pull - inventory")
-        output_dir.mkdir(exist_ok=True)
-
-        if not output_file:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"{entity['name']}_stock_{timestamp}.xlsx"
-
-        output_path = output_dir / output_file
-        df.to_excel(output_path, index=False)
-        print(f"\n  Saved to: {output_path}")
+    row_batch.print_sample(sample)
+    metrics.end_phase("summary")
 
-        if local_only:
-            print("\n(Skipped PostgreSQL upload - local only mode)")
-            return df
+    if local_only:
+        print("\n(Skipped PostgreSQL upload - local only mode)")
+        return all_stock
 
     # Upload to PostgreSQL (unless dry-run)
     if dry_run:
         print("\n(Dry run - no upload to PostgreSQL)")
-        return df
+        return all_stock
 
     # --- PostgreSQL upload ---
     snapshot_date = datetime.now().strftime("%Y-%m-%d")
@@ -441,47 +669,40 @@ def pull_inventory_stock(
 
     try:
         print(f"\nConnecting to PostgreSQL...")
-        conn = get_pg_connection(pg_host_override)
+        with metrics.phase("pg_connect"):
+            conn = get_pg_connection(pg_host_override)
 
         print(f"Uploading to {table} (snapshot: {snapshot_date})...")
+        metrics.start_phase("pg_upsert")
 
         with conn.cursor() as cur:
             # Delete existing data for today's snapshot
-            cur.execute(
-                f"DELETE FROM {table} WHERE snapshot_date = %s", (snapshot_date,)
-            )
-            deleted = cur.rowcount
+            deleted = fact_tables.delete(cur, table, "snapshot_date = %s", (snapshot_date,))
             if deleted > 0:
                 print(f"  Deleted {deleted:,} existing records for {snapshot_date}")
 
             # Insert new data
-            insert_sql = f"""
-                INSERT INTO {table} (kode_barang, nama_barang, nama_gudang, kuantitas,
-                                     unit_price, vendor_price, snapshot_date, load_batch_id)
-                VALUES %s
-            """
-            values = [
-                (
-                    row["kode_barang"],
-                    row["nama_barang"],
-                    row["nama_gudang"],
-                    row["kuantitas"],
-                    row["unit_price"],
-                    row["vendor_price"],
-                    snapshot_date,
-                    batch_id,
-                )
-                for row in all_stock
-            ]
+            inserted = insert_stock_rows(cur, table, all_stock, snapshot_date, batch_id)
+            metrics.add_rows("pg_upsert", inserted)
+            print(f"  Inserted {inserted:,} records")
 
-            execute_values(cur, insert_sql, values, page_size=500)
-            print(f"  Inserted {len(values):,} records")
+            # Refresh item-master cache (read by the sales + historical loaders)
+            cached_items = item_master.upsert_items(
+                cur, entity_key, all_items, batch_id
+            )
+            print(f"  Item master refreshed: {cached_items:,} items")
+
+            # Dead letters: record this run's failures, close any re-fetched ones
+            dead_letter.record_failures(
+                cur, entity_key, dead_letter.KIND_ITEM, failures, snapshot_date, batch_id
+            )
+            dead_letter.resolve(cur, entity_key, dead_letter.KIND_ITEM, fetched_ids)
 
             # Log to load_history
             cur.execute(
                 """
-                INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
                 (
                     "accurate_api",
@@ -491,46 +712,208 @@ def pull_inventory_stock(
                     snapshot_date,
                     snapshot_date,
                     len(all_stock),
-                    "success",
+                    "partial" if failures else "success",
+                    f"{len(failures)} item details dead-lettered" if failures else None,
                 ),
             )
+            metrics.store_phase_timings(cur, batch_id)
 
         conn.commit()
-        print(f"  Upload complete: {len(df):,} records -> {table}")
+        metrics.end_phase("pg_upsert")
+        print(f"  Upload complete: {len(all_stock):,} records -> {table}")
 
     except Exception as e:
         print(f"\n  PostgreSQL upload failed: {e}")
         if conn:
-            try:
-                conn.rollback()
-                # Attempt to log failure
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                        (
-                            "accurate_api",
-                            entity_key,
-                            "stock",
-                            batch_id,
-                            snapshot_date,
-                            snapshot_date,
-                            0,
-                            "error",
-                            str(e)[:500],
-                        ),
-                    )
-                    conn.commit()
-            except Exception:
-                pass  # Best-effort error logging
+            pg_pool.rollback(conn)  # Drops the connection if it is broken
+        pg_pool.log_load(
+            "accurate_api",
+            entity_key,
+            "stock",
+            batch_id,
+            snapshot_date,
+            snapshot_date,
+            0,
+            "error",
+            str(e),
+            pg_host_override=pg_host_override,
+        )
+
+        # Spool the fetched snapshot; the next run loads it before pulling again
+        segment = spool.write_segment(
+            spool.KIND_STOCK,
+            entity_key,
+            batch_id,
+            {"rows": all_stock, "items": all_items},
+            snapshot_date=snapshot_date,
+            failures=failures,
+            fetched_ids=fetched_ids,
+        )
+        print(f"  Spooled {len(all_stock):,} rows for replay: {segment}")
         raise
     finally:
+        pg_pool.release(conn)
+
+    return all_stock
+
+
+def load_spool_segment(cur, segment):
+    """spool.replay callback: replace one spooled stock snapshot (None if superseded)."""
+    manifest = segment.manifest
+    entity_key = manifest["entity"]
+    table = ENTITIES[entity_key]["pg_table"]
+    snapshot_date = manifest["snapshot_date"]
+    batch_id = manifest["batch_id"]
+
+    if spool.superseded(cur, table, snapshot_date, segment.created_at):
+        return None
+
+    fact_tables.delete(cur, table, "snapshot_date = %s", (snapshot_date,))
+    inserted = insert_stock_rows(cur, table, segment.read(), snapshot_date, batch_id)
+    item_master.upsert_items(cur, entity_key, segment.read_dicts("items"), batch_id)
+
+    failures = manifest.get("failures", [])
+    dead_letter.record_failures(cur, entity_key, dead_letter.KIND_ITEM, failures, snapshot_date, batch_id)
+    dead_letter.resolve(cur, entity_key, dead_letter.KIND_ITEM, manifest.get("fetched_ids", []))
+    cur.execute(
+        """
+        INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+        (
+            "spool_replay",
+            entity_key,
+            "stock",
+            batch_id,
+            snapshot_date,
+            snapshot_date,
+            inserted,
+            "partial" if failures else "success",
+            f"{len(failures)} item details dead-lettered" if failures else None,
+        ),
+    )
+    return inserted
+
+
+@run_metrics.instrumented("stock_retry")
+def retry_dead_letters(
+    entity_key: str,
+    dry_run: bool = False,
+    pg_host_override: str = None,
+    env_dir: Path = None,
+    max_attempts: int = None,
+) -> bool:
+    """
+    Re-fetch only the dead-lettered items of an entity and merge them in.
+
+    Each item's warehouse rows replace that item's rows in the snapshot it was
+    missing from, so the snapshot ends up as if the original run had not failed.
+
+    Args:
+        entity_key: Entity key (ddd, ljbb, mbb, ubb)
+        dry_run: If True, re-fetch and count without writing
+        pg_host_override: Override PG_HOST from CLI
+        env_dir: Directory containing entity .env files
+        max_attempts: Skip dead letters that already failed this many times
+
+    Returns:
+        True if every pending item was recovered
+    """
+    entity = ENTITIES[entity_key]
+    table = entity["pg_table"]
+    kind = dead_letter.KIND_ITEM
+
+    print(f"\n{'=' * 60}")
+    print(f"{entity['name']} dead-letter retry (stock items)")
+    print(f"{'=' * 60}")
+
+    api_token, signature_secret = load_entity_credentials(entity_key, entity, env_dir)
+
+    conn = get_pg_connection(pg_host_override)
+    batch_id = f"retry_stock_{entity_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    try:
+        with conn.cursor() as cur:
+            pending = dead_letter.load_pending(cur, entity_key, kind, max_attempts)
+        pg_pool.release(conn)
+        conn = None
+        print(f"  Pending dead letters: {len(pending)}")
+        if not pending:
+            return True
+
+        client = AccurateAPIClient(api_token, signature_secret, entity["api_host"])
+        client.connect()
+
+        recovered = []  # (letter, detail)
+        failures = []
+        archive = payload_archive.open_archive()
+        try:
+            for letter in pending:
+                try:
+                    detail = fetch_item_detail(client, entity_key, letter["object_id"], archive)
+                    recovered.append((letter, detail))
+                    print(f"  Recovered {detail.get('no') or letter['object_id']}")
+                except Exception as e:
+                    failure = dead_letter.failure(letter["object_id"], letter["object_no"], e)
+                    failure["snapshot_date"] = letter["snapshot_date"]
+                    failures.append(failure)
+                    print(f"  Still failing {letter['object_no'] or letter['object_id']} "
+                          f"(attempt {letter['attempts'] + 1}): {e}")
+                time.sleep(REQUEST_DELAY)
+        finally:
+            if archive:
+                archive.close()
+
+        total_rows = sum(len(flatten_item_stock(detail)) for _, detail in recovered)
+        print(f"  Recovered {len(recovered)}/{len(pending)} items, {total_rows:,} stock rows")
+
+        if dry_run:
+            print(f"\n(Dry run - would merge {total_rows:,} rows into {table})")
+            return not failures
+
+        conn = get_pg_connection(pg_host_override)  # Re-checked after the fetch
+        with conn.cursor() as cur:
+            for letter, detail in recovered:
+                # Replace just this item's rows in the snapshot it was missing from
+                fact_tables.delete(
+                    cur, table, "snapshot_date = %s AND kode_barang = %s",
+                    (letter["snapshot_date"], detail.get("no", "")),
+                )
+                insert_stock_rows(
+                    cur, table, flatten_item_stock(detail), letter["snapshot_date"], batch_id
+                )
+            item_master.upsert_items(
+                cur, entity_key, [item_master.extract_item(d) for _, d in recovered], batch_id
+            )
+            dead_letter.record_failures(cur, entity_key, kind, failures, None, batch_id)
+            dead_letter.resolve(cur, entity_key, kind, [l["object_id"] for l, _ in recovered])
+            cur.execute(
+                """
+                INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+                (
+                    "dead_letter_retry",
+                    entity_key,
+                    "stock",
+                    batch_id,
+                    min(l["snapshot_date"] for l in pending),
+                    max(l["snapshot_date"] for l in pending),
+                    total_rows,
+                    "partial" if failures else "success",
+                    f"{len(failures)} item details still failing" if failures else None,
+                ),
+            )
+        conn.commit()
+        print(f"  Retry complete: {total_rows:,} records -> {table}")
+        return not failures
+
+    except Exception:
         if conn:
-            conn.close()
+            pg_pool.rollback(conn)
+        raise
 
-    return df
+    finally:
+        pg_pool.release(conn)
 
 
 def pull_all_entities(
@@ -541,13 +924,13 @@ def pull_all_entities(
 
     for entity_key in ["ddd", "ljbb", "mbb", "ubb"]:
         try:
-            df = pull_inventory_stock(
+            rows = pull_inventory_stock(
                 entity_key,
                 dry_run=dry_run,
                 pg_host_override=pg_host_override,
                 env_dir=env_dir,
             )
-            results[entity_key] = {"status": "success", "records": len(df)}
+            results[entity_key] = {"status": "success", "records": len(rows)}
         except Exception as e:
             print(f"\n  Error pulling {entity_key}: {e}")
             results[entity_key] = {"status": "error", "error": str(e)}
@@ -581,10 +964,12 @@ def main():
     parser.add_argument(
         "--local-only",
         action="store_true",
-        help="Save to Excel only, skip PostgreSQL upload",
+        help="Export to a local file only, skip PostgreSQL upload",
     )
     parser.add_argument(
-        "--output", type=str, help="Custom Excel filename (for --local-only)"
+        "--output",
+        type=str,
+        help="Export filename; format by extension: .xlsx (default), .csv, .csv.gz, .parquet",
     )
     parser.add_argument(
         "--pg-host",
@@ -599,7 +984,27 @@ def main():
         help="Directory containing entity .env files (default: script dir)",
     )
 
+    parser.add_argument(
+        "--retry-dead-letters",
+        action="store_true",
+        help="Re-fetch only items recorded in raw.accurate_dead_letter and merge them in",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=None,
+        help="With --retry-dead-letters: skip ids that already failed this many times",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run (hotspots, flamegraph stacks, peak memory per phase)",
+    )
+    cassette.add_arguments(parser)
+
     args = parser.parse_args()
+    cassette.configure_from_args(args)
 
     # Load PG credentials from .env at script dir level
     pg_env_path = SCRIPT_DIR / ".env"
@@ -609,32 +1014,57 @@ def main():
     # Resolve env-dir for entity credential files
     env_dir = Path(args.env_dir) if args.env_dir else SCRIPT_DIR
 
-    try:
-        if args.entity == "all":
-            pull_all_entities(
-                dry_run=args.dry_run, pg_host_override=args.pg_host, env_dir=env_dir
-            )
-        else:
-            pull_inventory_stock(
-                args.entity,
-                dry_run=args.dry_run,
-                local_only=args.local_only,
-                output_file=args.output,
-                pg_host_override=args.pg_host,
-                env_dir=env_dir,
-            )
+    with run_profile.profiling("stock", enabled=args.profile):
+        try:
+            # Load snapshots spooled by earlier runs whose PG upload failed
+            if not (args.dry_run or args.local_only):
+                spool.replay(
+                    spool.KIND_STOCK,
+                    ["ddd", "ljbb", "mbb", "ubb"] if args.entity == "all" else [args.entity],
+                    lambda: get_pg_connection(args.pg_host),
+                    load_spool_segment,
+                )
 
-        print("\nDone!")
+            if args.retry_dead_letters:
+                entity_keys = ["ddd", "ljbb", "mbb", "ubb"] if args.entity == "all" else [args.entity]
+                results = [
+                    retry_dead_letters(
+                        entity_key,
+                        dry_run=args.dry_run,
+                        pg_host_override=args.pg_host,
+                        env_dir=env_dir,
+                        max_attempts=args.max_attempts,
+                    )
+                    for entity_key in entity_keys
+                ]
+                if not all(results):
+                    print("\nSome dead letters are still failing")
+                    sys.exit(1)
+            elif args.entity == "all":
+                pull_all_entities(
+                    dry_run=args.dry_run, pg_host_override=args.pg_host, env_dir=env_dir
+                )
+            else:
+                pull_inventory_stock(
+                    args.entity,
+                    dry_run=args.dry_run,
+                    local_only=args.local_only,
+                    output_file=args.output,
+                    pg_host_override=args.pg_host,
+                    env_dir=env_dir,
+                )
 
-    except KeyboardInterrupt:
-        print("\n\nInterrupted by user")
-        sys.exit(1)
-    except Exception as e:
-        print(f"\nError: {e}")
-        import traceback
+            print("\nDone!")
+
+        except KeyboardInterrupt:
+            print("\n\nInterrupted by user")
+            sys.exit(1)
+        except Exception as e:
+            print(f"\nError: {e}")
+            import traceback
 
-        traceback.print_exc()
-        sys.exit(1)
+            traceback.print_exc()
+            sys.exit(1)
 
 
 if __name__ == "__main__":
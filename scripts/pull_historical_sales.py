@@ -7,7 +7,9 @@ Downloads sales reports via Report Export API (fast workaround),
 cleans data, and inserts into raw.accurate_sales_{entity}.
 
 Missing columns vs official API: nama_gudang, vendor_price, dpp_amount, tax_amount
-These will be NULL for historical data. Daily cron fills all 19 cols going forward.
+nama_gudang, dpp_amount, tax_amount will be NULL for historical data. vendor_price
+(and bpp when the report has 0) is filled from raw.accurate_item_master, which the
+daily stock pull maintains. Daily cron fills all 19 cols going forward.
 
 Usage:
     python pull_historical_sales.py ddd --start 2024-01-01 --end 2026-02-08
@@ -26,13 +28,18 @@ import json
 import argparse
 import traceback
 import requests
-import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
 from datetime import datetime, timedelta
 from io import BytesIO
 from dotenv import load_dotenv
 
+import dimensions
+import fact_tables
+import item_master
+import pg_pool
+import row_batch
+import run_metrics
+import run_profile
+
 ENTITY_CONFIGS = {
     "ddd": {"name": "DDD", "table": "raw.accurate_sales_ddd"},
     "mbb": {"name": "MBB", "table": "raw.accurate_sales_mbb"},
@@ -127,16 +134,26 @@ class AccurateReportExporter:
         start_str = start_date.strftime("%d/%m/%Y")
         end_str = end_date.strftime("%d/%m/%Y")
         print(f"   Period: {start_str} to {end_str}")
-        cache_id = self.execute_report(start_str, end_str)
+        metrics = run_metrics.active()
+        with metrics.phase("report_execute"):
+            cache_id = self.execute_report(start_str, end_str)
         time.sleep(2)
-        excel_content = self.export_report(cache_id, "xls")
+        with metrics.phase("report_download"):
+            excel_content = self.export_report(cache_id, "xls")
+        metrics.count("report_bytes", len(excel_content))
         print(f"   Parsing Excel...")
-        df = pd.read_excel(BytesIO(excel_content), engine="openpyxl")
+        with metrics.phase("excel_parse"):
+            import pandas as pd  # Imported on first parse; slow to import
+
+            df = pd.read_excel(BytesIO(excel_content), engine="openpyxl")
+        metrics.add_rows("excel_parse", len(df))
         print(f"   Raw rows: {len(df):,}")
         return df
 
 
 def clean_report_data(df):
+    import pandas as pd
+
     column_mapping = {
         "Tanggal": "tanggal",
         "Nama Departemen": "nama_departemen",
@@ -198,19 +215,31 @@ def clean_report_data(df):
     return df
 
 
-def insert_to_postgres(
-    df, table, pg_host, pg_port, pg_db, pg_user, pg_pass, snapshot_date, batch_id
-):
+def insert_to_postgres(df, table, snapshot_date, batch_id, entity=None, pg_host_override=None):
+    """Upsert one cleaned chunk on the pooled connection, committed per chunk."""
     if df.empty:
         print("   No data to insert")
         return 0
 
-    conn = psycopg2.connect(
-        host=pg_host, port=pg_port, dbname=pg_db, user=pg_user, password=pg_pass
-    )
+    conn = pg_pool.connection(pg_host_override)
+    try:
+        total = _upsert_chunk(conn, df, table, snapshot_date, batch_id, entity)
+        conn.commit()
+        return total
+    except Exception:
+        pg_pool.rollback(conn)
+        raise
+    finally:
+        pg_pool.release(conn)
+
+
+def _upsert_chunk(conn, df, table, snapshot_date, batch_id, entity):
     cur = conn.cursor()
 
-    # nama_gudang, vendor_price, dpp_amount, tax_amount will be NULL (not in report)
+    # vendor_price / bpp gaps come from the item master (maintained by the stock pull)
+    master = item_master.load_item_master(cur, entity) if entity else {}
+
+    # nama_gudang, dpp_amount, tax_amount will be NULL (not in report)
     cols = [
         "tanggal",
         "nama_departemen",
@@ -223,89 +252,102 @@ def insert_to_postgres(
         "harga_satuan",
         "total_harga",
         "bpp",
+        "vendor_price",
         "snapshot_date",
         "loaded_at",
         "load_batch_id",
     ]
 
+    # Entity-partitioned layout: write the parent, entity is part of the key
+    target, partition_entity = fact_tables.resolve(cur, table)
+    extra = (partition_entity,) if partition_entity else ()
+
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    rows = []
+    rows = row_batch.RowBatch(cols)
+    filled = 0
     for _, r in df.iterrows():
+        item = master.get(r.get("kode_produk"))
+        bpp = float(r.get("bpp", 0))
+        vendor_price = None
+        if item:
+            vendor_price = item["vendor_price"] or None
+            if not bpp and item["cost"]:
+                bpp = item["cost"]
+            filled += 1
         rows.append(
-            (
-                r.get("tanggal"),
-                r.get("nama_departemen"),
-                r.get("nama_pelanggan"),
-                r.get("nomor_invoice"),
-                r.get("kode_produk"),
-                r.get("nama_barang"),
-                r.get("satuan"),
-                int(r.get("kuantitas", 0)),
-                float(r.get("harga_satuan", 0)),
-                float(r.get("total_harga", 0)),
-                float(r.get("bpp", 0)),
-                snapshot_date,
-                now,
-                batch_id,
-            )
+            r.get("tanggal"),
+            r.get("nama_departemen"),
+            r.get("nama_pelanggan"),
+            r.get("nomor_invoice"),
+            r.get("kode_produk"),
+            r.get("nama_barang"),
+            r.get("satuan"),
+            int(r.get("kuantitas", 0)),
+            float(r.get("harga_satuan", 0)),
+            float(r.get("total_harga", 0)),
+            bpp,
+            vendor_price,
+            snapshot_date,
+            now,
+            batch_id,
         )
 
+    if filled:
+        print(f"   Item master matched: {filled:,}/{len(rows):,} rows")
+
+    # Narrow layout: names are stored as dimension keys
+    if fact_tables.is_narrow(cur, target):
+        rows = dimensions.encode(cur, rows)
+    cols = [*rows.columns, *(["entity"] if partition_entity else [])]
+
     col_str = ", ".join(cols)
+    conflict = [*(["entity"] if partition_entity else []), "nomor_invoice", "kode_produk", "tanggal", "snapshot_date"]
 
-    insert_sql = f"""
-        INSERT INTO {table} ({col_str})
+    upsert_sql = f"""
+        INSERT INTO {target} AS t ({col_str})
         VALUES %s
-        ON CONFLICT (nomor_invoice, kode_produk, tanggal, snapshot_date)
+        ON CONFLICT ({", ".join(conflict)})
         DO UPDATE SET
             kuantitas = EXCLUDED.kuantitas,
             harga_satuan = EXCLUDED.harga_satuan,
             total_harga = EXCLUDED.total_harga,
             bpp = EXCLUDED.bpp,
+            vendor_price = COALESCE(EXCLUDED.vendor_price, t.vendor_price),
             loaded_at = EXCLUDED.loaded_at,
             load_batch_id = EXCLUDED.load_batch_id
     """
 
     batch_size = 1000
+    key = [cols.index(c) for c in conflict]
     total = 0
     for i in range(0, len(rows), batch_size):
-        batch = rows[i : i + batch_size]
-        execute_values(cur, insert_sql, batch)
-        total += len(batch)
+        batch = rows.slice(i, i + batch_size).tuples(*extra)
+        total += pg_pool.execute_pages(cur, upsert_sql, batch, key=key, page_size=batch_size)
         print(f"   Inserted: {total:,}/{len(rows):,}")
 
-    conn.commit()
     cur.close()
-    conn.close()
     return total
 
 
-def log_load(
-    pg_host, pg_port, pg_db, pg_user, pg_pass, table, batch_id, rows, status, error=None
-):
-    try:
-        conn = psycopg2.connect(
-            host=pg_host, port=pg_port, dbname=pg_db, user=pg_user, password=pg_pass
-        )
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO raw.load_history (table_name, load_batch_id, rows_loaded, status, error_message, loaded_at)
-            VALUES (%s, %s, %s, %s, %s, NOW())
-        """,
-            (table, batch_id, rows, status, error),
-        )
-        conn.commit()
-        cur.close()
-        conn.close()
-    except Exception as e:
-        print(f"   Warning: Could not log to load_history: {e}")
-
+def log_load(entity, batch_id, date_from, date_to, rows, status, error=None, pg_host_override=None):
+    """raw.load_history line via the pooled autocommit connection (best-effort)."""
+    pg_pool.log_load(
+        "accurate_report",
+        entity,
+        "sales",
+        batch_id,
+        date_from.strftime("%Y-%m-%d"),
+        date_to.strftime("%Y-%m-%d"),
+        rows,
+        status,
+        error,
+        phase_timings=run_metrics.active().phase_timings() if status != "error" else None,
+        pg_host_override=pg_host_override,
+    )
 
-def run_entity(entity, start_date, end_date, dry_run, env_dir):
-    cfg = ENTITY_CONFIGS[entity]
-    table = cfg["table"]
-    name = cfg["name"]
 
+def load_exporter(entity, env_dir):
+    """Report exporter from the entity's cookies in env_dir (None if not set)."""
     # Load entity env
     env_file = os.path.join(env_dir, f".env.{entity}")
     if os.path.exists(env_file):
@@ -323,29 +365,39 @@ def run_entity(entity, start_date, end_date, dry_run, env_dir):
 
     if not dsi or not usi or dsi == "PASTE_YOUR_DSI_COOKIE_HERE":
         print(
-            f"ERROR: No cookies for {name}. Update .env.{entity} with ACCURATE_DSI and ACCURATE_USI"
+            f"ERROR: No cookies for {ENTITY_CONFIGS[entity]['name']}. "
+            f"Update .env.{entity} with ACCURATE_DSI and ACCURATE_USI"
         )
-        return False
+        return None
+
+    return AccurateReportExporter(dsi, usi, report_host, report_id)
+
+
+def report_windows(start_date, end_date, days=90):
+    """(start, end) report windows of `days` days covering start_date..end_date."""
+    current_start = start_date
+    while current_start < end_date:
+        current_end = min(current_start + timedelta(days=days - 1), end_date)
+        yield current_start, current_end
+        current_start = current_end + timedelta(days=1)
+
 
-    pg_host = os.getenv("PG_HOST", "localhost")
-    pg_port = os.getenv("PG_PORT", "5432")
-    pg_db = os.getenv("PG_DATABASE", os.getenv("PG_DB", "openclaw_ops"))
-    pg_user = os.getenv("PG_USER", "openclaw_app")
-    pg_pass = os.getenv("PG_PASSWORD", os.getenv("PG_PASS", ""))
+@run_metrics.instrumented("historical")
+def run_entity(entity, start_date, end_date, dry_run, env_dir):
+    cfg = ENTITY_CONFIGS[entity]
+    table = cfg["table"]
+    name = cfg["name"]
 
-    exporter = AccurateReportExporter(dsi, usi, report_host, report_id)
+    exporter = load_exporter(entity, env_dir)
+    if exporter is None:
+        return False
     batch_id = f"historical_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     snapshot_date = datetime.now().strftime("%Y-%m-%d")
 
     # Chunk into 90-day windows
-    current_start = start_date
     total_rows = 0
-    chunk_num = 0
-
-    while current_start < end_date:
-        chunk_num += 1
-        current_end = min(current_start + timedelta(days=89), end_date)
 
+    for chunk_num, (current_start, current_end) in enumerate(report_windows(start_date, end_date), 1):
         print(f"\n{'=' * 60}")
         print(
             f"  {name} - Chunk {chunk_num}: {current_start.strftime('%Y-%m-%d')} to {current_end.strftime('%Y-%m-%d')}"
@@ -356,10 +408,10 @@ def run_entity(entity, start_date, end_date, dry_run, env_dir):
             df = exporter.download_sales_report(current_start, current_end)
             if df.empty:
                 print(f"   No data for this period")
-                current_start = current_end + timedelta(days=1)
                 continue
 
-            df = clean_report_data(df)
+            with run_metrics.phase("clean"):
+                df = clean_report_data(df)
 
             if dry_run:
                 print(f"   DRY RUN - would insert {len(df):,} rows")
@@ -367,51 +419,21 @@ def run_entity(entity, start_date, end_date, dry_run, env_dir):
                     print(f"   Sample:")
                     print(df.head(3).to_string())
             else:
-                inserted = insert_to_postgres(
-                    df,
-                    table,
-                    pg_host,
-                    pg_port,
-                    pg_db,
-                    pg_user,
-                    pg_pass,
-                    snapshot_date,
-                    batch_id,
-                )
+                with run_metrics.phase("pg_insert"):
+                    inserted = insert_to_postgres(df, table, snapshot_date, batch_id, entity=entity)
+                run_metrics.active().add_rows("pg_insert", inserted)
                 total_rows += inserted
                 print(f"   Chunk done: {inserted:,} rows")
 
         except Exception as e:
             print(f"   ERROR on chunk {chunk_num}: {e}")
-            log_load(
-                pg_host,
-                pg_port,
-                pg_db,
-                pg_user,
-                pg_pass,
-                table,
-                batch_id,
-                0,
-                "error",
-                str(e),
-            )
+            log_load(entity, batch_id, current_start, current_end, 0, "error", str(e))
             traceback.print_exc()
 
-        current_start = current_end + timedelta(days=1)
         time.sleep(1)
 
     if not dry_run and total_rows > 0:
-        log_load(
-            pg_host,
-            pg_port,
-            pg_db,
-            pg_user,
-            pg_pass,
-            table,
-            batch_id,
-            total_rows,
-            "success",
-        )
+        log_load(entity, batch_id, start_date, end_date, total_rows, "success")
 
     print(f"\n{'=' * 60}")
     print(f"  {name} COMPLETE: {total_rows:,} total rows inserted")
@@ -439,6 +461,12 @@ def main():
         default=os.path.dirname(os.path.abspath(__file__)),
         help="Directory with .env files",
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the run (hotspots, flamegraph stacks, peak memory per phase)",
+    )
+
     args = parser.parse_args()
 
     start_date = datetime.strptime(args.start, "%Y-%m-%d")
@@ -451,8 +479,9 @@ def main():
     print(f"Period: {args.start} to {args.end}")
     print(f"Mode: {'DRY RUN' if args.dry_run else 'LIVE INSERT'}")
 
-    for entity in entities:
-        run_entity(entity, start_date, end_date, args.dry_run, args.env_dir)
+    with run_profile.profiling("historical", enabled=args.profile):
+        for entity in entities:
+            run_entity(entity, start_date, end_date, args.dry_run, args.env_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+iSeller Sales CSV Loader -> raw.iseller_sales
+
+Replaces the manual CSV download + DBeaver upload. Takes one or more iSeller
+order-detail exports (.csv or .csv.gz), types and normalizes each line while
+streaming it, COPYs everything into a temp staging table and merges it into
+raw.iseller_sales on (order_number, item_sku) in one transaction.
+
+Merge rules:
+  - Overlapping exports: each order is taken from the newest export that
+    contains it (file snapshot date, then file name), so a line dropped by a
+    later export is not resurrected from an earlier one.
+  - A SKU repeated within one order is one line (quantity, discount and line
+    total summed).
+  - Change detection: an existing line is only rewritten when a column
+    differs and the export is not older than the stored snapshot. Lines of a
+    merged order that the export no longer has are deleted.
+
+Header names are matched case/space-insensitively against HEADER_ALIASES;
+unknown columns are ignored. Amounts accept "Rp 125.000", "125,000.00" and
+"125000"; timestamps without an offset are taken as WIB (+07:00).
+
+Requires the unique index from iseller_sales.sql (apply once).
+
+Usage:
+    python pull_iseller_sales.py exports/order-detail-2026-10.csv
+    python pull_iseller_sales.py exports/                         # every .csv / .csv.gz in it
+    python pull_iseller_sales.py a.csv b.csv.gz --snapshot-date 2026-10-19
+    python pull_iseller_sales.py exports/ --dry-run               # parse + report only
+"""
+
+import io
+import re
+import csv
+import gzip
+import time
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+import pg_pool
+
+SCRIPT_DIR = Path(__file__).parent
+
+TABLE = "raw.iseller_sales"
+KEY = ("order_number", "item_sku")
+
+# Loaded columns in table order, with how each CSV value is typed
+COLUMNS = {
+    "order_number": "text",
+    "order_date": "timestamp",
+    "customer_name": "text",
+    "customer_email": "text",
+    "customer_phone": "text",
+    "payment_method": "text",
+    "payment_status": "text",
+    "fulfillment_status": "text",
+    "shipping_method": "text",
+    "shipping_address": "text",
+    "shipping_city": "text",
+    "shipping_province": "text",
+    "shipping_postal_code": "text",
+    "item_sku": "text",
+    "item_name": "text",
+    "item_variant": "text",
+    "item_quantity": "number",
+    "item_price": "number",
+    "item_discount": "number",
+    "item_total": "number",
+    "order_subtotal": "number",
+    "order_discount": "number",
+    "order_shipping": "number",
+    "order_tax": "number",
+    "order_total": "number",
+    "channel": "text",
+    "notes": "text",
+}
+SUMMED = ("item_quantity", "item_discount", "item_total")
+
+# Normalized CSV header -> column (column names themselves always match)
+HEADER_ALIASES = {
+    "order_no": "order_number",
+    "order_id": "order_number",
+    "receipt_number": "order_number",
+    "transaction_date": "order_date",
+    "order_time": "order_date",
+    "date": "order_date",
+    "customer": "customer_name",
+    "email": "customer_email",
+    "phone": "customer_phone",
+    "phone_number": "customer_phone",
+    "payment": "payment_method",
+    "payment_type": "payment_method",
+    "order_status": "fulfillment_status",
+    "shipping_courier": "shipping_method",
+    "courier": "shipping_method",
+    "address": "shipping_address",
+    "city": "shipping_city",
+    "province": "shipping_province",
+    "postal_code": "shipping_postal_code",
+    "zip_code": "shipping_postal_code",
+    "sku": "item_sku",
+    "product_sku": "item_sku",
+    "variant_sku": "item_sku",
+    "product_name": "item_name",
+    "item": "item_name",
+    "variant": "item_variant",
+    "variant_name": "item_variant",
+    "quantity": "item_quantity",
+    "qty": "item_quantity",
+    "price": "item_price",
+    "unit_price": "item_price",
+    "discount": "item_discount",
+    "line_total": "item_total",
+    "subtotal": "order_subtotal",
+    "shipping_cost": "order_shipping",
+    "shipping_fee": "order_shipping",
+    "tax": "order_tax",
+    "total": "order_total",
+    "grand_total": "order_total",
+    "sales_channel": "channel",
+    "order_notes": "notes",
+    "note": "notes",
+}
+
+TIMESTAMP_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d-%m-%Y %H:%M:%S",
+    "%d %b %Y %H:%M:%S",
+    "%d %b %Y %H:%M",
+    "%d %B %Y %H:%M",
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+)
+WIB = "+07:00"
+
+MAX_REJECT_SAMPLES = 5
+
+
+# =============================================================================
+# Parsing
+# =============================================================================
+
+
+def _normalize_header(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+
+
+def map_header(header: list) -> list:
+    """
+    [(csv index, column), ...] for the recognised headers (first match wins).
+
+    Raises:
+        ValueError: order_number or item_sku not found
+    """
+    mapping = []
+    seen = set()
+    for i, name in enumerate(header):
+        normalized = _normalize_header(name)
+        column = normalized if normalized in COLUMNS else HEADER_ALIASES.get(normalized)
+        if column and column not in seen:
+            mapping.append((i, column))
+            seen.add(column)
+    missing = [c for c in KEY if c not in seen]
+    if missing:
+        raise ValueError(f"Export has no {' / '.join(missing)} column (header: {header})")
+    return mapping
+
+
+def parse_number(text: str):
+    """'Rp 1.250.000' / '1,250,000.50' / '1250000' / '12,5' -> str for COPY, None if blank."""
+    value = re.sub(r"\s|Rp|IDR", "", text)
+    if not value or value == "-":
+        return None
+    negative = value.startswith("(") and value.endswith(")")
+    value = value.strip("()")
+    if "," in value and "." in value:
+        # The later separator is the decimal point
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    elif "," in value:
+        head, _, tail = value.rpartition(",")
+        value = value.replace(",", "") if len(tail) == 3 else f"{head.replace(',', '')}.{tail}"
+    elif value.count(".") > 1 or (value.count(".") == 1 and len(value.rpartition(".")[2]) == 3):
+        value = value.replace(".", "")  # IDR thousands separators
+    float(value)  # ValueError on anything that is not a number
+    return f"-{value}" if negative else value
+
+
+class _TimestampParser:
+    """strptime over TIMESTAMP_FORMATS, trying the last format that worked first."""
+
+    def __init__(self):
+        self._last = TIMESTAMP_FORMATS[0]
+
+    def __call__(self, text: str):
+        value = text.strip()
+        if not value:
+            return None
+        if re.search(r"(Z|[+-]\d{2}:?\d{2})$", value):
+            return value  # Already has an offset; PostgreSQL parses it
+        for fmt in (self._last, *TIMESTAMP_FORMATS):
+            try:
+                parsed = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            self._last = fmt
+            return f"{parsed:%Y-%m-%d %H:%M:%S}{WIB}"
+        raise ValueError(f"unrecognised timestamp {value!r}")
+
+
+def _clean_text(text: str):
+    value = " ".join(text.split())
+    return value or None
+
+
+def _open_export(path: Path):
+    if path.name.lower().endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+class ExportFile:
+    """One CSV export: its rank among the loaded files and parse statistics."""
+
+    def __init__(self, path: Path, snapshot_date: str, rank: int):
+        self.path = path
+        self.snapshot_date = snapshot_date
+        self.rank = rank
+        self.lines = 0
+        self.rejected = 0
+        self.reject_samples = []
+        self.ignored_headers = []
+
+    def rows(self):
+        """
+        Staging tuples: (file_rank, line_no, *COLUMNS, snapshot_date).
+
+        Lines without an order number / SKU or with an unparseable value are
+        counted as rejected, not loaded.
+        """
+        parse_timestamp = _TimestampParser()
+        parsers = {"text": _clean_text, "number": parse_number, "timestamp": parse_timestamp}
+        with _open_export(self.path) as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            mapping = map_header(header)
+            mapped = {i for i, _ in mapping}
+            self.ignored_headers = [h for i, h in enumerate(header) if i not in mapped and h.strip()]
+            position = {c: n for n, c in enumerate(COLUMNS)}
+            plan = [(i, position[c], parsers[COLUMNS[c]]) for i, c in mapping]
+            key_positions = [position[c] for c in KEY]
+            width = len(header)
+
+            for line_no, record in enumerate(reader, 2):
+                if not any(record):
+                    continue
+                if len(record) < width:
+                    record += [""] * (width - len(record))
+                values = [None] * len(COLUMNS)
+                try:
+                    for i, pos, parse in plan:
+                        values[pos] = parse(record[i])
+                except ValueError as e:
+                    self._reject(line_no, str(e))
+                    continue
+                if any(values[p] is None for p in key_positions):
+                    self._reject(line_no, "missing order_number / item_sku")
+                    continue
+                self.lines += 1
+                yield (self.rank, line_no, *values, self.snapshot_date)
+
+    def _reject(self, line_no: int, reason: str):
+        self.rejected += 1
+        if len(self.reject_samples) < MAX_REJECT_SAMPLES:
+            self.reject_samples.append(f"line {line_no}: {reason}")
+
+
+def collect_exports(paths: list, snapshot_date: str = None) -> list:
+    """
+    ExportFile per .csv / .csv.gz (directories expanded), ranked oldest first.
+
+    A file's snapshot date is --snapshot-date if given, else its modification
+    date (the day it was exported); ties are broken by file name.
+    """
+    files = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            files.extend(p for p in sorted(path.iterdir()) if p.name.lower().endswith((".csv", ".csv.gz")))
+        elif path.exists():
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"Export not found: {path}")
+    dated = sorted(
+        {
+            (snapshot_date or date.fromtimestamp(p.stat().st_mtime).isoformat(), p.name, p)
+            for p in files
+        }
+    )
+    return [ExportFile(p, snap, rank) for rank, (snap, _, p) in enumerate(dated, 1)]
+
+
+class _CopyStream:
+    """File-like view of an iterator of row tuples as CSV, for copy_expert."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self.rows = 0
+
+    def read(self, size: int = -1) -> str:
+        target = size if size and size > 0 else 1 << 20
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        for row in self._rows:
+            self._writer.writerow(row)
+            self.rows += 1
+            if self._buffer.tell() >= target:
+                break
+        return self._buffer.getvalue()
+
+
+# =============================================================================
+# Staging + merge
+# =============================================================================
+
+STAGE = "iseller_stage"
+MERGED = "iseller_merged"
+
+
+def stage_exports(cur, exports: list) -> int:
+    """COPY every export into a temp staging table (dropped at commit)."""
+    columns = ", ".join(COLUMNS)
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE {STAGE} ON COMMIT DROP AS
+        SELECT 0::integer AS file_rank, 0::integer AS line_no, {columns}, snapshot_date
+        FROM {TABLE} WITH NO DATA
+    """
+    )
+    total = 0
+    for export in exports:
+        started = time.perf_counter()
+        stream = _CopyStream(export.rows())
+        cur.copy_expert(
+            f"COPY {STAGE} (file_rank, line_no, {columns}, snapshot_date) FROM STDIN WITH (FORMAT csv)",
+            stream,
+        )
+        total += stream.rows
+        print(
+            f"  {export.path.name}: {stream.rows:,} lines staged in {time.perf_counter() - started:,.1f}s"
+            f" (snapshot {export.snapshot_date}"
+            + (f", {export.rejected:,} rejected" if export.rejected else "")
+            + ")"
+        )
+    cur.execute(f"ANALYZE {STAGE}")
+    return total
+
+
+def merge_staged(cur, batch_id: str) -> dict:
+    """
+    Dedupe the staged lines and merge them into raw.iseller_sales.
+
+    Returns:
+        {"lines", "orders", "inserted", "updated", "unchanged", "removed",
+         "date_from", "date_to"}
+    """
+    columns = list(COLUMNS)
+    payload = [c for c in columns if c not in KEY]
+    aggregates = [
+        f"sum(s.{c}) AS {c}" if c in SUMMED else f"min(s.{c}) AS {c}" for c in payload
+    ]
+
+    # Newest export per order; SKUs repeated within an order collapse to one line
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE {MERGED} ON COMMIT DROP AS
+        WITH newest AS (
+            SELECT order_number, max(file_rank) AS file_rank
+            FROM {STAGE}
+            GROUP BY order_number
+        )
+        SELECT s.order_number, s.item_sku, {', '.join(aggregates)},
+               max(s.snapshot_date) AS snapshot_date
+        FROM {STAGE} s
+        JOIN newest n USING (order_number, file_rank)
+        GROUP BY s.order_number, s.item_sku
+    """
+    )
+    cur.execute(f"ANALYZE {MERGED}")
+    cur.execute(
+        f"SELECT count(*), count(DISTINCT order_number), min(order_date)::date, max(order_date)::date FROM {MERGED}"
+    )
+    lines, orders, date_from, date_to = cur.fetchone()
+
+    # Lines an order no longer has in its newest export
+    cur.execute(
+        f"""
+        DELETE FROM {TABLE} t
+        USING (SELECT DISTINCT order_number, snapshot_date FROM {MERGED}) o
+        WHERE t.order_number = o.order_number
+          AND (t.snapshot_date IS NULL OR t.snapshot_date <= o.snapshot_date)
+          AND NOT EXISTS (
+              SELECT 1 FROM {MERGED} m
+              WHERE m.order_number = t.order_number AND m.item_sku = t.item_sku
+          )
+    """
+    )
+    removed = cur.rowcount
+
+    target = ", ".join(columns)
+    updates = ",\n            ".join(f"{c} = EXCLUDED.{c}" for c in payload)
+    changed = (
+        f"({', '.join('t.' + c for c in payload)}) IS DISTINCT FROM "
+        f"({', '.join('EXCLUDED.' + c for c in payload)})"
+    )
+    cur.execute(
+        f"""
+        WITH upserted AS (
+            INSERT INTO {TABLE} AS t ({target}, snapshot_date, loaded_at, load_batch_id)
+            SELECT {target}, snapshot_date, now(), %s FROM {MERGED}
+            ON CONFLICT (order_number, item_sku) DO UPDATE SET
+            {updates},
+            snapshot_date = EXCLUDED.snapshot_date,
+            loaded_at = EXCLUDED.loaded_at,
+            load_batch_id = EXCLUDED.load_batch_id
+            WHERE (t.snapshot_date IS NULL OR t.snapshot_date <= EXCLUDED.snapshot_date)
+              AND {changed}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+        FROM upserted
+    """,
+        (batch_id,),
+    )
+    inserted, updated = cur.fetchone()
+    return {
+        "lines": lines,
+        "orders": orders,
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": lines - inserted - updated,
+        "removed": removed,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+
+
+def load_exports(exports: list, batch_id: str, pg_host_override: str = None) -> dict:
+    """Stage + merge all exports in one transaction, logged to raw.load_history."""
+    conn = pg_pool.connection(pg_host_override)
+    try:
+        with conn.cursor() as cur:
+            started = time.perf_counter()
+            staged = stage_exports(cur, exports)
+            print(f"  Staged {staged:,} lines in {time.perf_counter() - started:,.1f}s")
+
+            started = time.perf_counter()
+            result = merge_staged(cur, batch_id)
+            result["staged"] = staged
+            print(f"  Merged in {time.perf_counter() - started:,.1f}s")
+
+            rejected = sum(e.rejected for e in exports)
+            cur.execute(
+                """
+                INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+                (
+                    "iseller_csv",
+                    "iseller",
+                    "sales",
+                    batch_id,
+                    result["date_from"],
+                    result["date_to"],
+                    result["inserted"] + result["updated"],
+                    "partial" if rejected else "success",
+                    f"{rejected} CSV lines rejected" if rejected else None,
+                ),
+            )
+        conn.commit()
+        return result
+    except Exception as e:
+        pg_pool.rollback(conn)
+        pg_pool.log_load(
+            "iseller_csv", "iseller", "sales", batch_id, status="error", error_message=str(e),
+            pg_host_override=pg_host_override,
+        )
+        raise
+    finally:
+        pg_pool.release(conn)
+
+
+def dry_run(exports: list):
+    """Parse every export without touching PostgreSQL; report lines and overlap."""
+    first_seen = {}  # order_number -> rank of the first export containing it
+    overlapping = set()
+    key_position = list(COLUMNS).index("order_number") + 2
+    for export in exports:
+        started = time.perf_counter()
+        orders = set()
+        for row in export.rows():
+            orders.add(row[key_position])
+        for order in orders:
+            if order in first_seen:
+                overlapping.add(order)
+            else:
+                first_seen[order] = export.rank
+        print(
+            f"  {export.path.name}: {export.lines:,} lines, {len(orders):,} orders"
+            f" in {time.perf_counter() - started:,.1f}s (snapshot {export.snapshot_date}"
+            + (f", {export.rejected:,} rejected" if export.rejected else "")
+            + ")"
+        )
+    print(f"\n  Orders: {len(first_seen):,} distinct, {len(overlapping):,} in more than one export")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load iSeller order-detail CSV exports into raw.iseller_sales",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s exports/order-detail-2026-10.csv      One export
+  %(prog)s exports/                              Every .csv / .csv.gz in a folder
+  %(prog)s exports/ --dry-run                    Parse and report only
+        """,
+    )
+    parser.add_argument("paths", nargs="+", help="CSV exports (.csv / .csv.gz) or folders of them")
+    parser.add_argument("--snapshot-date", type=str, default=None,
+                        help="Snapshot date for every file (default: each file's modification date)")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and report, no PostgreSQL writes")
+    args = parser.parse_args()
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+
+    try:
+        exports = collect_exports(args.paths, args.snapshot_date)
+    except FileNotFoundError as e:
+        print(f"ERROR: {e}")
+        return 1
+    if not exports:
+        print("No .csv / .csv.gz exports found")
+        return 1
+
+    start_time = datetime.now()
+    batch_id = f"iseller_sales_{start_time.strftime('%Y%m%d_%H%M%S')}"
+    print(f"{'=' * 60}")
+    print(f"  ISELLER SALES LOAD - {len(exports)} export(s) -> {TABLE}")
+    print(f"  Started: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'=' * 60}")
+
+    try:
+        if args.dry_run:
+            dry_run(exports)
+            result = None
+        else:
+            result = load_exports(exports, batch_id, args.pg_host)
+    except (ValueError, ConnectionError) as e:
+        print(f"\nERROR: {e}")
+        return 1
+
+    for export in exports:
+        if export.ignored_headers:
+            print(f"  {export.path.name}: ignored columns {export.ignored_headers}")
+        for sample in export.reject_samples:
+            print(f"  {export.path.name}: rejected {sample}")
+
+    if result:
+        print(f"\n  Lines: {result['staged']:,} staged -> {result['lines']:,} after dedupe "
+              f"({result['orders']:,} orders, {result['date_from']} to {result['date_to']})")
+        print(f"  Inserted {result['inserted']:,}, updated {result['updated']:,}, "
+              f"unchanged {result['unchanged']:,}, removed {result['removed']:,}")
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(f"\n  Finished in {elapsed:,.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,156 @@
+"""
+Column-oriented row batches for the flatten -> summary -> load path.
+
+flatten_invoice / flatten_item_stock append each line straight into one list
+per column instead of building a dict per line. The loaders feed
+execute_values from zip() over the columns, the summaries aggregate in a
+single pass, and the spool writes the columns to Parquet as-is, so a row is
+never materialised as a dict unless something asks for one (to_dicts()).
+
+    batch = RowBatch(SALES_COLUMNS)
+    batch.append("2026-10-19", "Store A", ...)     # values in column order
+    batch.column("kuantitas")                        # -> list
+    execute_values(cur, sql, batch.tuples(snapshot_date, batch_id))
+"""
+
+from itertools import repeat
+
+
+class RowBatch:
+    """Rows stored as one list per column, appended in lockstep."""
+
+    __slots__ = ("columns", "data", "_appends")
+
+    def __init__(self, columns, data: dict = None):
+        self.columns = tuple(columns)
+        self.data = data if data is not None else {c: [] for c in self.columns}
+        self._appends = tuple(self.data[c].append for c in self.columns)
+
+    @classmethod
+    def from_dicts(cls, columns, rows: list) -> "RowBatch":
+        batch = cls(columns)
+        for row in rows:
+            batch.append(*(row.get(c) for c in batch.columns))
+        return batch
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def __repr__(self):
+        return f"RowBatch({len(self):,} rows x {len(self.columns)} columns)"
+
+    def append(self, *values):
+        for append, value in zip(self._appends, values):
+            append(value)
+
+    def extend(self, other: "RowBatch"):
+        for c in self.columns:
+            self.data[c].extend(other.data[c])
+
+    def truncate(self, length: int):
+        """Drop rows from index `length` on (undo a partially appended record)."""
+        for values in self.data.values():
+            del values[length:]
+
+    def column(self, name: str) -> list:
+        return self.data[name]
+
+    def tuples(self, *extra):
+        """Row tuples in column order, each followed by the constant `extra` values."""
+        return zip(*(self.data[c] for c in self.columns), *(repeat(v) for v in extra))
+
+    def to_dicts(self) -> list:
+        return [dict(zip(self.columns, values)) for values in self.tuples()]
+
+    def head(self, n: int) -> "RowBatch":
+        return self.slice(0, n)
+
+    def slice(self, start: int, stop: int = None) -> "RowBatch":
+        """Copy of rows [start:stop]."""
+        return RowBatch(self.columns, {c: v[start:stop] for c, v in self.data.items()})
+
+    def sort_by(self, *names):
+        """Sort in place by the given columns (None sorts as an empty string)."""
+        keys = [self.data[n] for n in names]
+        order = sorted(range(len(self)), key=lambda i: tuple(k[i] or "" for k in keys))
+        for c in self.columns:
+            values = self.data[c]
+            self.data[c] = [values[i] for i in order]
+        self._appends = tuple(self.data[c].append for c in self.columns)
+
+
+def as_batch(rows, columns) -> RowBatch:
+    """Accept a RowBatch or a list of row dicts (e.g. an older spool segment)."""
+    return rows if isinstance(rows, RowBatch) else RowBatch.from_dicts(columns, rows)
+
+
+class Summary:
+    """
+    Group counts, column sums and distinct counts, accumulated one pass per add().
+
+    add() can be called per chunk (e.g. per fetched item) so the rows themselves
+    need not be kept; result() gives the same numbers as one add() over all rows.
+    """
+
+    def __init__(self, group_by: str, sums=(), distinct=()):
+        self.group_by = group_by
+        self.sums = tuple(sums)
+        self.distinct = tuple(distinct)
+        self.rows = 0
+        self._totals = [0] * len(self.sums)
+        self._seen = [set() for _ in self.distinct]
+        self._groups = {}
+
+    def add(self, batch: RowBatch):
+        n_sums = len(self.sums)
+        groups, totals = self._groups, self._totals
+        columns = (
+            [batch.column(self.group_by)]
+            + [batch.column(c) for c in self.sums]
+            + [batch.column(c) for c in self.distinct]
+        )
+        for key, *values in zip(*columns):
+            measures = [v or 0 for v in values[:n_sums]]
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [1, *measures]
+            else:
+                group[0] += 1
+                for i, v in enumerate(measures, 1):
+                    group[i] += v
+            for i, v in enumerate(measures):
+                totals[i] += v
+            for s, v in zip(self._seen, values[n_sums:]):
+                s.add(v)
+        self.rows += len(batch)
+
+    def result(self) -> dict:
+        """
+        Returns:
+            {"rows": n, "sums": {column: total}, "distinct": {column: count},
+             "groups": {group value: [rows, *sums]}} - groups in first-seen order
+        """
+        return {
+            "rows": self.rows,
+            "sums": dict(zip(self.sums, self._totals)),
+            "distinct": {c: len(s) for c, s in zip(self.distinct, self._seen)},
+            "groups": self._groups,
+        }
+
+
+def summarize(batch: RowBatch, group_by: str, sums=(), distinct=()) -> dict:
+    """Summary.result() of a single batch, computed in one pass."""
+    summary = Summary(group_by, sums, distinct)
+    summary.add(batch)
+    return summary.result()
+
+
+def print_sample(batch: RowBatch, limit: int = 5):
+    """Print the first rows as an aligned text table."""
+    sample = [["" if v is None else str(v) for v in row] for row in batch.head(limit).tuples()]
+    if not sample:
+        return
+    widths = [max(len(c), *(len(row[i]) for row in sample)) for i, c in enumerate(batch.columns)]
+    print(" ".join(c.rjust(w) for c, w in zip(batch.columns, widths)))
+    for row in sample:
+        print(" ".join(v.rjust(w) for v, w in zip(row, widths)))
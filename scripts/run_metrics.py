@@ -0,0 +1,323 @@
+"""
+Per-request and per-phase instrumentation for the pull scripts.
+
+One RunMetrics is active per entity run (see `instrumented`). It collects:
+  - API request latency per endpoint (p50/p95/p99), response bytes, status codes
+  - retry counts and other counters
+  - phase durations (auth, list, detail, flatten, summary, pg_upsert, ...)
+  - rows per phase -> rows/sec
+
+At the end of the run it writes, to OPENCLAW_METRICS_DIR (default: scripts/metrics):
+  - {script}_{entity}.prom              Prometheus textfile (node_exporter collector)
+  - {script}_{entity}_{timestamp}.json  machine-readable run report
+
+Phase timings are also stored in raw.load_history.phase_timings (jsonb, see
+load_history_metrics.sql) via store_phase_timings().
+
+Usage:
+    @run_metrics.instrumented("sales")
+    def sync_entity(entity_key, ...):
+        metrics = run_metrics.active()
+        with metrics.phase("list_pages"):
+            ...
+        metrics.start_phase("summary")   # for long straight-line sections
+        ...
+        metrics.end_phase("summary")
+"""
+
+import os
+import json
+import time
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+
+def _metrics_dir() -> Path:
+    return Path(os.getenv("OPENCLAW_METRICS_DIR", SCRIPT_DIR / "metrics"))
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already-sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class RunMetrics:
+    """Metrics for a single (script, entity) run."""
+
+    def __init__(self, script: str, entity: str):
+        self.script = script
+        self.entity = entity
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self.status = "running"
+        self.phases = {}  # name -> seconds (accumulated)
+        self.phase_rows = {}  # name -> rows processed
+        self._open_phases = {}  # name -> start perf_counter
+        self.requests = {}  # endpoint -> {"latencies": [], "bytes": int, "status": {code: n}}
+        self.counters = {}
+
+    # --- Recording ---
+
+    def start_phase(self, name: str):
+        for listener in _phase_listeners:
+            listener("start", name)
+        self._open_phases[name] = time.perf_counter()
+
+    def end_phase(self, name: str):
+        start = self._open_phases.pop(name, None)
+        if start is not None:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            for listener in _phase_listeners:
+                listener("end", name)
+
+    @contextmanager
+    def phase(self, name: str):
+        self.start_phase(name)
+        try:
+            yield
+        finally:
+            self.end_phase(name)
+
+    def add_rows(self, phase_name: str, rows: int):
+        self.phase_rows[phase_name] = self.phase_rows.get(phase_name, 0) + rows
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe_request(self, endpoint: str, seconds: float, nbytes: int, status):
+        endpoint = endpoint.split("?", 1)[0]
+        stats = self.requests.setdefault(
+            endpoint, {"latencies": [], "bytes": 0, "status": {}}
+        )
+        stats["latencies"].append(seconds)
+        stats["bytes"] += nbytes
+        key = str(status)
+        stats["status"][key] = stats["status"].get(key, 0) + 1
+
+    # --- Reporting ---
+
+    def phase_timings(self) -> dict:
+        """Phase durations in seconds, including phases still in progress."""
+        now = time.perf_counter()
+        timings = dict(self.phases)
+        for name, start in self._open_phases.items():
+            timings[name] = timings.get(name, 0.0) + now - start
+        return {name: round(seconds, 3) for name, seconds in timings.items()}
+
+    def report(self) -> dict:
+        timings = self.phase_timings()
+        requests_report = {}
+        for endpoint, stats in self.requests.items():
+            latencies = sorted(stats["latencies"])
+            requests_report[endpoint] = {
+                "count": len(latencies),
+                "bytes": stats["bytes"],
+                "status": stats["status"],
+                "latency_sum_s": round(sum(latencies), 3),
+                "p50_s": round(_percentile(latencies, 50), 4),
+                "p95_s": round(_percentile(latencies, 95), 4),
+                "p99_s": round(_percentile(latencies, 99), 4),
+                "max_s": round(latencies[-1], 4) if latencies else 0.0,
+            }
+        rows_per_sec = {
+            name: round(rows / timings[name], 1)
+            for name, rows in self.phase_rows.items()
+            if timings.get(name)
+        }
+        return {
+            "script": self.script,
+            "entity": self.entity,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_time_s": round(time.perf_counter() - self._t0, 3),
+            "phases_s": timings,
+            "phase_rows": self.phase_rows,
+            "rows_per_sec": rows_per_sec,
+            "requests": requests_report,
+            "counters": self.counters,
+        }
+
+    def to_prometheus(self, report: dict = None) -> str:
+        report = report or self.report()
+        base = f'script="{self.script}",entity="{self.entity}"'
+        lines = [
+            "# HELP openclaw_pull_wall_seconds Wall time of the last run",
+            "# TYPE openclaw_pull_wall_seconds gauge",
+            f"openclaw_pull_wall_seconds{{{base}}} {report['wall_time_s']}",
+            "# HELP openclaw_pull_success 1 if the last run succeeded",
+            "# TYPE openclaw_pull_success gauge",
+            f"openclaw_pull_success{{{base}}} {1 if self.status == 'success' else 0}",
+            "# HELP openclaw_pull_last_run_timestamp_seconds Start time of the last run",
+            "# TYPE openclaw_pull_last_run_timestamp_seconds gauge",
+            f"openclaw_pull_last_run_timestamp_seconds{{{base}}} {int(self.started_at.timestamp())}",
+            "# HELP openclaw_pull_phase_seconds Duration per phase",
+            "# TYPE openclaw_pull_phase_seconds gauge",
+        ]
+        for name, seconds in report["phases_s"].items():
+            lines.append(f'openclaw_pull_phase_seconds{{{base},phase="{name}"}} {seconds}')
+        lines += [
+            "# HELP openclaw_pull_phase_rows Rows processed per phase",
+            "# TYPE openclaw_pull_phase_rows gauge",
+        ]
+        for name, rows in report["phase_rows"].items():
+            lines.append(f'openclaw_pull_phase_rows{{{base},phase="{name}"}} {rows}')
+        lines += [
+            "# HELP openclaw_api_request_seconds Accurate API request latency",
+            "# TYPE openclaw_api_request_seconds summary",
+        ]
+        for endpoint, stats in report["requests"].items():
+            labels = f'{base},endpoint="{endpoint}"'
+            for q, key in (("0.5", "p50_s"), ("0.95", "p95_s"), ("0.99", "p99_s")):
+                lines.append(f'openclaw_api_request_seconds{{{labels},quantile="{q}"}} {stats[key]}')
+            lines.append(f"openclaw_api_request_seconds_sum{{{labels}}} {stats['latency_sum_s']}")
+            lines.append(f"openclaw_api_request_seconds_count{{{labels}}} {stats['count']}")
+        lines += [
+            "# HELP openclaw_api_response_bytes_total Accurate API response bytes",
+            "# TYPE openclaw_api_response_bytes_total counter",
+        ]
+        for endpoint, stats in report["requests"].items():
+            lines.append(
+                f'openclaw_api_response_bytes_total{{{base},endpoint="{endpoint}"}} {stats["bytes"]}'
+            )
+        lines += [
+            "# HELP openclaw_pull_events_total Run counters (retries, errors, ...)",
+            "# TYPE openclaw_pull_events_total counter",
+        ]
+        for name, value in report["counters"].items():
+            lines.append(f'openclaw_pull_events_total{{{base},event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Write Prometheus textfile + JSON report (best-effort)."""
+        report = self.report()
+        out_dir = _metrics_dir()
+        try:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            prom_path = out_dir / f"{self.script}_{self.entity}.prom"
+            tmp_path = prom_path.with_suffix(".tmp")
+            tmp_path.write_text(self.to_prometheus(report))
+            os.replace(tmp_path, prom_path)
+
+            stamp = self.started_at.strftime("%Y%m%d_%H%M%S")
+            json_path = out_dir / f"{self.script}_{self.entity}_{stamp}.json"
+            json_path.write_text(json.dumps(report, indent=2))
+            print(f"  Metrics: {json_path}")
+        except OSError as e:
+            print(f"  Warning: could not write metrics: {e}")
+        return report
+
+    def store_phase_timings(self, cur, batch_id: str):
+        """Attach phase timings to the raw.load_history row(s) of this batch.
+
+        Runs under a SAVEPOINT so a missing phase_timings column (migration not
+        applied) never fails the load itself.
+        """
+        cur.execute("SAVEPOINT phase_timings")  # Outside the try: nothing to roll back to if it fails
+        try:
+            cur.execute(
+                "UPDATE raw.load_history SET phase_timings = %s WHERE batch_id = %s",
+                (json.dumps(self.phase_timings()), batch_id),
+            )
+            cur.execute("RELEASE SAVEPOINT phase_timings")
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT phase_timings")
+            print(f"  Warning: could not store phase timings: {e}")
+
+
+class _NullMetrics(RunMetrics):
+    """Accepts every call, records nothing (used outside instrumented runs)."""
+
+    def __init__(self):
+        super().__init__("none", "none")
+
+    def start_phase(self, name: str):
+        pass
+
+    def end_phase(self, name: str):
+        pass
+
+    @contextmanager
+    def phase(self, name: str):
+        yield
+
+    def add_rows(self, phase_name: str, rows: int):
+        pass
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def observe_request(self, endpoint: str, seconds: float, nbytes: int, status):
+        pass
+
+    def write(self):
+        return {}
+
+    def store_phase_timings(self, cur, batch_id: str):
+        pass
+
+
+_NULL = _NullMetrics()
+_active = None
+_last = None
+_phase_listeners = []  # callables (event, phase_name), e.g. run_profile.PhaseMemory
+
+
+def add_phase_listener(listener):
+    _phase_listeners.append(listener)
+
+
+def remove_phase_listener(listener):
+    if listener in _phase_listeners:
+        _phase_listeners.remove(listener)
+
+
+def last() -> RunMetrics:
+    """The most recently finished RunMetrics (None before any run finishes)."""
+    return _last
+
+
+def active() -> RunMetrics:
+    """The RunMetrics of the current entity run (no-op outside a run)."""
+    return _active or _NULL
+
+
+def phase(name: str):
+    return active().phase(name)
+
+
+def instrumented(script: str):
+    """Decorator: run the wrapped entity function under a fresh RunMetrics.
+
+    The entity key is taken from the first positional argument. The run is
+    marked "success" unless the function raises or returns False.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(entity_key, *args, **kwargs):
+            global _active, _last
+            previous = _active
+            metrics = RunMetrics(script, entity_key)
+            _active = metrics
+            try:
+                result = func(entity_key, *args, **kwargs)
+                metrics.status = "error" if result is False else "success"
+                return result
+            except BaseException:
+                metrics.status = "error"
+                raise
+            finally:
+                _active = previous
+                _last = metrics
+                metrics.write()
+
+        return wrapper
+
+    return decorator
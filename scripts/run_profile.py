@@ -0,0 +1,170 @@
+"""
+--profile support for the pull scripts.
+
+Wraps a whole CLI run with:
+  - cProfile (deterministic)  -> {script}_{ts}_hotspots.txt   (sorted by tottime + cumtime)
+  - a stack sampler thread    -> {script}_{ts}.folded         (collapsed stacks for
+                                 flamegraph.pl / speedscope / inferno)
+  - tracemalloc               -> {script}_{ts}_memory.txt     (peak per run_metrics phase
+                                 + top allocation sites)
+
+Files go to OPENCLAW_PROFILE_DIR (default: scripts/profiles).
+
+Usage:
+    with run_profile.profiling("sales", enabled=args.profile):
+        ...
+"""
+
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import run_metrics
+
+SCRIPT_DIR = Path(__file__).parent
+
+SAMPLE_INTERVAL = 0.005  # 5 ms
+
+
+def _profile_dir() -> Path:
+    return Path(os.getenv("OPENCLAW_PROFILE_DIR", SCRIPT_DIR / "profiles"))
+
+
+class StackSampler(threading.Thread):
+    """Samples the main thread's stack and counts collapsed stacks."""
+
+    def __init__(self, target_thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(parts))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class PhaseMemory:
+    """run_metrics phase listener: tracemalloc peak per phase (bytes, max over runs).
+
+    Every phase start resets tracemalloc's peak, so the peak seen so far is
+    folded first into the running whole-run peak (`run_peak`) and into the
+    phases still open (nested phases).
+    """
+
+    def __init__(self):
+        self.peaks = {}
+        self.run_peak = 0
+        self._open = []  # [name, peak so far] per open phase, outermost first
+
+    def _fold(self) -> int:
+        _, peak = tracemalloc.get_traced_memory()
+        self.run_peak = max(self.run_peak, peak)
+        for entry in self._open:
+            entry[1] = max(entry[1], peak)
+        return peak
+
+    def __call__(self, event: str, name: str):
+        if not tracemalloc.is_tracing():
+            return
+        self._fold()
+        if event == "start":
+            tracemalloc.reset_peak()
+            self._open.append([name, 0])
+        else:
+            for i in range(len(self._open) - 1, -1, -1):
+                if self._open[i][0] == name:
+                    _, peak = self._open.pop(i)
+                    self.peaks[name] = max(self.peaks.get(name, 0), peak)
+                    break
+
+
+def _hotspot_report(profiler: cProfile.Profile, limit: int = 40) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out).strip_dirs()
+    out.write("=== Top functions by own time (tottime) ===\n")
+    stats.sort_stats("tottime").print_stats(limit)
+    out.write("\n=== Top functions by cumulative time (cumtime) ===\n")
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def _memory_report(phase_memory: PhaseMemory, snapshot, peak: int, limit: int = 20) -> str:
+    lines = [f"Peak traced memory (whole run): {peak / 1024 / 1024:,.1f} MiB", ""]
+    lines.append("Peak traced memory per phase:")
+    for name, phase_peak in sorted(phase_memory.peaks.items(), key=lambda kv: -kv[1]):
+        lines.append(f"  {name:<20} {phase_peak / 1024 / 1024:>10,.1f} MiB")
+    lines += ["", f"Top {limit} allocation sites at exit:"]
+    for stat in snapshot.statistics("lineno")[:limit]:
+        lines.append(f"  {stat}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profiling(script: str, enabled: bool = True):
+    """Profile the enclosed block; no-op when enabled is False."""
+    if not enabled:
+        yield
+        return
+
+    out_dir = _profile_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    prefix = out_dir / f"{script}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    phase_memory = PhaseMemory()
+    run_metrics.add_phase_listener(phase_memory)
+    tracemalloc.start(10)
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    profiler = cProfile.Profile()
+    wall_start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - wall_start
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        phase_memory._fold()
+        peak = phase_memory.run_peak
+        tracemalloc.stop()
+        run_metrics.remove_phase_listener(phase_memory)
+
+        hotspots_path = Path(f"{prefix}_hotspots.txt")
+        hotspots_path.write_text(f"Wall time: {wall:,.2f}s\n\n" + _hotspot_report(profiler))
+        folded_path = Path(f"{prefix}.folded")
+        folded_path.write_text(sampler.folded())
+        memory_path = Path(f"{prefix}_memory.txt")
+        memory_path.write_text(_memory_report(phase_memory, snapshot, peak))
+        profiler.dump_stats(f"{prefix}.pstats")
+
+        print("\nProfile written:")
+        print(f"  Hotspots:   {hotspots_path}")
+        print(f"  Flamegraph: {folded_path}  (flamegraph.pl {folded_path.name} > flame.svg)")
+        print(f"  Memory:     {memory_path}  (peak {peak / 1024 / 1024:,.1f} MiB)")
@@ -0,0 +1,225 @@
+-- ============================================================
+-- DAILY SALES ROLLUP - core.fact_sales_daily
+-- Grain: entity x tanggal x nama_departemen x kode_produk
+--
+-- Maintained by statement triggers on raw.accurate_sales_{ddd,mbb,ubb} (on the
+-- partitioned parent once entity_partitions.sql is applied), so every loader
+-- (daily API sync, historical report export) keeps it current without extra
+-- code. Each statement recomputes the keys it touched from the raw rows.
+-- Each invoice line (nomor_invoice, kode_produk, tanggal) counts ONCE, using
+-- its most recent snapshot_date - snapshot copies do not inflate the totals.
+--
+-- Apply once:   psql -d openclaw_ops -f scripts/sales_rollup.sql
+-- Rebuild:      SELECT core.rebuild_fact_sales_daily('ddd');
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS core.fact_sales_daily (
+    entity          text          NOT NULL,
+    tanggal         date          NOT NULL,
+    nama_departemen text          NOT NULL,
+    kode_produk     text          NOT NULL,
+    kuantitas       numeric       NOT NULL DEFAULT 0,
+    total_harga     numeric       NOT NULL DEFAULT 0,
+    dpp_amount      numeric(15,2) NOT NULL DEFAULT 0,
+    tax_amount      numeric(15,2) NOT NULL DEFAULT 0,
+    line_count      integer       NOT NULL DEFAULT 0,
+    updated_at      timestamptz   NOT NULL DEFAULT now(),
+    PRIMARY KEY (entity, tanggal, nama_departemen, kode_produk)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fact_sales_daily_tanggal
+    ON core.fact_sales_daily (tanggal);
+
+-- ============================================================
+-- KEY REFRESH
+-- Recomputes the given (tanggal, kode_produk) keys of one entity from
+-- the raw rows, each invoice line at its latest snapshot. Reads through
+-- raw.accurate_sales_<entity>, which carries nama_departemen in every
+-- layout (table, partition view, narrow view). Keys must be distinct.
+--
+-- Concurrent loaders of one entity are serialized on a transaction-level
+-- advisory lock: under READ COMMITTED the statements after it take fresh
+-- snapshots, so the recompute sees rows the other session committed
+-- meanwhile instead of overwriting its totals with an aggregate without them.
+-- ============================================================
+
+DROP FUNCTION IF EXISTS core.apply_sales_daily_delta(text, record, integer);
+
+CREATE OR REPLACE FUNCTION core.refresh_fact_sales_daily(
+    p_entity      text,
+    p_tanggal     date[],
+    p_kode_produk text[]
+) RETURNS void AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('fact_sales_daily:' || p_entity));
+
+    DELETE FROM core.fact_sales_daily f
+     USING unnest(p_tanggal, p_kode_produk) AS k(tanggal, kode_produk)
+     WHERE f.entity = p_entity
+       AND f.tanggal = k.tanggal
+       AND f.kode_produk = k.kode_produk;
+
+    EXECUTE format(
+        'INSERT INTO core.fact_sales_daily AS f
+            (entity, tanggal, nama_departemen, kode_produk,
+             kuantitas, total_harga, dpp_amount, tax_amount, line_count)
+         SELECT $1, tanggal, COALESCE(nama_departemen, ''UNKNOWN''), kode_produk,
+                SUM(COALESCE(kuantitas, 0)), SUM(COALESCE(total_harga, 0)),
+                SUM(COALESCE(dpp_amount, 0)), SUM(COALESCE(tax_amount, 0)),
+                COUNT(*)
+           FROM (
+               SELECT DISTINCT ON (s.nomor_invoice, s.kode_produk, s.tanggal) s.*
+                 FROM %s s
+                 JOIN unnest($2, $3) AS k(tanggal, kode_produk)
+                   ON s.tanggal = k.tanggal AND s.kode_produk = k.kode_produk
+                ORDER BY s.nomor_invoice, s.kode_produk, s.tanggal, s.snapshot_date DESC
+           ) latest
+          GROUP BY tanggal, COALESCE(nama_departemen, ''UNKNOWN''), kode_produk
+         ON CONFLICT (entity, tanggal, nama_departemen, kode_produk)
+         DO UPDATE SET
+            kuantitas   = EXCLUDED.kuantitas,
+            total_harga = EXCLUDED.total_harga,
+            dpp_amount  = EXCLUDED.dpp_amount,
+            tax_amount  = EXCLUDED.tax_amount,
+            line_count  = EXCLUDED.line_count,
+            updated_at  = now()',
+        'raw.accurate_sales_' || p_entity)
+    USING p_entity, p_tanggal, p_kode_produk;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================
+-- STATEMENT TRIGGERS
+-- TG_ARGV[0] = entity key (ddd, mbb, ubb) on a per-entity table; on the
+-- partitioned parent there is no argument and the rows carry `entity`.
+--
+-- Every key touched by the statement (old and new rows) is recomputed
+-- once, after the statement: however many snapshots of a line one
+-- statement inserts or deletes, the key ends at the latest remaining one.
+-- A trigger with transition tables takes a single event, hence three.
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION core.trg_fact_sales_daily() RETURNS trigger AS $$
+DECLARE
+    v_source  text;
+    v_entity  text;
+    v_tanggal date[];
+    v_kode    text[];
+BEGIN
+    v_source := CASE TG_OP
+        WHEN 'INSERT' THEN 'new_rows'
+        WHEN 'DELETE' THEN 'old_rows'
+        ELSE '(SELECT * FROM old_rows UNION ALL SELECT * FROM new_rows)'
+    END;
+
+    FOR v_entity, v_tanggal, v_kode IN EXECUTE format(
+        'SELECT entity, array_agg(tanggal), array_agg(kode_produk)
+           FROM (SELECT DISTINCT %s AS entity, r.tanggal, r.kode_produk FROM %s r) k
+          GROUP BY entity',
+        CASE WHEN TG_NARGS > 0 THEN quote_literal(TG_ARGV[0]) ELSE 'r.entity' END,
+        v_source)
+    LOOP
+        PERFORM core.refresh_fact_sales_daily(v_entity, v_tanggal, v_kode);
+    END LOOP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION core.detach_fact_sales_daily(p_table text) RETURNS void AS $$
+DECLARE
+    v_name text;
+BEGIN
+    -- trg_fact_sales_daily: the row trigger of earlier versions
+    FOREACH v_name IN ARRAY ARRAY['trg_fact_sales_daily', 'trg_fact_sales_daily_ins',
+                                  'trg_fact_sales_daily_upd', 'trg_fact_sales_daily_del'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %s', v_name, p_table);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- p_entity: the entity of a per-entity table, NULL for the partitioned parent
+CREATE OR REPLACE FUNCTION core.attach_fact_sales_daily(p_table text, p_entity text DEFAULT NULL)
+RETURNS void AS $$
+DECLARE
+    v_args text := COALESCE(quote_literal(p_entity), '');
+BEGIN
+    PERFORM core.detach_fact_sales_daily(p_table);
+    EXECUTE format(
+        'CREATE TRIGGER trg_fact_sales_daily_ins AFTER INSERT ON %s '
+        'REFERENCING NEW TABLE AS new_rows '
+        'FOR EACH STATEMENT EXECUTE FUNCTION core.trg_fact_sales_daily(%s)',
+        p_table, v_args);
+    EXECUTE format(
+        'CREATE TRIGGER trg_fact_sales_daily_upd AFTER UPDATE ON %s '
+        'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+        'FOR EACH STATEMENT EXECUTE FUNCTION core.trg_fact_sales_daily(%s)',
+        p_table, v_args);
+    EXECUTE format(
+        'CREATE TRIGGER trg_fact_sales_daily_del AFTER DELETE ON %s '
+        'REFERENCING OLD TABLE AS old_rows '
+        'FOR EACH STATEMENT EXECUTE FUNCTION core.trg_fact_sales_daily(%s)',
+        p_table, v_args);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Per-entity tables, or the partitioned parent once entity_partitions.sql is
+-- applied: statements through the per-entity views, and the loaders, target
+-- the parent, and statement triggers on a partition would not fire for them
+DO $$
+DECLARE
+    v_entity text;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('raw.accurate_sales')) = 'p' THEN
+        FOREACH v_entity IN ARRAY ARRAY['ddd', 'mbb', 'ubb'] LOOP
+            IF to_regclass('raw.accurate_sales_part_' || v_entity) IS NOT NULL THEN
+                PERFORM core.detach_fact_sales_daily('raw.accurate_sales_part_' || v_entity);
+            END IF;
+        END LOOP;
+        PERFORM core.attach_fact_sales_daily('raw.accurate_sales');
+    ELSE
+        FOREACH v_entity IN ARRAY ARRAY['ddd', 'mbb', 'ubb'] LOOP
+            PERFORM core.attach_fact_sales_daily('raw.accurate_sales_' || v_entity, v_entity);
+        END LOOP;
+    END IF;
+END $$;
+
+-- ============================================================
+-- FULL REBUILD (initial backfill, or after bulk maintenance)
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION core.rebuild_fact_sales_daily(p_entity text)
+RETURNS integer AS $$
+DECLARE
+    v_rows integer;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('fact_sales_daily:' || p_entity));  -- As the key refresh
+
+    DELETE FROM core.fact_sales_daily WHERE entity = p_entity;
+
+    EXECUTE format(
+        'INSERT INTO core.fact_sales_daily
+            (entity, tanggal, nama_departemen, kode_produk,
+             kuantitas, total_harga, dpp_amount, tax_amount, line_count)
+         SELECT $1, tanggal, COALESCE(nama_departemen, ''UNKNOWN''), kode_produk,
+                SUM(COALESCE(kuantitas, 0)), SUM(COALESCE(total_harga, 0)),
+                SUM(COALESCE(dpp_amount, 0)), SUM(COALESCE(tax_amount, 0)),
+                COUNT(*)
+           FROM (
+               SELECT DISTINCT ON (nomor_invoice, kode_produk, tanggal) *
+                 FROM %s
+                ORDER BY nomor_invoice, kode_produk, tanggal, snapshot_date DESC
+           ) latest
+          GROUP BY tanggal, COALESCE(nama_departemen, ''UNKNOWN''), kode_produk',
+        'raw.accurate_sales_' || p_entity)
+    USING p_entity;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Initial backfill
+SELECT core.rebuild_fact_sales_daily('ddd');
+SELECT core.rebuild_fact_sales_daily('mbb');
+SELECT core.rebuild_fact_sales_daily('ubb');
@@ -0,0 +1,285 @@
+"""
+Durable local spool for fetched-but-unloaded batches.
+
+When the PostgreSQL upload of a pull fails, the flattened rows (and whatever
+else the load needs: item-master records, dead letters) are written here
+instead of being lost. The next run of the same script replays pending
+segments into PostgreSQL before fetching anything new, so a DB outage never
+costs an API re-pull.
+
+Layout (OPENCLAW_SPOOL_DIR, default: scripts/spool):
+    sales_ddd_accurate_sales_ddd_20261019_060000/
+        rows.parquet        flattened rows (one file per table in the segment)
+        items.parquet       optional extra tables (e.g. item master)
+        manifest.json       entity, kind, batch_id, snapshot_date, row counts,
+                            format, replay attempts - written last
+
+A segment is built in a hidden temp directory and renamed into place, so a
+directory with a manifest.json is always complete. Tables are Parquet (zstd,
+dictionary-encoded) when pyarrow is installed, gzip'd JSON lines otherwise.
+"""
+
+import os
+import json
+import gzip
+import shutil
+from datetime import date, datetime
+from pathlib import Path
+
+import pg_pool
+import row_batch
+
+SCRIPT_DIR = Path(__file__).parent
+
+KIND_SALES = "sales"
+KIND_STOCK = "stock"
+
+# Kinds whose segment is a whole snapshot (replaced, not merged, on load): only
+# the newest segment per snapshot is replayed. Sales segments each cover their
+# own date window and are all replayed, staleness decided per row by the loader.
+WHOLE_SNAPSHOT_KINDS = (KIND_STOCK,)
+
+MANIFEST = "manifest.json"
+
+
+def _spool_dir() -> Path:
+    return Path(os.getenv("OPENCLAW_SPOOL_DIR", SCRIPT_DIR / "spool"))
+
+
+def _pyarrow():
+    """(pyarrow, pyarrow.parquet), or None. Imported on first use - pyarrow is
+    slow to import and most runs never spool anything."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # Optional - JSON-lines fallback
+        return None
+    return pa, pq
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _write_table(path: Path, rows, fmt: str):
+    """rows: a row_batch.RowBatch (written column by column) or a list of dicts."""
+    columnar = isinstance(rows, row_batch.RowBatch)
+    if fmt == "parquet":
+        pa, pq = _pyarrow()
+        table = pa.table(rows.data) if columnar else pa.Table.from_pylist(rows)
+        pq.write_table(table, path, compression="zstd", use_dictionary=True)
+    else:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for row in rows.to_dicts() if columnar else rows:
+                f.write(json.dumps(row, default=_json_default) + "\n")
+
+
+def _read_table(path: Path, fmt: str, columns: list = None):
+    """A RowBatch when the table was written from one (columns given), else a list of dicts."""
+    if fmt == "parquet":
+        _, pq = _pyarrow()
+        table = pq.read_table(path)
+        if columns:
+            return row_batch.RowBatch(columns, table.to_pydict())
+        return table.to_pylist()
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return row_batch.RowBatch.from_dicts(columns, rows) if columns else rows
+
+
+class Segment:
+    """One spooled batch on disk."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.manifest = json.loads((path / MANIFEST).read_text())
+
+    def __repr__(self):
+        return f"Segment({self.path.name})"
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromisoformat(self.manifest["created_at"])
+
+    def read(self, table: str = "rows"):
+        """The table as written: a RowBatch or a list of dicts ([] if absent)."""
+        info = self.manifest["tables"].get(table)
+        if not info:
+            return []
+        return _read_table(self.path / info["file"], self.manifest["format"], info.get("columns"))
+
+    def read_dicts(self, table: str = "rows") -> list:
+        rows = self.read(table)
+        return rows.to_dicts() if isinstance(rows, row_batch.RowBatch) else rows
+
+    def record_attempt(self, error: Exception):
+        """Bump replay_attempts / last_error in the manifest (atomically)."""
+        self.manifest["replay_attempts"] = self.manifest.get("replay_attempts", 0) + 1
+        self.manifest["last_error"] = str(error)[:500]
+        tmp = self.path / (MANIFEST + ".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=2, default=_json_default))
+        os.replace(tmp, self.path / MANIFEST)
+
+    def remove(self):
+        """Drop the segment once its rows are committed to PostgreSQL."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def write_segment(kind: str, entity_key: str, batch_id: str, tables: dict, **meta) -> Path:
+    """
+    Spool a batch: tables = {"rows": RowBatch, "items": [...], ...} (row batches
+    or lists of dicts).
+
+    Extra keyword arguments (snapshot_date, date_from, failures, ...) go into the
+    manifest. Returns the segment directory.
+    """
+    root = _spool_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    fmt = "parquet" if _pyarrow() else "jsonl.gz"
+    name = f"{kind}_{entity_key}_{batch_id}"
+    tmp_dir = root / f".tmp-{name}-{os.getpid()}"
+    final_dir = root / name
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir()
+
+    table_info = {}
+    for table_name, rows in tables.items():
+        if not len(rows):
+            continue
+        file_name = f"{table_name}.{fmt}"
+        _write_table(tmp_dir / file_name, rows, fmt)
+        table_info[table_name] = {"file": file_name, "rows": len(rows)}
+        if isinstance(rows, row_batch.RowBatch):
+            table_info[table_name]["columns"] = list(rows.columns)
+
+    manifest = {
+        "kind": kind,
+        "entity": entity_key,
+        "batch_id": batch_id,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "format": fmt,
+        "tables": table_info,
+        "replay_attempts": 0,
+        **meta,
+    }
+    (tmp_dir / MANIFEST).write_text(json.dumps(manifest, indent=2, default=_json_default))
+    os.rename(tmp_dir, final_dir)
+    return final_dir
+
+
+def pending(kind: str, entity_key: str = None) -> list:
+    """Complete segments of a kind (optionally one entity), oldest first."""
+    root = _spool_dir()
+    if not root.exists():
+        return []
+    segments = []
+    for path in root.iterdir():
+        if path.name.startswith(".") or not (path / MANIFEST).exists():
+            continue
+        try:
+            segment = Segment(path)
+        except (OSError, ValueError) as e:
+            print(f"  Warning: unreadable spool segment {path.name}: {e}")
+            continue
+        if segment.manifest["kind"] != kind:
+            continue
+        if entity_key and segment.manifest["entity"] != entity_key:
+            continue
+        segments.append(segment)
+    return sorted(segments, key=lambda s: s.manifest["created_at"])
+
+
+def superseded(cur, table: str, snapshot_date, created_at: datetime) -> bool:
+    """True if the snapshot in PostgreSQL was loaded after the segment was spooled.
+
+    Replaying such a segment would overwrite newer data with older data. Only
+    meaningful for WHOLE_SNAPSHOT_KINDS: any write under the snapshot date
+    counts, whatever rows it covered.
+    """
+    cur.execute(
+        f"SELECT max(loaded_at) FROM {table} WHERE snapshot_date = %s", (snapshot_date,)
+    )
+    latest = cur.fetchone()[0]
+    if latest is None:
+        return False
+    if latest.tzinfo is not None:
+        latest = latest.astimezone().replace(tzinfo=None)
+    return latest > created_at
+
+
+def _snapshot_key(segment: Segment) -> tuple:
+    return segment.manifest["entity"], segment.manifest.get("snapshot_date")
+
+
+def replay(kind: str, entity_keys: list, connect, load_segment) -> bool:
+    """
+    Load pending segments into PostgreSQL, oldest first, one transaction each.
+
+    For WHOLE_SNAPSHOT_KINDS only the newest segment of each (entity,
+    snapshot_date) is loaded; the older ones are dropped with it. Loading an
+    older one first would make the newer one look superseded (its snapshot
+    would have been loaded after it was spooled).
+
+    Args:
+        connect: () -> psycopg2 connection (the script's get_pg_connection),
+            handed back with pg_pool.release()
+        load_segment: (cur, segment) -> rows loaded, or None if the segment is
+            superseded and should just be dropped
+
+    Returns:
+        True if nothing is left pending
+    """
+    segments = [s for key in entity_keys for s in pending(kind, key)]
+    if not segments:
+        return True
+    pending_count = len(segments)
+    older = {}  # newest segment path -> older segments of its snapshot
+    if kind in WHOLE_SNAPSHOT_KINDS:
+        newest = {_snapshot_key(s): s for s in segments}  # Oldest first: the last one wins
+        for segment in segments:
+            latest = newest[_snapshot_key(segment)]
+            if latest is not segment:
+                older.setdefault(latest.path, []).append(segment)
+        segments = [s for s in segments if newest[_snapshot_key(s)] is s]
+
+    print(f"\n{'=' * 60}")
+    print(f"  SPOOL REPLAY: {pending_count} pending {kind} segment(s)")
+    print(f"{'=' * 60}")
+
+    try:
+        conn = connect()
+    except Exception as e:
+        print(f"  PostgreSQL still unavailable, segments kept: {e}")
+        return False
+
+    remaining = 0
+    try:
+        for i, segment in enumerate(segments):
+            try:
+                with conn.cursor() as cur:
+                    loaded = load_segment(cur, segment)
+                conn.commit()
+            except Exception as e:
+                usable = pg_pool.rollback(conn)
+                segment.record_attempt(e)
+                remaining += 1 + len(older.get(segment.path, []))
+                print(f"  {segment.path.name}: replay failed (attempt {segment.manifest['replay_attempts']}): {e}")
+                if not usable:  # Connection lost: keep the rest for the next run
+                    kept = segments[i + 1:]
+                    remaining += sum(1 + len(older.get(s.path, [])) for s in kept)
+                    print(f"  PostgreSQL connection lost, {len(kept)} segment(s) kept")
+                    break
+                continue
+            if loaded is None:
+                print(f"  {segment.path.name}: superseded by a newer load, dropped")
+            else:
+                print(f"  {segment.path.name}: {loaded:,} rows loaded")
+            segment.remove()
+            for stale in older.get(segment.path, []):
+                print(f"  {stale.path.name}: superseded by {segment.path.name}, dropped")
+                stale.remove()
+    finally:
+        pg_pool.release(conn)
+    return remaining == 0
@@ -0,0 +1,159 @@
+"""
+Streaming file writers for local exports (pull_accurate_stock.py --local-only / --output).
+
+Rows are appended as they are fetched instead of being written in one go at
+the end, and memory stays flat: nothing is buffered beyond one Parquet row
+group. The format follows the file extension:
+
+    .xlsx      openpyxl write-only workbook (rows streamed to a temp file)
+    .csv       plain CSV
+    .csv.gz    gzip'd CSV
+    .parquet   pyarrow ParquetWriter, zstd, one row group per ROW_GROUP_ROWS
+
+The file is written as <name>.partial and renamed on close(), so an
+interrupted run never leaves a truncated file under the final name.
+"""
+
+import os
+import abc
+import csv
+import gzip
+from pathlib import Path
+
+import row_batch
+
+ROW_GROUP_ROWS = 64 * 1024
+
+FORMATS = (".xlsx", ".csv", ".csv.gz", ".parquet")
+
+
+def _format(path: Path) -> str:
+    name = path.name.lower()
+    for suffix in FORMATS:
+        if name.endswith(suffix):
+            return suffix
+    raise ValueError(f"Unsupported export format: {path.name} (use {', '.join(FORMATS)})")
+
+
+class _Writer(abc.ABC):
+    def __init__(self, path: Path, columns: tuple):
+        self.path = Path(path)
+        self.columns = tuple(columns)
+        self.partial = self.path.with_name(self.path.name + ".partial")
+        self.rows = 0
+
+    @abc.abstractmethod
+    def write(self, rows):
+        """Append row tuples (in column order)."""
+
+    @abc.abstractmethod
+    def _finish(self):
+        """Flush and close the .partial file."""
+
+    def close(self) -> Path:
+        self._finish()
+        os.replace(self.partial, self.path)
+        return self.path
+
+    def abort(self):
+        """Drop the .partial file (the run failed or produced no rows)."""
+        try:
+            self._finish()
+        except Exception:
+            pass  # Half-written file, deleted below; keep the caller's error
+        finally:
+            self.partial.unlink(missing_ok=True)
+
+
+class _CsvWriter(_Writer):
+    def __init__(self, path, columns, compress: bool):
+        super().__init__(path, columns)
+        if compress:
+            self._file = gzip.open(self.partial, "wt", encoding="utf-8", newline="")
+        else:
+            self._file = open(self.partial, "w", encoding="utf-8", newline="")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(self.columns)
+
+    def write(self, rows):
+        for row in rows:
+            self._csv.writerow(row)
+            self.rows += 1
+
+    def _finish(self):
+        self._file.close()
+
+
+class _XlsxWriter(_Writer):
+    def __init__(self, path, columns, sheet: str = "Sheet1"):
+        super().__init__(path, columns)
+        from openpyxl import Workbook  # Only xlsx exports need openpyxl
+
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(sheet)
+        self._sheet.append(self.columns)
+
+    def write(self, rows):
+        for row in rows:
+            self._sheet.append(row)
+            self.rows += 1
+
+    def _finish(self):
+        self._workbook.save(self.partial)
+
+
+class _ParquetWriter(_Writer):
+    def __init__(self, path, columns, types: dict = None):
+        super().__init__(path, columns)
+        import pyarrow as pa  # Only Parquet exports need pyarrow
+        import pyarrow.parquet as pq
+
+        arrow_types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+        self._pa = pa
+        self._schema = pa.schema(
+            [(c, arrow_types[(types or {}).get(c, "str")]) for c in self.columns]
+        )
+        self._writer = pq.ParquetWriter(
+            self.partial, self._schema, compression="zstd", use_dictionary=True
+        )
+        self._buffer = row_batch.RowBatch(self.columns)
+
+    def write(self, rows):
+        for row in rows:
+            self._buffer.append(*row)
+            self.rows += 1
+        if len(self._buffer) >= ROW_GROUP_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if len(self._buffer):
+            arrays = [
+                self._pa.array(self._buffer.column(f.name), type=f.type) for f in self._schema
+            ]
+            self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+            self._buffer.truncate(0)
+
+    def _finish(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_writer(path, columns, types: dict = None):
+    """
+    Streaming writer for `path`, format chosen by extension.
+
+    Args:
+        columns: column names (header / schema)
+        types: {column: "int" | "float" | "str"} for typed formats (Parquet); default str
+
+    Raises:
+        ValueError: unsupported extension
+    """
+    path = Path(path)
+    fmt = _format(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == ".xlsx":
+        return _XlsxWriter(path, columns)
+    if fmt == ".parquet":
+        return _ParquetWriter(path, columns, types)
+    return _CsvWriter(path, columns, compress=fmt == ".csv.gz")
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for a scratch benchmark database.
+
+Fills portal.* and raw.* (see bench_schema.sql) with data shaped like
+production, at a chosen scale, so bench_queries.py can time the maintenance
+queries, core views and planned mart reports before production grows into them.
+
+Realism knobs that matter for query plans:
+  - SKUs: {gender}1{series}{article}{size suffix}, e.g. L1CA0042Z38; the last 3
+    chars are the size (see schema reference section 10). Article popularity is
+    Zipf-distributed, middle sizes sell most. ~1% of raw codes carry case /
+    whitespace noise, ~0.5% are not in portal.kodemix at all.
+  - Stores: portal.store holds the canonical nama_accurate; raw sales use the
+    variants from section 11 (case, abbreviation, short name, trailing space).
+  - Snapshot duplicates: the daily sales sync re-pulls the last N days, so
+    every invoice line appears in N snapshot_dates (with occasional quantity
+    corrections). Stock is a full snapshot per entity per day. iSeller exports
+    overlap, so some orders appear in two snapshots.
+
+Loads with COPY, optionally dropping secondary indexes first and recreating them
+afterwards (--defer-indexes), then ANALYZEs.
+
+Usage:
+    createdb openclaw_bench
+    python synth_data.py --schema --scale small                 # ~2M rows
+    python synth_data.py --schema --scale large --defer-indexes # ~50M rows
+    python synth_data.py --years 2 --invoices-per-day 1000 --stock-days 90
+
+Refuses to run against openclaw_ops.
+"""
+
+import io
+import os
+import csv
+import sys
+import time
+import random
+import argparse
+import itertools
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+import psycopg2
+
+SCRIPT_DIR = Path(__file__).parent
+
+PRODUCTION_DATABASE = "openclaw_ops"
+DEFAULT_DATABASE = "openclaw_bench"
+
+SALES_ENTITIES = ["ddd", "mbb", "ubb"]
+STOCK_ENTITIES = ["ddd", "ljbb", "mbb", "ubb"]
+
+# Approximate total rows: small ~2M, medium ~9M, large ~50M
+SCALES = {
+    "small": {"years": 1, "invoices_per_day": 200, "stock_days": 7, "iseller_orders_per_day": 100},
+    "medium": {"years": 2, "invoices_per_day": 600, "stock_days": 30, "iseller_orders_per_day": 300},
+    "large": {"years": 3, "invoices_per_day": 2500, "stock_days": 180, "iseller_orders_per_day": 1000},
+}
+
+GENDERS = {
+    # code: (kodemix gender, sizes)
+    "M": ("MEN", ["Z39", "Z40", "Z41", "Z42", "Z43", "Z44"]),
+    "L": ("LADIES", ["Z36", "Z37", "Z38", "Z39", "Z40"]),
+    "B": ("BABY", ["Z20", "Z21", "Z22", "Z23", "Z24"]),
+    "K": ("BOYS", ["Z28", "Z29", "Z30", "Z31", "Z32", "Z33"]),
+    "G": ("GIRLS", ["Z28", "Z29", "Z30", "Z31", "Z32"]),
+}
+SERIES = {"CA": "CLASSIC", "SL": "SLIDE", "AM": "AIRMOVE", "ST": "STRIPE", "LU": "LUNA", "FL": "FLO"}
+COLORS = ["BLACK", "WHITE", "NAVY", "RED", "OLIVE", "BEIGE", "PINK", "GREY"]
+TIERS = [f"TIER {i}" for i in range(1, 9)]
+BRANCHES = ["Jatim", "Jakarta", "Sumatra", "Sulawesi", "Batam", "Bali"]
+MALL_WORDS = [
+    "Galaxy", "Grand", "City", "Royal", "Plaza", "Central", "Mega", "Sun", "Park", "Square",
+    "Pakuwon", "Tunjungan", "Ciputra", "Living", "World", "Trans", "Star", "Harbour",
+]
+MALL_SUFFIX = ["Mall", "Plaza", "Square", "City", "Town Square"]
+CITIES = ["Surabaya", "Jakarta", "Medan", "Manado", "Batam", "Denpasar", "Makassar", "Malang"]
+CHANNELS = [("Store", 70), ("Shopee", 12), ("Tokopedia", 10), ("Website", 5), ("TikTok Shop", 3)]
+
+# Warehouses (stock locations) per entity - DDD holds most of the retail network
+WAREHOUSES_PER_ENTITY = {"ddd": 60, "ljbb": 5, "mbb": 15, "ubb": 10}
+STOCKED_FRACTION = 0.25  # share of (SKU, warehouse) pairs with a stock row
+
+
+# ============================================================
+# Master data
+# ============================================================
+
+
+class Catalog:
+    """Products and stores, deterministic for a seed."""
+
+    def __init__(self, rng: random.Random, articles: int, stores: int):
+        self.articles = []  # dicts: kode, gender, series, name, price, sizes
+        self.skus = []  # (kode_besar, article index)
+        for i in range(articles):
+            gender_code = rng.choice(list(GENDERS))
+            series_code = rng.choice(list(SERIES))
+            kode = f"{gender_code}1{series_code}{i:04d}"
+            rsp = rng.choice([99000, 129000, 159000, 189000, 219000, 259000, 299000])
+            article = {
+                "kode": kode,
+                "gender": GENDERS[gender_code][0],
+                "series": SERIES[series_code],
+                "name": f"{GENDERS[gender_code][0]} {SERIES[series_code]} {rng.choice(COLORS)} {i}",
+                "color": rng.choice(COLORS),
+                "tier": rng.choice(TIERS),
+                "rsp": rsp,
+                "sizes": GENDERS[gender_code][1],
+            }
+            self.articles.append(article)
+            for size in article["sizes"]:
+                self.skus.append((kode + size, len(self.articles) - 1))
+
+        # Zipf article popularity, middle sizes sell most
+        article_weights = [1 / (rank ** 1.1) for rank in range(1, articles + 1)]
+        rng.shuffle(article_weights)
+        sku_weights = []
+        for kode_besar, article_idx in self.skus:
+            sizes = self.articles[article_idx]["sizes"]
+            pos = sizes.index(kode_besar[-3:])
+            middle = (len(sizes) - 1) / 2
+            sku_weights.append(article_weights[article_idx] * (1.0 - 0.15 * abs(pos - middle)))
+        self.sku_cum_weights = list(itertools.accumulate(sku_weights))
+
+        self.stores = []  # dicts: nama_accurate, nama_iseller, variants, branch
+        used = set()
+        while len(self.stores) < stores:
+            words = rng.sample(MALL_WORDS, 2)
+            suffix = rng.choice(MALL_SUFFIX)
+            city = rng.choice(CITIES)
+            full = f"Zuma {words[0]} {words[1]} {suffix} {city}"
+            if full in used:
+                continue
+            used.add(full)
+            initials = "".join(w[0] for w in (words[0], words[1], suffix.split()[0])).upper()
+            self.stores.append(
+                {
+                    "nama_accurate": full,
+                    "nama_iseller": full.upper(),
+                    "branch": rng.choice(BRANCHES),
+                    "city": city,
+                    # Section 11 mismatch types: A case, B abbreviation, C short name
+                    "variants": [
+                        (full, 70),
+                        (full.upper(), 12),
+                        (f"Zuma {initials}", 8),
+                        (f"Zuma {words[0]} {words[1]} {suffix}", 8),
+                        (full + " ", 2),
+                    ],
+                }
+            )
+
+    def pick_sku(self, rng: random.Random) -> tuple:
+        kode_besar, article_idx = rng.choices(self.skus, cum_weights=self.sku_cum_weights)[0]
+        return kode_besar, self.articles[article_idx]
+
+    def store_name_variant(self, rng: random.Random, store: dict) -> str:
+        names, weights = zip(*store["variants"])
+        return rng.choices(names, weights=weights)[0]
+
+
+def noisy_code(rng: random.Random, kode_besar: str) -> str:
+    """Raw-data SKU noise: case / whitespace (~1%), unknown codes (~0.5%)."""
+    roll = rng.random()
+    if roll < 0.005:
+        return kode_besar[:-3] + "X" + kode_besar[-2:]
+    if roll < 0.010:
+        return kode_besar.lower()
+    if roll < 0.015:
+        return kode_besar + " "
+    return kode_besar
+
+
+# ============================================================
+# Row generators (tuples in COPY column order)
+# ============================================================
+
+STORE_COLUMNS = [
+    "nama_department_old", "nama_accurate", "nama_iseller", "branch", "area", "category",
+    "stock_filter", "as_name", "bm_name", "max_display", "max_stock", "monthly_target", "storage",
+]
+KODEMIX_COLUMNS = [
+    "kode_mix_size", "kode_mix", "kode_besar", "kode", "tipe", "nama_barang", "ukuran",
+    "gender", "seri", "series", "status", "tier_baru", "article", "size", "color", "assortment", "no_urut",
+]
+HPPRSP_COLUMNS = [
+    "no", "kode", "nama_barang", "tipe", "series", "gender", "tier", "season", "status",
+    "supplier", "harga_beli", "price_taq", "rsp",
+]
+CAPACITY_COLUMNS = ["stock_location", "branch", "area", "category", "max_display", "max_stock", "storage"]
+SALES_COLUMNS = [
+    "tanggal", "nama_departemen", "nama_pelanggan", "nomor_invoice", "kode_produk", "nama_barang",
+    "satuan", "kuantitas", "harga_satuan", "total_harga", "bpp", "nama_gudang", "vendor_price",
+    "dpp_amount", "tax_amount", "snapshot_date", "loaded_at", "load_batch_id",
+]
+STOCK_COLUMNS = [
+    "kode_barang", "nama_barang", "nama_gudang", "kuantitas", "unit_price", "vendor_price",
+    "snapshot_date", "loaded_at", "load_batch_id",
+]
+ISELLER_COLUMNS = [
+    "order_number", "order_date", "customer_name", "customer_email", "customer_phone",
+    "payment_method", "payment_status", "fulfillment_status", "shipping_method", "shipping_city",
+    "item_sku", "item_name", "item_variant", "item_quantity", "item_price", "item_discount",
+    "item_total", "order_subtotal", "order_discount", "order_total", "channel", "snapshot_date",
+    "loaded_at", "load_batch_id",
+]
+
+
+def portal_rows(catalog: Catalog, rng: random.Random) -> dict:
+    stores = []
+    capacity = []
+    for s in catalog.stores:
+        max_display = rng.randint(300, 1500)
+        stores.append(
+            (
+                s["nama_accurate"].upper(), s["nama_accurate"], s["nama_iseller"], s["branch"],
+                s["city"], "RETAIL", s["branch"], None, None, str(max_display),
+                str(max_display * 2), str(rng.randint(100, 900) * 1_000_000), str(max_display),
+            )
+        )
+        capacity.append(
+            (s["nama_accurate"], s["branch"], s["city"], "RETAIL", max_display, max_display * 2, max_display)
+        )
+
+    kodemix = []
+    no_urut = itertools.count(1)
+    for a in catalog.articles:
+        for size in a["sizes"]:
+            kodemix.append(
+                (
+                    f"{a['kode']}-{size[1:]}", a["kode"], a["kode"] + size, a["kode"], "SANDAL",
+                    a["name"], size[1:], a["gender"], a["kode"][2:4], a["series"], "ACTIVE",
+                    a["tier"], a["kode"], size[1:], a["color"], a["series"], str(next(no_urut)),
+                )
+            )
+    hpprsp = [
+        (
+            str(i), a["kode"], a["name"], "SANDAL", a["series"], a["gender"], a["tier"],
+            f"SS{rng.randint(22, 26)}", "ACTIVE", "PT SUPPLIER", round(a["rsp"] * 0.4),
+            a["rsp"], a["rsp"],
+        )
+        for i, a in enumerate(catalog.articles, 1)
+    ]
+    return {
+        "portal.store": (STORE_COLUMNS, stores),
+        "portal.kodemix": (KODEMIX_COLUMNS, kodemix),
+        "portal.hpprsp": (HPPRSP_COLUMNS, hpprsp),
+        "portal.stock_capacity": (CAPACITY_COLUMNS, capacity),
+    }
+
+
+def sales_rows(catalog: Catalog, rng: random.Random, entity_key: str, start: date, end: date,
+               invoices_per_day: int, snapshot_window: int):
+    """Invoice lines, each repeated across snapshot_window daily snapshots."""
+    stores = catalog.stores if entity_key == "ddd" else catalog.stores[: max(3, len(catalog.stores) // 4)]
+    day = start
+    while day <= end:
+        per_day = max(1, int(rng.gauss(invoices_per_day, invoices_per_day * 0.2)))
+        if day.weekday() >= 5:
+            per_day = int(per_day * 1.4)  # weekend peak
+        for seq in range(1, per_day + 1):
+            invoice_no = f"SI.{day.year}.{day.month:02d}.{day.day:02d}{seq:05d}"
+            store = rng.choice(stores)
+            department = catalog.store_name_variant(rng, store)
+            customer = f"CUSTOMER {rng.randint(1, 5000):05d}" if rng.random() < 0.3 else "UMUM"
+            seen_codes = set()
+            for _ in range(rng.choices((1, 2, 3, 4, 6), weights=(50, 25, 12, 8, 5))[0]):
+                kode_besar, article = catalog.pick_sku(rng)
+                code = noisy_code(rng, kode_besar)
+                if code in seen_codes:
+                    continue
+                seen_codes.add(code)
+                qty = rng.choices((1, 2, 3, 6), weights=(80, 12, 5, 3))[0]
+                price = article["rsp"]
+                total = qty * price
+                dpp = round(total / 1.11, 2)
+                line = [
+                    day, department, customer, invoice_no, code, article["name"], "PASANG",
+                    qty, price, total, round(price * 0.4, 2), store["nama_accurate"],
+                    round(price * 0.45, 2), dpp, round(total - dpp, 2),
+                ]
+                for offset in range(snapshot_window):
+                    snapshot = day + timedelta(days=offset)
+                    if snapshot > end:
+                        break
+                    if offset and rng.random() < 0.02:  # late correction
+                        line[7] = max(1, line[7] - 1)
+                        line[9] = line[7] * price
+                    yield (
+                        *line,
+                        snapshot,
+                        f"{snapshot} 06:00:00+07",
+                        f"accurate_sales_{entity_key}_{snapshot:%Y%m%d}_060000",
+                    )
+        day += timedelta(days=1)
+
+
+def stock_rows(catalog: Catalog, rng: random.Random, entity_key: str, end: date, stock_days: int):
+    """Full stock snapshot per day; quantities drift slowly day to day."""
+    warehouses = [s["nama_accurate"] for s in catalog.stores[: WAREHOUSES_PER_ENTITY[entity_key]]]
+    if entity_key == "ddd":
+        warehouses = ["Gudang Pusat"] + warehouses
+    pairs = [
+        (kode_besar, catalog.articles[article_idx], wh)
+        for kode_besar, article_idx in catalog.skus
+        for wh in warehouses
+        if rng.random() < STOCKED_FRACTION
+    ]
+    balances = [rng.randint(0, 24) for _ in pairs]
+    for offset in range(stock_days - 1, -1, -1):
+        snapshot = end - timedelta(days=offset)
+        batch_id = f"accurate_stock_{entity_key}_{snapshot:%Y%m%d}_060000"
+        loaded_at = f"{snapshot} 06:00:00+07"
+        for i, (kode_besar, article, wh) in enumerate(pairs):
+            if rng.random() < 0.05:
+                balances[i] = max(0, balances[i] + rng.randint(-3, 2))
+            yield (
+                kode_besar, article["name"], wh, balances[i], article["rsp"],
+                round(article["rsp"] * 0.45, 2), snapshot, loaded_at, batch_id,
+            )
+
+
+def iseller_rows(catalog: Catalog, rng: random.Random, start: date, end: date, orders_per_day: int):
+    """Order lines; monthly exports overlap by a week, so late-month orders appear twice."""
+    channels, channel_weights = zip(*CHANNELS)
+    day = start
+    order_seq = itertools.count(1)
+    while day <= end:
+        for _ in range(max(1, int(rng.gauss(orders_per_day, orders_per_day * 0.2)))):
+            order_no = f"ISL-{next(order_seq):08d}"
+            order_time = datetime(day.year, day.month, day.day, rng.randint(10, 21), rng.randint(0, 59))
+            channel = rng.choices(channels, weights=channel_weights)[0]
+            customer_id = rng.randint(1, 20000)
+            lines = []
+            for _ in range(rng.choices((1, 2, 3), weights=(70, 22, 8))[0]):
+                kode_besar, article = catalog.pick_sku(rng)
+                qty = rng.choices((1, 2), weights=(90, 10))[0]
+                discount = rng.choice((0, 0, 0, 10000, 25000))
+                lines.append((kode_besar, article, qty, discount, qty * article["rsp"] - discount))
+            subtotal = sum(line[4] for line in lines)
+            next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+            snapshots = [next_month]
+            if day.day >= 24:
+                snapshots.append(next_month + timedelta(days=7))
+            for snapshot in snapshots:
+                for kode_besar, article, qty, discount, total in lines:
+                    yield (
+                        order_no, order_time, f"Customer {customer_id}", f"customer{customer_id}@example.com",
+                        f"08{customer_id:010d}", rng.choice(("QRIS", "Cash", "Debit", "Transfer")), "paid",
+                        "fulfilled", "pickup" if channel == "Store" else "courier", rng.choice(CITIES),
+                        kode_besar, article["name"], kode_besar[-3:], qty, article["rsp"], discount,
+                        total, subtotal, 0, subtotal, channel, snapshot, f"{snapshot} 09:00:00+07",
+                        f"iseller_{snapshot:%Y%m%d}",
+                    )
+        day += timedelta(days=1)
+
+
+# ============================================================
+# Loading
+# ============================================================
+
+COPY_CHUNK_ROWS = 200_000
+
+
+def copy_rows(cur, table: str, columns: list, rows) -> int:
+    """COPY an iterable of tuples into table in chunks; returns rows loaded."""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    total = 0
+    started = time.perf_counter()
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, COPY_CHUNK_ROWS))
+        if not chunk:
+            break
+        buf = io.StringIO()
+        csv.writer(buf).writerows(chunk)
+        buf.seek(0)
+        cur.copy_expert(sql, buf)
+        total += len(chunk)
+        rate = total / max(time.perf_counter() - started, 1e-9)
+        print(f"\r  {table}: {total:,} rows ({rate:,.0f} rows/s)", end="", flush=True)
+    print(f"\r  {table}: {total:,} rows in {time.perf_counter() - started:,.1f}s" + " " * 20)
+    return total
+
+
+def drop_secondary_indexes(cur, table: str) -> list:
+    """Drop non-constraint indexes of table; returns their definitions."""
+    schema, name = table.split(".")
+    cur.execute(
+        """
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.schemaname = %s AND i.tablename = %s
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conname = i.indexname AND c.connamespace = %s::regnamespace
+          )
+        """,
+        (schema, name, schema),
+    )
+    indexes = cur.fetchall()
+    for index_name, _ in indexes:
+        cur.execute(f"DROP INDEX {schema}.{index_name}")
+    return [definition for _, definition in indexes]
+
+
+def get_connection(database: str, pg_host_override: str = None):
+    host = pg_host_override or os.getenv("PG_HOST", "localhost")
+    port = os.getenv("PG_PORT", "5432")
+    user = os.getenv("PG_USER", "openclaw_app")
+    password = os.getenv("PG_PASSWORD")
+    if not password:
+        raise ValueError(
+            f"PG_PASSWORD is required. Set it in environment or .env file.\n"
+            f"  Connection: {user}@{host}:{port}/{database}"
+        )
+    conn = psycopg2.connect(
+        host=host, port=int(port), dbname=database, user=user, password=password, connect_timeout=10
+    )
+    conn.autocommit = False
+    print(f"  PG connected: {user}@{host}:{port}/{database}")
+    return conn
+
+
+def load_table(conn, table: str, columns: list, rows, defer_indexes: bool, truncate: bool) -> int:
+    with conn.cursor() as cur:
+        if truncate:
+            cur.execute(f"TRUNCATE {table}")
+        index_defs = drop_secondary_indexes(cur, table) if defer_indexes else []
+        loaded = copy_rows(cur, table, columns, rows)
+        if index_defs:
+            started = time.perf_counter()
+            for definition in index_defs:
+                cur.execute(definition)
+            print(f"  {table}: rebuilt {len(index_defs)} indexes in {time.perf_counter() - started:,.1f}s")
+        cur.execute(f"ANALYZE {table}")
+    conn.commit()
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a scratch benchmark database with synthetic portal/raw data")
+    parser.add_argument("--pg-database", type=str, default=DEFAULT_DATABASE,
+                        help=f"Target database (default: {DEFAULT_DATABASE}; {PRODUCTION_DATABASE} is refused)")
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    parser.add_argument("--schema", action="store_true", help="(Re)create tables from bench_schema.sql first")
+    parser.add_argument("--scale", choices=list(SCALES), default="small", help="Size preset (default: small)")
+    parser.add_argument("--years", type=int, help="Years of sales history (overrides preset)")
+    parser.add_argument("--invoices-per-day", type=int, help="Invoices per entity per day (overrides preset)")
+    parser.add_argument("--stock-days", type=int, help="Daily stock snapshots per entity (overrides preset)")
+    parser.add_argument("--iseller-orders-per-day", type=int, help="iSeller orders per day (overrides preset)")
+    parser.add_argument("--snapshot-window", type=int, default=3,
+                        help="Days each sales line is re-pulled (= pull_accurate_sales --days, default: 3)")
+    parser.add_argument("--articles", type=int, default=950, help="Articles in the catalog (default: 950)")
+    parser.add_argument("--stores", type=int, default=120, help="Stores (default: 120)")
+    parser.add_argument("--end-date", type=str, default=None, help="Last snapshot date YYYY-MM-DD (default: today)")
+    parser.add_argument("--only", choices=["portal", "sales", "stock", "iseller"], action="append",
+                        help="Load only these groups (repeatable, default: all)")
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="Drop secondary indexes during COPY and rebuild them afterwards")
+    parser.add_argument("--append", action="store_true", help="Do not TRUNCATE before loading")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    args = parser.parse_args()
+
+    if args.pg_database == PRODUCTION_DATABASE:
+        print(f"Refusing to generate synthetic data in {PRODUCTION_DATABASE}. Use a scratch database.")
+        sys.exit(2)
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+
+    scale = dict(SCALES[args.scale])
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    end = datetime.strptime(args.end_date, "%Y-%m-%d").date() if args.end_date else date.today()
+    start = end - timedelta(days=365 * scale["years"] - 1)
+    groups = args.only or ["portal", "sales", "stock", "iseller"]
+
+    rng = random.Random(args.seed)
+    catalog = Catalog(rng, args.articles, args.stores)
+    print(f"{'=' * 60}")
+    print(f"  SYNTHETIC DATA -> {args.pg_database}")
+    print(f"  {len(catalog.articles):,} articles / {len(catalog.skus):,} SKUs, {len(catalog.stores)} stores")
+    print(f"  Sales {start} .. {end}, {scale['invoices_per_day']:,} invoices/day/entity, "
+          f"window {args.snapshot_window}d | stock {scale['stock_days']} snapshots | "
+          f"iSeller {scale['iseller_orders_per_day']:,} orders/day")
+    print(f"{'=' * 60}")
+
+    conn = get_connection(args.pg_database, args.pg_host)
+    truncate = not args.append
+    started = time.perf_counter()
+    totals = {}
+    try:
+        if args.schema:
+            with conn.cursor() as cur:
+                cur.execute((SCRIPT_DIR / "bench_schema.sql").read_text())
+            conn.commit()
+            print("  Schema created from bench_schema.sql")
+
+        if "portal" in groups:
+            for table, (columns, rows) in portal_rows(catalog, rng).items():
+                totals[table] = load_table(conn, table, columns, rows, False, truncate)
+
+        if "sales" in groups:
+            for entity_key in SALES_ENTITIES:
+                table = f"raw.accurate_sales_{entity_key}"
+                rows = sales_rows(
+                    catalog, random.Random(f"{args.seed}:sales:{entity_key}"), entity_key, start, end,
+                    scale["invoices_per_day"] if entity_key == "ddd" else scale["invoices_per_day"] // 3,
+                    args.snapshot_window,
+                )
+                totals[table] = load_table(conn, table, SALES_COLUMNS, rows, args.defer_indexes, truncate)
+
+        if "stock" in groups:
+            for entity_key in STOCK_ENTITIES:
+                table = f"raw.accurate_stock_{entity_key}"
+                rows = stock_rows(
+                    catalog, random.Random(f"{args.seed}:stock:{entity_key}"), entity_key, end, scale["stock_days"]
+                )
+                totals[table] = load_table(conn, table, STOCK_COLUMNS, rows, args.defer_indexes, truncate)
+
+        if "iseller" in groups:
+            rows = iseller_rows(
+                catalog, random.Random(f"{args.seed}:iseller"), start, end, scale["iseller_orders_per_day"]
+            )
+            totals["raw.iseller_sales"] = load_table(
+                conn, "raw.iseller_sales", ISELLER_COLUMNS, rows, args.defer_indexes, truncate
+            )
+
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO raw.load_history
+                    (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status)
+                VALUES ('synth_data', %s, 'synthetic', %s, %s, %s, %s, 'success')
+                """,
+                (args.scale, f"synth_{datetime.now().strftime('%Y%m%d_%H%M%S')}", start, end, sum(totals.values())),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"\n{'=' * 60}")
+    print(f"  Loaded {sum(totals.values()):,} rows in {time.perf_counter() - started:,.1f}s")
+    for table, rows in totals.items():
+        print(f"    {table:<30} {rows:>14,}")
+    print(f"{'=' * 60}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,823 @@
+#!/usr/bin/env python3
+"""
+Distributed pulls through a PostgreSQL work queue (FOR UPDATE SKIP LOCKED).
+
+A pull script fetches everything for an entity in one process, so a big
+backfill or a full stock snapshot is hours of detail calls on one host. Here
+a coordinator splits a pull into units, and any number of workers on any
+host that reaches the database fetch and load them:
+
+    python work_queue.py enqueue sales all --days 3        # 50-invoice chunks
+    python work_queue.py enqueue stock ddd                 # item list pages
+    python work_queue.py enqueue historical mbb --start 2024-01-01 --end 2026-02-08
+
+    python work_queue.py work                              # on every host
+    python work_queue.py work --kind stock --entity ddd --exit-when-idle
+    python work_queue.py status
+    python work_queue.py budget accurate_api_ddd --rate 6
+
+Units run the pull scripts' own fetch / flatten / load functions. A unit's
+rows, item-master records, dead letters and its completion commit in one
+transaction, with run_id as load_batch_id.
+
+Leases: a claimed unit is leased for the run's lease_seconds and renewed
+while its objects are fetched. A crashed worker's unit is claimed again once
+the lease runs out (max_attempts, then failed). Completion is fenced on
+(leased_by, attempts), so a worker that lost its lease rolls its load back.
+
+Rate budget: every API call of every worker takes a token from a bucket in
+raw.accurate_rate_budget (accurate_api_{entity}, accurate_report_{entity}),
+so the Accurate limit holds however many workers run.
+
+Finishing: the worker that closes the last unit of a run logs it in
+raw.load_history. For stock it then deletes the snapshot's rows from earlier
+runs of the same day, unless a unit failed - like pull_accurate_stock.py,
+which replaces the whole snapshot or nothing. Until then the snapshot holds
+new and old rows side by side per item page.
+
+Tables: scripts/work_queue.sql
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+import dead_letter
+import fact_tables
+import item_master
+import payload_archive
+import pg_pool
+import pull_accurate_sales
+import pull_accurate_stock
+import pull_historical_sales
+import row_batch
+
+SCRIPT_DIR = Path(__file__).parent
+
+RUN_TABLE = "raw.accurate_work_run"
+UNIT_TABLE = "raw.accurate_work_unit"
+BUDGET_TABLE = "raw.accurate_rate_budget"
+
+KIND_SALES = "sales"
+KIND_STOCK = "stock"
+KIND_HISTORICAL = "historical"
+KINDS = (KIND_SALES, KIND_STOCK, KIND_HISTORICAL)
+
+ENTITIES = {
+    KIND_SALES: list(pull_accurate_sales.ENTITIES),
+    KIND_STOCK: list(pull_accurate_stock.ENTITIES),
+    KIND_HISTORICAL: list(pull_historical_sales.ENTITY_CONFIGS),
+}
+
+# Lease per unit; a report window is one long export call with no renewal
+LEASE_SECONDS = {KIND_SALES: 120, KIND_STOCK: 120, KIND_HISTORICAL: 900}
+UNIT_SIZE = 50  # Invoices per sales unit (stock units are list pages of 100)
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 5
+
+# Budgets created on first enqueue; change with `work_queue.py budget`
+API_RATE = 1 / pull_accurate_sales.REQUEST_DELAY  # 8 req/s per entity, all workers
+REPORT_RATE = 0.5
+
+
+def api_bucket(entity_key: str) -> str:
+    return f"accurate_api_{entity_key}"
+
+
+def report_bucket(entity_key: str) -> str:
+    return f"accurate_report_{entity_key}"
+
+
+class LeaseLost(Exception):
+    """The unit was reclaimed by another worker (lease expired)."""
+
+
+# =============================================================================
+# Rate budget
+# =============================================================================
+
+_TAKE_SQL = f"""
+    UPDATE {BUDGET_TABLE} b
+    SET tokens = LEAST(b.burst, b.tokens + b.rate * EXTRACT(epoch FROM c.now - b.updated_at)::float8) - %s,
+        updated_at = c.now
+    FROM (SELECT clock_timestamp() AS now) c
+    WHERE b.bucket = %s
+    RETURNING b.tokens, b.rate
+"""
+
+
+class RateBudget:
+    """A token bucket in raw.accurate_rate_budget, shared by every worker."""
+
+    def __init__(self, bucket: str, pg_host_override: str = None):
+        self.bucket = bucket
+        self.pg_host_override = pg_host_override
+
+    def take(self, n: int = 1):
+        """Take n tokens, sleeping until they are due."""
+        conn = pg_pool.audit_connection(self.pg_host_override)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(_TAKE_SQL, (n, self.bucket))
+                row = cur.fetchone()
+        finally:
+            pg_pool.release(conn)
+        if row is None:
+            raise LookupError(f"No rate budget {self.bucket!r} in {BUDGET_TABLE}")
+        tokens, rate = row
+        if tokens < 0:
+            time.sleep(-tokens / rate)
+
+
+def ensure_budgets(cur, entity_key: str):
+    """Create the entity's API and report buckets with the default rates."""
+    execute_values(
+        cur,
+        f"""
+        INSERT INTO {BUDGET_TABLE} (bucket, rate, burst, tokens) VALUES %s
+        ON CONFLICT (bucket) DO NOTHING
+    """,
+        [
+            (api_bucket(entity_key), API_RATE, API_RATE, API_RATE),
+            (report_bucket(entity_key), REPORT_RATE, 1, 1),
+        ],
+    )
+
+
+# =============================================================================
+# Coordinator
+# =============================================================================
+
+
+def create_run(cur, kind: str, entity_key: str, payloads: list, snapshot_date: str,
+               date_from: str = None, date_to: str = None) -> str:
+    """Insert a run and its units (pending). Returns the run_id."""
+    run_id = f"queue_{kind}_{entity_key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    cur.execute(
+        f"""
+        INSERT INTO {RUN_TABLE} (run_id, kind, entity, snapshot_date, date_from, date_to, units, lease_seconds)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+        (run_id, kind, entity_key, snapshot_date, date_from, date_to, len(payloads), LEASE_SECONDS[kind]),
+    )
+    execute_values(
+        cur,
+        f"INSERT INTO {UNIT_TABLE} (run_id, seq, payload, max_attempts) VALUES %s",
+        [(run_id, seq, json.dumps(payload), MAX_ATTEMPTS) for seq, payload in enumerate(payloads, 1)],
+    )
+    return run_id
+
+
+def _api_client(module, entity_key: str, env_dir: Path):
+    """Unconnected AccurateAPIClient of a pull module for an entity."""
+    entity = module.ENTITIES[entity_key]
+    # Credentials come from the entity's .env, loaded into os.environ with
+    # override=True; restore it so the next entity cannot pick them up
+    environ = dict(os.environ)
+    try:
+        api_token, signature_secret = module.load_entity_credentials(entity_key, entity, env_dir)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+    return module.AccurateAPIClient(api_token, signature_secret, entity["api_host"])
+
+
+def _payload(records: list, number_key: str) -> dict:
+    """Unit payload for list records: Accurate ids plus numbers for dead letters."""
+    return {"ids": [r.get("id") for r in records], "numbers": [r.get(number_key) for r in records]}
+
+
+def enqueue(kind: str, entity_key: str, pg_host_override: str = None, env_dir: Path = None,
+            days: int = 3, start_date: datetime = None, end_date: datetime = None,
+            unit_size: int = UNIT_SIZE) -> str:
+    """
+    List the work of one pull and queue it as a run. List calls are made here
+    (a small share of the calls); the detail calls are left to the workers.
+
+    Returns:
+        The run_id, or None if there is nothing to fetch
+    """
+    snapshot_date = datetime.now().strftime("%Y-%m-%d")
+    date_from = date_to = None
+
+    conn = pg_pool.connection(pg_host_override)
+    try:
+        with conn.cursor() as cur:
+            ensure_budgets(cur, entity_key)
+        conn.commit()
+    except Exception:
+        pg_pool.rollback(conn)
+        raise
+    finally:
+        pg_pool.release(conn)
+    budget = RateBudget(api_bucket(entity_key), pg_host_override)
+
+    if kind == KIND_SALES:
+        entity = pull_accurate_sales.ENTITIES[entity_key]
+        client = _api_client(pull_accurate_sales, entity_key, env_dir)
+        client.connect()
+        end = datetime.now()
+        start = end - timedelta(days=days - 1)
+        date_from, date_to = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+        invoices = pull_accurate_sales.list_invoices(client, start, end, throttle=budget.take)
+        payloads = [_payload(invoices[i : i + unit_size], "number") for i in range(0, len(invoices), unit_size)]
+        print(f"  {entity['name']}: {len(invoices):,} invoices {date_from}..{date_to}")
+
+    elif kind == KIND_STOCK:
+        entity = pull_accurate_stock.ENTITIES[entity_key]
+        client = _api_client(pull_accurate_stock, entity_key, env_dir)
+        client.connect()
+        payloads = []
+        page = 1
+        while True:
+            budget.take()
+            items = pull_accurate_stock.list_items(client, page)
+            if not items:
+                break
+            payloads.append({"page": page, **_payload(items, "no")})
+            if len(items) < 100:
+                break
+            page += 1
+        print(f"  {entity['name']}: {sum(len(p['ids']) for p in payloads):,} items on {len(payloads)} pages")
+
+    else:
+        windows = list(pull_historical_sales.report_windows(start_date, end_date))
+        payloads = [{"start": s.strftime("%Y-%m-%d"), "end": e.strftime("%Y-%m-%d")} for s, e in windows]
+        date_from, date_to = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        print(f"  {entity_key.upper()}: {len(payloads)} report windows {date_from}..{date_to}")
+
+    if not payloads:
+        print("  Nothing to queue")
+        return None
+
+    conn = pg_pool.connection(pg_host_override)  # Re-checked after the listing
+    try:
+        with conn.cursor() as cur:
+            run_id = create_run(cur, kind, entity_key, payloads, snapshot_date, date_from, date_to)
+        conn.commit()
+    except Exception:
+        pg_pool.rollback(conn)
+        raise
+    finally:
+        pg_pool.release(conn)
+    print(f"  Queued {len(payloads)} units: {run_id}")
+    return run_id
+
+
+# =============================================================================
+# Worker
+# =============================================================================
+
+_SWEEP_SQL = f"""
+    UPDATE {UNIT_TABLE}
+    SET status = 'failed', finished_at = now(), lease_expires_at = NULL,
+        last_error = 'lease expired (' || leased_by || ')'
+    WHERE id IN (
+        SELECT id FROM {UNIT_TABLE}
+        WHERE status = 'running' AND lease_expires_at < now() AND attempts >= max_attempts
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING run_id
+"""
+
+_CLAIM_SQL = f"""
+    UPDATE {UNIT_TABLE} u
+    SET status = 'running',
+        attempts = u.attempts + 1,
+        leased_by = %(worker)s,
+        lease_expires_at = now() + make_interval(secs => r.lease_seconds),
+        started_at = now(),
+        last_error = CASE WHEN u.status = 'running'
+                          THEN 'lease expired (' || u.leased_by || ')' ELSE u.last_error END
+    FROM {RUN_TABLE} r
+    WHERE r.run_id = u.run_id
+      AND u.id = (
+        SELECT c.id
+        FROM {UNIT_TABLE} c
+        JOIN {RUN_TABLE} cr ON cr.run_id = c.run_id
+        WHERE (c.status = 'pending' OR (c.status = 'running' AND c.lease_expires_at < now()))
+          AND c.attempts < c.max_attempts
+          AND (%(kinds)s::text[] IS NULL OR cr.kind = ANY(%(kinds)s::text[]))
+          AND (%(entities)s::text[] IS NULL OR cr.entity = ANY(%(entities)s::text[]))
+          AND NOT (cr.kind || ':' || cr.entity = ANY(%(skip)s::text[]))
+        ORDER BY c.id
+        LIMIT 1
+        FOR UPDATE OF c SKIP LOCKED
+      )
+    RETURNING u.id, u.run_id, u.seq, u.payload, u.attempts, r.kind, r.entity, r.snapshot_date, r.lease_seconds
+"""
+
+# Fenced on (leased_by, attempts): only the current holder can move the unit on
+_HELD = "id = %(id)s AND leased_by = %(worker)s AND attempts = %(attempts)s AND status = 'running'"
+
+_RENEW_SQL = f"""
+    UPDATE {UNIT_TABLE} SET lease_expires_at = now() + make_interval(secs => %(lease)s)
+    WHERE {_HELD}
+"""
+
+_COMPLETE_SQL = f"""
+    UPDATE {UNIT_TABLE}
+    SET status = 'done', rows_loaded = %(rows)s, dead_letters = %(dead)s,
+        finished_at = now(), lease_expires_at = NULL, last_error = NULL
+    WHERE {_HELD}
+"""
+
+_FAIL_SQL = f"""
+    UPDATE {UNIT_TABLE}
+    SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+        finished_at = CASE WHEN attempts >= max_attempts THEN now() END,
+        lease_expires_at = NULL, last_error = %(error)s
+    WHERE {_HELD}
+    RETURNING status
+"""
+
+_RELEASE_SQL = f"""
+    UPDATE {UNIT_TABLE}
+    SET status = 'pending', attempts = attempts - 1, leased_by = NULL, lease_expires_at = NULL
+    WHERE {_HELD}
+"""
+
+_FINISH_SQL = f"""
+    WITH totals AS (
+        SELECT COALESCE(sum(rows_loaded), 0) AS rows_loaded,
+               count(*) FILTER (WHERE status = 'failed') AS failed_units,
+               COALESCE(sum(dead_letters), 0) AS dead_letters
+        FROM {UNIT_TABLE}
+        WHERE run_id = %(run_id)s
+    )
+    UPDATE {RUN_TABLE} r
+    SET finished_at = now(),
+        status = CASE WHEN t.failed_units + t.dead_letters > 0 THEN 'partial' ELSE 'success' END
+    FROM totals t
+    WHERE r.run_id = %(run_id)s
+      AND r.finished_at IS NULL
+      AND NOT EXISTS (
+        SELECT 1 FROM {UNIT_TABLE} u
+        WHERE u.run_id = r.run_id AND u.status IN ('pending', 'running')
+      )
+    RETURNING r.kind, r.entity, r.snapshot_date, r.date_from, r.date_to, r.status,
+              t.rows_loaded, t.failed_units, t.dead_letters
+"""
+
+
+class Unit:
+    """A claimed unit and its lease."""
+
+    def __init__(self, id, run_id, seq, payload, attempts, kind, entity, snapshot_date, lease_seconds):
+        self.id = id
+        self.run_id = run_id
+        self.seq = seq
+        self.payload = payload
+        self.attempts = attempts
+        self.kind = kind
+        self.entity = entity
+        self.snapshot_date = snapshot_date
+        self.lease_seconds = lease_seconds
+        self.renewed_at = time.monotonic()
+
+    def __str__(self):
+        return f"{self.kind} {self.entity} #{self.seq} ({self.run_id}, attempt {self.attempts})"
+
+
+class Worker:
+    """Claims units until the queue is empty (or forever), one at a time."""
+
+    def __init__(self, pg_host_override: str = None, env_dir: Path = None,
+                 kinds: list = None, entities: list = None):
+        self.pg_host_override = pg_host_override
+        self.env_dir = env_dir or SCRIPT_DIR
+        self.kinds = kinds
+        self.entities = entities
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.skip = set()  # "kind:entity" this host has no credentials for
+        self._sources = {}  # (kind, entity) -> connected API client / report exporter
+        self._master = (None, {})  # (run_id, item master) for sales units
+
+    # --- queue ---------------------------------------------------------------
+
+    def _audit(self, sql: str, params: dict = None):
+        conn = pg_pool.audit_connection(self.pg_host_override)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.rowcount, cur.fetchall() if cur.description else []
+        finally:
+            pg_pool.release(conn)
+
+    def _held(self, unit: Unit, **params) -> dict:
+        return {"id": unit.id, "worker": self.worker_id, "attempts": unit.attempts, **params}
+
+    def claim(self) -> Unit:
+        """The next claimable unit, leased to this worker (None if there is none)."""
+        _, expired = self._audit(_SWEEP_SQL)
+        for run_id in {r[0] for r in expired}:
+            self.finish_run(run_id)
+        _, rows = self._audit(
+            _CLAIM_SQL,
+            {"worker": self.worker_id, "kinds": self.kinds, "entities": self.entities, "skip": sorted(self.skip)},
+        )
+        return Unit(*rows[0]) if rows else None
+
+    def heartbeat(self, unit: Unit):
+        """Renew the lease once a third of it has passed. Raises LeaseLost."""
+        if time.monotonic() - unit.renewed_at < unit.lease_seconds / 3:
+            return
+        renewed, _ = self._audit(_RENEW_SQL, self._held(unit, lease=unit.lease_seconds))
+        if not renewed:
+            raise LeaseLost(f"Lease on unit {unit.id} lost")
+        unit.renewed_at = time.monotonic()
+
+    def _commit(self, unit: Unit, load) -> tuple:
+        """Run load(cur) -> (rows, dead letters) and complete the unit, in one transaction."""
+        conn = pg_pool.connection(self.pg_host_override)
+        try:
+            with conn.cursor() as cur:
+                rows, dead = load(cur)
+                cur.execute(_COMPLETE_SQL, self._held(unit, rows=rows, dead=dead))
+                if cur.rowcount != 1:
+                    raise LeaseLost(f"Lease on unit {unit.id} lost before commit")
+            conn.commit()
+            return rows, dead
+        except Exception:
+            pg_pool.rollback(conn)
+            raise
+        finally:
+            pg_pool.release(conn)
+
+    def finish_run(self, run_id: str):
+        """Close the run if no unit is left open: stale stock rows, raw.load_history."""
+        conn = pg_pool.connection(self.pg_host_override)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(_FINISH_SQL, {"run_id": run_id})
+                row = cur.fetchone()
+                if row is None:
+                    conn.rollback()
+                    return
+                kind, entity_key, snapshot_date, date_from, date_to, status, rows, failed_units, dead = row
+                if kind == KIND_STOCK and rows and not failed_units:
+                    table = pull_accurate_stock.ENTITIES[entity_key]["pg_table"]
+                    deleted = fact_tables.delete(
+                        cur, table, "snapshot_date = %s AND load_batch_id IS DISTINCT FROM %s", (snapshot_date, run_id)
+                    )
+                    if deleted:
+                        print(f"  Deleted {deleted:,} older records for {snapshot_date}")
+                problems = [
+                    f"{failed_units} units failed" if failed_units else None,
+                    f"{dead} details dead-lettered" if dead else None,
+                ]
+                cur.execute(
+                    """
+                    INSERT INTO raw.load_history (source, entity, data_type, batch_id, date_from, date_to, rows_loaded, status, error_message)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                    (
+                        "accurate_report" if kind == KIND_HISTORICAL else "accurate_api",
+                        entity_key,
+                        KIND_STOCK if kind == KIND_STOCK else KIND_SALES,
+                        run_id,
+                        date_from or snapshot_date,
+                        date_to or snapshot_date,
+                        rows,
+                        status,
+                        ", ".join(p for p in problems if p) or None,
+                    ),
+                )
+            conn.commit()
+            print(f"  Run {run_id} finished: {rows:,} rows ({status})")
+        except Exception:
+            pg_pool.rollback(conn)
+            raise
+        finally:
+            pg_pool.release(conn)
+
+    # --- units ---------------------------------------------------------------
+
+    def _source(self, unit: Unit):
+        """Connected API client (or report exporter) for the unit. Raises ValueError
+        if this host has no credentials for the entity."""
+        key = (unit.kind, unit.entity)
+        if key in self._sources:
+            return self._sources[key]
+        if unit.kind == KIND_HISTORICAL:
+            environ = dict(os.environ)  # load_exporter loads the entity's .env too
+            try:
+                source = pull_historical_sales.load_exporter(unit.entity, str(self.env_dir))
+            finally:
+                os.environ.clear()
+                os.environ.update(environ)
+            if source is None:
+                raise ValueError(f"No report cookies for {unit.entity}")
+        else:
+            module = pull_accurate_sales if unit.kind == KIND_SALES else pull_accurate_stock
+            source = _api_client(module, unit.entity, self.env_dir)
+            source.connect()
+        self._sources[key] = source
+        return source
+
+    def _sales_unit(self, unit: Unit, client) -> tuple:
+        budget = RateBudget(api_bucket(unit.entity), self.pg_host_override)
+        rows = row_batch.RowBatch(pull_accurate_sales.SALES_COLUMNS)
+        fetched_ids, failures = [], []
+        archive = payload_archive.open_archive(commit_every=1)   # index shared with the other workers
+        try:
+            for invoice_id, number in zip(unit.payload["ids"], unit.payload["numbers"]):
+                self.heartbeat(unit)
+                budget.take()
+                try:
+                    pull_accurate_sales.fetch_invoice_rows(client, unit.entity, invoice_id, archive, out=rows)
+                    fetched_ids.append(invoice_id)
+                except Exception as e:
+                    failures.append(dead_letter.failure(invoice_id, number, e))
+                    print(f"  Error on invoice {number}: {e}")
+        finally:
+            if archive:
+                archive.close()
+
+        def load(cur):
+            if self._master[0] != unit.run_id:
+                self._master = (unit.run_id, item_master.load_item_master(cur, unit.entity))
+            item_master.fill_sales_rows(rows, self._master[1])
+            table = pull_accurate_sales.ENTITIES[unit.entity]["pg_table"]
+            upserted = pull_accurate_sales.upsert_sales_rows(
+                cur, table, rows, unit.snapshot_date, unit.run_id
+            ) if len(rows) else 0
+            kind = dead_letter.KIND_SALES_INVOICE
+            dead_letter.record_failures(cur, unit.entity, kind, failures, unit.snapshot_date, unit.run_id)
+            dead_letter.resolve(cur, unit.entity, kind, fetched_ids)
+            return upserted, len(failures)
+
+        return self._commit(unit, load)
+
+    def _stock_unit(self, unit: Unit, client) -> tuple:
+        budget = RateBudget(api_bucket(unit.entity), self.pg_host_override)
+        rows = row_batch.RowBatch(pull_accurate_stock.STOCK_COLUMNS)
+        items, fetched_ids, failures = [], [], []
+        archive = payload_archive.open_archive(commit_every=1)
+        try:
+            for item_id, number in zip(unit.payload["ids"], unit.payload["numbers"]):
+                self.heartbeat(unit)
+                budget.take()
+                try:
+                    detail = pull_accurate_stock.fetch_item_detail(client, unit.entity, item_id, archive)
+                except Exception as e:
+                    failures.append(dead_letter.failure(item_id, number, e))
+                    print(f"  Error on item {number or item_id}: {e}")
+                    continue
+                fetched_ids.append(item_id)
+                items.append(item_master.extract_item(detail))
+                pull_accurate_stock.flatten_item_stock(detail, rows)
+        finally:
+            if archive:
+                archive.close()
+
+        def load(cur):
+            # Replace this page's items in the snapshot (a re-run of the page, or an
+            # earlier run the same day); finish_run drops items no page returned
+            table = pull_accurate_stock.ENTITIES[unit.entity]["pg_table"]
+            codes = [n for n in unit.payload["numbers"] if n]
+            fact_tables.delete(cur, table, "snapshot_date = %s AND kode_barang = ANY(%s)", (unit.snapshot_date, codes))
+            inserted = pull_accurate_stock.insert_stock_rows(
+                cur, table, rows, unit.snapshot_date, unit.run_id
+            ) if len(rows) else 0
+            item_master.upsert_items(cur, unit.entity, items, unit.run_id)
+            kind = dead_letter.KIND_ITEM
+            dead_letter.record_failures(cur, unit.entity, kind, failures, unit.snapshot_date, unit.run_id)
+            dead_letter.resolve(cur, unit.entity, kind, fetched_ids)
+            return inserted, len(failures)
+
+        return self._commit(unit, load)
+
+    def _historical_unit(self, unit: Unit, exporter) -> tuple:
+        start = datetime.strptime(unit.payload["start"], "%Y-%m-%d")
+        end = datetime.strptime(unit.payload["end"], "%Y-%m-%d")
+        RateBudget(report_bucket(unit.entity), self.pg_host_override).take(2)  # execute + export
+        df = exporter.download_sales_report(start, end)
+        if not df.empty:
+            df = pull_historical_sales.clean_report_data(df)
+
+        def load(cur):
+            if df.empty:
+                return 0, 0
+            table = pull_historical_sales.ENTITY_CONFIGS[unit.entity]["table"]
+            return pull_historical_sales._upsert_chunk(
+                cur.connection, df, table, unit.snapshot_date, unit.run_id, unit.entity
+            ), 0
+
+        return self._commit(unit, load)
+
+    def process(self, unit: Unit) -> bool:
+        """Fetch and load one claimed unit. Returns True if it is done."""
+        print(f"\n[{self.worker_id}] {unit}")
+        started = time.perf_counter()
+        handlers = {
+            KIND_SALES: self._sales_unit,
+            KIND_STOCK: self._stock_unit,
+            KIND_HISTORICAL: self._historical_unit,
+        }
+        try:
+            try:
+                source = self._source(unit)
+            except ValueError as e:
+                # Not this host's entity: hand the unit back without using an attempt
+                print(f"  Skipping {unit.kind} {unit.entity} on this host: {e}")
+                self.skip.add(f"{unit.kind}:{unit.entity}")
+                self._audit(_RELEASE_SQL, self._held(unit))
+                return False
+            rows, dead = handlers[unit.kind](unit, source)
+        except LeaseLost as e:
+            print(f"  {e} - rolled back")
+            return False
+        except KeyboardInterrupt:
+            self._audit(_RELEASE_SQL, self._held(unit))
+            raise
+        except Exception as e:
+            _, result = self._audit(_FAIL_SQL, self._held(unit, error=f"{dead_letter.error_class(e)}: {e}"[:500]))
+            status = result[0][0] if result else "lost"
+            print(f"  Unit failed ({status}): {e}")
+            if status == "failed":
+                self.finish_run(unit.run_id)
+            return False
+
+        print(f"  Done: {rows:,} rows, {dead} dead-lettered ({time.perf_counter() - started:.1f}s)")
+        self.finish_run(unit.run_id)
+        return True
+
+    def run(self, max_units: int = None, exit_when_idle: bool = False, poll: float = POLL_SECONDS) -> int:
+        """Process units until max_units, or until the queue is empty with exit_when_idle."""
+        print(f"Worker {self.worker_id} (kinds: {self.kinds or 'all'}, entities: {self.entities or 'all'})")
+        done = 0
+        while max_units is None or done < max_units:
+            unit = self.claim()
+            if unit is None:
+                if exit_when_idle:
+                    break
+                time.sleep(poll)
+                continue
+            self.process(unit)
+            done += 1
+        print(f"\nWorker {self.worker_id}: {done} units processed")
+        return done
+
+
+# =============================================================================
+# Status / budgets
+# =============================================================================
+
+
+def print_status(cur, all_runs: bool = False):
+    cur.execute(
+        f"""
+        SELECT r.run_id, r.status,
+               count(*) FILTER (WHERE u.status = 'pending'),
+               count(*) FILTER (WHERE u.status = 'running'),
+               count(*) FILTER (WHERE u.status = 'done'),
+               count(*) FILTER (WHERE u.status = 'failed'),
+               COALESCE(sum(u.rows_loaded), 0),
+               count(DISTINCT u.leased_by) FILTER (WHERE u.status = 'running')
+        FROM {RUN_TABLE} r
+        JOIN {UNIT_TABLE} u ON u.run_id = r.run_id
+        WHERE %s OR r.finished_at IS NULL OR r.finished_at > now() - interval '1 day'
+        GROUP BY r.run_id, r.status, r.created_at
+        ORDER BY r.created_at
+    """,
+        (all_runs,),
+    )
+    runs = cur.fetchall()
+    print(f"{'run':<44} {'status':<8} {'pend':>5} {'run':>5} {'done':>5} {'fail':>5} {'rows':>10} {'workers':>7}")
+    for run_id, status, *counts, rows, workers in runs:
+        print(f"{run_id:<44} {status or 'open':<8} {counts[0]:>5} {counts[1]:>5} {counts[2]:>5} {counts[3]:>5} {rows:>10,} {workers:>7}")
+    if not runs:
+        print("  (no runs)")
+
+    cur.execute(f"SELECT bucket, rate, burst FROM {BUDGET_TABLE} ORDER BY bucket")
+    print("\nRate budgets:")
+    for bucket, rate, burst in cur.fetchall():
+        print(f"  {bucket}: {rate:g}/s (burst {burst:g})")
+
+
+def set_budget(cur, bucket: str, rate: float, burst: float = None):
+    burst = burst or max(rate, 1)
+    cur.execute(
+        f"""
+        INSERT INTO {BUDGET_TABLE} AS b (bucket, rate, burst, tokens) VALUES (%s, %s, %s, %s)
+        ON CONFLICT (bucket) DO UPDATE SET rate = EXCLUDED.rate, burst = EXCLUDED.burst,
+                                           tokens = LEAST(b.tokens, EXCLUDED.burst)
+    """,
+        (bucket, rate, burst, burst),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Distributed Accurate pulls through a PostgreSQL work queue",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python work_queue.py enqueue sales all --days 3
+  python work_queue.py enqueue stock ddd
+  python work_queue.py enqueue historical mbb --start 2024-01-01 --end 2026-02-08
+  python work_queue.py work                          # run on every host
+  python work_queue.py work --kind stock --exit-when-idle
+  python work_queue.py status
+  python work_queue.py budget accurate_api_ddd --rate 6
+""",
+    )
+    parser.add_argument("--pg-host", type=str, default=None, help="Override PG_HOST")
+    parser.add_argument(
+        "--env-dir",
+        type=str,
+        default=None,
+        help="Directory containing entity .env files (default: script dir)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("enqueue", help="List a pull's work and queue it as units")
+    p.add_argument("kind", choices=KINDS)
+    p.add_argument("entity", help="Entity key, or all")
+    p.add_argument("--days", type=int, default=3, help="sales: days to sync (default: 3)")
+    p.add_argument("--start", type=str, help="historical: start date (YYYY-MM-DD)")
+    p.add_argument("--end", type=str, help="historical: end date (YYYY-MM-DD)")
+    p.add_argument("--unit-size", type=int, default=UNIT_SIZE, help=f"sales: invoices per unit (default: {UNIT_SIZE})")
+
+    p = commands.add_parser("work", help="Claim and process units")
+    p.add_argument("--kind", choices=KINDS, action="append", help="Only this kind (repeatable)")
+    p.add_argument("--entity", action="append", help="Only this entity (repeatable)")
+    p.add_argument("--max-units", type=int, default=None, help="Stop after this many units")
+    p.add_argument("--exit-when-idle", action="store_true", help="Stop when no unit is claimable")
+    p.add_argument("--poll", type=float, default=POLL_SECONDS, help=f"Idle poll interval (default: {POLL_SECONDS}s)")
+
+    p = commands.add_parser("status", help="Show runs and rate budgets")
+    p.add_argument("--all", action="store_true", help="Include runs finished more than a day ago")
+
+    p = commands.add_parser("budget", help="Set a rate budget (tokens/s across all workers)")
+    p.add_argument("bucket", help="e.g. accurate_api_ddd, accurate_report_mbb")
+    p.add_argument("--rate", type=float, required=True)
+    p.add_argument("--burst", type=float, default=None, help="Default: max(rate, 1)")
+
+    args = parser.parse_args()
+
+    pg_env_path = SCRIPT_DIR / ".env"
+    if pg_env_path.exists():
+        load_dotenv(pg_env_path, override=False)
+    env_dir = Path(args.env_dir) if args.env_dir else SCRIPT_DIR
+
+    if args.command == "enqueue":
+        entities = ENTITIES[args.kind] if args.entity == "all" else [args.entity]
+        unknown = [e for e in entities if e not in ENTITIES[args.kind]]
+        if unknown:
+            parser.error(f"unknown {args.kind} entity: {', '.join(unknown)}")
+        start_date = end_date = None
+        if args.kind == KIND_HISTORICAL:
+            if not args.start or not args.end:
+                parser.error("historical needs --start and --end")
+            start_date = datetime.strptime(args.start, "%Y-%m-%d")
+            end_date = datetime.strptime(args.end, "%Y-%m-%d")
+        for entity_key in entities:
+            enqueue(
+                args.kind,
+                entity_key,
+                pg_host_override=args.pg_host,
+                env_dir=env_dir,
+                days=args.days,
+                start_date=start_date,
+                end_date=end_date,
+                unit_size=args.unit_size,
+            )
+
+    elif args.command == "work":
+        worker = Worker(args.pg_host, env_dir, kinds=args.kind, entities=args.entity)
+        try:
+            worker.run(max_units=args.max_units, exit_when_idle=args.exit_when_idle, poll=args.poll)
+        except KeyboardInterrupt:
+            print("\n\nInterrupted by user")
+            return 1
+
+    else:
+        conn = pg_pool.connection(args.pg_host)
+        try:
+            with conn.cursor() as cur:
+                if args.command == "status":
+                    print_status(cur, args.all)
+                else:
+                    set_budget(cur, args.bucket, args.rate, args.burst)
+                    print(f"  {args.bucket}: {args.rate:g}/s")
+            conn.commit()
+        except Exception:
+            pg_pool.rollback(conn)
+            raise
+        finally:
+            pg_pool.release(conn)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
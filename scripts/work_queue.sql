@@ -0,0 +1,67 @@
+-- ============================================================
+-- WORK QUEUE - raw.accurate_work_run / raw.accurate_work_unit
+--              raw.accurate_rate_budget
+-- Spreads one pull (daily sales, a stock snapshot, a historical
+-- backfill) over any number of worker processes on any host.
+--
+--   run   one coordinator call: kind + entity + snapshot_date.
+--         run_id is also the load_batch_id of every row it loads.
+--   unit  a slice of the run a worker fetches and loads in one
+--         transaction: a chunk of invoice ids, one item list page,
+--         or one report window.
+--
+-- Workers claim units with FOR UPDATE SKIP LOCKED and hold them under
+-- a lease (lease_expires_at). A unit whose lease ran out (crashed
+-- worker) is claimed again; after max_attempts it is marked failed.
+-- All API calls of all workers draw from raw.accurate_rate_budget.
+--
+-- Written by scripts/work_queue.py.
+--
+-- Apply once:   psql -d openclaw_ops -f scripts/work_queue.sql
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS raw.accurate_work_run (
+    run_id        text        PRIMARY KEY,
+    kind          text        NOT NULL,   -- 'sales' | 'stock' | 'historical'
+    entity        text        NOT NULL,
+    snapshot_date date        NOT NULL,
+    date_from     date,                   -- sales / historical period
+    date_to       date,
+    units         integer     NOT NULL,
+    lease_seconds integer     NOT NULL,
+    created_at    timestamptz NOT NULL DEFAULT now(),
+    finished_at   timestamptz,            -- set when no unit is pending/running
+    status        text                    -- 'success' | 'partial'
+);
+
+CREATE TABLE IF NOT EXISTS raw.accurate_work_unit (
+    id               bigserial   PRIMARY KEY,
+    run_id           text        NOT NULL REFERENCES raw.accurate_work_run ON DELETE CASCADE,
+    seq              integer     NOT NULL,
+    payload          jsonb       NOT NULL,   -- {"ids", "numbers"[, "page"]} | {"start", "end"}
+    status           text        NOT NULL DEFAULT 'pending',   -- pending | running | done | failed
+    attempts         integer     NOT NULL DEFAULT 0,
+    max_attempts     integer     NOT NULL DEFAULT 3,
+    leased_by        text,                   -- host:pid of the worker holding it
+    lease_expires_at timestamptz,
+    rows_loaded      integer,
+    dead_letters     integer,                -- invoices / items of the unit that failed
+    last_error       text,
+    started_at       timestamptz,
+    finished_at      timestamptz,
+    UNIQUE (run_id, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_accurate_work_unit_open
+    ON raw.accurate_work_unit (id)
+    WHERE status IN ('pending', 'running');
+
+-- Token bucket per API budget (e.g. accurate_api_ddd). Each call takes one
+-- token; tokens may go negative, and the caller then waits -tokens / rate.
+CREATE TABLE IF NOT EXISTS raw.accurate_rate_budget (
+    bucket     text             PRIMARY KEY,
+    rate       double precision NOT NULL,   -- tokens per second, all workers together
+    burst      double precision NOT NULL,
+    tokens     double precision NOT NULL,
+    updated_at timestamptz      NOT NULL DEFAULT clock_timestamp()
+);